@@ -0,0 +1,66 @@
+"""add embedding cache use seq
+
+Revision ID: a3f9c1d7e2b8
+Revises: d4a8e2c6f1b5
+Create Date: 2025-01-08 09:41:15.204873
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.schema import CreateSequence
+from sqlalchemy.schema import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3f9c1d7e2b8"
+down_revision = "d4a8e2c6f1b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    sequence = Sequence("embedding_cache_use_seq")
+    op.execute(CreateSequence(sequence))  # type: ignore
+    op.add_column(
+        "embedding_cache",
+        sa.Column(
+            "last_used_seq",
+            sa.BigInteger(),
+            nullable=True,
+            server_default=sequence.next_value(),
+        ),
+    )
+
+    # number the existing entries in least recently used order
+    op.execute(
+        """
+        UPDATE embedding_cache
+        SET last_used_seq = ordered.seq
+        FROM (
+            SELECT cache_key, nextval('embedding_cache_use_seq') AS seq
+            FROM (
+                SELECT cache_key FROM embedding_cache ORDER BY time_last_used
+            ) AS by_last_used
+        ) AS ordered
+        WHERE embedding_cache.cache_key = ordered.cache_key
+        """
+    )
+    op.alter_column("embedding_cache", "last_used_seq", nullable=False)
+
+    op.drop_index("ix_embedding_cache_time_last_used", table_name="embedding_cache")
+    op.create_index(
+        "ix_embedding_cache_last_used_seq",
+        "embedding_cache",
+        ["last_used_seq"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_embedding_cache_last_used_seq", table_name="embedding_cache")
+    op.create_index(
+        "ix_embedding_cache_time_last_used",
+        "embedding_cache",
+        ["time_last_used"],
+    )
+    op.drop_column("embedding_cache", "last_used_seq")
+    op.execute("DROP SEQUENCE embedding_cache_use_seq")
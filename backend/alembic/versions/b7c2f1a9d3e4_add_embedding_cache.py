@@ -0,0 +1,47 @@
+"""add embedding cache
+
+Revision ID: b7c2f1a9d3e4
+Revises: c0aab6edb6dd
+Create Date: 2024-12-20 10:12:41.318492
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b7c2f1a9d3e4"
+down_revision = "c0aab6edb6dd"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_cache",
+        sa.Column("cache_key", sa.String(), nullable=False),
+        sa.Column("model_name", sa.String(), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "time_last_used",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.create_index(
+        "ix_embedding_cache_time_last_used",
+        "embedding_cache",
+        ["time_last_used"],
+    )
+    op.create_index(
+        "ix_embedding_cache_model_name",
+        "embedding_cache",
+        ["model_name"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_embedding_cache_model_name", table_name="embedding_cache")
+    op.drop_index("ix_embedding_cache_time_last_used", table_name="embedding_cache")
+    op.drop_table("embedding_cache")
@@ -0,0 +1,49 @@
+"""add document chunk fingerprints
+
+Revision ID: d4a8e2c6f1b5
+Revises: b7c2f1a9d3e4
+Create Date: 2024-12-23 14:03:27.551209
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d4a8e2c6f1b5"
+down_revision = "b7c2f1a9d3e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "document_chunk_fingerprints",
+        sa.Column("document_id", sa.String(), nullable=False),
+        sa.Column("index_name", sa.String(), nullable=False),
+        sa.Column("doc_updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "chunk_fingerprints",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["document_id"],
+            ["document.id"],
+        ),
+        sa.PrimaryKeyConstraint("document_id", "index_name"),
+    )
+    op.create_index(
+        "ix_document_chunk_fingerprints_index_name",
+        "document_chunk_fingerprints",
+        ["index_name"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_document_chunk_fingerprints_index_name",
+        table_name="document_chunk_fingerprints",
+    )
+    op.drop_table("document_chunk_fingerprints")
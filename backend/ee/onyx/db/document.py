@@ -1,9 +1,12 @@
 from datetime import datetime
 from datetime import timezone
+from typing import Any
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from onyx.access.models import DocExternalAccess
 from onyx.access.models import ExternalAccess
 from onyx.access.utils import prefix_group_w_source
 from onyx.configs.constants import DocumentSource
@@ -101,3 +104,94 @@ def upsert_document_external_perms(
         db_session.commit()
 
     return False
+
+
+def upsert_document_external_perms_batch(
+    db_session: Session,
+    document_external_accesses: list[DocExternalAccess],
+    source_type: DocumentSource,
+) -> tuple[list[str], list[str]]:
+    """
+    Batched version of upsert_document_external_perms, the permissions of all the
+    documents are compared in one select and written in one INSERT ... ON CONFLICT.
+    Returns the ids of the documents that were created and the ids of the existing
+    documents whose permissions changed.
+    NOTE: this will replace any existing external access, it will not do a union
+    NOTE: this function is Postgres specific. Not all DBs support the ON CONFLICT clause.
+    """
+    # the last permissions of a document win, as they would with one upsert per document
+    doc_id_to_external_access = {
+        document_external_access.doc_id: document_external_access.external_access
+        for document_external_access in document_external_accesses
+    }
+    if not doc_id_to_external_access:
+        return [], []
+
+    existing_permissions = {
+        doc_id: (set(emails or []), set(group_ids or []), is_public)
+        for doc_id, emails, group_ids, is_public in db_session.execute(
+            select(
+                DbDocument.id,
+                DbDocument.external_user_emails,
+                DbDocument.external_user_group_ids,
+                DbDocument.is_public,
+            ).where(DbDocument.id.in_(doc_id_to_external_access.keys()))
+        )
+    }
+
+    # same clock as last_synced, which is also set from python
+    now = datetime.now(timezone.utc)
+    created_doc_ids: list[str] = []
+    changed_doc_ids: list[str] = []
+    rows: list[dict[str, Any]] = []
+    for doc_id, external_access in doc_id_to_external_access.items():
+        prefixed_external_groups: set[str] = {
+            prefix_group_w_source(
+                ext_group_name=group_id,
+                source=source_type,
+            )
+            for group_id in external_access.external_user_group_ids
+        }
+
+        existing = existing_permissions.get(doc_id)
+        if existing is None:
+            # If the document does not exist, still store the external access
+            # So that if the document is added later, the external access is already stored
+            # The upsert function in the indexing pipeline does not overwrite the permissions fields
+            created_doc_ids.append(doc_id)
+        elif existing != (
+            external_access.external_user_emails,
+            prefixed_external_groups,
+            external_access.is_public,
+        ):
+            changed_doc_ids.append(doc_id)
+        else:
+            continue
+
+        rows.append(
+            {
+                "id": doc_id,
+                "semantic_id": "",
+                "external_user_emails": list(external_access.external_user_emails),
+                "external_user_group_ids": list(prefixed_external_groups),
+                "is_public": external_access.is_public,
+                "last_modified": now,
+            }
+        )
+
+    if rows:
+        insert_stmt = insert(DbDocument).values(rows)
+        # also covers documents created by indexing since the select above
+        on_conflict_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "external_user_emails": insert_stmt.excluded.external_user_emails,
+                "external_user_group_ids": insert_stmt.excluded.external_user_group_ids,
+                "is_public": insert_stmt.excluded.is_public,
+                "last_modified": insert_stmt.excluded.last_modified,
+            },
+        )
+        db_session.execute(on_conflict_stmt)
+        db_session.commit()
+
+    return created_doc_ids, changed_doc_ids
@@ -6,6 +6,7 @@ from sqlalchemy import delete
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from onyx.access.user_acl_cache import invalidate_user_acl_cache
 from onyx.access.utils import prefix_group_w_source
 from onyx.configs.constants import DocumentSource
 from onyx.db.models import User__ExternalUserGroupId
@@ -95,6 +96,7 @@ def replace_user__ext_group_for_cc_pair(
 
     db_session.add_all(new_external_permissions)
     db_session.commit()
+    invalidate_user_acl_cache()
 
 
 def fetch_external_groups_for_user(
@@ -0,0 +1,178 @@
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import cast
+
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import EMBEDDING_BATCH_MAX_SIZE
+from shared_configs.configs import EMBEDDING_BATCH_MAX_WAIT_MS
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+
+class _PendingRequest:
+    def __init__(self, num_texts: int, future: "asyncio.Future[list[Embedding]]"):
+        self.future = future
+        self.embeddings: list[Embedding | None] = [None] * num_texts
+        self.num_remaining = num_texts
+
+    def set_embedding(self, position: int, embedding: Embedding) -> None:
+        if self.future.done():
+            return
+
+        self.embeddings[position] = embedding
+        self.num_remaining -= 1
+        if self.num_remaining == 0:
+            self.future.set_result(cast(list[Embedding], self.embeddings))
+
+    def set_exception(self, e: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(e)
+
+
+@dataclass
+class _PendingText:
+    text: str
+    request: _PendingRequest
+    position: int
+
+
+class EmbeddingBatcher:
+    """Coalesces the texts of concurrent embedding requests for one local model into shared
+    forward passes.
+
+    Texts are queued per text type. The worker waits up to `max_wait_seconds` for more texts
+    to arrive (or until `max_batch_size` texts are pending), then takes query texts first and
+    fills up the batch with passage texts in arrival order. Requests larger than a batch are
+    spread over several forward passes, so queries never wait for more than one batch of
+    passages. The encode function is expected to sort the batch by length and pad per
+    mini-batch, as SentenceTransformer.encode does, so mixing short and long texts in one
+    batch does not inflate the padding.
+
+    Batches are encoded one at a time in the default executor."""
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], list[Embedding]],
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_seconds: float = EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+    ) -> None:
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        self._query_texts: deque[_PendingText] = deque()
+        self._passage_texts: deque[_PendingText] = deque()
+        self._texts_pending = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+
+        self.num_batches = 0
+        self.num_texts = 0
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._query_texts) + len(self._passage_texts)
+
+    async def embed(
+        self, texts: list[str], text_type: EmbedTextType
+    ) -> list[Embedding]:
+        if not texts:
+            return []
+
+        future: asyncio.Future[
+            list[Embedding]
+        ] = asyncio.get_running_loop().create_future()
+        request = _PendingRequest(len(texts), future)
+        queue = (
+            self._query_texts
+            if text_type == EmbedTextType.QUERY
+            else self._passage_texts
+        )
+        queue.extend(
+            _PendingText(text=text, request=request, position=position)
+            for position, text in enumerate(texts)
+        )
+        self._texts_pending.set()
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        return await future
+
+    def _take_batch(self) -> list[_PendingText]:
+        batch: list[_PendingText] = []
+        for queue in (self._query_texts, self._passage_texts):
+            while queue and len(batch) < self.max_batch_size:
+                pending_text = queue.popleft()
+                # the request was cancelled or another part of it failed
+                if pending_text.request.future.done():
+                    continue
+                batch.append(pending_text)
+        return batch
+
+    async def _wait_for_batch(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_seconds
+        while self.num_pending < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._texts_pending.clear()
+            try:
+                await asyncio.wait_for(self._texts_pending.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._texts_pending.wait()
+            await self._wait_for_batch()
+
+            batch = self._take_batch()
+            if self.num_pending:
+                self._texts_pending.set()
+            else:
+                self._texts_pending.clear()
+            if not batch:
+                continue
+
+            try:
+                embeddings = await loop.run_in_executor(
+                    None, self.encode, [pending.text for pending in batch]
+                )
+            except Exception as e:
+                for pending in batch:
+                    pending.request.set_exception(e)
+                continue
+
+            self.num_batches += 1
+            self.num_texts += len(batch)
+            logger.debug(
+                f"Embedded batch of {len(batch)} texts from "
+                f"{len({id(pending.request) for pending in batch})} requests, "
+                f"{self.num_pending} texts still pending"
+            )
+
+            for pending, embedding in zip(batch, embeddings):
+                pending.request.set_embedding(pending.position, embedding)
+
+
+_BATCHERS: dict[tuple[str, int, bool], EmbeddingBatcher] = {}
+
+
+def get_embedding_batcher(
+    model_name: str,
+    max_context_length: int,
+    normalize_embeddings: bool,
+    encode: Callable[[list[str]], list[Embedding]],
+) -> EmbeddingBatcher:
+    """Requests can only share a forward pass if they are embedded exactly the same way.
+    The prefix is not part of the key since it is already applied to the texts."""
+    key = (model_name, max_context_length, normalize_embeddings)
+    if key not in _BATCHERS:
+        _BATCHERS[key] = EmbeddingBatcher(encode=encode)
+    return _BATCHERS[key]
@@ -9,6 +9,8 @@ from transformers import PreTrainedTokenizer  # type: ignore
 from model_server.constants import MODEL_WARM_UP_STRING
 from model_server.onyx_torch_model import ConnectorClassifier
 from model_server.onyx_torch_model import HybridClassifier
+from model_server.quantization import quantize_dynamic_int8
+from model_server.quantization import use_int8_quantization
 from model_server.utils import simple_log_function_time
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import CONNECTOR_CLASSIFIER_MODEL_REPO
@@ -109,6 +111,8 @@ def get_local_intent_model(
                     f"Failed to load model even after attempted snapshot download: {e}"
                 )
                 raise
+        if use_int8_quantization(model_name_or_path):
+            _INTENT_MODEL = quantize_dynamic_int8(_INTENT_MODEL)
     return _INTENT_MODEL
 
 
@@ -1,5 +1,6 @@
 import asyncio
 import json
+from functools import partial
 from types import TracebackType
 from typing import cast
 from typing import Optional
@@ -20,17 +21,22 @@ from sentence_transformers import SentenceTransformer  # type: ignore
 from vertexai.language_models import TextEmbeddingInput  # type: ignore
 from vertexai.language_models import TextEmbeddingModel  # type: ignore
 
+from model_server.batching import get_embedding_batcher
 from model_server.constants import DEFAULT_COHERE_MODEL
 from model_server.constants import DEFAULT_OPENAI_MODEL
 from model_server.constants import DEFAULT_VERTEX_MODEL
 from model_server.constants import DEFAULT_VOYAGE_MODEL
 from model_server.constants import EmbeddingModelTextType
 from model_server.constants import EmbeddingProvider
+from model_server.quantization import quantize_dynamic_int8
+from model_server.quantization import use_int8_quantization
 from model_server.utils import simple_log_function_time
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import API_BASED_EMBEDDING_TIMEOUT
+from shared_configs.configs import ENABLE_EMBEDDING_BATCHING
 from shared_configs.configs import INDEXING_ONLY
 from shared_configs.configs import OPENAI_EMBEDDING_TIMEOUT
+from shared_configs.configs import RERANK_BATCH_SIZE
 from shared_configs.enums import EmbedTextType
 from shared_configs.enums import RerankerProvider
 from shared_configs.model_server_models import Embedding
@@ -287,6 +293,8 @@ def get_embedding_model(
             model_name_or_path=model_name,
             trust_remote_code=True,
         )
+        if use_int8_quantization(model_name):
+            model = quantize_dynamic_int8(model)
         model.max_seq_length = max_context_length
         _GLOBAL_MODELS_DICT[model_name] = model
     elif max_context_length != _GLOBAL_MODELS_DICT[model_name].max_seq_length:
@@ -302,10 +310,26 @@ def get_local_reranking_model(
     if _RERANK_MODEL is None:
         logger.notice(f"Loading {model_name}")
         model = CrossEncoder(model_name)
+        if use_int8_quantization(model_name):
+            model.model = quantize_dynamic_int8(model.model)
         _RERANK_MODEL = model
     return _RERANK_MODEL
 
 
+def _local_encode(
+    texts: list[str],
+    local_model: "SentenceTransformer",
+    normalize_embeddings: bool,
+) -> list[Embedding]:
+    embeddings_vectors = local_model.encode(
+        texts, normalize_embeddings=normalize_embeddings
+    )
+    return [
+        embedding if isinstance(embedding, list) else embedding.tolist()
+        for embedding in embeddings_vectors
+    ]
+
+
 @simple_log_function_time()
 async def embed_text(
     texts: list[str],
@@ -370,17 +394,28 @@ async def embed_text(
         local_model = get_embedding_model(
             model_name=model_name, max_context_length=max_context_length
         )
-        # Run CPU-bound embedding in a thread pool
-        embeddings_vectors = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: local_model.encode(
-                prefixed_texts, normalize_embeddings=normalize_embeddings
-            ),
-        )
-        embeddings = [
-            embedding if isinstance(embedding, list) else embedding.tolist()
-            for embedding in embeddings_vectors
-        ]
+        if ENABLE_EMBEDDING_BATCHING:
+            batcher = get_embedding_batcher(
+                model_name=model_name,
+                max_context_length=max_context_length,
+                normalize_embeddings=normalize_embeddings,
+                encode=partial(
+                    _local_encode,
+                    local_model=local_model,
+                    normalize_embeddings=normalize_embeddings,
+                ),
+            )
+            embeddings = await batcher.embed(prefixed_texts, text_type)
+        else:
+            # Run CPU-bound embedding in a thread pool
+            embeddings = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: _local_encode(
+                    prefixed_texts,
+                    local_model=local_model,
+                    normalize_embeddings=normalize_embeddings,
+                ),
+            )
 
     else:
         logger.error("Neither model name nor provider specified for embedding")
@@ -392,13 +427,32 @@ async def embed_text(
     return embeddings
 
 
+def _length_sorted_predict(
+    cross_encoder: CrossEncoder,
+    query: str,
+    docs: list[str],
+    batch_size: int = RERANK_BATCH_SIZE,
+) -> list[float]:
+    """CrossEncoder.predict pads every mini-batch to its longest pair and keeps the pairs in
+    the given order. Predicting the pairs sorted by length puts docs of similar lengths in the
+    same mini-batch so short docs are not padded to the longest doc of the request."""
+    order = sorted(range(len(docs)), key=lambda ind: len(docs[ind]))
+    sorted_scores = cross_encoder.predict(
+        [(query, docs[ind]) for ind in order], batch_size=batch_size
+    )
+
+    scores = [0.0] * len(docs)
+    for sorted_ind, doc_ind in enumerate(order):
+        scores[doc_ind] = float(sorted_scores[sorted_ind])
+    return scores
+
+
 @simple_log_function_time()
 async def local_rerank(query: str, docs: list[str], model_name: str) -> list[float]:
     cross_encoder = get_local_reranking_model(model_name)
     # Run CPU-bound reranking in a thread pool
     return await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: cross_encoder.predict([(query, doc) for doc in docs]).tolist(),  # type: ignore
+        None, _length_sorted_predict, cross_encoder, query, docs
     )
 
 
@@ -0,0 +1,34 @@
+from typing import TypeVar
+
+import torch
+
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import INT8_QUANTIZED_MODELS
+
+logger = setup_logger()
+
+M = TypeVar("M", bound=torch.nn.Module)
+
+
+def use_int8_quantization(model_name: str) -> bool:
+    return model_name in INT8_QUANTIZED_MODELS
+
+
+def quantize_dynamic_int8(model: M) -> M:
+    """Replaces the linear layers of the model (in place) with ones that store their weights as
+    int8 and quantize the activations on the fly. The linear layers make up most of the compute
+    of transformer encoders on CPU, so this cuts their latency at a small accuracy cost.
+    Quantized kernels only exist for CPU, models on other devices are left as is.
+    """
+    device = next(model.parameters()).device
+    if device.type != "cpu":
+        logger.warning(
+            f"Not quantizing {type(model).__name__}, int8 quantization is only "
+            f"supported on CPU and the model is on {device}"
+        )
+        return model
+
+    logger.notice(f"Quantizing the linear layers of {type(model).__name__} to int8")
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session
 
 from onyx.access.models import DocumentAccess
+from onyx.access.user_acl_cache import cache_acl_for_user
+from onyx.access.user_acl_cache import get_cached_acl_for_user
 from onyx.access.utils import prefix_user_email
+from onyx.configs.app_configs import USER_ACL_CACHE_TTL
 from onyx.configs.constants import PUBLIC_DOC_PAT
 from onyx.db.document import get_access_info_for_document
 from onyx.db.document import get_access_info_for_documents
@@ -102,7 +105,17 @@ def _get_acl_for_user(user: User | None, db_session: Session) -> set[str]:
 
 
 def get_acl_for_user(user: User | None, db_session: Session | None = None) -> set[str]:
+    generation = None
+    if user and USER_ACL_CACHE_TTL > 0:
+        cached_acl, generation = get_cached_acl_for_user(user.id)
+        if cached_acl is not None:
+            return cached_acl
+
     versioned_acl_for_user_fn = fetch_versioned_implementation(
         "onyx.access.access", "_get_acl_for_user"
     )
-    return versioned_acl_for_user_fn(user, db_session)  # type: ignore
+    acl: set[str] = versioned_acl_for_user_fn(user, db_session)  # type: ignore
+
+    if user and generation is not None:
+        cache_acl_for_user(user.id, acl, generation)
+    return acl
@@ -0,0 +1,75 @@
+import json
+from typing import cast
+from uuid import UUID
+
+from onyx.configs.app_configs import USER_ACL_CACHE_TTL
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import CURRENT_TENANT_ID_CONTEXTVAR
+
+logger = setup_logger()
+
+
+REDIS_KEY_PREFIX = "user_acl:"
+# Bumped whenever group memberships change, every cached ACL of the tenant refers to the
+# generation it was computed in so bumping it invalidates all of them at once
+ACL_GENERATION_KEY = "user_acl_generation"
+
+
+def _get_generation(tenant_id: str | None) -> int:
+    raw = cast(
+        bytes | None, get_redis_client(tenant_id=tenant_id).get(ACL_GENERATION_KEY)
+    )
+    return int(raw) if raw else 0
+
+
+def _get_cache_key(user_id: UUID, generation: int) -> str:
+    return f"{REDIS_KEY_PREFIX}{generation}:{user_id}"
+
+
+def get_cached_acl_for_user(user_id: UUID) -> tuple[set[str] | None, int | None]:
+    """Returns the cached ACL of the user (None on a miss) and the generation to cache a
+    freshly computed ACL under (None if Redis is unavailable)."""
+    tenant_id = CURRENT_TENANT_ID_CONTEXTVAR.get()
+    try:
+        generation = _get_generation(tenant_id)
+        raw = cast(
+            bytes | None,
+            get_redis_client(tenant_id=tenant_id).get(
+                _get_cache_key(user_id, generation)
+            ),
+        )
+    except Exception as e:
+        logger.error(f"Failed to get cached ACL for user {user_id}: {str(e)}")
+        return None, None
+
+    if raw is None:
+        return None, generation
+    return set(json.loads(raw)), generation
+
+
+def cache_acl_for_user(user_id: UUID, acl: set[str], generation: int) -> None:
+    """The ACL is cached under the generation read before it was computed, so an ACL that
+    raced with a membership change is never served after the change."""
+    tenant_id = CURRENT_TENANT_ID_CONTEXTVAR.get()
+    try:
+        get_redis_client(tenant_id=tenant_id).set(
+            _get_cache_key(user_id, generation),
+            json.dumps(sorted(acl)),
+            ex=USER_ACL_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.error(f"Failed to cache ACL for user {user_id}: {str(e)}")
+
+
+def invalidate_user_acl_cache(tenant_id: str | None = None) -> None:
+    """Must be called after group membership changes are committed."""
+    if USER_ACL_CACHE_TTL <= 0:
+        return
+
+    tenant_id = tenant_id or CURRENT_TENANT_ID_CONTEXTVAR.get()
+    try:
+        get_redis_client(tenant_id=tenant_id).incrby(ACL_GENERATION_KEY, 1)
+    except Exception as e:
+        # cached ACLs expire after USER_ACL_CACHE_TTL at the latest
+        logger.error(f"Failed to invalidate the user ACL cache: {str(e)}")
@@ -11,6 +11,8 @@ from celery.signals import worker_ready
 from celery.signals import worker_shutdown
 
 import onyx.background.celery.apps.app_base as app_base
+from onyx.background.celery.tasks.indexing.tasks import get_warm_job_client
+from onyx.configs.app_configs import ENABLE_WARM_INDEXING_WORKERS
 from onyx.configs.constants import POSTGRES_CELERY_WORKER_INDEXING_APP_NAME
 from onyx.db.engine import SqlEngine
 from onyx.utils.logger import setup_logger
@@ -66,6 +68,10 @@ def on_worker_init(sender: Any, **kwargs: Any) -> None:
     app_base.wait_for_db(sender, **kwargs)
     app_base.wait_for_vespa(sender, **kwargs)
 
+    # start the indexing processes now so that the first attempts don't pay for their startup
+    if ENABLE_WARM_INDEXING_WORKERS:
+        get_warm_job_client(n_workers=sender.concurrency).prewarm()
+
     # Less startup checks in multi-tenant case
     if MULTI_TENANT:
         return
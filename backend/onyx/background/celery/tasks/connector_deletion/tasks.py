@@ -155,11 +155,11 @@ def try_generate_document_cc_pair_cleanup_tasks(
         task_logger.info(
             f"RedisConnectorDeletion.generate_tasks starting. cc_pair={cc_pair_id}"
         )
-        tasks_generated = redis_connector.delete.generate_tasks(
-            app, db_session, lock_beat
-        )
-        if tasks_generated is None:
+        result = redis_connector.delete.generate_tasks(app, db_session, lock_beat)
+        if result is None:
             raise ValueError("RedisConnectorDeletion.generate_tasks returned None")
+
+        tasks_generated, docs_generated = result
     except TaskDependencyError:
         redis_connector.delete.set_fence(None)
         raise
@@ -176,11 +176,13 @@ def try_generate_document_cc_pair_cleanup_tasks(
 
         task_logger.info(
             "RedisConnectorDeletion.generate_tasks finished. "
-            f"cc_pair={cc_pair_id} tasks_generated={tasks_generated}"
+            f"cc_pair={cc_pair_id} tasks_generated={tasks_generated} "
+            f"docs_generated={docs_generated}"
         )
 
         # set this only after all tasks have been added
         fence_payload.num_tasks = tasks_generated
+        fence_payload.num_docs = docs_generated
         redis_connector.delete.set_fence(fence_payload)
 
     return tasks_generated
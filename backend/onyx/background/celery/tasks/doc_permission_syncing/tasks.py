@@ -12,10 +12,13 @@ from redis.lock import Lock as RedisLock
 
 from ee.onyx.db.connector_credential_pair import get_all_auto_sync_cc_pairs
 from ee.onyx.db.document import upsert_document_external_perms
+from ee.onyx.db.document import upsert_document_external_perms_batch
 from ee.onyx.external_permissions.sync_params import DOC_PERMISSION_SYNC_PERIODS
 from ee.onyx.external_permissions.sync_params import DOC_PERMISSIONS_FUNC_MAP
 from onyx.access.models import DocExternalAccess
 from onyx.background.celery.apps.app_base import task_logger
+from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
+from onyx.background.celery.tasks.shared.tasks import sync_documents_to_vespa
 from onyx.configs.app_configs import JOB_TIMEOUT
 from onyx.configs.constants import CELERY_PERMISSIONS_SYNC_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
@@ -32,6 +35,8 @@ from onyx.db.enums import AccessType
 from onyx.db.enums import ConnectorCredentialPairStatus
 from onyx.db.models import ConnectorCredentialPair
 from onyx.db.users import batch_add_ext_perm_user_if_not_exists
+from onyx.document_index.document_index_utils import get_both_index_names
+from onyx.document_index.factory import get_default_document_index
 from onyx.redis.redis_connector import RedisConnector
 from onyx.redis.redis_connector_doc_perm_sync import (
     RedisConnectorPermissionSyncPayload,
@@ -343,3 +348,99 @@ def update_external_document_permissions_task(
     except Exception:
         logger.exception("Error Syncing Document Permissions")
         return False
+
+
+@shared_task(
+    name=OnyxCeleryTask.UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_BATCH_TASK,
+    soft_time_limit=LIGHT_SOFT_TIME_LIMIT,
+    time_limit=LIGHT_TIME_LIMIT,
+    max_retries=DOCUMENT_PERMISSIONS_UPDATE_MAX_RETRIES,
+    bind=True,
+)
+def update_external_document_permissions_batch_task(
+    self: Task,
+    tenant_id: str | None,
+    serialized_doc_external_accesses: list[dict],
+    source_string: str,
+    connector_id: int,
+    credential_id: int,
+) -> bool:
+    """Batched version of update_external_document_permissions_task. The users and the
+    permissions of all the documents are upserted in a few statements, then the
+    documents whose permissions changed get their access updated in Vespa in one
+    concurrent pass. Documents that fail to update in Vespa stay modified but unsynced
+    and are picked up by the stale document sync."""
+    document_external_accesses = [
+        DocExternalAccess.from_dict(serialized_doc_external_access)
+        for serialized_doc_external_access in serialized_doc_external_accesses
+    ]
+    try:
+        with get_session_with_tenant(tenant_id) as db_session:
+            # Add the users to the DB if they don't exist
+            emails: set[str] = set()
+            for document_external_access in document_external_accesses:
+                emails.update(
+                    document_external_access.external_access.external_user_emails
+                )
+            batch_add_ext_perm_user_if_not_exists(
+                db_session=db_session,
+                emails=list(emails),
+            )
+            # Then we upsert the documents' external permissions in postgres
+            created_doc_ids, changed_doc_ids = upsert_document_external_perms_batch(
+                db_session=db_session,
+                document_external_accesses=document_external_accesses,
+                source_type=DocumentSource(source_string),
+            )
+
+            if created_doc_ids:
+                # If new documents were created, we associate them with the cc_pair
+                upsert_document_by_connector_credential_pair(
+                    db_session=db_session,
+                    connector_id=connector_id,
+                    credential_id=credential_id,
+                    document_ids=created_doc_ids,
+                )
+
+            synced_doc_ids: list[str] = []
+            failures: dict[str, Exception] = {}
+            chunks_affected = 0
+            if changed_doc_ids:
+                curr_ind_name, sec_ind_name = get_both_index_names(db_session)
+                doc_index = get_default_document_index(
+                    primary_index_name=curr_ind_name, secondary_index_name=sec_ind_name
+                )
+                synced_doc_ids, failures, chunks_affected = sync_documents_to_vespa(
+                    changed_doc_ids, db_session, RetryDocumentIndex(doc_index)
+                )
+
+            for doc_id, e in failures.items():
+                task_logger.warning(
+                    f"Vespa access update failed, left for the stale document sync: "
+                    f"doc={doc_id} exception={e!r}"
+                )
+
+            task_logger.info(
+                f"update_external_document_permissions_batch_task finished: "
+                f"docs={len(document_external_accesses)} "
+                f"created={len(created_doc_ids)} "
+                f"changed={len(changed_doc_ids)} "
+                f"vespa_synced={len(synced_doc_ids)} "
+                f"chunks={chunks_affected}"
+            )
+        return True
+    except SoftTimeLimitExceeded:
+        task_logger.info(
+            f"SoftTimeLimitExceeded exception. "
+            f"docs={len(document_external_accesses)}"
+        )
+        return False
+    except Exception as e:
+        logger.exception("Error Syncing Document Permissions")
+
+        if self.request.retries < DOCUMENT_PERMISSIONS_UPDATE_MAX_RETRIES:
+            # the upserts are idempotent, so the whole batch is retried.
+            # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+            countdown = 2 ** (self.request.retries + 4)
+            self.retry(exc=e, countdown=countdown)
+        return False
@@ -1,3 +1,4 @@
+import threading
 import time
 from datetime import datetime
 from datetime import timezone
@@ -19,8 +20,14 @@ from sqlalchemy.orm import Session
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.celery_redis import celery_find_task
 from onyx.background.indexing.job_client import SimpleJobClient
+from onyx.background.indexing.job_client import WarmJobClient
 from onyx.background.indexing.run_indexing import run_indexing_entrypoint
 from onyx.configs.app_configs import DISABLE_INDEX_UPDATE_ON_SWAP
+from onyx.configs.app_configs import ENABLE_WARM_INDEXING_WORKERS
+from onyx.configs.app_configs import INDEXING_PROGRESS_FLUSH_INTERVAL
+from onyx.configs.app_configs import INDEXING_STOP_CHECK_INTERVAL
+from onyx.configs.app_configs import INDEXING_WORKER_MAX_ATTEMPTS
+from onyx.configs.app_configs import INDEXING_WORKER_MAX_MEMORY_MB
 from onyx.configs.constants import CELERY_INDEXING_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import DANSWER_REDIS_FUNCTION_LOCK_PREFIX
@@ -69,6 +76,17 @@ logger = setup_logger()
 
 
 class IndexingCallback(IndexingHeartbeatInterface):
+    """Heartbeat of the indexing and pruning generators.
+
+    It is called per document / batch, so the Redis round trips are coalesced: progress is
+    accumulated locally and written every INDEXING_PROGRESS_FLUSH_INTERVAL seconds, the stop
+    signal is re-read at most every INDEXING_STOP_CHECK_INTERVAL seconds (once seen, it
+    sticks), and the lock is only reacquired once a quarter of its timeout has elapsed.
+    Call flush_progress before reading the progress key."""
+
+    # fraction of the lock timeout after which progress() reacquires the lock
+    LOCK_REACQUIRE_FRACTION = 0.25
+
     def __init__(
         self,
         stop_key: str,
@@ -87,28 +105,86 @@ class IndexingCallback(IndexingHeartbeatInterface):
         self.last_tag: str = "IndexingCallback.__init__"
         self.last_lock_reacquire: datetime = datetime.now(timezone.utc)
 
+        # the callback may be invoked from several threads (pipelined indexing)
+        self._state_lock = threading.Lock()
+        self._lock_reacquire_interval = (
+            self.redis_lock.timeout * self.LOCK_REACQUIRE_FRACTION
+            if self.redis_lock.timeout
+            else 0.0
+        )
+        self._last_lock_reacquire_time = time.monotonic()
+        self._pending_progress = 0
+        self._last_progress_flush_time = float("-inf")
+        self._stopped = False
+        self._last_stop_check_time = float("-inf")
+
     def should_stop(self) -> bool:
-        if self.redis_client.exists(self.stop_key):
-            return True
-        return False
+        with self._state_lock:
+            now = time.monotonic()
+            if self._stopped:
+                return True
+
+            if now - self._last_stop_check_time >= INDEXING_STOP_CHECK_INTERVAL:
+                self._stopped = bool(self.redis_client.exists(self.stop_key))
+                self._last_stop_check_time = now
+
+            return self._stopped
 
     def progress(self, tag: str, amount: int) -> None:
-        try:
-            self.redis_lock.reacquire()
+        with self._state_lock:
+            now = time.monotonic()
+            if now - self._last_lock_reacquire_time >= self._lock_reacquire_interval:
+                try:
+                    self.redis_lock.reacquire()
+                    self.last_lock_reacquire = datetime.now(timezone.utc)
+                    self._last_lock_reacquire_time = now
+                except LockError:
+                    logger.exception(
+                        f"IndexingCallback - lock.reacquire exceptioned. "
+                        f"lock_timeout={self.redis_lock.timeout} "
+                        f"start={self.started} "
+                        f"last_tag={self.last_tag} "
+                        f"last_reacquired={self.last_lock_reacquire} "
+                        f"now={datetime.now(timezone.utc)}"
+                    )
+                    raise
+
             self.last_tag = tag
-            self.last_lock_reacquire = datetime.now(timezone.utc)
-        except LockError:
-            logger.exception(
-                f"IndexingCallback - lock.reacquire exceptioned. "
-                f"lock_timeout={self.redis_lock.timeout} "
-                f"start={self.started} "
-                f"last_tag={self.last_tag} "
-                f"last_reacquired={self.last_lock_reacquire} "
-                f"now={datetime.now(timezone.utc)}"
+            self._pending_progress += amount
+            if now - self._last_progress_flush_time >= INDEXING_PROGRESS_FLUSH_INTERVAL:
+                self._flush_progress(now)
+
+    def flush_progress(self) -> None:
+        """Writes the progress accumulated since the last write to Redis."""
+        with self._state_lock:
+            self._flush_progress(time.monotonic())
+
+    def _flush_progress(self, now: float) -> None:
+        if self._pending_progress:
+            self.redis_client.incrby(
+                self.generator_progress_key, self._pending_progress
             )
-            raise
+            self._pending_progress = 0
+        self._last_progress_flush_time = now
 
-        self.redis_client.incrby(self.generator_progress_key, amount)
+
+_warm_job_client: WarmJobClient | None = None
+_warm_job_client_lock = threading.Lock()
+
+
+def get_warm_job_client(n_workers: int = 1) -> WarmJobClient:
+    """The pool of warm spawned indexing processes shared by the proxy tasks of this
+    celery worker. n_workers only applies to the first call, which creates the pool."""
+    global _warm_job_client
+    with _warm_job_client_lock:
+        if _warm_job_client is None:
+            _warm_job_client = WarmJobClient(
+                n_workers=n_workers,
+                preload_modules=[__name__],
+                max_jobs_per_worker=INDEXING_WORKER_MAX_ATTEMPTS,
+                max_memory_bytes=INDEXING_WORKER_MAX_MEMORY_MB * 1024 * 1024,
+            )
+        return _warm_job_client
 
 
 def get_unfenced_index_attempt_ids(db_session: Session, r: redis.Redis) -> list[int]:
@@ -762,7 +838,9 @@ def connector_indexing_proxy_task(
     if not self.request.id:
         task_logger.error("self.request.id is None!")
 
-    client = SimpleJobClient()
+    client: SimpleJobClient | WarmJobClient = (
+        get_warm_job_client() if ENABLE_WARM_INDEXING_WORKERS else SimpleJobClient()
+    )
 
     job = client.submit(
         connector_indexing_task_wrapper,
@@ -854,9 +932,7 @@ def connector_indexing_proxy_task(
         if job.status == "error":
             ignore_exitcode = False
 
-            exit_code: int | None = None
-            if job.process:
-                exit_code = job.process.exitcode
+            exit_code = job.exit_code
 
             # seeing odd behavior where spawned tasks usually return exit code 1 in the cloud,
             # even though logging clearly indicates that they completed successfully
@@ -894,7 +970,8 @@ def connector_indexing_proxy_task(
     task_logger.info(
         f"Indexing watchdog - finished: attempt={index_attempt_id} "
         f"cc_pair={cc_pair_id} "
-        f"search_settings={search_settings_id}"
+        f"search_settings={search_settings_id} "
+        f"startup_latency={job.startup_latency}"
     )
     return
 
@@ -1098,6 +1175,7 @@ def connector_indexing_task(
         )
 
         # get back the total number of indexed docs and return it
+        callback.flush_progress()
         n_final_progress = redis_connector_index.get_progress()
         redis_connector_index.set_generator_complete(HTTPStatus.OK.value)
     except Exception as e:
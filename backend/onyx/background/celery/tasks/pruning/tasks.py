@@ -293,6 +293,7 @@ def connector_pruning_generator_task(
             all_connector_doc_ids: set[str] = extract_ids_from_runnable_connector(
                 runnable_connector, callback
             )
+            callback.flush_progress()
 
             # a list of docs in our local index
             all_indexed_document_ids = {
@@ -1,27 +1,43 @@
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
 from http import HTTPStatus
+from typing import Any
 
 import httpx
 from celery import shared_task
 from celery import Task
 from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy.orm import Session
 from tenacity import RetryError
 
 from onyx.access.access import get_access_for_document
+from onyx.access.access import get_access_for_documents
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
+from onyx.configs.app_configs import VESPA_SYNC_MAX_THREADS
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.db.document import delete_document_by_connector_credential_pair__no_commit
+from onyx.db.document import delete_documents_by_connector_credential_pair__no_commit
 from onyx.db.document import delete_documents_complete__no_commit
 from onyx.db.document import get_document
 from onyx.db.document import get_document_connector_count
+from onyx.db.document import get_document_connector_counts
+from onyx.db.document import get_documents_by_ids
 from onyx.db.document import mark_document_as_modified
 from onyx.db.document import mark_document_as_synced
+from onyx.db.document import mark_documents_as_modified
+from onyx.db.document import mark_documents_as_synced
 from onyx.db.document_set import fetch_document_sets_for_document
+from onyx.db.document_set import fetch_document_sets_for_documents
 from onyx.db.engine import get_session_with_tenant
 from onyx.document_index.document_index_utils import get_both_index_names
 from onyx.document_index.factory import get_default_document_index
 from onyx.document_index.interfaces import VespaDocumentFields
 from onyx.server.documents.models import ConnectorCredentialPairIdentifier
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 DOCUMENT_BY_CC_PAIR_CLEANUP_MAX_RETRIES = 3
 
@@ -30,6 +46,112 @@ DOCUMENT_BY_CC_PAIR_CLEANUP_MAX_RETRIES = 3
 LIGHT_SOFT_TIME_LIMIT = 105
 LIGHT_TIME_LIMIT = LIGHT_SOFT_TIME_LIMIT + 15
 
+# batch tasks run VESPA_SYNC_MAX_THREADS Vespa calls at a time, and each call can take up to
+# the single document limit
+BATCH_SOFT_TIME_LIMIT = LIGHT_SOFT_TIME_LIMIT * math.ceil(
+    VESPA_SYNC_BATCH_SIZE / VESPA_SYNC_MAX_THREADS
+)
+BATCH_TIME_LIMIT = BATCH_SOFT_TIME_LIMIT + 15
+
+
+@dataclass
+class VespaSyncResult:
+    synced_document_ids: list[str] = field(default_factory=list)
+    failures: dict[str, Exception] = field(default_factory=dict)
+    chunks_affected: int = 0
+
+
+def get_vespa_document_fields(
+    document_ids: list[str], db_session: Session
+) -> dict[str, VespaDocumentFields]:
+    """Loads the document sets, access, boost and hidden flag of the documents in a few
+    queries. Documents that don't exist in the db are left out."""
+    docs = get_documents_by_ids(db_session, document_ids)
+    found_document_ids = [doc.id for doc in docs]
+
+    # the below functions do not include cc_pairs being deleted.
+    doc_id_to_doc_sets = dict(
+        fetch_document_sets_for_documents(found_document_ids, db_session)
+    )
+    doc_id_to_access = get_access_for_documents(
+        document_ids=found_document_ids, db_session=db_session
+    )
+
+    return {
+        doc.id: VespaDocumentFields(
+            document_sets=set(doc_id_to_doc_sets.get(doc.id, [])),
+            access=doc_id_to_access[doc.id],
+            boost=doc.boost,
+            hidden=doc.hidden,
+        )
+        for doc in docs
+    }
+
+
+def try_document_index_call(func: Callable[..., int], *args: Any) -> int | Exception:
+    """Calls a RetryDocumentIndex method and returns the number of chunks affected, or
+    the exception it failed with so that one failed document does not fail a whole
+    batch. Tenacity RetryErrors are unwrapped to the last exception."""
+    try:
+        return func(*args)
+    except Exception as ex:
+        if isinstance(ex, RetryError):
+            # only return the inner exception if it is of type Exception
+            e_temp = ex.last_attempt.exception()
+            if isinstance(e_temp, Exception):
+                return e_temp
+        return ex
+
+
+def sync_documents_to_vespa(
+    document_ids: list[str],
+    db_session: Session,
+    retry_index: RetryDocumentIndex,
+    result: VespaSyncResult | None = None,
+) -> tuple[list[str], dict[str, Exception], int]:
+    """Updates the document sets, access, boost and hidden flag of the documents in
+    Vespa and marks them as synced. The fields of all the documents are loaded up front
+    in a few queries, then the documents are updated VESPA_SYNC_MAX_THREADS at a time and
+    each group is marked as synced as soon as it finishes. Documents that don't exist in
+    the db are skipped.
+
+    Returns the synced document ids, the exceptions of the failed documents by id and
+    the number of chunks updated. They are also collected in result as the sync goes, so
+    pass one in to know how far the sync got if it is interrupted."""
+    if result is None:
+        result = VespaSyncResult()
+
+    doc_id_to_fields = list(get_vespa_document_fields(document_ids, db_session).items())
+    for start in range(0, len(doc_id_to_fields), VESPA_SYNC_MAX_THREADS):
+        group = doc_id_to_fields[start : start + VESPA_SYNC_MAX_THREADS]
+
+        # update Vespa. OK if doc doesn't exist. Raises exception otherwise.
+        results = run_functions_tuples_in_parallel(
+            [
+                (
+                    try_document_index_call,
+                    (retry_index.update_single, document_id, fields),
+                )
+                for document_id, fields in group
+            ],
+            max_workers=VESPA_SYNC_MAX_THREADS,
+        )
+
+        synced_document_ids: list[str] = []
+        for (document_id, _), call_result in zip(group, results):
+            if isinstance(call_result, Exception):
+                result.failures[document_id] = call_result
+            else:
+                synced_document_ids.append(document_id)
+                result.chunks_affected += call_result
+
+        # update db last. Worst case = we crash right before this and
+        # the sync might repeat again later
+        mark_documents_as_synced(synced_document_ids, db_session)
+        result.synced_document_ids.extend(synced_document_ids)
+
+    return result.synced_document_ids, result.failures, result.chunks_affected
+
 
 @shared_task(
     name=OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
@@ -187,3 +309,205 @@ def document_by_cc_pair_cleanup_task(
         return False
 
     return True
+
+
+@shared_task(
+    name=OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_BATCH_TASK,
+    soft_time_limit=BATCH_SOFT_TIME_LIMIT,
+    time_limit=BATCH_TIME_LIMIT,
+    max_retries=DOCUMENT_BY_CC_PAIR_CLEANUP_MAX_RETRIES,
+    bind=True,
+)
+def document_by_cc_pair_cleanup_batch_task(
+    self: Task,
+    document_ids: list[str],
+    connector_id: int,
+    credential_id: int,
+    tenant_id: str | None,
+) -> bool:
+    """Batched version of document_by_cc_pair_cleanup_task. The documents are split by
+    their cc_pair reference count into documents deleted everywhere and documents only
+    detached from this cc_pair. Vespa is updated VESPA_SYNC_MAX_THREADS documents at a
+    time, and the db changes for each group are committed as soon as it finishes.
+
+    Failed documents, and on a soft time limit the documents not committed yet, are
+    retried under the same task id so that the taskset of the generator still tracks the
+    batch."""
+    task_logger.debug(
+        f"Task start: docs={len(document_ids)} first_doc={document_ids[0]}"
+    )
+
+    cc_pair_identifier = ConnectorCredentialPairIdentifier(
+        connector_id=connector_id,
+        credential_id=credential_id,
+    )
+    # documents that are committed, skipped or failed with a non-retryable error
+    finished_document_ids: set[str] = set()
+    deleted_document_ids: list[str] = []
+    updated_document_ids: list[str] = []
+    chunks_affected = 0
+    retry_exception: Exception | None = None
+    try:
+        with get_session_with_tenant(tenant_id) as db_session:
+            curr_ind_name, sec_ind_name = get_both_index_names(db_session)
+            doc_index = get_default_document_index(
+                primary_index_name=curr_ind_name, secondary_index_name=sec_ind_name
+            )
+
+            retry_index = RetryDocumentIndex(doc_index)
+
+            counts = dict(get_document_connector_counts(db_session, document_ids))
+            # count == 1 means this is the only remaining cc_pair reference to the doc
+            # delete it from vespa and the db
+            delete_document_ids = [
+                document_id
+                for document_id in document_ids
+                if counts.get(document_id) == 1
+            ]
+            # count > 1 means the document still has cc_pair references, update the
+            # access and document sets in vespa without this cc_pair
+            doc_id_to_fields = get_vespa_document_fields(
+                [
+                    document_id
+                    for document_id in document_ids
+                    if counts.get(document_id, 0) > 1
+                ],
+                db_session,
+            )
+
+            calls: list[tuple[str, str, Callable[..., int], tuple]] = [
+                (document_id, "delete", retry_index.delete_single, (document_id,))
+                for document_id in delete_document_ids
+            ] + [
+                (
+                    document_id,
+                    "update",
+                    retry_index.update_single,
+                    (document_id, fields),
+                )
+                for document_id, fields in doc_id_to_fields.items()
+            ]
+            finished_document_ids.update(document_ids)
+            finished_document_ids.difference_update(
+                document_id for document_id, _, _, _ in calls
+            )
+
+            for start in range(0, len(calls), VESPA_SYNC_MAX_THREADS):
+                sub_batch = calls[start : start + VESPA_SYNC_MAX_THREADS]
+                results = run_functions_tuples_in_parallel(
+                    [
+                        (try_document_index_call, (func, *args))
+                        for _, _, func, args in sub_batch
+                    ],
+                    max_workers=VESPA_SYNC_MAX_THREADS,
+                )
+
+                sub_batch_deleted_document_ids: list[str] = []
+                sub_batch_updated_document_ids: list[str] = []
+                sub_batch_chunks_affected = 0
+                for (document_id, action, _, _), result in zip(sub_batch, results):
+                    if not isinstance(result, Exception):
+                        if action == "delete":
+                            sub_batch_deleted_document_ids.append(document_id)
+                        else:
+                            sub_batch_updated_document_ids.append(document_id)
+                        sub_batch_chunks_affected += result
+                    elif isinstance(result, httpx.HTTPStatusError):
+                        task_logger.error(
+                            f"Non-retryable HTTPStatusError: "
+                            f"doc={document_id} "
+                            f"action={action} "
+                            f"status={result.response.status_code}"
+                        )
+                        finished_document_ids.add(document_id)
+                    else:
+                        task_logger.error(
+                            f"Unexpected exception: doc={document_id} action={action} "
+                            f"exception={result!r}"
+                        )
+                        retry_exception = result
+
+                if sub_batch_deleted_document_ids:
+                    delete_documents_complete__no_commit(
+                        db_session=db_session,
+                        document_ids=sub_batch_deleted_document_ids,
+                    )
+
+                if sub_batch_updated_document_ids:
+                    # there are still other cc_pair references to these docs, so only
+                    # remove the relationship to this cc_pair
+                    delete_documents_by_connector_credential_pair__no_commit(
+                        db_session=db_session,
+                        document_ids=sub_batch_updated_document_ids,
+                        connector_credential_pair_identifier=cc_pair_identifier,
+                    )
+                    mark_documents_as_synced(sub_batch_updated_document_ids, db_session)
+
+                # commit what Vespa already reflects before moving on, so that a time
+                # limit or crash later in the batch does not lose it
+                db_session.commit()
+
+                deleted_document_ids.extend(sub_batch_deleted_document_ids)
+                updated_document_ids.extend(sub_batch_updated_document_ids)
+                finished_document_ids.update(sub_batch_deleted_document_ids)
+                finished_document_ids.update(sub_batch_updated_document_ids)
+                chunks_affected += sub_batch_chunks_affected
+    except SoftTimeLimitExceeded as e:
+        task_logger.info(
+            f"SoftTimeLimitExceeded exception. "
+            f"docs={len(document_ids)} first_doc={document_ids[0]}"
+        )
+        retry_exception = e
+    except Exception as e:
+        task_logger.exception(
+            f"Unexpected exception: docs={len(document_ids)} first_doc={document_ids[0]}"
+        )
+        retry_exception = e
+
+    retry_document_ids = [
+        document_id
+        for document_id in document_ids
+        if document_id not in finished_document_ids
+    ]
+    task_logger.info(
+        f"document_by_cc_pair_cleanup_batch_task finished: "
+        f"docs={len(document_ids)} "
+        f"deleted={len(deleted_document_ids)} "
+        f"updated={len(updated_document_ids)} "
+        f"retrying={len(retry_document_ids)} "
+        f"chunks={chunks_affected}"
+    )
+
+    if not retry_document_ids:
+        return True
+
+    if self.request.retries < DOCUMENT_BY_CC_PAIR_CLEANUP_MAX_RETRIES:
+        # Still retrying. Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+        countdown = 2 ** (self.request.retries + 4)
+        self.retry(
+            kwargs=dict(
+                document_ids=retry_document_ids,
+                connector_id=connector_id,
+                credential_id=credential_id,
+                tenant_id=tenant_id,
+            ),
+            exc=retry_exception,
+            countdown=countdown,
+        )
+
+    # This is the last attempt! mark the documents as dirty in the db so that they
+    # eventually get fixed out of band via stale document reconciliation
+    task_logger.warning(
+        f"Max celery task retries reached. Marking docs as dirty for reconciliation: "
+        f"docs={len(retry_document_ids)} first_doc={retry_document_ids[0]}"
+    )
+    with get_session_with_tenant(tenant_id) as db_session:
+        # delete the cc pair relationship now and let reconciliation clean it up
+        # in vespa
+        delete_documents_by_connector_credential_pair__no_commit(
+            db_session=db_session,
+            document_ids=retry_document_ids,
+            connector_credential_pair_identifier=cc_pair_identifier,
+        )
+        mark_documents_as_modified(retry_document_ids, db_session)
+    return False
@@ -21,8 +21,12 @@ from onyx.access.access import get_access_for_document
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.celery_redis import celery_get_queue_length
 from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
+from onyx.background.celery.tasks.shared.tasks import BATCH_SOFT_TIME_LIMIT
+from onyx.background.celery.tasks.shared.tasks import BATCH_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import LIGHT_SOFT_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import LIGHT_TIME_LIMIT
+from onyx.background.celery.tasks.shared.tasks import sync_documents_to_vespa
+from onyx.background.celery.tasks.shared.tasks import VespaSyncResult
 from onyx.configs.app_configs import JOB_TIMEOUT
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryQueues
@@ -214,7 +218,7 @@ def try_generate_stale_document_sync_tasks(
 
         task_logger.info(
             f"RedisConnector.generate_tasks finished for single cc_pair. "
-            f"cc_pair={cc_pair.id} tasks_generated={result[0]} tasks_possible={result[1]}"
+            f"cc_pair={cc_pair.id} tasks_generated={result[0]} docs_possible={result[1]}"
         )
 
         total_tasks_generated += result[0]
@@ -273,7 +277,8 @@ def try_generate_document_set_sync_tasks(
 
     task_logger.info(
         f"RedisDocumentSet.generate_tasks finished. "
-        f"document_set={document_set.id} tasks_generated={tasks_generated}"
+        f"document_set={document_set.id} tasks_generated={tasks_generated} "
+        f"docs={result[1]}"
     )
 
     # set this only after all tasks have been added
@@ -328,7 +333,8 @@ def try_generate_user_group_sync_tasks(
 
     task_logger.info(
         f"RedisUserGroup.generate_tasks finished. "
-        f"usergroup={usergroup.id} tasks_generated={tasks_generated}"
+        f"usergroup={usergroup.id} tasks_generated={tasks_generated} "
+        f"docs={result[1]}"
     )
 
     # set this only after all tasks have been added
@@ -455,7 +461,7 @@ def monitor_connector_deletion_taskset(
                     "Connector deletion - documents still found after taskset completion. "
                     "Clearing the current deletion attempt and allowing deletion to restart: "
                     f"cc_pair={cc_pair_id} "
-                    f"docs_deleted={fence_data.num_tasks} "
+                    f"docs_deleted={fence_data.num_docs} "
                     f"docs_remaining={len(doc_ids)}"
                 )
 
@@ -524,7 +530,7 @@ def monitor_connector_deletion_taskset(
         f"cc_pair={cc_pair_id} "
         f"connector={cc_pair.connector_id} "
         f"credential={cc_pair.credential_id} "
-        f"docs_deleted={fence_data.num_tasks}"
+        f"docs_deleted={fence_data.num_docs}"
     )
 
     redis_connector.delete.reset()
@@ -916,3 +922,102 @@ def vespa_metadata_sync_task(
         self.retry(exc=e, countdown=countdown)
 
     return True
+
+
+def _get_unfinished_document_ids(
+    document_ids: list[str], result: VespaSyncResult
+) -> list[str]:
+    """The documents of an interrupted sync that were neither synced nor failed with a
+    non-retryable error."""
+    finished_document_ids = set(result.synced_document_ids) | {
+        document_id
+        for document_id, e in result.failures.items()
+        if isinstance(e, httpx.HTTPStatusError)
+    }
+    return [
+        document_id
+        for document_id in document_ids
+        if document_id not in finished_document_ids
+    ]
+
+
+@shared_task(
+    name=OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+    bind=True,
+    soft_time_limit=BATCH_SOFT_TIME_LIMIT,
+    time_limit=BATCH_TIME_LIMIT,
+    max_retries=3,
+)
+def vespa_metadata_sync_batch_task(
+    self: Task, document_ids: list[str], tenant_id: str | None
+) -> bool:
+    """Batched version of vespa_metadata_sync_task. The document sets and access of the
+    documents are loaded in a few queries, the Vespa updates are made concurrently and
+    the documents are marked synced as their updates finish.
+
+    Failed documents, and on a soft time limit the documents not synced yet, are retried
+    under the same task id so that the taskset of the generator still tracks the batch."""
+    retry_document_ids: list[str] = []
+    retry_exception: Exception | None = None
+    result = VespaSyncResult()
+    try:
+        with get_session_with_tenant(tenant_id) as db_session:
+            curr_ind_name, sec_ind_name = get_both_index_names(db_session)
+            doc_index = get_default_document_index(
+                primary_index_name=curr_ind_name, secondary_index_name=sec_ind_name
+            )
+
+            retry_index = RetryDocumentIndex(doc_index)
+
+            sync_documents_to_vespa(document_ids, db_session, retry_index, result)
+    except SoftTimeLimitExceeded as e:
+        task_logger.info(
+            f"SoftTimeLimitExceeded exception. "
+            f"docs={len(document_ids)} first_doc={document_ids[0]} "
+            f"synced={len(result.synced_document_ids)}"
+        )
+        retry_document_ids = _get_unfinished_document_ids(document_ids, result)
+        retry_exception = e
+    except Exception as e:
+        task_logger.exception(
+            f"Unexpected exception during vespa metadata sync: "
+            f"docs={len(document_ids)} first_doc={document_ids[0]}"
+        )
+        retry_document_ids = _get_unfinished_document_ids(document_ids, result)
+        retry_exception = e
+    else:
+        for document_id, e in result.failures.items():
+            if isinstance(e, httpx.HTTPStatusError):
+                task_logger.error(
+                    f"Non-retryable HTTPStatusError: "
+                    f"doc={document_id} "
+                    f"status={e.response.status_code}"
+                )
+                continue
+
+            task_logger.error(
+                f"Unexpected exception during vespa metadata sync: "
+                f"doc={document_id} exception={e!r}"
+            )
+            retry_document_ids.append(document_id)
+            retry_exception = e
+
+        task_logger.info(
+            f"vespa_metadata_sync_batch_task finished: "
+            f"docs={len(document_ids)} "
+            f"missing={len(document_ids) - len(result.synced_document_ids) - len(result.failures)} "
+            f"synced={len(result.synced_document_ids)} "
+            f"retrying={len(retry_document_ids)} "
+            f"chunks={result.chunks_affected}"
+        )
+
+    if retry_document_ids:
+        # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+        countdown = 2 ** (self.request.retries + 4)
+        self.retry(
+            kwargs=dict(document_ids=retry_document_ids, tenant_id=tenant_id),
+            exc=retry_exception,
+            countdown=countdown,
+        )
+
+    return True
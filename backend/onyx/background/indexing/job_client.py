@@ -4,16 +4,29 @@ not follow the expected behavior, etc.
 
 NOTE: cannot use Celery directly due to
 https://github.com/celery/celery/issues/7007#issuecomment-1740139367"""
+import atexit
+import contextvars
+import gc
+import importlib
+import threading
+import time
+import weakref
 from collections.abc import Callable
 from dataclasses import dataclass
+from multiprocessing import Pipe
 from multiprocessing import Process
+from multiprocessing.connection import Connection
 from typing import Any
 from typing import Literal
 from typing import Optional
 
+import psutil
+
+from onyx.configs.app_configs import CHUNKER_NUM_PROCESSES
 from onyx.configs.constants import POSTGRES_CELERY_WORKER_INDEXING_CHILD_APP_NAME
 from onyx.db.engine import SqlEngine
 from onyx.utils.logger import setup_logger
+from onyx.utils.process_caches import reset_process_caches
 
 logger = setup_logger()
 
@@ -26,6 +39,29 @@ JobStatusType = (
 )
 
 
+# Daemonic processes are not allowed to start processes of their own, so the job processes
+# are only daemonic when indexing does not start chunking processes.
+_DAEMONIC_JOB_PROCESSES = CHUNKER_NUM_PROCESSES <= 1
+_non_daemonic_job_processes: weakref.WeakSet[Process] = weakref.WeakSet()
+
+
+def _new_job_process(target: Callable, args: tuple) -> Process:
+    process = Process(target=target, args=args, daemon=_DAEMONIC_JOB_PROCESSES)
+    if not process.daemon:
+        _non_daemonic_job_processes.add(process)
+    return process
+
+
+@atexit.register
+def _terminate_job_processes() -> None:
+    """multiprocessing terminates the daemonic children of an exiting process but waits for
+    the others, do the same for the non-daemonic job processes. Registered after the exit
+    handler of multiprocessing, so it runs before it."""
+    for process in list(_non_daemonic_job_processes):
+        if process.is_alive():
+            process.terminate()
+
+
 def _initializer(
     func: Callable, args: list | tuple, kwargs: dict[str, Any] | None = None
 ) -> Any:
@@ -39,6 +75,13 @@ def _initializer(
 
     logger.info("Initializing spawned worker child process.")
 
+    _init_engine()
+
+    # Proceed with executing the target function
+    return func(*args, **kwargs)
+
+
+def _init_engine() -> None:
     # Reset the engine in the child process
     SqlEngine.reset_engine()
 
@@ -48,22 +91,72 @@ def _initializer(
     # Initialize a new engine with desired parameters
     SqlEngine.init_engine(pool_size=4, max_overflow=12, pool_recycle=60)
 
-    # Proceed with executing the target function
-    return func(*args, **kwargs)
-
 
 def _run_in_process(
-    func: Callable, args: list | tuple, kwargs: dict[str, Any] | None = None
+    func: Callable,
+    args: list | tuple,
+    submitted_at: float,
+    kwargs: dict[str, Any] | None = None,
 ) -> None:
+    logger.info(
+        f"Spawned worker child process started job: "
+        f"startup_latency={time.time() - submitted_at:.2f}s warm=False"
+    )
     _initializer(func, args, kwargs)
 
 
+def _run_warm_worker(conn: Connection, preload_modules: list[str]) -> None:
+    """Main loop of a WarmJobClient worker. Does the expensive initialization once, then
+    runs the jobs received over conn one at a time until told to exit."""
+    logger.info("Initializing warm spawned worker child process.")
+
+    _init_engine()
+    for module in preload_modules:
+        importlib.import_module(module)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+
+        # None is the signal to exit
+        if message is None:
+            return
+
+        job_id, func, args, submitted_at = message
+        startup_latency = time.time() - submitted_at
+        logger.info(
+            f"Spawned worker child process started job: job={job_id} "
+            f"startup_latency={startup_latency:.2f}s warm=True"
+        )
+        conn.send(("started", startup_latency))
+
+        status: JobStatusType = "finished"
+        error: str | None = None
+        try:
+            # run each job in an empty context so that context variables
+            # (e.g. the current tenant) don't leak from one job to the next
+            contextvars.Context().run(func, *args)
+        except Exception as e:
+            logger.exception(f"Warm worker job exceptioned: job={job_id}")
+            status = "error"
+            error = f"{type(e).__name__}: {e}"
+
+        # neither may the process wide caches, the next job may be for another tenant
+        reset_process_caches()
+        gc.collect()
+        conn.send((status, error))
+
+
 @dataclass
 class SimpleJob:
     """Drop in replacement for `dask.distributed.Future`"""
 
     id: int
     process: Optional["Process"] = None
+    # seconds between the submit and the start of the job, only reported by warm workers
+    startup_latency: float | None = None
 
     def cancel(self) -> bool:
         return self.release()
@@ -87,6 +180,10 @@ class SimpleJob:
         else:
             return "finished"
 
+    @property
+    def exit_code(self) -> int | None:
+        return self.process.exitcode if self.process else None
+
     def done(self) -> bool:
         return (
             self.status == "finished"
@@ -131,10 +228,230 @@ class SimpleJobClient:
         job_id = self.job_id_counter
         self.job_id_counter += 1
 
-        process = Process(target=_run_in_process, args=(func, args), daemon=True)
+        process = _new_job_process(_run_in_process, (func, args, time.time()))
         job = SimpleJob(id=job_id, process=process)
         process.start()
 
         self.jobs[job_id] = job
 
         return job
+
+
+@dataclass
+class _WarmWorker:
+    process: Process
+    conn: Connection
+    num_jobs: int = 0
+    job: Optional["WarmJob"] = None
+
+
+@dataclass
+class WarmJob(SimpleJob):
+    """A job running in a worker of a WarmJobClient. Unlike a SimpleJob, the worker process
+    outlives the job, so the status comes from the messages sent by the worker."""
+
+    client: Optional["WarmJobClient"] = None
+    worker: _WarmWorker | None = None
+    result: JobStatusType | None = None
+    # the exception raised by the job, as reported by the worker
+    error: str | None = None
+
+    def _poll(self) -> None:
+        if self.client is None or self.worker is None:
+            return
+
+        with self.client.lock:
+            try:
+                while self.result is None and self.worker.conn.poll():
+                    kind, value = self.worker.conn.recv()
+                    if kind == "started":
+                        self.startup_latency = value
+                    else:
+                        self.result = kind
+                        self.error = value
+            except (EOFError, OSError):
+                # the worker died, the status falls back to the process state
+                pass
+
+    def release(self) -> bool:
+        if self.client is None or self.worker is None:
+            return super().release()
+
+        # a job that is still running can only be stopped by terminating its worker
+        terminated = False if self.done() else super().release()
+        self.client.release_worker(self.worker, discard=terminated)
+        return terminated
+
+    @property
+    def status(self) -> JobStatusType:
+        self._poll()
+        if self.result is not None:
+            return self.result
+        return super().status
+
+    @property
+    def exit_code(self) -> int | None:
+        """The worker outlives a job that raised, report the exit code the job would have
+        had in a process of its own (an unhandled exception exits with 1)."""
+        self._poll()
+        if self.result is not None:
+            return 1 if self.result == "error" else 0
+        return super().exit_code
+
+    def exception(self) -> str:
+        self._poll()
+        if self.error is not None:
+            return f"Job with ID '{self.id}' raised {self.error}"
+        return super().exception()
+
+
+class WarmJobClient:
+    """Drop in replacement for SimpleJobClient that keeps a pool of n_workers spawned
+    processes which have already imported preload_modules and initialized their engine,
+    and reuses them across jobs. A worker is replaced once it has run max_jobs_per_worker
+    jobs or uses more than max_memory_bytes (0 = no limit) after a job.
+
+    Jobs of a worker may be for different tenants. Each job runs in an empty contextvars
+    context, and the caches registered with register_process_cache are cleared after it.
+    Process wide state that is specific to a job or tenant must be registered there.
+
+    Thread safe, jobs may be submitted and polled from several threads."""
+
+    def __init__(
+        self,
+        n_workers: int = 1,
+        preload_modules: list[str] | None = None,
+        max_jobs_per_worker: int = 20,
+        max_memory_bytes: int = 0,
+    ) -> None:
+        self.n_workers = n_workers
+        self.preload_modules = preload_modules or []
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_bytes = max_memory_bytes
+        self.job_id_counter = 0
+        self.workers: list[_WarmWorker] = []
+        self.lock = threading.RLock()
+
+    def prewarm(self) -> None:
+        """Starts workers until the pool is full, without waiting for them to be ready."""
+        with self.lock:
+            stopped_workers = self._cleanup_workers()
+            while len(self.workers) < self.n_workers:
+                self.workers.append(self._spawn_worker())
+        self._join_stopped_workers(stopped_workers)
+
+    def submit(self, func: Callable, *args: Any, pure: bool = True) -> WarmJob | None:
+        """NOTE: `pure` arg is needed so this can be a drop in replacement for Dask"""
+        with self.lock:
+            stopped_workers = self._cleanup_workers()
+            worker = next((w for w in self.workers if w.job is None), None)
+            if worker is None:
+                # every warm worker is busy, e.g. with a job its watchdog gave up on
+                logger.info(
+                    f"No idle warm worker, spawning an extra one. "
+                    f"Currently running '{len(self.workers)}' workers."
+                )
+                worker = self._spawn_worker()
+                self.workers.append(worker)
+
+            job = WarmJob(
+                id=self.job_id_counter,
+                process=worker.process,
+                client=self,
+                worker=worker,
+            )
+            self.job_id_counter += 1
+
+            worker.job = job
+            worker.num_jobs += 1
+            worker.conn.send((job.id, func, args, time.time()))
+
+        self._join_stopped_workers(stopped_workers)
+        return job
+
+    def release_worker(self, worker: _WarmWorker, discard: bool = False) -> None:
+        """Returns the worker of a finished job to the pool, or drops it from the pool
+        if its job was terminated."""
+        with self.lock:
+            worker.job = None
+            if discard and worker in self.workers:
+                worker.conn.close()
+                self.workers.remove(worker)
+
+            stopped_workers = self._cleanup_workers()
+            # start the replacement of a recycled worker now so that it is warm
+            # by the time the next job comes in
+            while len(self.workers) < self.n_workers:
+                self.workers.append(self._spawn_worker())
+        self._join_stopped_workers(stopped_workers)
+
+    def _spawn_worker(self) -> _WarmWorker:
+        conn, child_conn = Pipe()
+        process = _new_job_process(
+            _run_warm_worker, (child_conn, self.preload_modules)
+        )
+        process.start()
+        child_conn.close()
+        return _WarmWorker(process=process, conn=conn)
+
+    def _should_recycle(self, worker: _WarmWorker) -> bool:
+        if worker.num_jobs >= self.max_jobs_per_worker:
+            return True
+
+        if not self.max_memory_bytes:
+            return False
+
+        try:
+            rss = psutil.Process(worker.process.pid).memory_info().rss
+        except psutil.Error:
+            return True
+        return rss > self.max_memory_bytes
+
+    def _stop_worker(self, worker: _WarmWorker) -> None:
+        """Asks the worker to exit. Called with the lock held, the worker is then waited
+        for by _join_stopped_workers once the lock is released."""
+        logger.info(
+            f"Stopping warm worker: pid={worker.process.pid} jobs={worker.num_jobs}"
+        )
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+
+    def _join_stopped_workers(self, workers: list[_WarmWorker]) -> None:
+        """Waits for the workers stopped by _cleanup_workers to exit. Called without the
+        lock so that polling the other jobs is not blocked meanwhile."""
+        for worker in workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            with self.lock:
+                worker.conn.close()
+
+    def _cleanup_workers(self) -> list[_WarmWorker]:
+        """Drops dead workers, frees the workers of jobs that are done but were never
+        released, then recycles idle workers that are worn out or in excess.
+
+        Returns the recycled workers, which are removed from the pool and asked to exit
+        but still have to be passed to _join_stopped_workers once the lock is released.
+        """
+        stopped_workers: list[_WarmWorker] = []
+        for worker in list(self.workers):
+            if worker.job is not None and worker.job.done():
+                worker.job = None
+
+            if not worker.process.is_alive():
+                logger.debug(f"Cleaning up dead warm worker: pid={worker.process.pid}")
+                worker.conn.close()
+                self.workers.remove(worker)
+                continue
+
+            if worker.job is not None:
+                continue
+
+            if self._should_recycle(worker) or len(self.workers) > self.n_workers:
+                self._stop_worker(worker)
+                self.workers.remove(worker)
+                stopped_workers.append(worker)
+
+        return stopped_workers
@@ -1,38 +1,51 @@
 import time
 import traceback
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterator
+from contextlib import closing
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from functools import partial
 
 from sqlalchemy.orm import Session
 
 from onyx.background.indexing.checkpointing import get_time_windows_for_index_attempt
 from onyx.background.indexing.tracer import OnyxTracer
+from onyx.configs.app_configs import ENABLE_PIPELINED_INDEXING
 from onyx.configs.app_configs import INDEXING_SIZE_WARNING_THRESHOLD
 from onyx.configs.app_configs import INDEXING_TRACER_INTERVAL
 from onyx.configs.app_configs import POLL_CONNECTOR_OFFSET
 from onyx.configs.constants import MilestoneRecordType
 from onyx.connectors.connector_runner import ConnectorRunner
 from onyx.connectors.factory import instantiate_connector
+from onyx.connectors.models import Document
 from onyx.connectors.models import IndexAttemptMetadata
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.connector_credential_pair import get_last_successful_attempt_time
 from onyx.db.connector_credential_pair import update_connector_credential_pair
 from onyx.db.engine import get_session_with_tenant
 from onyx.db.enums import ConnectorCredentialPairStatus
+from onyx.db.index_attempt import get_index_attempt
 from onyx.db.index_attempt import mark_attempt_canceled
 from onyx.db.index_attempt import mark_attempt_failed
 from onyx.db.index_attempt import mark_attempt_partially_succeeded
 from onyx.db.index_attempt import mark_attempt_succeeded
 from onyx.db.index_attempt import transition_attempt_to_in_progress
 from onyx.db.index_attempt import update_docs_indexed
+from onyx.db.models import ConnectorCredentialPair
 from onyx.db.models import IndexAttempt
 from onyx.db.models import IndexingStatus
 from onyx.db.models import IndexModelStatus
+from onyx.db.models import SearchSettings
 from onyx.document_index.factory import get_default_document_index
+from onyx.indexing.chunker import shutdown_chunking_processes
 from onyx.indexing.embedder import DefaultIndexingEmbedder
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.indexing_pipeline import build_indexing_pipeline
+from onyx.indexing.indexing_pipeline import build_staged_indexing_pipeline
+from onyx.indexing.indexing_pipeline import IndexingPipelineProtocol
 from onyx.utils.logger import setup_logger
 from onyx.utils.logger import TaskAttemptSingleton
 from onyx.utils.telemetry import create_milestone_and_report
@@ -94,6 +107,106 @@ class ConnectorStopSignal(Exception):
     """A custom exception used to signal a stop in processing."""
 
 
+def _check_index_attempt_should_continue(
+    db_session: Session,
+    index_attempt: IndexAttempt,
+    db_cc_pair: ConnectorCredentialPair,
+    search_settings: SearchSettings,
+    callback: IndexingHeartbeatInterface | None,
+) -> None:
+    """Raises if the index attempt should not process any more batches."""
+    # Check if connector is disabled mid run and stop if so unless it's the secondary
+    # index being built. We want to populate it even for paused connectors
+    # Often paused connectors are sources that aren't updated frequently but the
+    # contents still need to be initially pulled.
+    if callback:
+        if callback.should_stop():
+            raise ConnectorStopSignal("Connector stop signal detected")
+
+    # TODO: should we move this into the above callback instead?
+    db_session.refresh(db_cc_pair)
+    if (
+        (
+            db_cc_pair.status == ConnectorCredentialPairStatus.PAUSED
+            and search_settings.status != IndexModelStatus.FUTURE
+        )
+        # if it's deleting, we don't care if this is a secondary index
+        or db_cc_pair.status == ConnectorCredentialPairStatus.DELETING
+    ):
+        # let the `except` block handle this
+        raise RuntimeError("Connector was disabled mid run")
+
+    db_session.refresh(index_attempt)
+    if index_attempt.status != IndexingStatus.IN_PROGRESS:
+        # Likely due to user manually disabling it or model swap
+        raise RuntimeError(
+            f"Index Attempt was canceled, status is {index_attempt.status}"
+        )
+
+
+def _check_index_attempt_should_continue_by_id(
+    db_session: Session,
+    index_attempt_id: int,
+    callback: IndexingHeartbeatInterface | None,
+) -> None:
+    """Same as _check_index_attempt_should_continue, for the threads of the staged
+    pipeline which cannot use the session of the attempt and pass their own."""
+    index_attempt = get_index_attempt(db_session, index_attempt_id)
+    if index_attempt is None or index_attempt.search_settings is None:
+        raise RuntimeError(f"Index attempt {index_attempt_id} not found")
+
+    _check_index_attempt_should_continue(
+        db_session=db_session,
+        index_attempt=index_attempt,
+        db_cc_pair=index_attempt.connector_credential_pair,
+        search_settings=index_attempt.search_settings,
+        callback=callback,
+    )
+
+
+def _log_doc_batch(doc_batch: list[Document]) -> None:
+    batch_description = []
+    for doc in doc_batch:
+        batch_description.append(doc.to_short_descriptor())
+
+        doc_size = 0
+        for section in doc.sections:
+            doc_size += len(section.text)
+
+        if doc_size > INDEXING_SIZE_WARNING_THRESHOLD:
+            logger.warning(
+                f"Document size: doc='{doc.to_short_descriptor()}' "
+                f"size={doc_size} "
+                f"threshold={INDEXING_SIZE_WARNING_THRESHOLD}"
+            )
+
+    logger.debug(f"Indexing batch of documents: {batch_description}")
+
+
+def _index_doc_batches_serially(
+    document_batches: Iterator[list[Document]],
+    indexing_pipeline: IndexingPipelineProtocol,
+    index_attempt_metadata: IndexAttemptMetadata,
+    start_batch_num: int,
+    check_should_continue: Callable[[], None],
+) -> Generator[tuple[list[Document], int, int], None, None]:
+    """Fetches, chunks, embeds and writes one batch at a time.
+    Yields (document batch, number of new docs, number of chunks)."""
+    for ind, doc_batch in enumerate(document_batches):
+        check_should_continue()
+        _log_doc_batch(doc_batch)
+
+        # use 1-index for this
+        index_attempt_metadata.batch_num = start_batch_num + ind + 1
+
+        # real work happens here!
+        new_docs, total_batch_chunks = indexing_pipeline(
+            document_batch=doc_batch,
+            index_attempt_metadata=index_attempt_metadata,
+        )
+        yield doc_batch, new_docs, total_batch_chunks
+
+
 def _run_indexing(
     db_session: Session,
     index_attempt: IndexAttempt,
@@ -133,18 +246,36 @@ def _run_indexing(
         callback=callback,
     )
 
+    ignore_time_skip = index_attempt.from_beginning or (
+        search_settings.status == IndexModelStatus.FUTURE
+    )
     indexing_pipeline = build_indexing_pipeline(
         attempt_id=index_attempt.id,
         embedder=embedding_model,
         document_index=document_index,
-        ignore_time_skip=(
-            index_attempt.from_beginning
-            or (search_settings.status == IndexModelStatus.FUTURE)
-        ),
+        ignore_time_skip=ignore_time_skip,
         db_session=db_session,
         tenant_id=tenant_id,
         callback=callback,
     )
+    staged_indexing_pipeline = (
+        build_staged_indexing_pipeline(
+            attempt_id=index_attempt.id,
+            embedder=embedding_model,
+            document_index=document_index,
+            ignore_time_skip=ignore_time_skip,
+            db_session=db_session,
+            tenant_id=tenant_id,
+            callback=callback,
+            check_should_continue=partial(
+                _check_index_attempt_should_continue_by_id,
+                index_attempt_id=index_attempt.id,
+                callback=callback,
+            ),
+        )
+        if ENABLE_PIPELINED_INDEXING
+        else None
+    )
 
     db_cc_pair = index_attempt.connector_credential_pair
     db_connector = index_attempt.connector_credential_pair.connector
@@ -176,6 +307,15 @@ def _run_indexing(
         credential_id=db_credential.id,
     )
 
+    check_should_continue = partial(
+        _check_index_attempt_should_continue,
+        db_session=db_session,
+        index_attempt=index_attempt,
+        db_cc_pair=db_cc_pair,
+        search_settings=search_settings,
+        callback=callback,
+    )
+
     batch_num = 0
     net_doc_change = 0
     document_count = 0
@@ -208,95 +348,66 @@ def _run_indexing(
             tracer_counter = 0
             if INDEXING_TRACER_INTERVAL > 0:
                 tracer.snap()
-            for doc_batch in connector_runner.run():
-                # Check if connector is disabled mid run and stop if so unless it's the secondary
-                # index being built. We want to populate it even for paused connectors
-                # Often paused connectors are sources that aren't updated frequently but the
-                # contents still need to be initially pulled.
-                if callback:
-                    if callback.should_stop():
-                        raise ConnectorStopSignal("Connector stop signal detected")
-
-                # TODO: should we move this into the above callback instead?
-                db_session.refresh(db_cc_pair)
-                if (
-                    (
-                        db_cc_pair.status == ConnectorCredentialPairStatus.PAUSED
-                        and search_settings.status != IndexModelStatus.FUTURE
-                    )
-                    # if it's deleting, we don't care if this is a secondary index
-                    or db_cc_pair.status == ConnectorCredentialPairStatus.DELETING
-                ):
-                    # let the `except` block handle this
-                    raise RuntimeError("Connector was disabled mid run")
-
-                db_session.refresh(index_attempt)
-                if index_attempt.status != IndexingStatus.IN_PROGRESS:
-                    # Likely due to user manually disabling it or model swap
-                    raise RuntimeError(
-                        f"Index Attempt was canceled, status is {index_attempt.status}"
-                    )
-
-                batch_description = []
-                for doc in doc_batch:
-                    batch_description.append(doc.to_short_descriptor())
-
-                    doc_size = 0
-                    for section in doc.sections:
-                        doc_size += len(section.text)
-
-                    if doc_size > INDEXING_SIZE_WARNING_THRESHOLD:
-                        logger.warning(
-                            f"Document size: doc='{doc.to_short_descriptor()}' "
-                            f"size={doc_size} "
-                            f"threshold={INDEXING_SIZE_WARNING_THRESHOLD}"
-                        )
-
-                logger.debug(f"Indexing batch of documents: {batch_description}")
-
-                index_attempt_md.batch_num = batch_num + 1  # use 1-index for this
-
-                # real work happens here!
-                new_docs, total_batch_chunks = indexing_pipeline(
-                    document_batch=doc_batch,
+            if staged_indexing_pipeline:
+                batch_results = staged_indexing_pipeline(
+                    document_batches=connector_runner.run(),
                     index_attempt_metadata=index_attempt_md,
+                    start_batch_num=batch_num,
                 )
-
-                batch_num += 1
-                net_doc_change += new_docs
-                chunk_count += total_batch_chunks
-                document_count += len(doc_batch)
-                all_connector_doc_ids.update(doc.id for doc in doc_batch)
-
-                # commit transaction so that the `update` below begins
-                # with a brand new transaction. Postgres uses the start
-                # of the transactions when computing `NOW()`, so if we have
-                # a long running transaction, the `time_updated` field will
-                # be inaccurate
-                db_session.commit()
-
-                if callback:
-                    callback.progress("_run_indexing", len(doc_batch))
-
-                # This new value is updated every batch, so UI can refresh per batch update
-                update_docs_indexed(
-                    db_session=db_session,
-                    index_attempt=index_attempt,
-                    total_docs_indexed=document_count,
-                    new_docs_indexed=net_doc_change,
-                    docs_removed_from_index=0,
+            else:
+                batch_results = _index_doc_batches_serially(
+                    document_batches=connector_runner.run(),
+                    indexing_pipeline=indexing_pipeline,
+                    index_attempt_metadata=index_attempt_md,
+                    start_batch_num=batch_num,
+                    check_should_continue=check_should_continue,
                 )
 
-                tracer_counter += 1
-                if (
-                    INDEXING_TRACER_INTERVAL > 0
-                    and tracer_counter % INDEXING_TRACER_INTERVAL == 0
-                ):
-                    logger.debug(
-                        f"Running trace comparison for batch {tracer_counter}. interval={INDEXING_TRACER_INTERVAL}"
+            # closing the results makes sure the pipeline threads are torn down as soon as
+            # we bail out of the loop
+            with closing(batch_results):
+                for doc_batch, new_docs, total_batch_chunks in batch_results:
+                    if staged_indexing_pipeline:
+                        # the pipeline threads check before fetching and writing each
+                        # batch, this also stops before the bookkeeping of a finished one
+                        check_should_continue()
+                        _log_doc_batch(doc_batch)
+
+                    batch_num += 1
+                    net_doc_change += new_docs
+                    chunk_count += total_batch_chunks
+                    document_count += len(doc_batch)
+                    all_connector_doc_ids.update(doc.id for doc in doc_batch)
+
+                    # commit transaction so that the `update` below begins
+                    # with a brand new transaction. Postgres uses the start
+                    # of the transactions when computing `NOW()`, so if we have
+                    # a long running transaction, the `time_updated` field will
+                    # be inaccurate
+                    db_session.commit()
+
+                    if callback:
+                        callback.progress("_run_indexing", len(doc_batch))
+
+                    # This new value is updated every batch, so UI can refresh per batch update
+                    update_docs_indexed(
+                        db_session=db_session,
+                        index_attempt=index_attempt,
+                        total_docs_indexed=document_count,
+                        new_docs_indexed=net_doc_change,
+                        docs_removed_from_index=0,
                     )
-                    tracer.snap()
-                    tracer.log_previous_diff(INDEXING_TRACER_NUM_PRINT_ENTRIES)
+
+                    tracer_counter += 1
+                    if (
+                        INDEXING_TRACER_INTERVAL > 0
+                        and tracer_counter % INDEXING_TRACER_INTERVAL == 0
+                    ):
+                        logger.debug(
+                            f"Running trace comparison for batch {tracer_counter}. interval={INDEXING_TRACER_INTERVAL}"
+                        )
+                        tracer.snap()
+                        tracer.log_previous_diff(INDEXING_TRACER_NUM_PRINT_ENTRIES)
 
             run_end_dt = window_end
             if is_primary:
@@ -473,3 +584,7 @@ def run_indexing_entrypoint(
         logger.exception(
             f"Indexing job with ID '{index_attempt_id}' for tenant {tenant_id} failed due to {e}"
         )
+    finally:
+        # the chunking processes are per attempt, don't leave them behind in the
+        # (possibly reused) indexing process
+        shutdown_chunking_processes()
@@ -119,7 +119,7 @@ def combine_message_thread(
             role_str = message.role.value.upper()
 
         msg_str = f"{role_str}:\n{message.message}"
-        message_token_count = len(llm_tokenizer.encode(msg_str))
+        message_token_count = llm_tokenizer.count_tokens(msg_str)
 
         if (
             max_tokens is not None
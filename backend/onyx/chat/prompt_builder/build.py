@@ -1,6 +1,3 @@
-from collections.abc import Callable
-from typing import cast
-
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import HumanMessage
 from langchain_core.messages import SystemMessage
@@ -73,9 +70,7 @@ class AnswerPromptBuilder:
             provider_type=llm_config.model_provider,
             model_name=llm_config.model_name,
         )
-        self.llm_tokenizer_encode_func = cast(
-            Callable[[str], list[int]], llm_tokenizer.encode
-        )
+        self.llm_tokenizer_count_func = llm_tokenizer.count_tokens
 
         self.raw_message_history = message_history
         (
@@ -90,7 +85,7 @@ class AnswerPromptBuilder:
         self.system_message_and_token_cnt: tuple[SystemMessage, int] | None = None
         self.user_message_and_token_cnt = (
             user_message,
-            check_message_tokens(user_message, self.llm_tokenizer_encode_func),
+            check_message_tokens(user_message, count_fn=self.llm_tokenizer_count_func),
         )
 
         self.new_messages_and_token_cnts: list[tuple[BaseMessage, int]] = []
@@ -104,18 +99,22 @@ class AnswerPromptBuilder:
 
         self.system_message_and_token_cnt = (
             system_message,
-            check_message_tokens(system_message, self.llm_tokenizer_encode_func),
+            check_message_tokens(
+                system_message, count_fn=self.llm_tokenizer_count_func
+            ),
         )
 
     def update_user_prompt(self, user_message: HumanMessage) -> None:
         self.user_message_and_token_cnt = (
             user_message,
-            check_message_tokens(user_message, self.llm_tokenizer_encode_func),
+            check_message_tokens(user_message, count_fn=self.llm_tokenizer_count_func),
         )
 
     def append_message(self, message: BaseMessage) -> None:
         """Append a new message to the message history."""
-        token_count = check_message_tokens(message, self.llm_tokenizer_encode_func)
+        token_count = check_message_tokens(
+            message, count_fn=self.llm_tokenizer_count_func
+        )
         self.new_messages_and_token_cnts.append((message, token_count))
 
     def get_user_message_content(self) -> str:
@@ -1,6 +1,6 @@
 import json
 from collections import defaultdict
-from copy import deepcopy
+from dataclasses import dataclass
 from typing import TypeVar
 
 from pydantic import BaseModel
@@ -16,8 +16,9 @@ from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
 from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.natural_language_processing.utils import get_tokenizer
-from onyx.natural_language_processing.utils import tokenizer_trim_content
+from onyx.natural_language_processing.utils import tokenizer_trim_content_to_fit
 from onyx.prompts.prompt_utils import build_doc_context_str
 from onyx.tools.tool_implementations.search.search_utils import section_to_dict
 from onyx.utils.logger import setup_logger
@@ -131,6 +132,109 @@ def _remove_sections_to_ignore(
     ]
 
 
+def _escape_json_content(content: str) -> str:
+    """The content as it appears in the tool message json, where non-ascii characters,
+    quotes and newlines are escaped and take more tokens than in the raw content."""
+    return json.dumps(content)[1:-1]
+
+
+@dataclass
+class _PrunedSection:
+    """View of a section during pruning, the section itself is only copied (shallowly)
+    if its content is trimmed. The tokens of the content are counted once, in the form
+    the content takes in the prompt (json escaped for tool messages)."""
+
+    section: InferenceSection
+    content: str
+    content_token_count: int
+    # title, metadata and formatting around the content in the prompt
+    overhead_token_count: int
+    escape_json: bool = False
+
+    @property
+    def token_count(self) -> int:
+        return self.content_token_count + self.overhead_token_count
+
+    def trim(self, desired_length: int, llm_tokenizer: BaseTokenizer) -> None:
+        if not self.escape_json:
+            self.content = tokenizer_trim_content_to_fit(
+                content=self.content,
+                desired_length=desired_length,
+                tokenizer=llm_tokenizer,
+                token_count=self.content_token_count,
+            )
+            self.content_token_count = min(self.content_token_count, desired_length)
+            return
+
+        if self.content_token_count <= desired_length:
+            return
+
+        # trim the raw content to its share of the desired length, then shrink it
+        # further until its escaped form fits
+        raw_token_count = llm_tokenizer.count_tokens(self.content)
+        raw_length = desired_length * raw_token_count // self.content_token_count
+        while True:
+            content = tokenizer_trim_content_to_fit(
+                content=self.content,
+                desired_length=raw_length,
+                tokenizer=llm_tokenizer,
+                token_count=raw_token_count,
+            )
+            content_token_count = llm_tokenizer.count_tokens(
+                _escape_json_content(content)
+            )
+            if content_token_count <= desired_length or raw_length <= 0:
+                break
+            raw_length = min(
+                raw_length - 1, raw_length * desired_length // content_token_count
+            )
+
+        self.content = content
+        self.content_token_count = content_token_count
+
+    def to_section(self) -> InferenceSection:
+        if self.content is self.section.combined_content:
+            return self.section
+        return self.section.model_copy(update={"combined_content": self.content})
+
+
+def _count_section_tokens(
+    section: InferenceSection,
+    ind: int,
+    using_tool_message: bool,
+    llm_tokenizer: BaseTokenizer,
+) -> _PrunedSection:
+    """Counts the tokens of the section content and, separately, of everything around
+    it in the prompt (title, metadata, json keys) so that the content is neither copied
+    into a prompt string nor tokenized again to truncate it."""
+    if using_tool_message:
+        # If using tool message, it will be a bit of an overestimate as the extra json text around the section
+        # will be counted towards the token count. However, once the Sections are merged, the extra json parts
+        # that overlap will not be counted multiple times like it is in the pruning step.
+        section_dict = section_to_dict(section, ind)
+        section_dict["content"] = ""
+        overhead_str = json.dumps(section_dict)
+        content_str = _escape_json_content(section.combined_content)
+    else:
+        overhead_str = build_doc_context_str(
+            semantic_identifier=section.center_chunk.semantic_identifier,
+            source_type=section.center_chunk.source_type,
+            content="",
+            metadata_dict=section.center_chunk.metadata,
+            updated_at=section.center_chunk.updated_at,
+            ind=ind,
+        )
+        content_str = section.combined_content
+
+    return _PrunedSection(
+        section=section,
+        content=section.combined_content,
+        content_token_count=llm_tokenizer.count_tokens(content_str),
+        overhead_token_count=llm_tokenizer.count_tokens(overhead_str),
+        escape_json=using_tool_message,
+    )
+
+
 def _apply_pruning(
     sections: list[InferenceSection],
     section_relevance_list: list[bool] | None,
@@ -144,7 +248,6 @@ def _apply_pruning(
         provider_type=llm_config.model_provider,
         model_name=llm_config.model_name,
     )
-    sections = deepcopy(sections)  # don't modify in place
 
     # re-order docs with all the "relevant" docs at the front
     sections = reorder_sections(
@@ -153,26 +256,20 @@ def _apply_pruning(
     # remove docs that are explicitly marked as not for QA
     sections = _remove_sections_to_ignore(sections=sections)
 
+    # the sections are not modified in place, trimmed ones are copied at the end
+    pruned_sections: list[_PrunedSection] = []
     final_section_ind = None
     total_tokens = 0
     for ind, section in enumerate(sections):
-        section_str = (
-            # If using tool message, it will be a bit of an overestimate as the extra json text around the section
-            # will be counted towards the token count. However, once the Sections are merged, the extra json parts
-            # that overlap will not be counted multiple times like it is in the pruning step.
-            json.dumps(section_to_dict(section, ind))
-            if using_tool_message
-            else build_doc_context_str(
-                semantic_identifier=section.center_chunk.semantic_identifier,
-                source_type=section.center_chunk.source_type,
-                content=section.combined_content,
-                metadata_dict=section.center_chunk.metadata,
-                updated_at=section.center_chunk.updated_at,
-                ind=ind,
-            )
+        pruned_section = _count_section_tokens(
+            section=section,
+            ind=ind,
+            using_tool_message=using_tool_message,
+            llm_tokenizer=llm_tokenizer,
         )
+        pruned_sections.append(pruned_section)
 
-        section_token_count = len(llm_tokenizer.encode(section_str))
+        section_token_count = pruned_section.token_count
         # if not using sections (specifically, using Sections where each section maps exactly to the one center chunk),
         # truncate chunks that are way too long. This can happen if the embedding model tokenizer is different
         # than the LLM tokenizer
@@ -194,12 +291,8 @@ def _apply_pruning(
                     "Found more tokens in Section than expected, "
                     "likely mismatch between embedding and LLM tokenizers. Trimming content..."
                 )
-            section.combined_content = tokenizer_trim_content(
-                content=section.combined_content,
-                desired_length=DOC_EMBEDDING_CONTEXT_SIZE,
-                tokenizer=llm_tokenizer,
-            )
-            section_token_count = DOC_EMBEDDING_CONTEXT_SIZE
+            pruned_section.trim(DOC_EMBEDDING_CONTEXT_SIZE, llm_tokenizer)
+            section_token_count = pruned_section.token_count
 
         total_tokens += section_token_count
         if total_tokens > token_limit:
@@ -211,8 +304,6 @@ def _apply_pruning(
             if final_section_ind != len(sections) - 1:
                 # If using Sections, then the final section could be more than we need, in this case we are willing to
                 # truncate the final section to fit the specified context window
-                sections = sections[: final_section_ind + 1]
-
                 if is_manually_selected_docs:
                     # For document selection flow, only allow the final document/section to get truncated
                     # if more than that needs to be throw away then some documents are completely thrown away in which
@@ -222,11 +313,12 @@ def _apply_pruning(
                     )
 
             amount_to_truncate = total_tokens - token_limit
-            # NOTE: need to recalculate the length here, since the previous calculation included
-            # overhead from JSON-fying the doc / the metadata
-            final_doc_content_length = len(
-                llm_tokenizer.encode(sections[final_section_ind].combined_content)
-            ) - (amount_to_truncate)
+            # NOTE: only the content is truncated, the count of the content alone (without the overhead from
+            # JSON-fying the doc / the metadata) was kept for this
+            final_section = pruned_sections[final_section_ind]
+            final_doc_content_length = (
+                final_section.content_token_count - amount_to_truncate
+            )
             # this could occur if we only have space for the title / metadata
             # not ideal, but it's the most reasonable thing to do
             # NOTE: the frontend prevents documents from being selected if
@@ -234,30 +326,23 @@ def _apply_pruning(
             # from occurring in the first place
             if final_doc_content_length <= 0:
                 logger.error(
-                    f"Final section ({sections[final_section_ind].center_chunk.semantic_identifier}) content "
+                    f"Final section ({final_section.section.center_chunk.semantic_identifier}) content "
                     "length is less than 0. Removing this section from the final prompt."
                 )
-                sections.pop()
+                pruned_sections.pop()
             else:
-                sections[final_section_ind].combined_content = tokenizer_trim_content(
-                    content=sections[final_section_ind].combined_content,
-                    desired_length=final_doc_content_length,
-                    tokenizer=llm_tokenizer,
-                )
+                final_section.trim(final_doc_content_length, llm_tokenizer)
         else:
             # For search on chunk level (Section is just a chunk), don't truncate the final Chunk/Section unless it's the only one
             # If it's not the only one, we can throw it away, if it's the only one, we have to truncate
             if final_section_ind != 0:
-                sections = sections[:final_section_ind]
+                pruned_sections = pruned_sections[:final_section_ind]
             else:
-                sections[0].combined_content = tokenizer_trim_content(
-                    content=sections[0].combined_content,
-                    desired_length=token_limit - _METADATA_TOKEN_ESTIMATE,
-                    tokenizer=llm_tokenizer,
+                pruned_sections[0].trim(
+                    token_limit - _METADATA_TOKEN_ESTIMATE, llm_tokenizer
                 )
-                sections = [sections[0]]
 
-    return sections
+    return [pruned_section.to_section() for pruned_section in pruned_sections]
 
 
 def prune_sections(
@@ -6,15 +6,43 @@ from onyx.chat.models import LlmDoc
 from onyx.chat.models import OnyxAnswerPiece
 from onyx.chat.stream_processing.utils import DocumentIdOrderMapping
 from onyx.configs.chat_configs import STOP_STREAM_PAT
-from onyx.prompts.constants import TRIPLE_BACKTICK
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
 
 
-def in_code_block(llm_text: str) -> bool:
-    count = llm_text.count(TRIPLE_BACKTICK)
-    return count % 2 != 0
+CITATION_PATTERN = re.compile(r"\[(\d+)\]|\[\[(\d+)\]\]")  # [1], [[1]], etc.
+POSSIBLE_CITATION_PATTERN = re.compile(r"(\[+\d*$)")  # [1, [, [[, [[2, etc.
+MANUAL_CITATION_PATTERN = re.compile(r"\[\[(\d+)\]\]")
+
+
+class CodeFenceTracker:
+    """Tracks whether the text streamed so far is inside a code block, looking at each
+    character once. Equivalent to counting the (non-overlapping) triple backticks of the
+    whole text: a run of n backticks contains n // 3 of them, so only the number of fences in
+    completed runs and the length of the current run are kept."""
+
+    def __init__(self) -> None:
+        self._num_fences = 0
+        self._backtick_run = 0
+
+    def feed(self, text: str) -> None:
+        if "`" not in text:
+            if text and self._backtick_run:
+                self._num_fences += self._backtick_run // 3
+                self._backtick_run = 0
+            return
+
+        for char in text:
+            if char == "`":
+                self._backtick_run += 1
+            elif self._backtick_run:
+                self._num_fences += self._backtick_run // 3
+                self._backtick_run = 0
+
+    @property
+    def in_code_block(self) -> bool:
+        return (self._num_fences + self._backtick_run // 3) % 2 != 0
 
 
 class CitationProcessor:
@@ -32,9 +60,13 @@ class CitationProcessor:
         self.display_doc_order_dict = (
             display_doc_order_dict  # original order of docs to displayed to user
         )
-        self.llm_out = ""
+        # only the length and the code fences of the streamed answer are needed, keeping
+        # the whole text would make every token cost as much as the answer so far
+        self.llm_out_len = 0
+        self.code_fences = CodeFenceTracker()
         self.max_citation_num = len(context_docs)
-        self.citation_order: list[int] = []
+        # real citation number -> 1-based order in which it was first cited
+        self.citation_order: dict[int, int] = {}
         self.curr_segment = ""
         self.cited_inds: set[int] = set()
         self.hold = ""
@@ -60,7 +92,9 @@ class CitationProcessor:
             self.hold = ""
 
         self.curr_segment += token
-        self.llm_out += token
+        self.llm_out_len += len(token)
+        self.code_fences.feed(token)
+        in_code_block = self.code_fences.in_code_block
 
         # Handle code blocks without language tags
         if "`" in self.curr_segment:
@@ -68,21 +102,17 @@ class CitationProcessor:
                 pass
             elif "```" in self.curr_segment:
                 piece_that_comes_after = self.curr_segment.split("```")[1][0]
-                if piece_that_comes_after == "\n" and in_code_block(self.llm_out):
+                if piece_that_comes_after == "\n" and in_code_block:
                     self.curr_segment = self.curr_segment.replace("```", "```plaintext")
 
-        citation_pattern = r"\[(\d+)\]|\[\[(\d+)\]\]"  # [1], [[1]], etc.
-        citations_found = list(re.finditer(citation_pattern, self.curr_segment))
-        possible_citation_pattern = r"(\[+\d*$)"  # [1, [, [[, [[2, etc.
-        possible_citation_found = re.search(
-            possible_citation_pattern, self.curr_segment
-        )
+        citations_found = list(CITATION_PATTERN.finditer(self.curr_segment))
+        possible_citation_found = POSSIBLE_CITATION_PATTERN.search(self.curr_segment)
 
-        if len(citations_found) == 0 and len(self.llm_out) - self.past_cite_count > 5:
+        if len(citations_found) == 0 and self.llm_out_len - self.past_cite_count > 5:
             self.current_citations = []
 
         result = ""
-        if citations_found and not in_code_block(self.llm_out):
+        if citations_found and not in_code_block:
             last_citation_end = 0
             length_to_add = 0
             while len(citations_found) > 0:
@@ -95,11 +125,8 @@ class CitationProcessor:
                     context_llm_doc = self.context_docs[numerical_value - 1]
                     real_citation_num = self.order_mapping[context_llm_doc.document_id]
 
-                    if real_citation_num not in self.citation_order:
-                        self.citation_order.append(real_citation_num)
-
-                    target_citation_num = (
-                        self.citation_order.index(real_citation_num) + 1
+                    target_citation_num = self.citation_order.setdefault(
+                        real_citation_num, len(self.citation_order) + 1
                     )
 
                     # get the value that was displayed to user, should always
@@ -128,7 +155,7 @@ class CitationProcessor:
 
                     # Handle edge case where LLM outputs citation itself
                     if self.curr_segment.startswith("[["):
-                        match = re.match(r"\[\[(\d+)\]\]", self.curr_segment)
+                        match = MANUAL_CITATION_PATTERN.match(self.curr_segment)
                         if match:
                             try:
                                 doc_id = int(match.group(1))
@@ -150,7 +177,7 @@ class CitationProcessor:
 
                     link = context_llm_doc.link
 
-                    self.past_cite_count = len(self.llm_out)
+                    self.past_cite_count = self.llm_out_len
                     self.current_citations.append(target_citation_num)
 
                     if target_citation_num not in self.cited_inds:
@@ -1,7 +1,9 @@
 # THIS IS NO LONGER IN USE
+import bisect
 import math
 import re
 from collections.abc import Generator
+from enum import Enum
 from json import JSONDecodeError
 from typing import Optional
 
@@ -25,6 +27,21 @@ from onyx.utils.text_processing import shared_precompare_cleanup
 logger = setup_logger()
 answer_pattern = re.compile(r'{\s*"answer"\s*:\s*"', re.IGNORECASE)
 
+_JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_STRING_SPECIAL_CHARS = re.compile(r'["\\]')
+_STRING_END_CHARS = ",]}"
+# The answer is expected right away, past this the model is likely hallucinating
+_MAX_ANSWER_START_CHARS = 400
+
 
 class OnyxQuote(BaseModel):
     # This is during inference so everything is a string by this point
@@ -98,6 +115,91 @@ def _extract_answer_json(raw_model_output: str) -> dict:
     return answer_json
 
 
+class _QuoteMatchIndex:
+    """Precomputed lookup of quotes in the docs that have source links. The docs are
+    cleaned up once and joined into a single text so that an exact match is one
+    substring search over all of the docs, instead of a cleanup and a search per doc
+    and per quote. The joining newlines are removed by the cleanup of the quotes, so
+    a match can never span two docs."""
+
+    def __init__(self, docs: list[LlmDoc] | list[InferenceChunk]) -> None:
+        self.docs = [doc for doc in docs if doc.source_links]
+        self.cleaned_contents = [
+            shared_precompare_cleanup(doc.content) for doc in self.docs
+        ]
+
+        self.doc_starts: list[int] = []
+        position = 0
+        for cleaned_content in self.cleaned_contents:
+            self.doc_starts.append(position)
+            position += len(cleaned_content) + 1
+        self.combined_content = "\n".join(self.cleaned_contents)
+
+        self.link_offsets: list[list[int]] = []
+        self.links: list[list[str]] = []
+        for doc in self.docs:
+            sorted_links = sorted(
+                (doc.source_links or {}).items(), key=lambda item: int(item[0])
+            )
+            self.link_offsets.append([int(offset) for offset, _ in sorted_links])
+            self.links.append([link for _, link in sorted_links])
+
+    def _find(
+        self, quote_clean: str, max_edits: int, fuzzy_search: bool
+    ) -> tuple[int, int] | None:
+        """Returns the index of the first doc containing the quote and the offset of
+        the quote in the cleaned up doc content."""
+        if fuzzy_search:
+            re_search_str = (
+                r"(" + re.escape(quote_clean) + r"){e<=" + str(max_edits) + r"}"
+            )
+            for doc_ind, cleaned_content in enumerate(self.cleaned_contents):
+                found = regex.search(re_search_str, cleaned_content)
+                if found:
+                    return doc_ind, found.span()[0]
+            return None
+
+        position = self.combined_content.find(quote_clean)
+        if position == -1:
+            return None
+        doc_ind = bisect.bisect_right(self.doc_starts, position) - 1
+        return doc_ind, position - self.doc_starts[doc_ind]
+
+    def match(
+        self,
+        quote: str,
+        max_error_percent: float = QUOTE_ALLOWED_ERROR_PERCENT,
+        fuzzy_search: bool = False,
+        prefix_only_length: int = 100,
+    ) -> OnyxQuote | None:
+        if not self.docs:
+            return None
+
+        quote_clean = shared_precompare_cleanup(
+            clean_model_quote(quote, trim_length=prefix_only_length)
+        )
+        max_edits = math.ceil(float(len(quote)) * max_error_percent)
+        found = self._find(quote_clean, max_edits, fuzzy_search)
+        if found is None:
+            return None
+        doc_ind, offset = found
+
+        # Extracting the link from the offset, there should always be one because the
+        # offset is at least 0 and there must be a 0 link_offset
+        link_ind = bisect.bisect_right(self.link_offsets[doc_ind], offset) - 1
+        curr_link = self.links[doc_ind][link_ind] if link_ind >= 0 else None
+
+        doc = self.docs[doc_ind]
+        return OnyxQuote(
+            quote=quote,
+            document_id=doc.document_id,
+            link=curr_link,
+            source_type=doc.source_type,
+            semantic_identifier=doc.semantic_identifier,
+            blurb=doc.blurb,
+        )
+
+
 def match_quotes_to_docs(
     quotes: list[str],
     docs: list[LlmDoc] | list[InferenceChunk],
@@ -105,54 +207,17 @@ def match_quotes_to_docs(
     fuzzy_search: bool = False,
     prefix_only_length: int = 100,
 ) -> OnyxQuotes:
+    quote_index = _QuoteMatchIndex(docs)
     onyx_quotes: list[OnyxQuote] = []
     for quote in quotes:
-        max_edits = math.ceil(float(len(quote)) * max_error_percent)
-
-        for doc in docs:
-            if not doc.source_links:
-                continue
-
-            quote_clean = shared_precompare_cleanup(
-                clean_model_quote(quote, trim_length=prefix_only_length)
-            )
-            chunk_clean = shared_precompare_cleanup(doc.content)
-
-            # Finding the offset of the quote in the plain text
-            if fuzzy_search:
-                re_search_str = (
-                    r"(" + re.escape(quote_clean) + r"){e<=" + str(max_edits) + r"}"
-                )
-                found = regex.search(re_search_str, chunk_clean)
-                if not found:
-                    continue
-                offset = found.span()[0]
-            else:
-                if quote_clean not in chunk_clean:
-                    continue
-                offset = chunk_clean.index(quote_clean)
-
-            # Extracting the link from the offset
-            curr_link = None
-            for link_offset, link in doc.source_links.items():
-                # Should always find one because offset is at least 0 and there
-                # must be a 0 link_offset
-                if int(link_offset) <= offset:
-                    curr_link = link
-                else:
-                    break
-
-            onyx_quotes.append(
-                OnyxQuote(
-                    quote=quote,
-                    document_id=doc.document_id,
-                    link=curr_link,
-                    source_type=doc.source_type,
-                    semantic_identifier=doc.semantic_identifier,
-                    blurb=doc.blurb,
-                )
-            )
-            break
+        onyx_quote = quote_index.match(
+            quote,
+            max_error_percent=max_error_percent,
+            fuzzy_search=fuzzy_search,
+            prefix_only_length=prefix_only_length,
+        )
+        if onyx_quote:
+            onyx_quotes.append(onyx_quote)
 
     return OnyxQuotes(quotes=onyx_quotes)
 
@@ -192,17 +257,6 @@ def _process_answer(
     return OnyxAnswer(answer=answer), quotes
 
 
-def _stream_json_answer_end(answer_so_far: str, next_token: str) -> bool:
-    next_token = next_token.replace('\\"', "")
-    # If the previous character is an escape token, don't consider the first character of next_token
-    # This does not work if it's an escaped escape sign before the " but this is rare, not worth handling
-    if answer_so_far and answer_so_far[-1] == "\\":
-        next_token = next_token[1:]
-    if '"' in next_token:
-        return True
-    return False
-
-
 def _extract_quotes_from_completed_token_stream(
     model_output: str, context_docs: list[LlmDoc], is_json_prompt: bool = True
 ) -> OnyxQuotes:
@@ -215,7 +269,194 @@ def _extract_quotes_from_completed_token_stream(
     return quotes
 
 
+class _JsonAnswerState(Enum):
+    ANSWER_START = "answer_start"
+    ANSWER = "answer"
+    QUOTES_KEY = "quotes_key"
+    QUOTES_VALUE = "quotes_value"
+    QUOTES_LIST = "quotes_list"
+    QUOTE = "quote"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class _JsonAnswerStreamParser:
+    """Incremental parser for the `{"answer": "...", "quotes": ["...", ...]}` model output.
+    Every character is looked at once, the answer is decoded as it streams in and each
+    quote is returned as soon as its string is closed.
+
+    LLMs do not always escape the quotation marks inside of the strings, so a `"` only
+    closes a string if the next non whitespace character is one that can follow a value
+    (`,`, `]` or `}`). Output that does not follow the format puts the parser in the
+    FAILED state, the caller should then fall back to parsing the complete output."""
+
+    def __init__(self) -> None:
+        self.state = _JsonAnswerState.ANSWER_START
+        self.answer_start_buffer = ""
+        self.quotes_key: list[str] = []
+        self.quotes_is_list = False
+
+        # contents of the string being parsed
+        self.string_chars: list[str] = []
+        # escape sequence (without the backslash) split across tokens
+        self.partial_escape: str | None = None
+        # a `"` and the whitespace after it, not yet known to close the string
+        self.pending_close = ""
+
+    def _consume_string(self, text: str, pos: int) -> tuple[int, bool]:
+        """Adds the decoded string contents starting at text[pos] to string_chars.
+        Returns the position after the consumed characters and whether the string was
+        closed, in which case the character following it is left to the caller."""
+        while pos < len(text):
+            if self.partial_escape is not None:
+                self.partial_escape += text[pos]
+                pos += 1
+                if self.partial_escape[0] == "u":
+                    if len(self.partial_escape) < 5:
+                        continue
+                    try:
+                        self.string_chars.append(chr(int(self.partial_escape[1:], 16)))
+                    except ValueError:
+                        self.string_chars.append("\\" + self.partial_escape)
+                else:
+                    self.string_chars.append(
+                        _JSON_ESCAPES.get(self.partial_escape, self.partial_escape)
+                    )
+                self.partial_escape = None
+                continue
+
+            if self.pending_close:
+                char = text[pos]
+                if char.isspace():
+                    self.pending_close += char
+                    pos += 1
+                    continue
+                closed = char in _STRING_END_CHARS
+                if not closed:
+                    # unescaped quotation mark inside of the string
+                    self.string_chars.append(self.pending_close)
+                self.pending_close = ""
+                if closed:
+                    return pos, True
+                continue
+
+            special = _STRING_SPECIAL_CHARS.search(text, pos)
+            end = special.start() if special else len(text)
+            self.string_chars.append(text[pos:end])
+            if special is None:
+                return end, False
+            if special.group() == "\\":
+                self.partial_escape = ""
+            else:
+                self.pending_close = '"'
+            pos = end + 1
+
+        return pos, False
+
+    def _take_string(self) -> str:
+        string = "".join(self.string_chars)
+        self.string_chars = []
+        return string
+
+    def feed(self, token: str) -> list[tuple[_JsonAnswerState, str | None]]:
+        """Returns the parsed (ANSWER, piece) and (QUOTE, quote) parts in the order they
+        were completed, the answer ending is marked by an (ANSWER, None) part."""
+        parts: list[tuple[_JsonAnswerState, str | None]] = []
+        text = token
+        pos = 0
+
+        if self.state == _JsonAnswerState.ANSWER_START:
+            self.answer_start_buffer += token
+            match = answer_pattern.search(self.answer_start_buffer)
+            # Prevent heavy cases of hallucinations
+            if len(self.answer_start_buffer) > _MAX_ANSWER_START_CHARS:
+                self.state = _JsonAnswerState.FAILED
+                logger.warning("LLM did not produce json as prompted")
+                logger.debug(f"Model output thus far: {self.answer_start_buffer}")
+                return parts
+            if match is None:
+                return parts
+            text = self.answer_start_buffer
+            pos = match.end()
+            self.state = _JsonAnswerState.ANSWER
+
+        while pos < len(text):
+            if self.state == _JsonAnswerState.ANSWER:
+                pos, closed = self._consume_string(text, pos)
+                answer_piece = self._take_string()
+                if answer_piece:
+                    parts.append((_JsonAnswerState.ANSWER, answer_piece))
+                if closed:
+                    parts.append((_JsonAnswerState.ANSWER, None))
+                    self.state = _JsonAnswerState.QUOTES_KEY
+                continue
+
+            if self.state == _JsonAnswerState.QUOTE:
+                pos, closed = self._consume_string(text, pos)
+                if closed:
+                    parts.append((_JsonAnswerState.QUOTE, self._take_string()))
+                    self.state = (
+                        _JsonAnswerState.QUOTES_LIST
+                        if self.quotes_is_list
+                        else _JsonAnswerState.DONE
+                    )
+                continue
+
+            if self.state in (_JsonAnswerState.DONE, _JsonAnswerState.FAILED):
+                break
+
+            char = text[pos]
+            pos += 1
+            if self.state == _JsonAnswerState.QUOTES_KEY:
+                if char == "}":
+                    self.state = _JsonAnswerState.DONE
+                elif char != ":":
+                    self.quotes_key.append(char)
+                elif "".join(self.quotes_key).strip(' ,"\n\t').lower() in (
+                    "quotes",
+                    "quote",
+                ):
+                    self.state = _JsonAnswerState.QUOTES_VALUE
+                else:
+                    self.state = _JsonAnswerState.FAILED
+            elif self.state == _JsonAnswerState.QUOTES_VALUE:
+                if char == "[":
+                    self.quotes_is_list = True
+                    self.state = _JsonAnswerState.QUOTES_LIST
+                elif char == '"':
+                    self.state = _JsonAnswerState.QUOTE
+                elif not char.isspace():
+                    self.state = _JsonAnswerState.DONE
+            elif self.state == _JsonAnswerState.QUOTES_LIST:
+                if char == '"':
+                    self.state = _JsonAnswerState.QUOTE
+                elif not (char.isspace() or char == ","):
+                    self.state = _JsonAnswerState.DONE
+
+        return parts
+
+    def finish(self) -> list[str]:
+        """Returns the last quote if the output ends right after it is closed."""
+        if self.state == _JsonAnswerState.QUOTE and self.pending_close:
+            self.state = _JsonAnswerState.DONE
+            return [self._take_string()]
+        return []
+
+    @property
+    def succeeded(self) -> bool:
+        return self.state not in (
+            _JsonAnswerState.ANSWER_START,
+            _JsonAnswerState.FAILED,
+        )
+
+
 class QuotesProcessor:
+    """Streams the answer of the model output and the quotes supporting it. With a json
+    prompt, the output is parsed as it streams in and each quote is matched to the docs
+    and yielded as soon as it is complete (one OnyxQuotes per matched quote). Otherwise,
+    or if the output does not follow the json format, the quotes are extracted from the
+    complete output at the end of the stream."""
+
     def __init__(
         self,
         context_docs: list[LlmDoc],
@@ -224,92 +465,73 @@ class QuotesProcessor:
         self.context_docs = context_docs
         self.is_json_prompt = is_json_prompt
 
-        self.found_answer_start = False if is_json_prompt else True
+        self.json_parser = _JsonAnswerStreamParser() if is_json_prompt else None
+        self.quote_index = _QuoteMatchIndex(context_docs)
         self.found_answer_end = False
         self.hold_quote = ""
-        self.model_output = ""
-        self.hold = ""
+        self.model_output_parts: list[str] = []
+
+    def _match_quotes(self, quotes: list[str]) -> Generator[OnyxQuotes, None, None]:
+        for quote in quotes:
+            if not quote.strip():
+                continue
+            onyx_quote = self.quote_index.match(quote)
+            if onyx_quote:
+                yield OnyxQuotes(quotes=[onyx_quote])
+            else:
+                logger.debug(f"Quote not found in the docs: {quote}")
+
+    def _process_json_token(
+        self, token: str
+    ) -> Generator[OnyxAnswerPiece | OnyxQuotes, None, None]:
+        if self.json_parser is None:
+            return
+
+        for part_type, text in self.json_parser.feed(token):
+            if part_type == _JsonAnswerState.ANSWER:
+                yield OnyxAnswerPiece(answer_piece=text)
+            elif text is not None:
+                yield from self._match_quotes([text])
 
     def process_token(
         self, token: str | None
     ) -> Generator[OnyxAnswerPiece | OnyxQuotes, None, None]:
         # None -> end of stream
         if token is None:
-            if self.model_output:
-                yield _extract_quotes_from_completed_token_stream(
-                    model_output=self.model_output,
-                    context_docs=self.context_docs,
-                    is_json_prompt=self.is_json_prompt,
-                )
+            if not self.model_output_parts:
+                return
+            if self.json_parser and self.json_parser.succeeded:
+                yield from self._match_quotes(self.json_parser.finish())
+                return
+            yield _extract_quotes_from_completed_token_stream(
+                model_output="".join(self.model_output_parts),
+                context_docs=self.context_docs,
+                is_json_prompt=self.is_json_prompt,
+            )
             return
 
-        model_previous = self.model_output
-        self.model_output += token
-        if not self.found_answer_start:
-            m = answer_pattern.search(self.model_output)
-            if m:
-                self.found_answer_start = True
-
-                # Prevent heavy cases of hallucinations
-                if self.is_json_prompt and len(self.model_output) > 400:
-                    self.found_answer_end = True
-                    logger.warning("LLM did not produce json as prompted")
-                    logger.debug("Model output thus far:", self.model_output)
-                    return
-
-                remaining = self.model_output[m.end() :]
-
-                # Look for an unescaped quote, which means the answer is entirely contained
-                # in this token e.g. if the token is `{"answer": "blah", "qu`
-                quote_indices = [i for i, char in enumerate(remaining) if char == '"']
-                for quote_idx in quote_indices:
-                    # Check if quote is escaped by counting backslashes before it
-                    num_backslashes = 0
-                    pos = quote_idx - 1
-                    while pos >= 0 and remaining[pos] == "\\":
-                        num_backslashes += 1
-                        pos -= 1
-                    # If even number of backslashes, quote is not escaped
-                    if num_backslashes % 2 == 0:
-                        yield OnyxAnswerPiece(answer_piece=remaining[:quote_idx])
-                        return
-
-                # If no unescaped quote found, yield the remaining string
-                if len(remaining) > 0:
-                    yield OnyxAnswerPiece(answer_piece=remaining)
-                return
+        self.model_output_parts.append(token)
+        if self.is_json_prompt:
+            yield from self._process_json_token(token)
+            return
 
-        if self.found_answer_start and not self.found_answer_end:
-            if self.is_json_prompt and _stream_json_answer_end(model_previous, token):
-                self.found_answer_end = True
+        if self.found_answer_end:
+            return
 
-                if token:
-                    try:
-                        answer_token_section = token.index('"')
-                        yield OnyxAnswerPiece(
-                            answer_piece=self.hold_quote + token[:answer_token_section]
-                        )
-                    except ValueError:
-                        logger.error("Quotation mark not found in token")
-                        yield OnyxAnswerPiece(answer_piece=self.hold_quote + token)
-                yield OnyxAnswerPiece(answer_piece=None)
-                return
+        quote_pat = f"\n{QUOTE_PAT}"
+        quote_loose = f"\n{quote_pat[:-1]}\n"
+        quote_pat_full = f"\n{quote_pat}"
 
-            elif not self.is_json_prompt:
-                quote_pat = f"\n{QUOTE_PAT}"
-                quote_loose = f"\n{quote_pat[:-1]}\n"
-                quote_pat_full = f"\n{quote_pat}"
+        if (
+            quote_pat in self.hold_quote + token
+            or quote_loose in self.hold_quote + token
+        ):
+            self.found_answer_end = True
+            yield OnyxAnswerPiece(answer_piece=None)
+            return
+        if self.hold_quote + token in quote_pat_full:
+            self.hold_quote += token
+            return
 
-                if (
-                    quote_pat in self.hold_quote + token
-                    or quote_loose in self.hold_quote + token
-                ):
-                    self.found_answer_end = True
-                    yield OnyxAnswerPiece(answer_piece=None)
-                    return
-                if self.hold_quote + token in quote_pat_full:
-                    self.hold_quote += token
-                    return
-
-            yield OnyxAnswerPiece(answer_piece=self.hold_quote + token)
-            self.hold_quote = ""
+        yield OnyxAnswerPiece(answer_piece=self.hold_quote + token)
+        self.hold_quote = ""
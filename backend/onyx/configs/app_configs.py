@@ -412,6 +412,23 @@ MINI_CHUNK_SIZE = 150
 # This is the number of regular chunks per large chunk
 LARGE_CHUNK_RATIO = 4
 
+# Tokenizes every section of a document exactly once while chunking and keeps running token
+# counts instead of re-tokenizing the growing chunk. Identical output for tokenizers that split on
+# whitespace (all of the default HuggingFace ones), token counts at section boundaries may be off by
+# a token for BPE tokenizers which can merge across the section separator.
+CHUNKER_INCREMENTAL_TOKEN_COUNTING = (
+    os.environ.get("CHUNKER_INCREMENTAL_TOKEN_COUNTING", "").lower() == "true"
+)
+
+# Number of processes used to chunk the documents of a batch in parallel, each with its own
+# tokenizer. Chunks keep the order of the documents. 1 chunks in the indexing process itself.
+# Above 1, the indexing processes are started non-daemonic so that they may start children.
+CHUNKER_NUM_PROCESSES = int(os.environ.get("CHUNKER_NUM_PROCESSES") or 1)
+
+# Number of token counts memoized per tokenizer, titles, metadata suffixes, prompts and tool
+# definitions are counted over and over with the same text. 0 disables the memo.
+TOKENIZER_MEMO_MAX_ENTRIES = int(os.environ.get("TOKENIZER_MEMO_MAX_ENTRIES") or 4096)
+
 # Include the document level metadata in each chunk. If the metadata is too long, then it is thrown out
 # We don't want the metadata to overwhelm the actual contents of the chunk
 SKIP_METADATA_IN_CHUNK = os.environ.get("SKIP_METADATA_IN_CHUNK", "").lower() == "true"
@@ -433,6 +450,74 @@ INDEXING_TRACER_INTERVAL = int(os.environ.get("INDEXING_TRACER_INTERVAL") or 0)
 # exception without aborting the attempt.
 INDEXING_EXCEPTION_LIMIT = int(os.environ.get("INDEXING_EXCEPTION_LIMIT") or 0)
 
+# Runs the indexing of a connector as a set of overlapping stages (fetch -> chunk -> embed -> write)
+# connected by bounded queues instead of processing one batch at a time end to end.
+# Uses more memory (up to the sum of the queue depths in batches) and more DB connections.
+ENABLE_PIPELINED_INDEXING = (
+    os.environ.get("ENABLE_PIPELINED_INDEXING", "").lower() == "true"
+)
+# Number of threads per stage of the pipelined indexing
+INDEXING_PIPELINE_CHUNK_WORKERS = int(
+    os.environ.get("INDEXING_PIPELINE_CHUNK_WORKERS") or 1
+)
+INDEXING_PIPELINE_EMBED_WORKERS = int(
+    os.environ.get("INDEXING_PIPELINE_EMBED_WORKERS") or 1
+)
+INDEXING_PIPELINE_WRITE_WORKERS = int(
+    os.environ.get("INDEXING_PIPELINE_WRITE_WORKERS") or 1
+)
+# Number of document batches that can be buffered between two stages
+INDEXING_PIPELINE_QUEUE_DEPTH = int(
+    os.environ.get("INDEXING_PIPELINE_QUEUE_DEPTH") or 2
+)
+
+# Seconds between two writes of the indexing progress to Redis. Progress reported in between
+# is accumulated in the indexing process. 0 writes on every progress report.
+INDEXING_PROGRESS_FLUSH_INTERVAL = float(
+    os.environ.get("INDEXING_PROGRESS_FLUSH_INTERVAL") or 5
+)
+# Seconds during which the indexing process reuses the last read of the stop signal
+# instead of checking Redis again. 0 checks on every call.
+INDEXING_STOP_CHECK_INTERVAL = float(
+    os.environ.get("INDEXING_STOP_CHECK_INTERVAL") or 1
+)
+
+# Runs index attempts in a pool of spawned worker processes that are started ahead of time and
+# reused across attempts, instead of spawning (and re-importing everything in) a fresh process
+# for every attempt. A worker is replaced after INDEXING_WORKER_MAX_ATTEMPTS attempts, or once
+# its memory exceeds INDEXING_WORKER_MAX_MEMORY_MB after an attempt (0 disables the memory check).
+ENABLE_WARM_INDEXING_WORKERS = (
+    os.environ.get("ENABLE_WARM_INDEXING_WORKERS", "").lower() == "true"
+)
+INDEXING_WORKER_MAX_ATTEMPTS = int(os.environ.get("INDEXING_WORKER_MAX_ATTEMPTS") or 20)
+INDEXING_WORKER_MAX_MEMORY_MB = int(
+    os.environ.get("INDEXING_WORKER_MAX_MEMORY_MB") or 2048
+)
+
+# Maximum number of chunk / title embeddings kept in the Postgres embedding cache. When set, texts
+# that were already embedded with the same model configuration skip the model server on re-index.
+# Each entry takes roughly 4 bytes per embedding dimension. 0 disables the cache.
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES") or 0)
+
+# Seconds that query embeddings are cached in Redis (shared by all API server workers) so that
+# repeated queries skip the model server. The search settings are part of the cache key, so
+# changing them invalidates the cached embeddings. 0 disables the cache.
+QUERY_EMBEDDING_CACHE_TTL = int(os.environ.get("QUERY_EMBEDDING_CACHE_TTL") or 0)
+# Number of query embeddings additionally kept in memory by each worker
+QUERY_EMBEDDING_CACHE_MAX_LOCAL_ENTRIES = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_MAX_LOCAL_ENTRIES") or 1024
+)
+
+# Seconds that cross-encoder scores are cached in Redis per (query, chunk, chunk content,
+# reranking model) so that paginating, regenerating or retrying a search does not rerank the
+# same chunks again. 0 disables the cache.
+RERANK_SCORE_CACHE_TTL = int(os.environ.get("RERANK_SCORE_CACHE_TTL") or 0)
+
+# Stores a fingerprint per chunk when a document is indexed and, on re-index, only embeds and
+# writes the chunks whose fingerprint changed and deletes the chunks that no longer exist instead
+# of rewriting the whole document. Mostly helps large documents that are edited frequently.
+ENABLE_CHUNK_DIFFING = os.environ.get("ENABLE_CHUNK_DIFFING", "").lower() == "true"
+
 # Maximum file size in a document to be indexed
 MAX_DOCUMENT_CHARS = int(os.environ.get("MAX_DOCUMENT_CHARS") or 5_000_000)
 MAX_FILE_SIZE_BYTES = int(
@@ -484,6 +569,45 @@ CUSTOM_ANSWER_VALIDITY_CONDITIONS = json.loads(
 
 VESPA_REQUEST_TIMEOUT = int(os.environ.get("VESPA_REQUEST_TIMEOUT") or "15")
 
+# Connection pool of the process wide Vespa client shared by the query, visit, update and delete
+# paths. Idle connections are kept open for VESPA_HTTP_KEEPALIVE_EXPIRY seconds to be reused.
+VESPA_HTTP_MAX_CONNECTIONS = int(os.environ.get("VESPA_HTTP_MAX_CONNECTIONS") or 100)
+VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS") or 20
+)
+VESPA_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("VESPA_HTTP_KEEPALIVE_EXPIRY") or 60)
+
+# Filters Vespa queries by ACL with a single weightedSet term bound as a query parameter instead
+# of an OR clause per ACL entry in the YQL, for users with many (external) groups
+ENABLE_VESPA_COMPACT_ACL_FILTER = (
+    os.environ.get("ENABLE_VESPA_COMPACT_ACL_FILTER", "").lower() == "true"
+)
+# Seconds that the ACL entries of a user (their email, groups and external groups) are cached in
+# Redis for search. Group membership changes invalidate the cache. 0 disables the cache.
+USER_ACL_CACHE_TTL = int(os.environ.get("USER_ACL_CACHE_TTL") or 0)
+
+# Writes chunks to Vespa from an asyncio feeder that keeps up to VESPA_FEED_MAX_IN_FLIGHT HTTP/2
+# requests in flight for the whole batch of documents, instead of one thread per request in
+# barriers of 128 chunks. Transient failures (timeouts, 429 / 5xx responses) are retried up to
+# VESPA_FEED_MAX_RETRIES times with exponential backoff.
+ENABLE_VESPA_ASYNC_FEED = (
+    os.environ.get("ENABLE_VESPA_ASYNC_FEED", "").lower() == "true"
+)
+VESPA_FEED_MAX_IN_FLIGHT = int(os.environ.get("VESPA_FEED_MAX_IN_FLIGHT") or 128)
+VESPA_FEED_MAX_RETRIES = int(os.environ.get("VESPA_FEED_MAX_RETRIES") or 5)
+
+# Number of documents handled by a single vespa metadata sync task (document sets, access, boost,
+# hidden) or document cleanup task (connector deletion and pruning), and the number of concurrent
+# Vespa updates / deletes in the task
+VESPA_SYNC_BATCH_SIZE = int(os.environ.get("VESPA_SYNC_BATCH_SIZE") or 64)
+VESPA_SYNC_MAX_THREADS = int(os.environ.get("VESPA_SYNC_MAX_THREADS") or 8)
+# Number of documents whose external permissions are upserted by a single doc permissions
+# sync task. Each changed document is also updated in Vespa by the task, so this is kept in
+# line with VESPA_SYNC_BATCH_SIZE to finish within the task time limit
+DOC_PERMISSIONS_SYNC_BATCH_SIZE = int(
+    os.environ.get("DOC_PERMISSIONS_SYNC_BATCH_SIZE") or 64
+)
+
 SYSTEM_RECURSION_LIMIT = int(os.environ.get("SYSTEM_RECURSION_LIMIT") or "1000")
 
 PARSE_WITH_TRAFILATURA = os.environ.get("PARSE_WITH_TRAFILATURA", "").lower() == "true"
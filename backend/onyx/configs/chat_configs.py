@@ -78,6 +78,23 @@ DISABLE_LLM_DOC_RELEVANCE = (
     os.environ.get("DISABLE_LLM_DOC_RELEVANCE", "").lower() == "true"
 )
 
+# Rank constant of the reciprocal rank fusion of the results of the multilingual query
+# rephrasings, higher values give more weight to chunks found by several rephrasings
+MULTILINGUAL_RRF_K = int(os.environ.get("MULTILINGUAL_RRF_K") or 60)
+
+# Starts embedding the raw query while the LLM based preprocessing (time/source filter
+# extraction, query analysis) runs instead of only once it has finished
+ENABLE_SPECULATIVE_QUERY_EMBEDDING = (
+    os.environ.get("ENABLE_SPECULATIVE_QUERY_EMBEDDING", "true").lower() == "true"
+)
+
+# Fetches the surrounding chunks (or full documents) of the search results in the same
+# batched request as the chunks referenced by large chunks, instead of in a separate
+# request once retrieval is done
+ENABLE_BATCHED_CONTEXT_EXPANSION = (
+    os.environ.get("ENABLE_BATCHED_CONTEXT_EXPANSION", "").lower() == "true"
+)
+
 # Stops streaming answers back to the UI if this pattern is seen:
 STOP_STREAM_PAT = os.environ.get("STOP_STREAM_PAT") or None
 
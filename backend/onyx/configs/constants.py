@@ -302,13 +302,18 @@ class OnyxCeleryTask:
     UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_TASK = (
         "update_external_document_permissions_task"
     )
+    UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_BATCH_TASK = (
+        "update_external_document_permissions_batch_task"
+    )
     CONNECTOR_EXTERNAL_GROUP_SYNC_GENERATOR_TASK = (
         "connector_external_group_sync_generator_task"
     )
     CONNECTOR_INDEXING_PROXY_TASK = "connector_indexing_proxy_task"
     CONNECTOR_PRUNING_GENERATOR_TASK = "connector_pruning_generator_task"
     DOCUMENT_BY_CC_PAIR_CLEANUP_TASK = "document_by_cc_pair_cleanup_task"
+    DOCUMENT_BY_CC_PAIR_CLEANUP_BATCH_TASK = "document_by_cc_pair_cleanup_batch_task"
     VESPA_METADATA_SYNC_TASK = "vespa_metadata_sync_task"
+    VESPA_METADATA_SYNC_BATCH_TASK = "vespa_metadata_sync_batch_task"
     CHECK_TTL_MANAGEMENT_TASK = "check_ttl_management_task"
     AUTOGENERATE_USAGE_REPORT_TASK = "autogenerate_usage_report_task"
 
@@ -16,11 +16,13 @@ from onyx.connectors.confluence.onyx_confluence import (
 from onyx.file_processing.extract_file_text import extract_file_text
 from onyx.file_processing.html_utils import format_document_soup
 from onyx.utils.logger import setup_logger
+from onyx.utils.process_caches import register_process_cache
 
 logger = setup_logger()
 
 
 _USER_EMAIL_CACHE: dict[str, str | None] = {}
+register_process_cache(_USER_EMAIL_CACHE.clear)
 
 
 def get_user_email_from_username__server(
@@ -43,6 +45,7 @@ def get_user_email_from_username__server(
 
 _USER_NOT_FOUND = "Unknown Confluence User"
 _USER_ID_TO_DISPLAY_NAME_CACHE: dict[str, str | None] = {}
+register_process_cache(_USER_ID_TO_DISPLAY_NAME_CACHE.clear)
 
 
 def _get_user(confluence_client: OnyxConfluence, user_id: str) -> str:
@@ -1,6 +1,8 @@
+import time
 from collections import defaultdict
 from collections.abc import Callable
 from collections.abc import Iterator
+from concurrent.futures import Future
 from typing import cast
 
 from sqlalchemy.orm import Session
@@ -11,6 +13,8 @@ from onyx.chat.prune_and_merge import _merge_sections
 from onyx.chat.prune_and_merge import ChunkRange
 from onyx.chat.prune_and_merge import merge_chunk_intervals
 from onyx.configs.chat_configs import DISABLE_LLM_DOC_RELEVANCE
+from onyx.configs.chat_configs import ENABLE_BATCHED_CONTEXT_EXPANSION
+from onyx.configs.chat_configs import ENABLE_SPECULATIVE_QUERY_EMBEDDING
 from onyx.context.search.enums import LLMEvaluationType
 from onyx.context.search.enums import QueryFlow
 from onyx.context.search.enums import SearchType
@@ -32,11 +36,17 @@ from onyx.db.search_settings import get_current_search_settings
 from onyx.document_index.factory import get_default_document_index
 from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.llm.interfaces import LLM
+from onyx.natural_language_processing.query_embedding_cache import embed_query
+from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.secondary_llm_flows.agentic_evaluation import evaluate_inference_section
 from onyx.utils.logger import setup_logger
 from onyx.utils.threadpool_concurrency import FunctionCall
 from onyx.utils.threadpool_concurrency import run_functions_in_parallel
+from onyx.utils.threadpool_concurrency import run_in_background
 from onyx.utils.timing import log_function_time
+from shared_configs.configs import MODEL_SERVER_HOST
+from shared_configs.configs import MODEL_SERVER_PORT
+from shared_configs.model_server_models import Embedding
 
 logger = setup_logger()
 
@@ -76,8 +86,16 @@ class SearchPipeline:
         self._search_query: SearchQuery | None = None
         self._predicted_search_type: SearchType | None = None
 
+        # The raw query is embedded while the (LLM based) preprocessing runs
+        self._query_embedding_future: Future[Embedding] | None = None
+
+        # Seconds spent in each stage of the pipeline, see stage_timings
+        self._stage_timings: dict[str, float] = {}
+
         # Initial document index retrieval chunks
         self._retrieved_chunks: list[InferenceChunk] | None = None
+        # Surrounding chunks fetched along with the retrieval, see doc_index_retrieval
+        self._context_chunks: dict[tuple[str, int], InferenceChunk] | None = None
         # Another call made to the document index to get surrounding sections
         self._retrieved_sections: list[InferenceSection] | None = None
         # Reranking and LLM section selection can be run together
@@ -97,7 +115,55 @@ class SearchPipeline:
 
     """Pre-processing"""
 
+    def _start_query_embedding(self) -> None:
+        if not ENABLE_SPECULATIVE_QUERY_EMBEDDING:
+            return
+
+        # The model is built here as reading the search settings may hit the db session
+        # which must not be used from another thread
+        model = EmbeddingModel.from_db_model(
+            search_settings=self.search_settings,
+            # The below are globally set, this flow always uses the indexing one
+            server_host=MODEL_SERVER_HOST,
+            server_port=MODEL_SERVER_PORT,
+        )
+        query = self.search_request.query
+        search_settings_id = self.search_settings.id
+
+        def _embed() -> Embedding:
+            start = time.monotonic()
+            embedding = embed_query(
+                query, model=model, search_settings_id=search_settings_id
+            )
+            self._stage_timings["query_embedding"] = time.monotonic() - start
+            return embedding
+
+        self._query_embedding_future = run_in_background(_embed)
+
+    def _join_query_embedding(self) -> Embedding | None:
+        """Returns the speculatively computed embedding if it matches the final query,
+        otherwise retrieval embeds the query itself."""
+        if self._query_embedding_future is None:
+            return None
+
+        future = self._query_embedding_future
+        self._query_embedding_future = None
+        if self.search_query.query != self.search_request.query:
+            return None
+
+        start = time.monotonic()
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"Speculative query embedding failed, retrying: {e}")
+            return None
+        finally:
+            self._stage_timings["query_embedding_wait"] = time.monotonic() - start
+
     def _run_preprocessing(self) -> None:
+        self._start_query_embedding()
+
+        start = time.monotonic()
         final_search_query = retrieval_preprocessing(
             search_request=self.search_request,
             user=self.user,
@@ -105,9 +171,19 @@ class SearchPipeline:
             db_session=self.db_session,
             bypass_acl=self.bypass_acl,
         )
+        self._stage_timings["preprocessing"] = time.monotonic() - start
+
         self._search_query = final_search_query
         self._predicted_search_type = final_search_query.search_type
 
+    @property
+    def stage_timings(self) -> dict[str, float]:
+        """Seconds spent in each stage that has run so far: preprocessing,
+        query_embedding (runs concurrently with preprocessing), query_embedding_wait
+        (time retrieval was blocked on the embedding), retrieval, section_expansion
+        and reranking."""
+        return dict(self._stage_timings)
+
     @property
     def search_query(self) -> SearchQuery:
         if self._search_query is not None:
@@ -139,13 +215,23 @@ class SearchPipeline:
         if self._retrieved_chunks is not None:
             return self._retrieved_chunks
 
+        search_query = self.search_query
+        query_embedding = self._join_query_embedding()
+
+        if ENABLE_BATCHED_CONTEXT_EXPANSION:
+            self._context_chunks = {}
+
+        start = time.monotonic()
         # These chunks do not include large chunks and have been deduped
         self._retrieved_chunks = retrieve_chunks(
-            query=self.search_query,
+            query=search_query,
             document_index=self.document_index,
             db_session=self.db_session,
             retrieval_metrics_callback=self.retrieval_metrics_callback,
+            query_embedding=query_embedding,
+            context_chunks=self._context_chunks,
         )
+        self._stage_timings["retrieval"] = time.monotonic() - start
 
         return cast(list[InferenceChunk], self._retrieved_chunks)
 
@@ -163,6 +249,7 @@ class SearchPipeline:
         # These chunks are ordered, deduped, and contain no large chunks
         retrieved_chunks = self._get_chunks()
 
+        start = time.monotonic()
         above = self.search_query.chunks_above
         below = self.search_query.chunks_below
 
@@ -170,6 +257,12 @@ class SearchPipeline:
         inference_chunks: list[InferenceChunk] = []
         chunk_requests: list[VespaChunkRequest] = []
 
+        # With batched context expansion, the surrounding chunks were already fetched
+        # during retrieval and no further request is needed
+        prefetched = self._context_chunks is not None
+        if self._context_chunks is not None:
+            inference_chunks.extend(self._context_chunks.values())
+
         # Full doc setting takes priority
         if self.search_query.full_doc:
             seen_document_ids = set()
@@ -184,14 +277,28 @@ class SearchPipeline:
                         )
                     )
 
-            inference_chunks.extend(
-                cleanup_chunks(
-                    self.document_index.id_based_retrieval(
-                        chunk_requests=chunk_requests,
-                        filters=IndexFilters(access_control_list=None),
+            if prefetched:
+                # keep the score order of the documents, the retrieval of several query
+                # rephrasings may have filled in the chunks in any order
+                doc_ranks = {
+                    request.document_id: rank
+                    for rank, request in enumerate(chunk_requests)
+                }
+                inference_chunks.sort(
+                    key=lambda chunk: (
+                        doc_ranks.get(chunk.document_id, len(doc_ranks)),
+                        chunk.chunk_id,
+                    )
+                )
+            else:
+                inference_chunks.extend(
+                    cleanup_chunks(
+                        self.document_index.id_based_retrieval(
+                            chunk_requests=chunk_requests,
+                            filters=IndexFilters(access_control_list=None),
+                        )
                     )
                 )
-            )
 
             # Create a dictionary to group chunks by document_id
             grouped_inference_chunks: dict[str, list[InferenceChunk]] = {}
@@ -213,6 +320,7 @@ class SearchPipeline:
                         "Skipped creation of section for full docs, no chunks found"
                     )
 
+            self._stage_timings["section_expansion"] = time.monotonic() - start
             self._retrieved_sections = expanded_inference_sections
             return expanded_inference_sections
 
@@ -257,7 +365,7 @@ class SearchPipeline:
                     )
                 )
 
-        if chunk_requests:
+        if chunk_requests and not prefetched:
             inference_chunks.extend(
                 cleanup_chunks(
                     self.document_index.id_based_retrieval(
@@ -302,6 +410,7 @@ class SearchPipeline:
             else:
                 logger.warning("Skipped creation of section, no chunks found")
 
+        self._stage_timings["section_expansion"] = time.monotonic() - start
         self._retrieved_sections = expanded_inference_sections
         return expanded_inference_sections
 
@@ -317,9 +426,12 @@ class SearchPipeline:
         if self._reranked_sections is not None:
             return self._reranked_sections
 
+        retrieved_sections = self._get_sections()
+
+        start = time.monotonic()
         self._postprocessing_generator = search_postprocessing(
             search_query=self.search_query,
-            retrieved_sections=self._get_sections(),
+            retrieved_sections=retrieved_sections,
             llm=self.fast_llm,
             rerank_metrics_callback=self.rerank_metrics_callback,
         )
@@ -327,6 +439,8 @@ class SearchPipeline:
         self._reranked_sections = cast(
             list[InferenceSection], next(self._postprocessing_generator)
         )
+        self._stage_timings["reranking"] = time.monotonic() - start
+        logger.debug(f"Search pipeline stage timings: {self._stage_timings}")
 
         return self._reranked_sections
 
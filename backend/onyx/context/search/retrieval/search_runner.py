@@ -1,4 +1,5 @@
 import string
+from collections import defaultdict
 from collections.abc import Callable
 
 import nltk  # type:ignore
@@ -6,6 +7,7 @@ from nltk.corpus import stopwords  # type:ignore
 from nltk.tokenize import word_tokenize  # type:ignore
 from sqlalchemy.orm import Session
 
+from onyx.configs.chat_configs import MULTILINGUAL_RRF_K
 from onyx.context.search.models import ChunkMetric
 from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunk
@@ -23,6 +25,8 @@ from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
 )
+from onyx.natural_language_processing.query_embedding_cache import embed_queries
+from onyx.natural_language_processing.query_embedding_cache import embed_query
 from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.secondary_llm_flows.query_expansion import multilingual_query_expansion
 from onyx.utils.logger import setup_logger
@@ -30,7 +34,7 @@ from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 from onyx.utils.timing import log_function_time
 from shared_configs.configs import MODEL_SERVER_HOST
 from shared_configs.configs import MODEL_SERVER_PORT
-from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
 
 
 logger = setup_logger()
@@ -85,28 +89,81 @@ def remove_stop_words_and_punctuation(keywords: list[str]) -> list[str]:
         return keywords
 
 
-def combine_retrieval_results(
+def reciprocal_rank_fusion(
     chunk_sets: list[list[InferenceChunk]],
+    k: int = MULTILINGUAL_RRF_K,
 ) -> list[InferenceChunk]:
-    all_chunks = [chunk for chunk_set in chunk_sets for chunk in chunk_set]
-
+    """Fuses the ranked results of several queries, each chunk is scored with the sum of
+    1 / (k + rank) over the result lists it appears in. Unlike comparing the raw scores,
+    this does not assume that the scores of different queries are on the same scale."""
+    fused_scores: dict[tuple[str, int], float] = defaultdict(float)
     unique_chunks: dict[tuple[str, int], InferenceChunk] = {}
-    for chunk in all_chunks:
-        key = (chunk.document_id, chunk.chunk_id)
-        if key not in unique_chunks:
-            unique_chunks[key] = chunk
-            continue
+    for chunk_set in chunk_sets:
+        for rank, chunk in enumerate(chunk_set, start=1):
+            key = (chunk.document_id, chunk.chunk_id)
+            fused_scores[key] += 1 / (k + rank)
+            unique_chunks.setdefault(key, chunk)
+
+    for key, chunk in unique_chunks.items():
+        chunk.score = fused_scores[key]
+
+    # stable sort, ties keep the order in which the chunks were first seen
+    return sorted(
+        unique_chunks.values(), key=lambda chunk: chunk.score or 0, reverse=True
+    )
 
-        stored_chunk_score = unique_chunks[key].score or 0
-        this_chunk_score = chunk.score or 0
-        if stored_chunk_score < this_chunk_score:
-            unique_chunks[key] = chunk
 
-    sorted_chunks = sorted(
-        unique_chunks.values(), key=lambda x: x.score or 0, reverse=True
+def _get_query_embedding_model(db_session: Session) -> tuple[EmbeddingModel, int]:
+    search_settings = get_current_search_settings(db_session)
+
+    model = EmbeddingModel.from_db_model(
+        search_settings=search_settings,
+        # The below are globally set, this flow always uses the indexing one
+        server_host=MODEL_SERVER_HOST,
+        server_port=MODEL_SERVER_PORT,
     )
+    return model, search_settings.id
+
+
+def _merge_chunk_requests(
+    chunk_requests: list[VespaChunkRequest],
+) -> list[VespaChunkRequest]:
+    """Merges the overlapping or adjacent chunk ranges of each document so that no chunk is
+    requested twice, keeps the order in which the documents first appear."""
+    doc_ranges: dict[str, list[tuple[int, int]]] = {}
+    uncapped_doc_ids: set[str] = set()
+    for request in chunk_requests:
+        ranges = doc_ranges.setdefault(request.document_id, [])
+        if request.max_chunk_ind is None:
+            uncapped_doc_ids.add(request.document_id)
+        else:
+            ranges.append((request.min_chunk_ind or 0, request.max_chunk_ind))
+
+    merged_requests: list[VespaChunkRequest] = []
+    for document_id, ranges in doc_ranges.items():
+        if document_id in uncapped_doc_ids:
+            merged_requests.append(VespaChunkRequest(document_id=document_id))
+            continue
+
+        ranges.sort()
+        start, end = ranges[0]
+        for range_start, range_end in ranges[1:]:
+            if range_start > end + 1:
+                merged_requests.append(
+                    VespaChunkRequest(
+                        document_id=document_id, min_chunk_ind=start, max_chunk_ind=end
+                    )
+                )
+                start, end = range_start, range_end
+            else:
+                end = max(end, range_end)
+        merged_requests.append(
+            VespaChunkRequest(
+                document_id=document_id, min_chunk_ind=start, max_chunk_ind=end
+            )
+        )
 
-    return sorted_chunks
+    return merged_requests
 
 
 @log_function_time(print_only=True)
@@ -114,23 +171,27 @@ def doc_index_retrieval(
     query: SearchQuery,
     document_index: DocumentIndex,
     db_session: Session,
+    query_embedding: Embedding | None = None,
+    context_chunks: dict[tuple[str, int], InferenceChunk] | None = None,
 ) -> list[InferenceChunk]:
     """
     This function performs the search to retrieve the chunks,
     extracts chunks from the large chunks, persists the scores
     from the large chunks to the referenced chunks,
     dedupes the chunks, and cleans the chunks.
-    """
-    search_settings = get_current_search_settings(db_session)
 
-    model = EmbeddingModel.from_db_model(
-        search_settings=search_settings,
-        # The below are globally set, this flow always uses the indexing one
-        server_host=MODEL_SERVER_HOST,
-        server_port=MODEL_SERVER_PORT,
-    )
+    `query_embedding` is the embedding of `query.query` if it was already computed.
 
-    query_embedding = model.encode([query.query], text_type=EmbedTextType.QUERY)[0]
+    If `context_chunks` is given, the chunks surrounding the hits (`query.chunks_above`/
+    `query.chunks_below`, or the whole documents if `query.full_doc`) are fetched in the
+    same batched request as the chunks referenced by large chunks and added to it, keyed
+    by (document_id, chunk_id). The sections can then be built without another round trip.
+    """
+    if query_embedding is None:
+        model, search_settings_id = _get_query_embedding_model(db_session)
+        query_embedding = embed_query(
+            query.query, model=model, search_settings_id=search_settings_id
+        )
 
     top_chunks = document_index.hybrid_retrieval(
         query=query.query,
@@ -143,6 +204,10 @@ def doc_index_retrieval(
         offset=query.offset,
     )
 
+    # Without context_chunks only the chunks referenced by large chunks are fetched
+    above = query.chunks_above if context_chunks is not None else 0
+    below = query.chunks_below if context_chunks is not None else 0
+
     retrieval_requests: list[VespaChunkRequest] = []
     normal_chunks: list[InferenceChunkUncleaned] = []
     referenced_chunk_scores: dict[tuple[str, int], float] = {}
@@ -151,8 +216,8 @@ def doc_index_retrieval(
             retrieval_requests.append(
                 VespaChunkRequest(
                     document_id=replace_invalid_doc_id_characters(chunk.document_id),
-                    min_chunk_ind=chunk.large_chunk_reference_ids[0],
-                    max_chunk_ind=chunk.large_chunk_reference_ids[-1],
+                    min_chunk_ind=max(0, chunk.large_chunk_reference_ids[0] - above),
+                    max_chunk_ind=chunk.large_chunk_reference_ids[-1] + below,
                 )
             )
             # for each referenced chunk, persist the
@@ -164,28 +229,57 @@ def doc_index_retrieval(
                 )
         else:
             normal_chunks.append(chunk)
+            if above or below:
+                retrieval_requests.append(
+                    VespaChunkRequest(
+                        document_id=replace_invalid_doc_id_characters(
+                            chunk.document_id
+                        ),
+                        min_chunk_ind=max(0, chunk.chunk_id - above),
+                        max_chunk_ind=chunk.chunk_id + below,
+                    )
+                )
 
-    # If there are no large chunks, just return the normal chunks
+    if context_chunks is not None and query.full_doc:
+        # The whole documents cover every range, keeps the score order of the documents
+        retrieval_requests = [
+            VespaChunkRequest(document_id=replace_invalid_doc_id_characters(doc_id))
+            for doc_id in dict.fromkeys(chunk.document_id for chunk in top_chunks)
+        ]
+
+    # If there are no large chunks and no context to fetch, just return the normal chunks
     if not retrieval_requests:
         return cleanup_chunks(normal_chunks)
 
-    # Retrieve and return the referenced normal chunks from the large chunks
-    retrieved_inference_chunks = document_index.id_based_retrieval(
-        chunk_requests=retrieval_requests,
+    # Retrieve the referenced normal chunks from the large chunks, along with the
+    # surrounding context in the same request
+    fetched_chunks = document_index.id_based_retrieval(
+        chunk_requests=_merge_chunk_requests(retrieval_requests),
         filters=query.filters,
         batch_retrieval=True,
     )
 
     # Apply the scores from the large chunks to the chunks referenced
     # by each large chunk
-    for chunk in retrieved_inference_chunks:
+    retrieved_inference_chunks: list[InferenceChunkUncleaned] = []
+    for chunk in fetched_chunks:
         if (chunk.document_id, chunk.chunk_id) in referenced_chunk_scores:
             chunk.score = referenced_chunk_scores[(chunk.document_id, chunk.chunk_id)]
             referenced_chunk_scores.pop((chunk.document_id, chunk.chunk_id))
-        else:
+            retrieved_inference_chunks.append(chunk)
+        elif context_chunks is None:
             logger.error(
                 f"Chunk {chunk.document_id} {chunk.chunk_id} not found in referenced chunk scores"
             )
+            retrieved_inference_chunks.append(chunk)
+
+    if context_chunks is not None:
+        context_chunks.update(
+            {
+                (chunk.document_id, chunk.chunk_id): chunk
+                for chunk in cleanup_chunks(fetched_chunks)
+            }
+        )
 
     # Log any chunks that were not found in the retrieved chunks
     for reference in referenced_chunk_scores.keys():
@@ -222,42 +316,70 @@ def retrieve_chunks(
     db_session: Session,
     retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
     | None = None,
+    query_embedding: Embedding | None = None,
+    context_chunks: dict[tuple[str, int], InferenceChunk] | None = None,
 ) -> list[InferenceChunk]:
-    """Returns a list of the best chunks from an initial keyword/semantic/ hybrid search."""
+    """Returns a list of the best chunks from an initial keyword/semantic/ hybrid search.
+    `query_embedding` is the embedding of `query.query` if it was already computed and
+    `context_chunks` is filled with the surrounding chunks, see doc_index_retrieval."""
 
     multilingual_expansion = get_multilingual_expansion(db_session)
     # Don't do query expansion on complex queries, rephrasings likely would not work well
     if not multilingual_expansion or "\n" in query.query or "\r" in query.query:
         top_chunks = doc_index_retrieval(
-            query=query, document_index=document_index, db_session=db_session
+            query=query,
+            document_index=document_index,
+            db_session=db_session,
+            query_embedding=query_embedding,
+            context_chunks=context_chunks,
         )
     else:
         simplified_queries = set()
-        run_queries: list[tuple[Callable, tuple]] = []
+        rephrases: list[str] = []
 
         # Currently only uses query expansion on multilingual use cases
         query_rephrases = multilingual_query_expansion(
             query.query, multilingual_expansion
         )
-        # Just to be extra sure, add the original query.
-        query_rephrases.append(query.query)
-        for rephrase in set(query_rephrases):
+        # Just to be extra sure, add the original query (first, so it is kept over
+        # near identical rephrases)
+        for rephrase in dict.fromkeys([query.query] + query_rephrases):
             # Sometimes the model rephrases the query in the same language with minor changes
             # Avoid doing an extra search with the minor changes as this biases the results
             simplified_rephrase = _simplify_text(rephrase)
             if simplified_rephrase in simplified_queries:
                 continue
             simplified_queries.add(simplified_rephrase)
+            rephrases.append(rephrase)
+
+        # All of the rephrases are embedded with a single request to the model server,
+        # the original query may already have been embedded
+        to_embed = rephrases[1:] if query_embedding is not None else rephrases
+        model, search_settings_id = _get_query_embedding_model(db_session)
+        embeddings = (
+            embed_queries(to_embed, model=model, search_settings_id=search_settings_id)
+            if to_embed
+            else []
+        )
+        if query_embedding is not None:
+            embeddings.insert(0, query_embedding)
 
-            q_copy = query.copy(update={"query": rephrase}, deep=True)
-            run_queries.append(
+        # The Vespa queries share the pooled HTTP client
+        run_queries: list[tuple[Callable, tuple]] = [
+            (
+                doc_index_retrieval,
                 (
-                    doc_index_retrieval,
-                    (q_copy, document_index, db_session),
-                )
+                    query.copy(update={"query": rephrase}, deep=True),
+                    document_index,
+                    db_session,
+                    embedding,
+                    context_chunks,
+                ),
             )
+            for rephrase, embedding in zip(rephrases, embeddings)
+        ]
         parallel_search_results = run_functions_tuples_in_parallel(run_queries)
-        top_chunks = combine_retrieval_results(parallel_search_results)
+        top_chunks = reciprocal_rank_fusion(parallel_search_results)
 
     if not top_chunks:
         logger.warning(
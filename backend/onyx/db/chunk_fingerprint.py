@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy import exists
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from onyx.db.models import DocumentChunkFingerprints
+
+
+def get_chunk_fingerprints_for_documents(
+    db_session: Session, document_ids: list[str], index_name: str
+) -> dict[str, DocumentChunkFingerprints]:
+    if not document_ids:
+        return {}
+
+    rows = db_session.scalars(
+        select(DocumentChunkFingerprints).where(
+            DocumentChunkFingerprints.document_id.in_(document_ids),
+            DocumentChunkFingerprints.index_name == index_name,
+        )
+    ).all()
+    return {row.document_id: row for row in rows}
+
+
+def chunk_fingerprints_exist(db_session: Session, index_name: str) -> bool:
+    return bool(
+        db_session.scalar(
+            select(
+                exists().where(DocumentChunkFingerprints.index_name == index_name)
+            )
+        )
+    )
+
+
+def upsert_chunk_fingerprints__no_commit(
+    db_session: Session,
+    index_name: str,
+    document_id_to_fingerprints: dict[
+        str, tuple[datetime | None, list[dict[str, Any]]]
+    ],
+) -> None:
+    """Maps document id -> (doc_updated_at, chunk fingerprints).
+    NOTE: this function is Postgres specific. Not all DBs support the ON CONFLICT clause.
+    """
+    if not document_id_to_fingerprints:
+        return
+
+    insert_stmt = insert(DocumentChunkFingerprints).values(
+        [
+            {
+                "document_id": document_id,
+                "index_name": index_name,
+                "doc_updated_at": doc_updated_at,
+                "chunk_fingerprints": chunk_fingerprints,
+            }
+            for document_id, (
+                doc_updated_at,
+                chunk_fingerprints,
+            ) in document_id_to_fingerprints.items()
+        ]
+    )
+    on_conflict_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=["document_id", "index_name"],
+        set_={
+            "doc_updated_at": insert_stmt.excluded.doc_updated_at,
+            "chunk_fingerprints": insert_stmt.excluded.chunk_fingerprints,
+        },
+    )
+    db_session.execute(on_conflict_stmt)
+
+
+def delete_chunk_fingerprints_for_documents__no_commit(
+    db_session: Session, document_ids: list[str], index_name: str | None = None
+) -> None:
+    """Deletes the fingerprints of the documents for one index, or for all indices if
+    no index name is given"""
+    if not document_ids:
+        return
+
+    stmt = delete(DocumentChunkFingerprints).where(
+        DocumentChunkFingerprints.document_id.in_(document_ids)
+    )
+    if index_name is not None:
+        stmt = stmt.where(DocumentChunkFingerprints.index_name == index_name)
+    db_session.execute(stmt)
+
+
+def delete_chunk_fingerprints_for_index(db_session: Session, index_name: str) -> None:
+    db_session.execute(
+        delete(DocumentChunkFingerprints).where(
+            DocumentChunkFingerprints.index_name == index_name
+        )
+    )
+    db_session.commit()
@@ -9,6 +9,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
 
+from onyx.access.user_acl_cache import invalidate_user_acl_cache
 from onyx.configs.constants import DocumentSource
 from onyx.db.connector import fetch_connector_by_id
 from onyx.db.credentials import fetch_credential_by_id
@@ -456,6 +457,7 @@ def remove_credential_from_connector(
         )
         db_session.delete(association)
         db_session.commit()
+        invalidate_user_acl_cache()
         return StatusResponse(
             success=True,
             message=f"Credential {credential_id} removed from Connector",
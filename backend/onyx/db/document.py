@@ -13,6 +13,7 @@ from sqlalchemy import or_
 from sqlalchemy import Select
 from sqlalchemy import select
 from sqlalchemy import tuple_
+from sqlalchemy import update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.engine.util import TransactionalContext
 from sqlalchemy.exc import OperationalError
@@ -20,6 +21,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import null
 
 from onyx.configs.constants import DEFAULT_BOOST
+from onyx.db.chunk_fingerprint import (
+    delete_chunk_fingerprints_for_documents__no_commit,
+)
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.enums import AccessType
 from onyx.db.enums import ConnectorCredentialPairStatus
@@ -430,6 +434,21 @@ def mark_document_as_modified(
     db_session.commit()
 
 
+def mark_documents_as_modified(document_ids: list[str], db_session: Session) -> None:
+    """Same as mark_document_as_modified for many documents in one statement. Unknown
+    document ids are ignored."""
+    if not document_ids:
+        return
+
+    stmt = (
+        update(DbDocument)
+        .where(DbDocument.id.in_(document_ids))
+        .values(last_modified=datetime.now(timezone.utc))
+    )
+    db_session.execute(stmt)
+    db_session.commit()
+
+
 def mark_document_as_synced(document_id: str, db_session: Session) -> None:
     stmt = select(DbDocument).where(DbDocument.id == document_id)
     doc = db_session.scalar(stmt)
@@ -441,6 +460,21 @@ def mark_document_as_synced(document_id: str, db_session: Session) -> None:
     db_session.commit()
 
 
+def mark_documents_as_synced(document_ids: list[str], db_session: Session) -> None:
+    """Same as mark_document_as_synced for many documents in one statement. Unknown
+    document ids are ignored."""
+    if not document_ids:
+        return
+
+    stmt = (
+        update(DbDocument)
+        .where(DbDocument.id.in_(document_ids))
+        .values(last_synced=datetime.now(timezone.utc))
+    )
+    db_session.execute(stmt)
+    db_session.commit()
+
+
 def delete_document_by_connector_credential_pair__no_commit(
     db_session: Session,
     document_id: str,
@@ -500,6 +534,9 @@ def delete_documents_complete__no_commit(
     delete_document_tags_for_documents__no_commit(
         document_ids=document_ids, db_session=db_session
     )
+    delete_chunk_fingerprints_for_documents__no_commit(
+        db_session=db_session, document_ids=document_ids
+    )
     delete_documents__no_commit(db_session, document_ids)
 
 
@@ -0,0 +1,120 @@
+from array import array
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import Sequence
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from onyx.db.models import EmbeddingCacheEntry
+from onyx.utils.logger import setup_logger
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+# Hits only refresh the last used time if it is older than this, otherwise re-indexing a
+# fully cached corpus would rewrite every row of the cache
+_LAST_USED_REFRESH_INTERVAL = timedelta(days=1)
+
+_USE_SEQ = Sequence("embedding_cache_use_seq")
+
+
+def _pack_embedding(embedding: Embedding) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+def _unpack_embedding(data: bytes) -> Embedding:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+def get_cached_embeddings(
+    db_session: Session, cache_keys: list[str]
+) -> dict[str, Embedding]:
+    """Returns the cached embeddings for the keys that are present and marks them as used."""
+    if not cache_keys:
+        return {}
+
+    rows = db_session.execute(
+        select(EmbeddingCacheEntry.cache_key, EmbeddingCacheEntry.embedding).where(
+            EmbeddingCacheEntry.cache_key.in_(cache_keys)
+        )
+    ).all()
+    if not rows:
+        return {}
+
+    hit_keys = [row.cache_key for row in rows]
+    now = datetime.now(timezone.utc)
+    db_session.execute(
+        update(EmbeddingCacheEntry)
+        .where(EmbeddingCacheEntry.cache_key.in_(hit_keys))
+        .where(EmbeddingCacheEntry.time_last_used < now - _LAST_USED_REFRESH_INTERVAL)
+        .values(time_last_used=now, last_used_seq=_USE_SEQ.next_value())
+    )
+    db_session.commit()
+
+    return {row.cache_key: _unpack_embedding(row.embedding) for row in rows}
+
+
+def upsert_cached_embeddings(
+    db_session: Session,
+    model_name: str,
+    key_to_embedding: dict[str, Embedding],
+) -> None:
+    """NOTE: this function is Postgres specific. Not all DBs support the ON CONFLICT clause."""
+    if not key_to_embedding:
+        return
+
+    insert_stmt = insert(EmbeddingCacheEntry).values(
+        [
+            {
+                "cache_key": cache_key,
+                "model_name": model_name,
+                "embedding": _pack_embedding(embedding),
+            }
+            for cache_key, embedding in key_to_embedding.items()
+        ]
+    )
+    # the key covers everything the embedding depends on, so an existing entry is identical
+    db_session.execute(insert_stmt.on_conflict_do_nothing())
+    db_session.commit()
+
+
+def prune_embedding_cache(db_session: Session, max_entries: int) -> int:
+    """Evicts the least recently used entries so that at most `max_entries` remain.
+    Returns the number of evicted entries.
+
+    Every insert and refresh draws a new `last_used_seq`, so the most recently used
+    `max_entries` entries all lie within `max_entries` of the highest value. Sequence
+    values skipped by conflicting inserts make this evict a bit early, never too late, and
+    the cache size never has to be counted."""
+    max_seq = db_session.scalar(select(func.max(EmbeddingCacheEntry.last_used_seq)))
+    if max_seq is None or max_seq <= max_entries:
+        return 0
+
+    result = db_session.execute(
+        delete(EmbeddingCacheEntry).where(
+            EmbeddingCacheEntry.last_used_seq <= max_seq - max_entries
+        )
+    )
+    db_session.commit()
+
+    num_evicted: int = result.rowcount  # type: ignore
+    if num_evicted:
+        logger.info(
+            f"Pruned embedding cache: evicted={num_evicted} max_entries={max_entries}"
+        )
+    return num_evicted
+
+
+def delete_cached_embeddings_for_model(db_session: Session, model_name: str) -> None:
+    db_session.execute(
+        delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model_name == model_name)
+    )
+    db_session.commit()
@@ -16,6 +16,7 @@ from fastapi_users_db_sqlalchemy import SQLAlchemyBaseOAuthAccountTableUUID
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTableUUID
 from fastapi_users_db_sqlalchemy.access_token import SQLAlchemyBaseAccessTokenTableUUID
 from fastapi_users_db_sqlalchemy.generics import TIMESTAMPAware
+from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import DateTime
 from sqlalchemy import Enum
@@ -877,6 +878,55 @@ class DocumentByConnectorCredentialPair(Base):
     )
 
 
+class DocumentChunkFingerprints(Base):
+    """Content fingerprints of the chunks of a document as they were last written to a
+    document index. Used on re-index to only embed and write the chunks that changed."""
+
+    __tablename__ = "document_chunk_fingerprints"
+
+    document_id: Mapped[str] = mapped_column(
+        ForeignKey("document.id"), primary_key=True
+    )
+    # the chunks of a document differ per index (chunk size, large chunks, etc.)
+    index_name: Mapped[str] = mapped_column(String, primary_key=True)
+    doc_updated_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # list of {"chunk_id": int, "large_chunk_reference_ids": list[int], "fingerprint": str}
+    chunk_fingerprints: Mapped[list[dict[str, Any]]] = mapped_column(
+        postgresql.JSONB(), nullable=False
+    )
+
+    __table_args__ = (Index("ix_document_chunk_fingerprints_index_name", "index_name"),)
+
+
+class EmbeddingCacheEntry(Base):
+    """Embedding of a single text for a specific embedding model configuration, used to
+    skip the model server when re-indexing content that has not changed."""
+
+    __tablename__ = "embedding_cache"
+
+    # sha256 over the model configuration + the text, see onyx/indexing/embedding_cache.py
+    cache_key: Mapped[str] = mapped_column(String, primary_key=True)
+    # kept around so the entries of a model that is no longer used can be dropped
+    model_name: Mapped[str] = mapped_column(String, nullable=False)
+    # packed float32 values
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    time_last_used: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # drawn from a sequence on insert and whenever the last used time is refreshed, so the
+    # entries below `max(last_used_seq) - max_entries` are the least recently used ones
+    last_used_seq: Mapped[int] = mapped_column(
+        BigInteger, Sequence("embedding_cache_use_seq"), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_embedding_cache_last_used_seq", "last_used_seq"),
+        Index("ix_embedding_cache_model_name", "model_name"),
+    )
+
+
 """
 Messages Tables
 """
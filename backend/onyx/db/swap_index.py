@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
 
 from onyx.configs.constants import KV_REINDEX_KEY
+from onyx.db.chunk_fingerprint import delete_chunk_fingerprints_for_index
 from onyx.db.connector_credential_pair import get_connector_credential_pairs
 from onyx.db.connector_credential_pair import resync_cc_pair
+from onyx.db.embedding_cache import delete_cached_embeddings_for_model
 from onyx.db.enums import IndexModelStatus
 from onyx.db.index_attempt import cancel_indexing_attempts_past_model
 from onyx.db.index_attempt import (
@@ -75,4 +77,16 @@ def check_index_swap(db_session: Session) -> SearchSettings | None:
 
             old_search_settings = current_search_settings
 
+        # Cached embeddings of the old model can never be hit again
+        if current_search_settings.model_name != search_settings.model_name:
+            delete_cached_embeddings_for_model(
+                db_session=db_session, model_name=current_search_settings.model_name
+            )
+
+        # The old index is not written to anymore and its name may be reused by a later index
+        if current_search_settings.index_name != search_settings.index_name:
+            delete_chunk_fingerprints_for_index(
+                db_session=db_session, index_name=current_search_settings.index_name
+            )
+
     return old_search_settings
@@ -174,7 +174,8 @@ def _generate_ext_permissioned_user(email: str) -> User:
 def batch_add_ext_perm_user_if_not_exists(
     db_session: Session, emails: list[str]
 ) -> list[User]:
-    lower_emails = [email.lower() for email in emails]
+    # deduplicated so that emails differing only by case create a single user
+    lower_emails = list(dict.fromkeys(email.lower() for email in emails))
     found_users, missing_lower_emails = _get_users_by_emails(db_session, lower_emails)
 
     new_users: list[User] = []
@@ -36,25 +36,38 @@ def translate_boost_count_to_multiplier(boost: int) -> float:
     return 2 / (1 + math.exp(-1 * boost / 3))
 
 
-def get_uuid_from_chunk(
-    chunk: IndexChunk | InferenceChunk, mini_chunk_ind: int = 0
+def get_uuid_from_chunk_info(
+    *,
+    document_id: str,
+    chunk_id: int,
+    large_chunk_reference_ids: list[int] | tuple[int, ...] = (),
+    mini_chunk_ind: int = 0,
 ) -> uuid.UUID:
-    doc_str = (
-        chunk.document_id
-        if isinstance(chunk, InferenceChunk)
-        else chunk.source_document.id
-    )
+    doc_str = document_id
     # Web parsing URL duplicate catching
     if doc_str and doc_str[-1] == "/":
         doc_str = doc_str[:-1]
-    unique_identifier_string = "_".join(
-        [doc_str, str(chunk.chunk_id), str(mini_chunk_ind)]
-    )
-    if chunk.large_chunk_reference_ids:
+    unique_identifier_string = "_".join([doc_str, str(chunk_id), str(mini_chunk_ind)])
+    if large_chunk_reference_ids:
         unique_identifier_string += "_large" + "_".join(
             [
                 str(referenced_chunk_id)
-                for referenced_chunk_id in chunk.large_chunk_reference_ids
+                for referenced_chunk_id in large_chunk_reference_ids
             ]
         )
     return uuid.uuid5(uuid.NAMESPACE_X500, unique_identifier_string)
+
+
+def get_uuid_from_chunk(
+    chunk: IndexChunk | InferenceChunk, mini_chunk_ind: int = 0
+) -> uuid.UUID:
+    return get_uuid_from_chunk_info(
+        document_id=(
+            chunk.document_id
+            if isinstance(chunk, InferenceChunk)
+            else chunk.source_document.id
+        ),
+        chunk_id=chunk.chunk_id,
+        large_chunk_reference_ids=chunk.large_chunk_reference_ids,
+        mini_chunk_ind=mini_chunk_ind,
+    )
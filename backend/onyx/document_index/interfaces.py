@@ -16,6 +16,29 @@ class DocumentInsertionRecord:
     already_existed: bool
 
 
+@dataclass(frozen=True)
+class IndexChunkRef:
+    """Identifies a single chunk of a document in the document index"""
+
+    chunk_id: int
+    large_chunk_reference_ids: tuple[int, ...] = ()
+
+
+@dataclass
+class DocumentChunkDiff:
+    """
+    Result of diffing the freshly built chunks of an already indexed document against the
+    chunks that were last written for it. Only the new / changed chunks of the document are
+    passed to `index`, the unchanged chunks are left in place and the removed ones are deleted.
+    """
+
+    document_id: str
+    unchanged_chunks: list[IndexChunkRef]
+    removed_chunks: list[IndexChunkRef]
+    # If set, the document's update time moved and must be assigned to the unchanged chunks
+    doc_updated_at: datetime | None = None
+
+
 @dataclass(frozen=True)
 class VespaChunkRequest:
     document_id: str
@@ -149,6 +172,7 @@ class Indexable(abc.ABC):
         self,
         chunks: list[DocMetadataAwareIndexChunk],
         fresh_index: bool = False,
+        chunk_diffs: dict[str, DocumentChunkDiff] | None = None,
     ) -> set[DocumentInsertionRecord]:
         """
         Takes a list of document chunks and indexes them in the document index
@@ -158,6 +182,11 @@ class Indexable(abc.ABC):
         last run. Therefore, upserting the first 0 through n chunks may leave some old chunks that
         have not been written over.
 
+        NOTE: The exception to the above are documents in `chunk_diffs`. For these, only the
+        new / changed chunks are passed in, the chunks listed as unchanged must be kept and only
+        the chunks listed as removed must be deleted. A document may be in `chunk_diffs` without
+        having any chunks passed in if none of its chunks changed.
+
         NOTE: The chunks of a document are never separated into separate index() calls. So there is
         no worry of receiving the first 0 through n chunks in one index call and the next n through
         m chunks of a docu in the next index call.
@@ -174,6 +203,8 @@ class Indexable(abc.ABC):
         - chunks: Document chunks with all of the information needed for indexing to the document
                 index.
         - fresh_index: Boolean indicating whether this is a fresh index with no existing documents.
+        - chunk_diffs: Map of document id to the chunk level diff of already indexed documents
+                whose chunks were compared against the previously indexed ones.
 
         Returns:
             List of document ids which map to unique documents and are used for deduping chunks
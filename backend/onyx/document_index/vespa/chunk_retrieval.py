@@ -14,7 +14,8 @@ from onyx.configs.app_configs import LOG_VESPA_TIMING_INFORMATION
 from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunkUncleaned
 from onyx.document_index.interfaces import VespaChunkRequest
-from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
+from onyx.document_index.vespa.shared_utils.utils import get_shared_vespa_http_client
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client_stats
 from onyx.document_index.vespa.shared_utils.vespa_request_builders import (
     build_vespa_filters,
 )
@@ -195,9 +196,8 @@ def _get_chunks_via_visit_api(
     while True:
         try:
             filtered_params = {k: v for k, v in params.items() if v is not None}
-            with get_vespa_http_client() as http_client:
-                response = http_client.get(url, params=filtered_params)
-                response.raise_for_status()
+            response = get_shared_vespa_http_client().get(url, params=filtered_params)
+            response.raise_for_status()
         except httpx.HTTPError as e:
             error_base = "Failed to query Vespa"
             logger.error(
@@ -298,9 +298,8 @@ def query_vespa(
     )
 
     try:
-        with get_vespa_http_client() as http_client:
-            response = http_client.post(SEARCH_ENDPOINT, json=params)
-            response.raise_for_status()
+        response = get_shared_vespa_http_client().post(SEARCH_ENDPOINT, json=params)
+        response.raise_for_status()
     except httpx.HTTPError as e:
         error_base = "Failed to query Vespa"
         logger.error(
@@ -316,6 +315,7 @@ def query_vespa(
 
     if LOG_VESPA_TIMING_INFORMATION:
         logger.debug("Vespa timing info: %s", response_json.get("timing"))
+        logger.debug("Vespa client connection stats: %s", get_vespa_http_client_stats())
     hits = response_json["root"].get("children", [])
 
     if not hits:
@@ -349,7 +349,10 @@ def _get_chunks_via_batch_search(
     if not chunk_requests:
         return []
 
-    filters_str = build_vespa_filters(filters=filters, include_hidden=True)
+    filter_params: dict[str, str | int | float] = {}
+    filters_str = build_vespa_filters(
+        filters=filters, include_hidden=True, query_params=filter_params
+    )
 
     yql = (
         YQL_BASE.format(index_name=index_name)
@@ -363,6 +366,7 @@ def _get_chunks_via_batch_search(
     params: dict[str, str | int | float] = {
         "yql": yql,
         "hits": MAX_ID_SEARCH_QUERY_SIZE,
+        **filter_params,
     }
 
     inference_chunks = query_vespa(params)
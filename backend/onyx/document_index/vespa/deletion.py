@@ -63,3 +63,47 @@ def delete_vespa_docs(
     finally:
         if not external_executor:
             executor.shutdown(wait=True)
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _delete_vespa_chunk(
+    chunk_id: str, index_name: str, http_client: httpx.Client
+) -> None:
+    try:
+        res = http_client.delete(
+            f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{chunk_id}"
+        )
+        res.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Failed to delete chunk, details: {e.response.text}")
+        raise
+
+
+def delete_vespa_chunks(
+    chunk_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+    executor: concurrent.futures.ThreadPoolExecutor | None = None,
+) -> None:
+    """Deletes individual chunks by their Vespa document id, unlike delete_vespa_docs
+    this does not need to look up the chunks of a document first."""
+    external_executor = True
+
+    if not executor:
+        external_executor = False
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS)
+
+    try:
+        chunk_deletion_future = {
+            executor.submit(
+                _delete_vespa_chunk, chunk_id, index_name, http_client
+            ): chunk_id
+            for chunk_id in chunk_ids
+        }
+        for future in concurrent.futures.as_completed(chunk_deletion_future):
+            # Will raise exception if the deletion raised an exception
+            future.result()
+
+    finally:
+        if not external_executor:
+            executor.shutdown(wait=True)
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from typing import Any
+
+import httpx
+
+from onyx.configs.app_configs import VESPA_FEED_MAX_IN_FLIGHT
+from onyx.configs.app_configs import VESPA_FEED_MAX_RETRIES
+from onyx.document_index.document_index_utils import get_uuid_from_chunk
+from onyx.document_index.vespa.chunk_retrieval import (
+    get_all_vespa_ids_for_document_id,
+)
+from onyx.document_index.vespa.indexing_utils import build_vespa_chunk_fields
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_async_http_client
+from onyx.document_index.vespa_constants import DOCUMENT_ID_ENDPOINT
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+_RETRYABLE_STATUS_CODES = {
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+}
+
+
+class _VespaFeeder:
+    """Feeds the chunks of a batch of documents through the document/v1 API. Every document is
+    fed by its own task, all HTTP requests share one semaphore so that at most `max_in_flight`
+    of them are outstanding at any time and a slow document does not hold back the others.
+    """
+
+    def __init__(
+        self,
+        index_name: str,
+        http_client: httpx.AsyncClient,
+        multitenant: bool,
+        max_in_flight: int,
+        max_retries: int,
+        retry_delay: float,
+    ) -> None:
+        self.index_name = index_name
+        self.http_client = http_client
+        self.multitenant = multitenant
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+        self.num_requests = 0
+        self.num_retries = 0
+
+    def _chunk_url(self, vespa_chunk_id: str) -> str:
+        return f"{DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)}/{vespa_chunk_id}"
+
+    async def _request(
+        self, method: str, url: str, json: dict[str, Any] | None = None
+    ) -> httpx.Response:
+        """Sends the request, retrying with exponential backoff on connection errors, timeouts
+        and overload responses. The last response is returned once the retries run out.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self._in_flight:
+                    self.num_requests += 1
+                    response = await self.http_client.request(method, url, json=json)
+                if (
+                    response.status_code not in _RETRYABLE_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    return response
+                reason = f"status {response.status_code}"
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason = repr(e)
+
+            delay = self.retry_delay * 2**attempt
+            attempt += 1
+            self.num_retries += 1
+            logger.debug(
+                f"Retrying {method} {url} in {delay}s after {reason}, attempt {attempt}"
+            )
+            await asyncio.sleep(delay)
+
+    async def _chunk_exists(self, vespa_chunk_id: str) -> bool:
+        response = await self._request("GET", self._chunk_url(vespa_chunk_id))
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            return False
+
+        if response.status_code != HTTPStatus.OK:
+            raise RuntimeError(
+                f"Unexpected fetch document by ID value from Vespa "
+                f"with error {response.status_code}. "
+                f"Index name: {self.index_name}. "
+                f"Doc chunk id: {vespa_chunk_id}"
+            )
+        return True
+
+    async def _delete_chunk(self, vespa_chunk_id: str) -> None:
+        response = await self._request("DELETE", self._chunk_url(vespa_chunk_id))
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Failed to delete chunk, details: {e.response.text}")
+            raise
+
+    async def _delete_document(self, document_id: str) -> None:
+        # the visit is paginated and rare compared to the puts, keep it off the event loop
+        vespa_chunk_ids = await asyncio.to_thread(
+            get_all_vespa_ids_for_document_id,
+            document_id=document_id,
+            index_name=self.index_name,
+            get_large_chunks=True,
+        )
+        await asyncio.gather(
+            *(self._delete_chunk(vespa_chunk_id) for vespa_chunk_id in vespa_chunk_ids)
+        )
+
+    async def _put_chunk(self, chunk: DocMetadataAwareIndexChunk) -> None:
+        document = chunk.source_document
+        response = await self._request(
+            "POST",
+            self._chunk_url(str(get_uuid_from_chunk(chunk))),
+            json={"fields": build_vespa_chunk_fields(chunk, self.multitenant)},
+        )
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.exception(
+                f"Failed to index document: '{document.id}'. Got response: '{response.text}'"
+            )
+            if e.response.status_code == HTTPStatus.INSUFFICIENT_STORAGE:
+                logger.error(
+                    "NOTE: HTTP Status 507 Insufficient Storage usually means "
+                    "you need to allocate more memory or disk space to the "
+                    "Vespa/index container."
+                )
+            raise
+
+    async def feed_document(
+        self, chunks: list[DocMetadataAwareIndexChunk], check_existing: bool
+    ) -> bool:
+        """Writes the chunks of one document and returns whether the document already existed.
+        An existing document has all of its chunks deleted first as the number of chunks may
+        have shrunk."""
+        already_existed = False
+        if check_existing:
+            first_chunks = [chunk for chunk in chunks if chunk.chunk_id == 0]
+            exists = await asyncio.gather(
+                *(
+                    self._chunk_exists(str(get_uuid_from_chunk(chunk)))
+                    for chunk in first_chunks
+                )
+            )
+            already_existed = any(exists)
+            if already_existed:
+                await self._delete_document(chunks[0].source_document.id)
+
+        await asyncio.gather(*(self._put_chunk(chunk) for chunk in chunks))
+        return already_existed
+
+
+async def feed_vespa_chunks_async(
+    chunks: list[DocMetadataAwareIndexChunk],
+    index_name: str,
+    http_client: httpx.AsyncClient,
+    multitenant: bool,
+    check_existing: bool,
+    skip_existence_check_doc_ids: set[str] | None = None,
+    max_in_flight: int = VESPA_FEED_MAX_IN_FLIGHT,
+    max_retries: int = VESPA_FEED_MAX_RETRIES,
+    retry_delay: float = 1.0,
+) -> set[str]:
+    """Writes the chunks to Vespa and returns the ids of the documents that already existed.
+
+    With `check_existing`, the existence of every document is checked as part of feeding it,
+    except for the documents in `skip_existence_check_doc_ids` which must keep their existing
+    chunks. Raises the first error once its retries are exhausted."""
+    skip_existence_check_doc_ids = skip_existence_check_doc_ids or set()
+    feeder = _VespaFeeder(
+        index_name=index_name,
+        http_client=http_client,
+        multitenant=multitenant,
+        max_in_flight=max_in_flight,
+        max_retries=max_retries,
+        retry_delay=retry_delay,
+    )
+
+    doc_id_to_chunks: dict[str, list[DocMetadataAwareIndexChunk]] = defaultdict(list)
+    for chunk in chunks:
+        doc_id_to_chunks[chunk.source_document.id].append(chunk)
+
+    start = time.monotonic()
+    doc_ids = list(doc_id_to_chunks.keys())
+    already_existed = await asyncio.gather(
+        *(
+            feeder.feed_document(
+                doc_id_to_chunks[doc_id],
+                check_existing=check_existing
+                and doc_id not in skip_existence_check_doc_ids,
+            )
+            for doc_id in doc_ids
+        )
+    )
+    logger.debug(
+        f"Fed {len(chunks)} chunks of {len(doc_ids)} documents to Vespa in "
+        f"{time.monotonic() - start:.2f}s: requests={feeder.num_requests} "
+        f"retries={feeder.num_retries}"
+    )
+
+    return {doc_id for doc_id, existed in zip(doc_ids, already_existed) if existed}
+
+
+_feed_loop: asyncio.AbstractEventLoop | None = None
+_feed_loop_pid: int | None = None
+_feed_loop_lock = threading.Lock()
+# only ever touched from the feed loop
+_feed_http_client: httpx.AsyncClient | None = None
+
+
+def _get_feed_loop() -> asyncio.AbstractEventLoop:
+    """Process wide event loop, run by a daemon thread, that every synchronous feed is
+    scheduled on. Since the loop outlives the feeds, they all share one AsyncClient and
+    its pooled connections instead of opening new ones for every batch."""
+    global _feed_loop, _feed_loop_pid, _feed_http_client
+
+    with _feed_loop_lock:
+        # the loop thread does not survive a fork, the child has to start its own
+        if _feed_loop is None or _feed_loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="vespa-feed-loop", daemon=True
+            ).start()
+            _feed_loop = loop
+            _feed_loop_pid = os.getpid()
+            _feed_http_client = None
+
+        return _feed_loop
+
+
+async def _get_feed_http_client() -> httpx.AsyncClient:
+    # created on the feed loop since async clients are bound to the loop they are used in
+    global _feed_http_client
+
+    if _feed_http_client is None or _feed_http_client.is_closed:
+        _feed_http_client = get_vespa_async_http_client()
+    return _feed_http_client
+
+
+def feed_vespa_chunks(
+    chunks: list[DocMetadataAwareIndexChunk],
+    index_name: str,
+    multitenant: bool,
+    check_existing: bool,
+    skip_existence_check_doc_ids: set[str] | None = None,
+) -> set[str]:
+    """Synchronous entry point of the feed, safe to call from any thread. Blocks until the
+    feed, which runs on the shared feed loop, is done."""
+
+    async def _feed() -> set[str]:
+        return await feed_vespa_chunks_async(
+            chunks=chunks,
+            index_name=index_name,
+            http_client=await _get_feed_http_client(),
+            multitenant=multitenant,
+            check_existing=check_existing,
+            skip_existence_check_doc_ids=skip_existence_check_doc_ids,
+        )
+
+    future = asyncio.run_coroutine_threadsafe(_feed(), _get_feed_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # e.g. a soft time limit interrupted the wait, don't leave the feed running
+        future.cancel()
+        raise
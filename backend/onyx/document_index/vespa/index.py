@@ -18,6 +18,7 @@ import httpx  # type: ignore
 import requests  # type: ignore
 
 from onyx.configs.app_configs import DOCUMENT_INDEX_NAME
+from onyx.configs.app_configs import ENABLE_VESPA_ASYNC_FEED
 from onyx.configs.chat_configs import DOC_TIME_DECAY
 from onyx.configs.chat_configs import NUM_RETURNED_HITS
 from onyx.configs.chat_configs import TITLE_CONTENT_RATIO
@@ -25,6 +26,8 @@ from onyx.configs.chat_configs import VESPA_SEARCHER_THREADS
 from onyx.configs.constants import KV_REINDEX_KEY
 from onyx.context.search.models import IndexFilters
 from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.document_index.document_index_utils import get_uuid_from_chunk_info
+from onyx.document_index.interfaces import DocumentChunkDiff
 from onyx.document_index.interfaces import DocumentIndex
 from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import UpdateRequest
@@ -38,13 +41,16 @@ from onyx.document_index.vespa.chunk_retrieval import (
     parallel_visit_api_retrieval,
 )
 from onyx.document_index.vespa.chunk_retrieval import query_vespa
+from onyx.document_index.vespa.deletion import delete_vespa_chunks
 from onyx.document_index.vespa.deletion import delete_vespa_docs
+from onyx.document_index.vespa.feed import feed_vespa_chunks
 from onyx.document_index.vespa.indexing_utils import batch_index_vespa_chunks
 from onyx.document_index.vespa.indexing_utils import clean_chunk_id_copy
 from onyx.document_index.vespa.indexing_utils import (
     get_existing_documents_from_chunks,
 )
-from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
+from onyx.document_index.vespa.indexing_utils import get_vespa_updated_at_attribute
+from onyx.document_index.vespa.shared_utils.utils import get_shared_vespa_http_client
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
 )
@@ -57,6 +63,7 @@ from onyx.document_index.vespa_constants import BOOST
 from onyx.document_index.vespa_constants import CONTENT_SUMMARY
 from onyx.document_index.vespa_constants import DANSWER_CHUNK_REPLACEMENT_PAT
 from onyx.document_index.vespa_constants import DATE_REPLACEMENT
+from onyx.document_index.vespa_constants import DOC_UPDATED_AT
 from onyx.document_index.vespa_constants import DOCUMENT_ID_ENDPOINT
 from onyx.document_index.vespa_constants import DOCUMENT_REPLACEMENT_PAT
 from onyx.document_index.vespa_constants import DOCUMENT_SETS
@@ -134,7 +141,7 @@ class VespaIndex(DocumentIndex):
         self.index_name = index_name
         self.secondary_index_name = secondary_index_name
         self.multitenant = multitenant
-        self.http_client = get_vespa_http_client()
+        self.http_client = get_shared_vespa_http_client()
 
     def ensure_indices_exist(
         self,
@@ -308,27 +315,36 @@ class VespaIndex(DocumentIndex):
         self,
         chunks: list[DocMetadataAwareIndexChunk],
         fresh_index: bool = False,
+        chunk_diffs: dict[str, DocumentChunkDiff] | None = None,
     ) -> set[DocumentInsertionRecord]:
         """Receive a list of chunks from a batch of documents and index the chunks into Vespa along
         with updating the associated permissions. Assumes that a document will not be split into
         multiple chunk batches calling this function multiple times, otherwise only the last set of
-        chunks will be kept"""
+        chunks will be kept. Documents in `chunk_diffs` only get their removed chunks deleted
+        instead of being wiped before the (changed) chunks are written."""
         # IMPORTANT: This must be done one index at a time, do not use secondary index here
         cleaned_chunks = [clean_chunk_id_copy(chunk) for chunk in chunks]
+        cleaned_chunk_diffs = {
+            replace_invalid_doc_id_characters(doc_id): chunk_diff
+            for doc_id, chunk_diff in (chunk_diffs or {}).items()
+        }
 
         existing_docs: set[str] = set()
 
         # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficial for
         # indexing / updates / deletes since we have to make a large volume of requests.
-        with (
-            concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor,
-            get_vespa_http_client() as http_client,
-        ):
-            if not fresh_index:
+        http_client = get_shared_vespa_http_client()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
+            # The async feed checks for existing documents as part of feeding each document
+            if not fresh_index and not ENABLE_VESPA_ASYNC_FEED:
                 # Check for existing documents, existing documents need to have all of their chunks deleted
                 # prior to indexing as the document size (num chunks) may have shrunk
+                # Diffed documents are known to exist and must keep their unchanged chunks
                 first_chunks = [
-                    chunk for chunk in cleaned_chunks if chunk.chunk_id == 0
+                    chunk
+                    for chunk in cleaned_chunks
+                    if chunk.chunk_id == 0
+                    and chunk.source_document.id not in cleaned_chunk_diffs
                 ]
                 for chunk_batch in batch_generator(first_chunks, BATCH_SIZE):
                     existing_docs.update(
@@ -348,16 +364,52 @@ class VespaIndex(DocumentIndex):
                         executor=executor,
                     )
 
-            for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
-                batch_index_vespa_chunks(
-                    chunks=chunk_batch,
-                    index_name=self.index_name,
-                    http_client=http_client,
-                    multitenant=self.multitenant,
-                    executor=executor,
+            if not fresh_index:
+                existing_docs.update(cleaned_chunk_diffs.keys())
+                removed_chunk_ids = [
+                    str(
+                        get_uuid_from_chunk_info(
+                            document_id=doc_id,
+                            chunk_id=chunk_ref.chunk_id,
+                            large_chunk_reference_ids=chunk_ref.large_chunk_reference_ids,
+                        )
+                    )
+                    for doc_id, chunk_diff in cleaned_chunk_diffs.items()
+                    for chunk_ref in chunk_diff.removed_chunks
+                ]
+                for chunk_id_batch in batch_generator(removed_chunk_ids, BATCH_SIZE):
+                    delete_vespa_chunks(
+                        chunk_ids=chunk_id_batch,
+                        index_name=self.index_name,
+                        http_client=http_client,
+                        executor=executor,
+                    )
+
+            if ENABLE_VESPA_ASYNC_FEED:
+                existing_docs.update(
+                    feed_vespa_chunks(
+                        chunks=cleaned_chunks,
+                        index_name=self.index_name,
+                        multitenant=self.multitenant,
+                        check_existing=not fresh_index,
+                        skip_existence_check_doc_ids=set(cleaned_chunk_diffs.keys()),
+                    )
                 )
+            else:
+                for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
+                    batch_index_vespa_chunks(
+                        chunks=chunk_batch,
+                        index_name=self.index_name,
+                        http_client=http_client,
+                        multitenant=self.multitenant,
+                        executor=executor,
+                    )
+
+        if not fresh_index:
+            self._refresh_unchanged_chunks(cleaned_chunk_diffs)
 
         all_doc_ids = {chunk.source_document.id for chunk in cleaned_chunks}
+        all_doc_ids.update(cleaned_chunk_diffs.keys())
 
         return {
             DocumentInsertionRecord(
@@ -367,6 +419,42 @@ class VespaIndex(DocumentIndex):
             for doc_id in all_doc_ids
         }
 
+    def _refresh_unchanged_chunks(
+        self, cleaned_chunk_diffs: dict[str, DocumentChunkDiff]
+    ) -> None:
+        """The unchanged chunks of a diffed document are not rewritten, but the document level
+        update time is stored on every chunk and is used for the recency bias."""
+        updates: list[_VespaUpdateRequest] = []
+        for doc_id, chunk_diff in cleaned_chunk_diffs.items():
+            if chunk_diff.doc_updated_at is None:
+                continue
+
+            update_dict = {
+                "fields": {
+                    DOC_UPDATED_AT: {
+                        "assign": get_vespa_updated_at_attribute(
+                            chunk_diff.doc_updated_at
+                        )
+                    }
+                }
+            }
+            for chunk_ref in chunk_diff.unchanged_chunks:
+                vespa_chunk_id = get_uuid_from_chunk_info(
+                    document_id=doc_id,
+                    chunk_id=chunk_ref.chunk_id,
+                    large_chunk_reference_ids=chunk_ref.large_chunk_reference_ids,
+                )
+                updates.append(
+                    _VespaUpdateRequest(
+                        document_id=doc_id,
+                        url=f"{DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)}/{vespa_chunk_id}",
+                        update_request=update_dict,
+                    )
+                )
+
+        if updates:
+            self._apply_updates_batched(updates)
+
     @staticmethod
     def _apply_updates_batched(
         updates: list[_VespaUpdateRequest],
@@ -389,10 +477,8 @@ class VespaIndex(DocumentIndex):
         # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficient for
         # indexing / updates / deletes since we have to make a large volume of requests.
 
-        with (
-            concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor,
-            get_vespa_http_client() as http_client,
-        ):
+        http_client = get_shared_vespa_http_client()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
             for update_batch in batch_generator(updates, batch_size):
                 future_to_document_id = {
                     executor.submit(
@@ -535,56 +621,54 @@ class VespaIndex(DocumentIndex):
         if self.secondary_index_name:
             index_names.append(self.secondary_index_name)
 
-        with get_vespa_http_client(http2=False) as http_client:
-            for index_name in index_names:
-                params = httpx.QueryParams(
-                    {
-                        "selection": f"{index_name}.document_id=='{normalized_doc_id}'",
-                        "cluster": DOCUMENT_INDEX_NAME,
-                    }
-                )
+        http_client = get_shared_vespa_http_client(http2=False)
+        for index_name in index_names:
+            params = httpx.QueryParams(
+                {
+                    "selection": f"{index_name}.document_id=='{normalized_doc_id}'",
+                    "cluster": DOCUMENT_INDEX_NAME,
+                }
+            )
 
-                while True:
-                    try:
-                        vespa_url = (
-                            f"{DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)}"
-                        )
-                        logger.debug(f'update_single PUT on URL "{vespa_url}"')
-                        resp = http_client.put(
-                            vespa_url,
-                            params=params,
-                            headers={"Content-Type": "application/json"},
-                            json=update_dict,
-                        )
+            while True:
+                try:
+                    vespa_url = (
+                        f"{DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)}"
+                    )
+                    logger.debug(f'update_single PUT on URL "{vespa_url}"')
+                    resp = http_client.put(
+                        vespa_url,
+                        params=params,
+                        headers={"Content-Type": "application/json"},
+                        json=update_dict,
+                    )
 
-                        resp.raise_for_status()
-                    except httpx.HTTPStatusError as e:
-                        logger.error(
-                            f"Failed to update chunks, details: {e.response.text}"
-                        )
-                        raise
+                    resp.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Failed to update chunks, details: {e.response.text}")
+                    raise
 
-                    resp_data = resp.json()
+                resp_data = resp.json()
 
-                    if "documentCount" in resp_data:
-                        chunks_updated = resp_data["documentCount"]
-                        total_chunks_updated += chunks_updated
+                if "documentCount" in resp_data:
+                    chunks_updated = resp_data["documentCount"]
+                    total_chunks_updated += chunks_updated
 
-                    # Check for continuation token to handle pagination
-                    if "continuation" not in resp_data:
-                        break  # Exit loop if no continuation token
+                # Check for continuation token to handle pagination
+                if "continuation" not in resp_data:
+                    break  # Exit loop if no continuation token
 
-                    if not resp_data["continuation"]:
-                        break  # Exit loop if continuation token is empty
+                if not resp_data["continuation"]:
+                    break  # Exit loop if continuation token is empty
 
-                    params = params.set("continuation", resp_data["continuation"])
+                params = params.set("continuation", resp_data["continuation"])
 
-                logger.debug(
-                    f"VespaIndex.update_single: "
-                    f"index={index_name} "
-                    f"doc={normalized_doc_id} "
-                    f"chunks_updated={total_chunks_updated}"
-                )
+            logger.debug(
+                f"VespaIndex.update_single: "
+                f"index={index_name} "
+                f"doc={normalized_doc_id} "
+                f"chunks_updated={total_chunks_updated}"
+            )
 
         return total_chunks_updated
 
@@ -595,15 +679,15 @@ class VespaIndex(DocumentIndex):
 
         # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficial for
         # indexing / updates / deletes since we have to make a large volume of requests.
-        with get_vespa_http_client() as http_client:
-            index_names = [self.index_name]
-            if self.secondary_index_name:
-                index_names.append(self.secondary_index_name)
-
-            for index_name in index_names:
-                delete_vespa_docs(
-                    document_ids=doc_ids, index_name=index_name, http_client=http_client
-                )
+        http_client = get_shared_vespa_http_client()
+        index_names = [self.index_name]
+        if self.secondary_index_name:
+            index_names.append(self.secondary_index_name)
+
+        for index_name in index_names:
+            delete_vespa_docs(
+                document_ids=doc_ids, index_name=index_name, http_client=http_client
+            )
         return
 
     def delete_single(self, doc_id: str) -> int:
@@ -623,53 +707,49 @@ class VespaIndex(DocumentIndex):
         if self.secondary_index_name:
             index_names.append(self.secondary_index_name)
 
-        with get_vespa_http_client(http2=False) as http_client:
-            for index_name in index_names:
-                params = httpx.QueryParams(
-                    {
-                        "selection": f"{index_name}.document_id=='{doc_id}'",
-                        "cluster": DOCUMENT_INDEX_NAME,
-                    }
-                )
+        http_client = get_shared_vespa_http_client(http2=False)
+        for index_name in index_names:
+            params = httpx.QueryParams(
+                {
+                    "selection": f"{index_name}.document_id=='{doc_id}'",
+                    "cluster": DOCUMENT_INDEX_NAME,
+                }
+            )
 
-                while True:
-                    try:
-                        vespa_url = (
-                            f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}"
-                        )
-                        logger.debug(f'delete_single DELETE on URL "{vespa_url}"')
-                        resp = http_client.delete(
-                            vespa_url,
-                            params=params,
-                        )
-                        resp.raise_for_status()
-                    except httpx.HTTPStatusError as e:
-                        logger.error(
-                            f"Failed to delete chunk, details: {e.response.text}"
-                        )
-                        raise
+            while True:
+                try:
+                    vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}"
+                    logger.debug(f'delete_single DELETE on URL "{vespa_url}"')
+                    resp = http_client.delete(
+                        vespa_url,
+                        params=params,
+                    )
+                    resp.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Failed to delete chunk, details: {e.response.text}")
+                    raise
 
-                    resp_data = resp.json()
+                resp_data = resp.json()
 
-                    if "documentCount" in resp_data:
-                        chunks_deleted = resp_data["documentCount"]
-                        total_chunks_deleted += chunks_deleted
+                if "documentCount" in resp_data:
+                    chunks_deleted = resp_data["documentCount"]
+                    total_chunks_deleted += chunks_deleted
 
-                    # Check for continuation token to handle pagination
-                    if "continuation" not in resp_data:
-                        break  # Exit loop if no continuation token
+                # Check for continuation token to handle pagination
+                if "continuation" not in resp_data:
+                    break  # Exit loop if no continuation token
 
-                    if not resp_data["continuation"]:
-                        break  # Exit loop if continuation token is empty
+                if not resp_data["continuation"]:
+                    break  # Exit loop if continuation token is empty
 
-                    params = params.set("continuation", resp_data["continuation"])
+                params = params.set("continuation", resp_data["continuation"])
 
-                logger.debug(
-                    f"VespaIndex.delete_single: "
-                    f"index={index_name} "
-                    f"doc={doc_id} "
-                    f"chunks_deleted={total_chunks_deleted}"
-                )
+            logger.debug(
+                f"VespaIndex.delete_single: "
+                f"index={index_name} "
+                f"doc={doc_id} "
+                f"chunks_deleted={total_chunks_deleted}"
+            )
 
         return total_chunks_deleted
 
@@ -706,7 +786,8 @@ class VespaIndex(DocumentIndex):
         offset: int = 0,
         title_content_ratio: float | None = TITLE_CONTENT_RATIO,
     ) -> list[InferenceChunkUncleaned]:
-        vespa_where_clauses = build_vespa_filters(filters)
+        filter_params: dict[str, str | int | float] = {}
+        vespa_where_clauses = build_vespa_filters(filters, query_params=filter_params)
         # Needs to be at least as much as the value set in Vespa schema config
         target_hits = max(10 * num_to_retrieve, 1000)
         yql = (
@@ -735,6 +816,7 @@ class VespaIndex(DocumentIndex):
             "offset": offset,
             "ranking.profile": f"hybrid_search{len(query_embedding)}",
             "timeout": VESPA_TIMEOUT,
+            **filter_params,
         }
 
         return query_vespa(params)
@@ -746,7 +828,10 @@ class VespaIndex(DocumentIndex):
         num_to_retrieve: int = NUM_RETURNED_HITS,
         offset: int = 0,
     ) -> list[InferenceChunkUncleaned]:
-        vespa_where_clauses = build_vespa_filters(filters, include_hidden=True)
+        filter_params: dict[str, str | int | float] = {}
+        vespa_where_clauses = build_vespa_filters(
+            filters, include_hidden=True, query_params=filter_params
+        )
         yql = (
             YQL_BASE.format(index_name=self.index_name)
             + vespa_where_clauses
@@ -757,13 +842,14 @@ class VespaIndex(DocumentIndex):
             + f'or ({{defaultIndex: "{CONTENT_SUMMARY}"}}userInput(@query)))'
         )
 
-        params: dict[str, str | int] = {
+        params: dict[str, str | int | float] = {
             "yql": yql,
             "query": query,
             "hits": num_to_retrieve,
             "offset": 0,
             "ranking.profile": "admin_search",
             "timeout": VESPA_TIMEOUT,
+            **filter_params,
         }
 
         return query_vespa(params)
@@ -837,22 +923,23 @@ class VespaIndex(DocumentIndex):
                 f"Querying for document IDs with tenant_id: {tenant_id}, offset: {offset}"
             )
 
-            with get_vespa_http_client(no_timeout=True) as http_client:
-                response = http_client.get(url, params=query_params)
-                response.raise_for_status()
+            response = get_shared_vespa_http_client().get(
+                url, params=query_params, timeout=None
+            )
+            response.raise_for_status()
 
-                search_result = response.json()
-                hits = search_result.get("root", {}).get("children", [])
+            search_result = response.json()
+            hits = search_result.get("root", {}).get("children", [])
 
-                if not hits:
-                    break
+            if not hits:
+                break
 
-                for hit in hits:
-                    doc_id = hit.get("id")
-                    if doc_id:
-                        document_ids.append(doc_id)
+            for hit in hits:
+                doc_id = hit.get("id")
+                if doc_id:
+                    document_ids.append(doc_id)
 
-                offset += limit  # Move to the next page
+            offset += limit  # Move to the next page
 
         logger.debug(
             f"Retrieved {len(document_ids)} document IDs for tenant_id: {tenant_id}"
@@ -880,35 +967,34 @@ class VespaIndex(DocumentIndex):
             response = http_client.delete(
                 delete_request.url,
                 headers={"Content-Type": "application/json"},
+                timeout=None,
             )
             response.raise_for_status()
 
         logger.debug(f"Starting batch deletion for {len(delete_requests)} documents")
 
+        http_client = get_shared_vespa_http_client()
         with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
-            with get_vespa_http_client(no_timeout=True) as http_client:
-                for batch_start in range(0, len(delete_requests), batch_size):
-                    batch = delete_requests[batch_start : batch_start + batch_size]
-
-                    future_to_document_id = {
-                        executor.submit(
-                            _delete_document,
-                            delete_request,
-                            http_client,
-                        ): delete_request.document_id
-                        for delete_request in batch
-                    }
+            for batch_start in range(0, len(delete_requests), batch_size):
+                batch = delete_requests[batch_start : batch_start + batch_size]
 
-                    for future in concurrent.futures.as_completed(
-                        future_to_document_id
-                    ):
-                        doc_id = future_to_document_id[future]
-                        try:
-                            future.result()
-                            logger.debug(f"Successfully deleted document: {doc_id}")
-                        except httpx.HTTPError as e:
-                            logger.error(f"Failed to delete document {doc_id}: {e}")
-                            # Optionally, implement retry logic or error handling here
+                future_to_document_id = {
+                    executor.submit(
+                        _delete_document,
+                        delete_request,
+                        http_client,
+                    ): delete_request.document_id
+                    for delete_request in batch
+                }
+
+                for future in concurrent.futures.as_completed(future_to_document_id):
+                    doc_id = future_to_document_id[future]
+                    try:
+                        future.result()
+                        logger.debug(f"Successfully deleted document: {doc_id}")
+                    except httpx.HTTPError as e:
+                        logger.error(f"Failed to delete document {doc_id}: {e}")
+                        # Optionally, implement retry logic or error handling here
 
         logger.info("Batch deletion completed")
 
@@ -922,7 +1008,10 @@ class VespaIndex(DocumentIndex):
         This method is currently used for random chunk retrieval in the context of
         assistant starter message creation (passed as sample context for usage by the assistant).
         """
-        vespa_where_clauses = build_vespa_filters(filters, remove_trailing_and=True)
+        filter_params: dict[str, str | int | float] = {}
+        vespa_where_clauses = build_vespa_filters(
+            filters, remove_trailing_and=True, query_params=filter_params
+        )
 
         yql = YQL_BASE.format(index_name=self.index_name) + vespa_where_clauses
 
@@ -934,6 +1023,7 @@ class VespaIndex(DocumentIndex):
             "timeout": VESPA_TIMEOUT,
             "ranking.profile": "random_",
             "ranking.properties.random.seed": random_seed,
+            **filter_params,
         }
 
         return query_vespa(params)
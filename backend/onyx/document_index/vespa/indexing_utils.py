@@ -3,6 +3,7 @@ import json
 from datetime import datetime
 from datetime import timezone
 from http import HTTPStatus
+from typing import Any
 
 import httpx
 from retry import retry
@@ -72,7 +73,7 @@ def _does_document_exist(
     return True
 
 
-def _vespa_get_updated_at_attribute(t: datetime | None) -> int | None:
+def get_vespa_updated_at_attribute(t: datetime | None) -> int | None:
     if not t:
         return None
 
@@ -118,20 +119,13 @@ def get_existing_documents_from_chunks(
     return document_ids
 
 
-@retry(tries=5, delay=1, backoff=2)
-def _index_vespa_chunk(
-    chunk: DocMetadataAwareIndexChunk,
-    index_name: str,
-    http_client: httpx.Client,
-    multitenant: bool,
-) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+def build_vespa_chunk_fields(
+    chunk: DocMetadataAwareIndexChunk, multitenant: bool
+) -> dict[str, Any]:
+    """The Vespa document fields of a chunk, as written by a feed (put) request"""
     document = chunk.source_document
 
     # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
     embeddings = chunk.embeddings
 
     embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
@@ -142,7 +136,7 @@ def _index_vespa_chunk(
 
     title = document.get_title_for_document_index()
 
-    vespa_document_fields = {
+    vespa_document_fields: dict[str, Any] = {
         DOCUMENT_ID: document.id,
         CHUNK_ID: chunk.chunk_id,
         BLURB: remove_invalid_unicode_chars(chunk.blurb),
@@ -168,7 +162,7 @@ def _index_vespa_chunk(
         METADATA_SUFFIX: chunk.metadata_suffix_keyword,
         EMBEDDINGS: embeddings_name_vector_map,
         TITLE_EMBEDDING: chunk.title_embedding,
-        DOC_UPDATED_AT: _vespa_get_updated_at_attribute(document.doc_updated_at),
+        DOC_UPDATED_AT: get_vespa_updated_at_attribute(document.doc_updated_at),
         PRIMARY_OWNERS: get_experts_stores_representations(document.primary_owners),
         SECONDARY_OWNERS: get_experts_stores_representations(document.secondary_owners),
         # the only `set` vespa has is `weightedset`, so we have to give each
@@ -184,6 +178,23 @@ def _index_vespa_chunk(
         if chunk.tenant_id:
             vespa_document_fields[TENANT_ID] = chunk.tenant_id
 
+    return vespa_document_fields
+
+
+@retry(tries=5, delay=1, backoff=2)
+def _index_vespa_chunk(
+    chunk: DocMetadataAwareIndexChunk,
+    index_name: str,
+    http_client: httpx.Client,
+    multitenant: bool,
+) -> None:
+    json_header = {
+        "Content-Type": "application/json",
+    }
+    document = chunk.source_document
+    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+    vespa_document_fields = build_vespa_chunk_fields(chunk, multitenant)
+
     vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
     logger.debug(f'Indexing to URL "{vespa_url}"')
     res = http_client.post(
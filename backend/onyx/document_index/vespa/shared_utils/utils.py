@@ -1,4 +1,8 @@
+import os
 import re
+import threading
+from collections.abc import Callable
+from typing import Any
 from typing import cast
 
 import httpx
@@ -6,6 +10,9 @@ import httpx
 from onyx.configs.app_configs import MANAGED_VESPA
 from onyx.configs.app_configs import VESPA_CLOUD_CERT_PATH
 from onyx.configs.app_configs import VESPA_CLOUD_KEY_PATH
+from onyx.configs.app_configs import VESPA_HTTP_KEEPALIVE_EXPIRY
+from onyx.configs.app_configs import VESPA_HTTP_MAX_CONNECTIONS
+from onyx.configs.app_configs import VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS
 from onyx.configs.app_configs import VESPA_REQUEST_TIMEOUT
 
 # NOTE: This does not seem to be used in reality despite the Vespa Docs pointing to this code
@@ -55,17 +62,139 @@ def remove_invalid_unicode_chars(text: str) -> str:
     return _illegal_xml_chars_RE.sub("", text)
 
 
+def _build_vespa_http_client(
+    timeout: float | None,
+    http2: bool,
+    limits: httpx.Limits | None = None,
+    event_hooks: dict[str, list[Callable]] | None = None,
+) -> httpx.Client:
+    return httpx.Client(
+        cert=cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
+        if MANAGED_VESPA
+        else None,
+        verify=False if not MANAGED_VESPA else True,
+        timeout=timeout,
+        http2=http2,
+        limits=limits or httpx.Limits(),
+        event_hooks=event_hooks,
+    )
+
+
 def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx.Client:
     """
     Configure and return an HTTP client for communicating with Vespa,
     including authentication if needed.
     """
 
-    return httpx.Client(
+    return _build_vespa_http_client(
+        timeout=None if no_timeout else VESPA_REQUEST_TIMEOUT, http2=http2
+    )
+
+
+def get_vespa_async_http_client(
+    max_connections: int = VESPA_HTTP_MAX_CONNECTIONS, http2: bool = True
+) -> httpx.AsyncClient:
+    """
+    Async counterpart of get_vespa_http_client, used by the feed. With HTTP/2 many in-flight
+    requests are multiplexed over few connections. Must only be used from the event loop it
+    was created in, the feed keeps one open on its process wide loop.
+    """
+    return httpx.AsyncClient(
         cert=cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
         if MANAGED_VESPA
         else None,
         verify=False if not MANAGED_VESPA else True,
-        timeout=None if no_timeout else VESPA_REQUEST_TIMEOUT,
+        timeout=VESPA_REQUEST_TIMEOUT,
         http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=VESPA_HTTP_KEEPALIVE_EXPIRY,
+        ),
     )
+
+
+class VespaHttpClientStats:
+    """Connection reuse counters of the shared Vespa clients of this process"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    @property
+    def reused_connection_requests(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    @property
+    def reuse_rate(self) -> float:
+        return self.reused_connection_requests / self.requests if self.requests else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"requests={self.requests} new_connections={self.new_connections} "
+            f"reuse_rate={self.reuse_rate:.2%}"
+        )
+
+
+_shared_clients: dict[bool, httpx.Client] = {}
+_shared_clients_pid: int | None = None
+_shared_clients_lock = threading.Lock()
+_shared_client_stats = VespaHttpClientStats()
+
+
+def _trace_vespa_connection(event_name: str, info: dict[str, Any]) -> None:
+    # only emitted when the pool has no idle connection to hand out
+    if event_name == "connection.connect_tcp.complete":
+        _shared_client_stats.record_new_connection()
+
+
+def _on_vespa_request(request: httpx.Request) -> None:
+    _shared_client_stats.record_request()
+    request.extensions["trace"] = _trace_vespa_connection
+
+
+def get_shared_vespa_http_client(http2: bool = True) -> httpx.Client:
+    """
+    Process wide, thread safe, connection pooled client for communicating with Vespa.
+    Unlike get_vespa_http_client, the client must NOT be closed (e.g. used as a context
+    manager) by the caller since connections are kept alive and reused across calls.
+
+    Uses VESPA_REQUEST_TIMEOUT, pass `timeout=` to the individual requests to override it.
+    """
+    global _shared_clients_pid
+
+    with _shared_clients_lock:
+        # pooled connections must not be shared with the parent of a forked process
+        if _shared_clients_pid != os.getpid():
+            _shared_clients.clear()
+            _shared_clients_pid = os.getpid()
+
+        client = _shared_clients.get(http2)
+        if client is None or client.is_closed:
+            client = _build_vespa_http_client(
+                timeout=VESPA_REQUEST_TIMEOUT,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=VESPA_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=VESPA_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                event_hooks={"request": [_on_vespa_request]},
+            )
+            _shared_clients[http2] = client
+
+    return client
+
+
+def get_vespa_http_client_stats() -> VespaHttpClientStats:
+    """Connection reuse stats of the clients returned by get_shared_vespa_http_client"""
+    return _shared_client_stats
@@ -1,7 +1,9 @@
+import json
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 
+from onyx.configs.app_configs import ENABLE_VESPA_COMPACT_ACL_FILTER
 from onyx.configs.constants import INDEX_SEPARATOR
 from onyx.context.search.models import IndexFilters
 from onyx.document_index.interfaces import VespaChunkRequest
@@ -19,12 +21,32 @@ from onyx.utils.logger import setup_logger
 logger = setup_logger()
 
 
+ACL_QUERY_PARAM = "acl_entries"
+
+
 def build_vespa_filters(
     filters: IndexFilters,
     *,
     include_hidden: bool = False,
     remove_trailing_and: bool = False,  # Set to True when using as a complete Vespa query
+    query_params: dict[str, str | int | float] | None = None,
 ) -> str:
+    """When `query_params` are given (the params of the query the filters are used in), the
+    ACL filter may be bound as a query parameter instead of being inlined into the YQL.
+    """
+
+    def _build_acl_filter(acl: list[str]) -> str:
+        valid_acl = sorted(entry for entry in acl if entry)
+        if not ENABLE_VESPA_COMPACT_ACL_FILTER or query_params is None or not valid_acl:
+            return _build_or_filters(ACCESS_CONTROL_LIST, acl)
+
+        # A single weightedSet term instead of an OR clause per entry, the YQL (and its parse
+        # cost) does not grow with the number of groups the user is in
+        query_params[ACL_QUERY_PARAM] = json.dumps(
+            {entry: 1 for entry in valid_acl}, separators=(",", ":")
+        )
+        return f"weightedSet({ACCESS_CONTROL_LIST}, @{ACL_QUERY_PARAM}) and "
+
     def _build_or_filters(key: str, vals: list[str] | None) -> str:
         if vals is None:
             return ""
@@ -64,9 +86,7 @@ def build_vespa_filters(
 
     # CAREFUL touching this one, currently there is no second ACL double-check post retrieval
     if filters.access_control_list is not None:
-        filter_str += _build_or_filters(
-            ACCESS_CONTROL_LIST, filters.access_control_list
-        )
+        filter_str += _build_acl_filter(filters.access_control_list)
 
     source_strs = (
         [s.value for s in filters.source_type] if filters.source_type else None
@@ -0,0 +1,125 @@
+import hashlib
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
+    get_experts_stores_representations,
+)
+from onyx.connectors.models import Document
+from onyx.db.models import DocumentChunkFingerprints
+from onyx.document_index.interfaces import DocumentChunkDiff
+from onyx.document_index.interfaces import IndexChunkRef
+from onyx.indexing.models import DocAwareChunk
+
+
+class ChunkFingerprint(BaseModel):
+    chunk_id: int
+    large_chunk_reference_ids: list[int] = []
+    fingerprint: str
+
+    def to_chunk_ref(self) -> IndexChunkRef:
+        return IndexChunkRef(
+            chunk_id=self.chunk_id,
+            large_chunk_reference_ids=tuple(self.large_chunk_reference_ids),
+        )
+
+
+def fingerprint_chunk(chunk: DocAwareChunk) -> ChunkFingerprint:
+    """Hashes everything about a chunk that ends up in the document index, apart from the
+    document update time (refreshed separately) and the access / document set / boost
+    metadata (kept up to date by the metadata sync)."""
+    document = chunk.source_document
+    fingerprint_input = [
+        chunk.chunk_id,
+        chunk.large_chunk_reference_ids,
+        chunk.blurb,
+        chunk.content,
+        chunk.source_links,
+        chunk.section_continuation,
+        chunk.title_prefix,
+        chunk.metadata_suffix_semantic,
+        chunk.metadata_suffix_keyword,
+        chunk.mini_chunk_texts,
+        document.get_title_for_document_index(),
+        document.semantic_identifier,
+        document.source.value,
+        document.metadata,
+        get_experts_stores_representations(document.primary_owners),
+        get_experts_stores_representations(document.secondary_owners),
+    ]
+    fingerprint = hashlib.sha256(
+        json.dumps(fingerprint_input, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return ChunkFingerprint(
+        chunk_id=chunk.chunk_id,
+        large_chunk_reference_ids=chunk.large_chunk_reference_ids,
+        fingerprint=fingerprint,
+    )
+
+
+def diff_document_chunks(
+    document: Document,
+    chunks: list[DocAwareChunk],
+    fingerprints: list[ChunkFingerprint],
+    previous: DocumentChunkFingerprints | None,
+) -> tuple[list[DocAwareChunk], DocumentChunkDiff | None]:
+    """Compares the chunks of a document (and their fingerprints, in the same order) against
+    the fingerprints stored when the document was last indexed.
+
+    Returns the chunks that have to be embedded and written along with the diff to pass to the
+    document index. If there is nothing to diff against, all chunks are returned and the diff
+    is None, meaning the document is rewritten as a whole."""
+    if previous is None:
+        return chunks, None
+
+    doc_updated_at = None
+    if document.doc_updated_at != previous.doc_updated_at:
+        # an update time can be assigned to the unchanged chunks but not removed from them
+        if document.doc_updated_at is None:
+            return chunks, None
+        doc_updated_at = document.doc_updated_at
+
+    previous_fingerprints = {
+        (
+            fingerprint.chunk_id,
+            tuple(fingerprint.large_chunk_reference_ids),
+        ): fingerprint
+        for fingerprint in _load_fingerprints(previous.chunk_fingerprints)
+    }
+
+    changed_chunks: list[DocAwareChunk] = []
+    unchanged_chunks: list[IndexChunkRef] = []
+    for chunk, fingerprint in zip(chunks, fingerprints):
+        chunk_ref = fingerprint.to_chunk_ref()
+        previous_fingerprint = previous_fingerprints.pop(
+            (chunk_ref.chunk_id, chunk_ref.large_chunk_reference_ids), None
+        )
+        if (
+            previous_fingerprint
+            and previous_fingerprint.fingerprint == fingerprint.fingerprint
+        ):
+            unchanged_chunks.append(chunk_ref)
+        else:
+            changed_chunks.append(chunk)
+
+    return changed_chunks, DocumentChunkDiff(
+        document_id=document.id,
+        unchanged_chunks=unchanged_chunks,
+        # whatever was not matched by a new chunk does not exist anymore
+        removed_chunks=[
+            fingerprint.to_chunk_ref() for fingerprint in previous_fingerprints.values()
+        ],
+        doc_updated_at=doc_updated_at,
+    )
+
+
+def _load_fingerprints(
+    raw_fingerprints: list[dict[str, Any]]
+) -> list[ChunkFingerprint]:
+    return [ChunkFingerprint.model_validate(raw) for raw in raw_fingerprints]
+
+
+def dump_fingerprints(fingerprints: list[ChunkFingerprint]) -> list[dict[str, Any]]:
+    return [fingerprint.model_dump() for fingerprint in fingerprints]
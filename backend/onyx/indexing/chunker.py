@@ -1,4 +1,15 @@
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+
 from onyx.configs.app_configs import BLURB_SIZE
+from onyx.configs.app_configs import CHUNKER_INCREMENTAL_TOKEN_COUNTING
+from onyx.configs.app_configs import CHUNKER_NUM_PROCESSES
 from onyx.configs.app_configs import LARGE_CHUNK_RATIO
 from onyx.configs.app_configs import MINI_CHUNK_SIZE
 from onyx.configs.app_configs import SKIP_METADATA_IN_CHUNK
@@ -27,6 +38,10 @@ CHUNK_OVERLAP = 0
 # could be another 128 tokens leaving 256 for the actual contents
 MAX_METADATA_PERCENTAGE = 0.25
 CHUNK_MIN_CONTENT = 256
+# How often (in seconds) the stop signal is checked while waiting on a chunking process
+_PROCESS_STOP_CHECK_INTERVAL = 1.0
+# How often (in seconds) a chunking process checks that the process that started it is alive
+_PARENT_CHECK_INTERVAL = 1.0
 
 
 logger = setup_logger()
@@ -127,9 +142,33 @@ class Chunker:
         chunk_overlap: int = CHUNK_OVERLAP,
         mini_chunk_size: int = MINI_CHUNK_SIZE,
         callback: IndexingHeartbeatInterface | None = None,
+        incremental_token_counting: bool = CHUNKER_INCREMENTAL_TOKEN_COUNTING,
+        num_processes: int = CHUNKER_NUM_PROCESSES,
     ) -> None:
         from llama_index.text_splitter import SentenceSplitter
 
+        # Everything needed to build an identical Chunker in a chunking process
+        self._process_chunker_kwargs: dict[str, Any] = {
+            "tokenizer": tokenizer,
+            "enable_multipass": enable_multipass,
+            "enable_large_chunks": enable_large_chunks,
+            "blurb_size": blurb_size,
+            "include_metadata": include_metadata,
+            "chunk_token_limit": chunk_token_limit,
+            "chunk_overlap": chunk_overlap,
+            "mini_chunk_size": mini_chunk_size,
+            "incremental_token_counting": incremental_token_counting,
+        }
+        if num_processes > 1 and multiprocessing.current_process().daemon:
+            logger.warning(
+                "Daemonic processes cannot start the chunking processes, chunking "
+                "in this process instead"
+            )
+            num_processes = 1
+        self.num_processes = num_processes
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._process_pool_lock = threading.Lock()
+
         self.include_metadata = include_metadata
         self.chunk_token_limit = chunk_token_limit
         self.enable_multipass = enable_multipass
@@ -137,6 +176,16 @@ class Chunker:
         self.tokenizer = tokenizer
         self.callback = callback
 
+        # When enabled, every section is tokenized once and the token counts / offsets of
+        # the chunk being built are kept as running totals instead of re-tokenizing the
+        # whole chunk for every section added to it.
+        self.incremental_token_counting = incremental_token_counting
+        self.blurb_size = blurb_size
+        self._section_separator_tokens = tokenizer.count_tokens(SECTION_SEPARATOR)
+        self._section_separator_offset = len(
+            shared_precompare_cleanup(SECTION_SEPARATOR)
+        )
+
         self.blurb_splitter = SentenceSplitter(
             tokenizer=tokenizer.tokenize,
             chunk_size=blurb_size,
@@ -159,12 +208,16 @@ class Chunker:
             else None
         )
 
-    def _split_oversized_chunk(self, text: str, content_token_limit: int) -> list[str]:
+    def _split_oversized_chunk(
+        self, text: str, content_token_limit: int, tokens: list[str] | None = None
+    ) -> list[str]:
         """
         Splits the text into smaller chunks based on token count to ensure
-        no chunk exceeds the content_token_limit.
+        no chunk exceeds the content_token_limit. Pass the tokens of the text if
+        they are already known.
         """
-        tokens = self.tokenizer.tokenize(text)
+        if tokens is None:
+            tokens = self.tokenizer.tokenize(text)
         chunks = []
         start = 0
         total_tokens = len(tokens)
@@ -202,16 +255,24 @@ class Chunker:
         chunks: list[DocAwareChunk] = []
         link_offsets: dict[int, str] = {}
         chunk_text = ""
+        # running totals for chunk_text, only used with incremental token counting
+        chunk_token_count = 0
+        chunk_offset = 0
+        # the blurb only ever comes from the start of the chunk, so with incremental token
+        # counting only the leading sections (about twice the blurb size) are passed to the
+        # blurb splitter instead of the whole chunk
+        chunk_blurb_end: int | None = None
 
         def _create_chunk(
             text: str,
             links: dict[int, str],
             is_continuation: bool = False,
+            blurb_text_end: int | None = None,
         ) -> DocAwareChunk:
             return DocAwareChunk(
                 source_document=document,
                 chunk_id=len(chunks),
-                blurb=self._extract_blurb(text),
+                blurb=self._extract_blurb(text[:blurb_text_end]),
                 content=text,
                 source_links=links or {0: ""},
                 section_continuation=is_continuation,
@@ -236,31 +297,37 @@ class Chunker:
                 )
                 continue
 
-            section_token_count = len(self.tokenizer.tokenize(section_text))
+            section_token_count = self.tokenizer.count_tokens(section_text)
 
             # Large sections are considered self-contained/unique
             # Therefore, they start a new chunk and are not concatenated
             # at the end by other sections
             if section_token_count > content_token_limit:
                 if chunk_text:
-                    chunks.append(_create_chunk(chunk_text, link_offsets))
+                    chunks.append(
+                        _create_chunk(chunk_text, link_offsets, False, chunk_blurb_end)
+                    )
                     link_offsets = {}
                     chunk_text = ""
+                    chunk_token_count = 0
+                    chunk_offset = 0
+                    chunk_blurb_end = None
 
                 split_texts = self.chunk_splitter.split_text(section_text)
 
                 for i, split_text in enumerate(split_texts):
-                    if (
-                        STRICT_CHUNK_TOKEN_LIMIT
-                        and
-                        # Tokenizer only runs if STRICT_CHUNK_TOKEN_LIMIT is true
-                        len(self.tokenizer.tokenize(split_text)) > content_token_limit
-                    ):
+                    # Tokenizer only runs if STRICT_CHUNK_TOKEN_LIMIT is true
+                    split_tokens = (
+                        self.tokenizer.tokenize(split_text)
+                        if STRICT_CHUNK_TOKEN_LIMIT
+                        else None
+                    )
+                    if split_tokens and len(split_tokens) > content_token_limit:
                         # If STRICT_CHUNK_TOKEN_LIMIT is true, manually check
                         # the token count of each split text to ensure it is
                         # not larger than the content_token_limit
                         smaller_chunks = self._split_oversized_chunk(
-                            split_text, content_token_limit
+                            split_text, content_token_limit, split_tokens
                         )
                         for i, small_chunk in enumerate(smaller_chunks):
                             chunks.append(
@@ -281,22 +348,46 @@ class Chunker:
 
                 continue
 
-            current_token_count = len(self.tokenizer.tokenize(chunk_text))
-            current_offset = len(shared_precompare_cleanup(chunk_text))
+            next_section_tokens = self._section_separator_tokens + section_token_count
+            if self.incremental_token_counting:
+                current_token_count = chunk_token_count
+                current_offset = chunk_offset
+            else:
+                current_token_count = self.tokenizer.count_tokens(chunk_text)
+                current_offset = len(shared_precompare_cleanup(chunk_text))
             # In the case where the whole section is shorter than a chunk, either add
             # to chunk or start a new one
-            next_section_tokens = (
-                len(self.tokenizer.tokenize(SECTION_SEPARATOR)) + section_token_count
-            )
             if next_section_tokens + current_token_count <= content_token_limit:
+                extends_blurb_text = (
+                    self.incremental_token_counting
+                    and chunk_token_count <= 2 * self.blurb_size
+                )
                 if chunk_text:
                     chunk_text += SECTION_SEPARATOR
+                    if self.incremental_token_counting:
+                        chunk_token_count += self._section_separator_tokens
+                        chunk_offset += self._section_separator_offset
                 chunk_text += section_text
                 link_offsets[current_offset] = section_link_text
+                if self.incremental_token_counting:
+                    chunk_token_count += section_token_count
+                if extends_blurb_text:
+                    chunk_blurb_end = len(chunk_text)
             else:
-                chunks.append(_create_chunk(chunk_text, link_offsets))
+                chunks.append(
+                    _create_chunk(chunk_text, link_offsets, False, chunk_blurb_end)
+                )
                 link_offsets = {0: section_link_text}
                 chunk_text = section_text
+                if self.incremental_token_counting:
+                    chunk_token_count = section_token_count
+                    chunk_offset = 0
+                    chunk_blurb_end = len(chunk_text)
+
+            if self.incremental_token_counting:
+                # the cleanup only ever drops individual characters (and the section separator
+                # keeps it from matching across sections), so the offset is additive
+                chunk_offset += len(shared_precompare_cleanup(section_text))
 
         # Once we hit the end, if we're still in the process of building a chunk, add what we have.
         # If there is only whitespace left then don't include it. If there are no chunks at all
@@ -306,6 +397,7 @@ class Chunker:
                 _create_chunk(
                     chunk_text,
                     link_offsets or {0: section_link_text},
+                    blurb_text_end=chunk_blurb_end,
                 )
             )
 
@@ -319,7 +411,7 @@ class Chunker:
 
         title = self._extract_blurb(document.get_title_for_document_index() or "")
         title_prefix = title + RETURN_SEPARATOR if title else ""
-        title_tokens = len(self.tokenizer.tokenize(title_prefix))
+        title_tokens = self.tokenizer.count_tokens(title_prefix)
 
         metadata_suffix_semantic = ""
         metadata_suffix_keyword = ""
@@ -331,7 +423,7 @@ class Chunker:
             ) = _get_metadata_suffix_for_document_index(
                 document.metadata, include_separator=True
             )
-            metadata_tokens = len(self.tokenizer.tokenize(metadata_suffix_semantic))
+            metadata_tokens = self.tokenizer.count_tokens(metadata_suffix_semantic)
 
         if metadata_tokens >= self.chunk_token_limit * MAX_METADATA_PERCENTAGE:
             # Note: we can keep the keyword suffix even if the semantic suffix is too long to fit in the model
@@ -365,6 +457,9 @@ class Chunker:
         Takes in a list of documents and chunks them into smaller chunks for indexing
         while persisting the document metadata.
         """
+        if self.num_processes > 1 and len(documents) > 1:
+            return self._chunk_in_processes(documents)
+
         final_chunks: list[DocAwareChunk] = []
         for document in documents:
             if self.callback:
@@ -378,3 +473,101 @@ class Chunker:
                 self.callback.progress("Chunker.chunk", len(chunks))
 
         return final_chunks
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = _start_process_pool(
+                    self.num_processes, self._process_chunker_kwargs
+                )
+                # the processes are kept warm for the following batches of this Chunker,
+                # i.e. of this indexing attempt
+                weakref.finalize(self, self._process_pool.shutdown, cancel_futures=True)
+            return self._process_pool
+
+    def _chunk_in_processes(self, documents: list[Document]) -> list[DocAwareChunk]:
+        """Chunks every document in one of the chunking processes. The results are collected
+        in document order, so the heartbeat / stop checks run between documents just like
+        when chunking sequentially."""
+        process_pool = self._get_process_pool()
+        futures = [
+            process_pool.submit(_chunk_document_in_process, document)
+            for document in documents
+        ]
+
+        final_chunks: list[DocAwareChunk] = []
+        try:
+            for document, future in zip(documents, futures):
+                while True:
+                    if self.callback and self.callback.should_stop():
+                        raise RuntimeError("Chunker.chunk: Stop signal detected")
+                    done, _ = wait([future], timeout=_PROCESS_STOP_CHECK_INTERVAL)
+                    if done:
+                        break
+
+                chunks = future.result()
+                # the chunks were pickled with a copy of the document, point them back to the
+                # one passed in
+                for chunk in chunks:
+                    chunk.source_document = document
+                final_chunks.extend(chunks)
+
+                if self.callback:
+                    self.callback.progress("Chunker.chunk", len(chunks))
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return final_chunks
+
+
+# Process pools started in this process, shut down by shutdown_chunking_processes
+_process_pools: list[ProcessPoolExecutor] = []
+_process_pools_lock = threading.Lock()
+
+# Set in each chunking process by _init_chunking_process
+_process_chunker: Chunker | None = None
+
+
+def _start_process_pool(
+    num_processes: int, chunker_kwargs: dict[str, Any]
+) -> ProcessPoolExecutor:
+    process_pool = ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_chunking_process,
+        initargs=(chunker_kwargs, os.getpid()),
+    )
+    with _process_pools_lock:
+        _process_pools.append(process_pool)
+    return process_pool
+
+
+def shutdown_chunking_processes() -> None:
+    """Stops the chunking processes started by the Chunkers of this process. Called at
+    the end of each indexing attempt."""
+    with _process_pools_lock:
+        process_pools = list(_process_pools)
+        _process_pools.clear()
+
+    for process_pool in process_pools:
+        process_pool.shutdown(cancel_futures=True)
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    # the process is reparented once its parent is gone, even if it was killed
+    while os.getppid() == parent_pid:
+        time.sleep(_PARENT_CHECK_INTERVAL)
+    os._exit(1)
+
+
+def _init_chunking_process(chunker_kwargs: dict[str, Any], parent_pid: int) -> None:
+    global _process_chunker
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+    _process_chunker = Chunker(**chunker_kwargs, num_processes=1)
+
+
+def _chunk_document_in_process(document: Document) -> list[DocAwareChunk]:
+    if _process_chunker is None:
+        raise RuntimeError("Chunking process was not initialized")
+    return _process_chunker._handle_single_document(document)
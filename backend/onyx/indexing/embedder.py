@@ -1,7 +1,9 @@
 from abc import ABC
 from abc import abstractmethod
 
+from onyx.configs.app_configs import EMBEDDING_CACHE_MAX_ENTRIES
 from onyx.db.models import SearchSettings
+from onyx.indexing.embedding_cache import EmbeddingCache
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.models import ChunkEmbedding
 from onyx.indexing.models import DocAwareChunk
@@ -62,6 +64,11 @@ class IndexingEmbedder(ABC):
             retrim_content=True,
             callback=callback,
         )
+        self.embedding_cache = (
+            EmbeddingCache(self.embedding_model)
+            if EMBEDDING_CACHE_MAX_ENTRIES > 0
+            else None
+        )
 
     @abstractmethod
     def embed_chunks(
@@ -131,11 +138,16 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
                     raise RuntimeError("Large chunk contains mini chunks")
                 flat_chunk_texts.extend(chunk.mini_chunk_texts)
 
-        embeddings = self.embedding_model.encode(
-            texts=flat_chunk_texts,
-            text_type=EmbedTextType.PASSAGE,
-            large_chunks_present=large_chunks_present,
-        )
+        if self.embedding_cache:
+            embeddings = self.embedding_cache.encode_passages(
+                flat_chunk_texts, large_chunks_present=large_chunks_present
+            )
+        else:
+            embeddings = self.embedding_model.encode(
+                texts=flat_chunk_texts,
+                text_type=EmbedTextType.PASSAGE,
+                large_chunks_present=large_chunks_present,
+            )
 
         chunk_titles = {
             chunk.source_document.get_title_for_document_index() for chunk in chunks
@@ -149,9 +161,14 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         # Cache the Title embeddings to only have to do it once
         title_embed_dict: dict[str, Embedding] = {}
         if chunk_titles_list:
-            title_embeddings = self.embedding_model.encode(
-                chunk_titles_list, text_type=EmbedTextType.PASSAGE
-            )
+            if self.embedding_cache:
+                title_embeddings = self.embedding_cache.encode_passages(
+                    chunk_titles_list
+                )
+            else:
+                title_embeddings = self.embedding_model.encode(
+                    chunk_titles_list, text_type=EmbedTextType.PASSAGE
+                )
             title_embed_dict.update(
                 {
                     title: vector
@@ -197,6 +214,9 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             embedded_chunks.append(new_embedded_chunk)
             embedding_ind_start += num_embeddings
 
+        if self.embedding_cache:
+            logger.info(f"Embedding cache stats: {self.embedding_cache.stats}")
+
         return embedded_chunks
 
     @classmethod
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+
+from onyx.configs.app_configs import EMBEDDING_CACHE_MAX_ENTRIES
+from onyx.configs.app_configs import LARGE_CHUNK_RATIO
+from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from onyx.db.embedding_cache import get_cached_embeddings
+from onyx.db.embedding_cache import prune_embedding_cache
+from onyx.db.embedding_cache import upsert_cached_embeddings
+from onyx.db.engine import get_session_with_default_tenant
+from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
+from onyx.utils.logger import setup_logger
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+# Number of newly cached embeddings after which the least recently used entries are evicted
+_PRUNE_INTERVAL = 10_000
+
+
+class EmbeddingCacheStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} "
+            f"hit_rate={self.hit_rate:.2%} evictions={self.evictions}"
+        )
+
+
+class EmbeddingCache:
+    """Persistent (Postgres backed) cache of passage embeddings.
+
+    Entries are keyed by everything that influences the embedding of a text: the model,
+    the provider and its endpoint / deployment, the normalize flag, the passage prefix
+    and the max sequence length the text is truncated to. Unchanged chunks therefore hit the cache when a document is
+    re-indexed and also when switching to new search settings that keep the same model.
+    The cache is bounded to `max_entries`, least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self,
+        embedding_model: EmbeddingModel,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.embedding_model = embedding_model
+        self.max_entries = max_entries
+        self.stats = EmbeddingCacheStats()
+
+        self._lock = threading.Lock()
+        self._inserts_since_prune = 0
+        self._key_prefix = "\x00".join(
+            [
+                str(embedding_model.provider_type),
+                embedding_model.api_url or "",
+                embedding_model.deployment_name or "",
+                embedding_model.api_version or "",
+                embedding_model.model_name or "",
+                str(embedding_model.normalize),
+                embedding_model.passage_prefix or "",
+            ]
+        )
+
+    def _cache_key(self, text: str, max_seq_length: int) -> str:
+        return hashlib.sha256(
+            f"{self._key_prefix}\x00{max_seq_length}\x00{text}".encode()
+        ).hexdigest()
+
+    def encode_passages(
+        self, texts: list[str], large_chunks_present: bool = False
+    ) -> list[Embedding]:
+        """Drop-in for EmbeddingModel.encode(texts, EmbedTextType.PASSAGE, ...) which only
+        sends the texts that are not cached (and each distinct text only once)."""
+        max_seq_length = DOC_EMBEDDING_CONTEXT_SIZE
+        if large_chunks_present:
+            max_seq_length *= LARGE_CHUNK_RATIO
+
+        keys = [self._cache_key(text, max_seq_length) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+
+        with get_session_with_default_tenant() as db_session:
+            key_to_embedding = get_cached_embeddings(db_session, unique_keys)
+
+        key_to_text = dict(zip(keys, texts))
+        missing_keys = [key for key in unique_keys if key not in key_to_embedding]
+        new_embeddings: dict[str, Embedding] = {}
+        if missing_keys:
+            embeddings = self.embedding_model.encode(
+                texts=[key_to_text[key] for key in missing_keys],
+                text_type=EmbedTextType.PASSAGE,
+                large_chunks_present=large_chunks_present,
+            )
+            new_embeddings = dict(zip(missing_keys, embeddings))
+            key_to_embedding.update(new_embeddings)
+
+        num_hits = len(texts) - len(missing_keys)
+        with self._lock:
+            self.stats.hits += num_hits
+            self.stats.misses += len(missing_keys)
+            self._inserts_since_prune += len(new_embeddings)
+            should_prune = self._inserts_since_prune >= _PRUNE_INTERVAL
+            if should_prune:
+                self._inserts_since_prune = 0
+
+        if new_embeddings:
+            with get_session_with_default_tenant() as db_session:
+                upsert_cached_embeddings(
+                    db_session=db_session,
+                    model_name=self.embedding_model.model_name or "",
+                    key_to_embedding=new_embeddings,
+                )
+                if should_prune:
+                    evicted = prune_embedding_cache(db_session, self.max_entries)
+                    with self._lock:
+                        self.stats.evictions += evicted
+
+        logger.debug(
+            f"Embedding cache: batch_hits={num_hits} batch_misses={len(missing_keys)} "
+            f"total: {self.stats}"
+        )
+
+        return [key_to_embedding[key] for key in keys]
@@ -1,7 +1,10 @@
 import traceback
 from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterator
 from functools import partial
 from http import HTTPStatus
+from typing import cast
 from typing import Protocol
 
 import httpx
@@ -11,8 +14,13 @@ from sqlalchemy.orm import Session
 
 from onyx.access.access import get_access_for_documents
 from onyx.access.models import DocumentAccess
+from onyx.configs.app_configs import ENABLE_CHUNK_DIFFING
 from onyx.configs.app_configs import ENABLE_MULTIPASS_INDEXING
 from onyx.configs.app_configs import INDEXING_EXCEPTION_LIMIT
+from onyx.configs.app_configs import INDEXING_PIPELINE_CHUNK_WORKERS
+from onyx.configs.app_configs import INDEXING_PIPELINE_EMBED_WORKERS
+from onyx.configs.app_configs import INDEXING_PIPELINE_QUEUE_DEPTH
+from onyx.configs.app_configs import INDEXING_PIPELINE_WRITE_WORKERS
 from onyx.configs.app_configs import MAX_DOCUMENT_CHARS
 from onyx.configs.constants import DEFAULT_BOOST
 from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
@@ -20,6 +28,12 @@ from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
 )
 from onyx.connectors.models import Document
 from onyx.connectors.models import IndexAttemptMetadata
+from onyx.db.chunk_fingerprint import chunk_fingerprints_exist
+from onyx.db.chunk_fingerprint import (
+    delete_chunk_fingerprints_for_documents__no_commit,
+)
+from onyx.db.chunk_fingerprint import get_chunk_fingerprints_for_documents
+from onyx.db.chunk_fingerprint import upsert_chunk_fingerprints__no_commit
 from onyx.db.document import get_documents_by_ids
 from onyx.db.document import prepare_to_modify_documents
 from onyx.db.document import update_docs_last_modified__no_commit
@@ -27,19 +41,29 @@ from onyx.db.document import update_docs_updated_at__no_commit
 from onyx.db.document import upsert_document_by_connector_credential_pair
 from onyx.db.document import upsert_documents
 from onyx.db.document_set import fetch_document_sets_for_documents
+from onyx.db.engine import get_session_with_tenant
 from onyx.db.index_attempt import create_index_attempt_error
 from onyx.db.models import Document as DBDocument
 from onyx.db.search_settings import get_current_search_settings
 from onyx.db.tag import create_or_add_document_tag
 from onyx.db.tag import create_or_add_document_tag_list
+from onyx.document_index.interfaces import DocumentChunkDiff
 from onyx.document_index.interfaces import DocumentIndex
 from onyx.document_index.interfaces import DocumentMetadata
+from onyx.indexing.chunk_diff import ChunkFingerprint
+from onyx.indexing.chunk_diff import diff_document_chunks
+from onyx.indexing.chunk_diff import dump_fingerprints
+from onyx.indexing.chunk_diff import fingerprint_chunk
 from onyx.indexing.chunker import Chunker
 from onyx.indexing.embedder import IndexingEmbedder
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.models import DocAwareChunk
 from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.indexing.models import IndexChunk
 from onyx.utils.logger import setup_logger
+from onyx.utils.process_caches import register_process_cache
+from onyx.utils.threadpool_concurrency import PipelineStage
+from onyx.utils.threadpool_concurrency import run_staged_pipeline
 from onyx.utils.timing import log_function_time
 from shared_configs.enums import EmbeddingProvider
 
@@ -49,6 +73,9 @@ logger = setup_logger()
 class DocumentBatchPrepareContext(BaseModel):
     updatable_docs: list[Document]
     id_to_db_doc_map: dict[str, DBDocument]
+    # only populated when chunk diffing is enabled, see filter_unchanged_chunks
+    chunk_fingerprints: dict[str, list[ChunkFingerprint]] = {}
+    chunk_diffs: dict[str, DocumentChunkDiff] = {}
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
@@ -133,6 +160,57 @@ def get_doc_ids_to_update(
     return updatable_docs
 
 
+def handle_index_doc_batch_exception(
+    *,
+    e: Exception,
+    trace: str,
+    document_batch: list[Document],
+    index_attempt_metadata: IndexAttemptMetadata,
+    attempt_id: int | None,
+    db_session: Session,
+) -> None:
+    """Records a failed batch against the index attempt. Re-raises if the attempt
+    is not allowed to tolerate any more failed batches."""
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code == HTTPStatus.INSUFFICIENT_STORAGE:
+            logger.error(
+                "NOTE: HTTP Status 507 Insufficient Storage indicates "
+                "you need to allocate more memory or disk space to the "
+                "Vespa/index container."
+            )
+
+    if INDEXING_EXCEPTION_LIMIT == 0:
+        raise e
+
+    create_index_attempt_error(
+        attempt_id,
+        batch=index_attempt_metadata.batch_num,
+        docs=document_batch,
+        exception_msg=str(e),
+        exception_traceback=trace,
+        db_session=db_session,
+    )
+    logger.exception(
+        f"Indexing batch {index_attempt_metadata.batch_num} failed. msg='{e}' trace='{trace}'"
+    )
+
+    index_attempt_metadata.num_exceptions += 1
+    if index_attempt_metadata.num_exceptions == INDEXING_EXCEPTION_LIMIT:
+        logger.warning(
+            f"Maximum number of exceptions for this index attempt "
+            f"({INDEXING_EXCEPTION_LIMIT}) has been reached. "
+            f"The next exception will abort the indexing attempt."
+        )
+    elif index_attempt_metadata.num_exceptions > INDEXING_EXCEPTION_LIMIT:
+        logger.warning(
+            f"Maximum number of exceptions for this index attempt "
+            f"({INDEXING_EXCEPTION_LIMIT}) has been exceeded."
+        )
+        raise RuntimeError(
+            f"Maximum exception limit of {INDEXING_EXCEPTION_LIMIT} exceeded."
+        )
+
+
 def index_doc_batch_with_handler(
     *,
     chunker: Chunker,
@@ -158,59 +236,25 @@ def index_doc_batch_with_handler(
             tenant_id=tenant_id,
         )
     except Exception as e:
-        if isinstance(e, httpx.HTTPStatusError):
-            if e.response.status_code == HTTPStatus.INSUFFICIENT_STORAGE:
-                logger.error(
-                    "NOTE: HTTP Status 507 Insufficient Storage indicates "
-                    "you need to allocate more memory or disk space to the "
-                    "Vespa/index container."
-                )
-
-        if INDEXING_EXCEPTION_LIMIT == 0:
-            raise
-
-        trace = traceback.format_exc()
-        create_index_attempt_error(
-            attempt_id,
-            batch=index_attempt_metadata.batch_num,
-            docs=document_batch,
-            exception_msg=str(e),
-            exception_traceback=trace,
+        handle_index_doc_batch_exception(
+            e=e,
+            trace=traceback.format_exc(),
+            document_batch=document_batch,
+            index_attempt_metadata=index_attempt_metadata,
+            attempt_id=attempt_id,
             db_session=db_session,
         )
-        logger.exception(
-            f"Indexing batch {index_attempt_metadata.batch_num} failed. msg='{e}' trace='{trace}'"
-        )
-
-        index_attempt_metadata.num_exceptions += 1
-        if index_attempt_metadata.num_exceptions == INDEXING_EXCEPTION_LIMIT:
-            logger.warning(
-                f"Maximum number of exceptions for this index attempt "
-                f"({INDEXING_EXCEPTION_LIMIT}) has been reached. "
-                f"The next exception will abort the indexing attempt."
-            )
-        elif index_attempt_metadata.num_exceptions > INDEXING_EXCEPTION_LIMIT:
-            logger.warning(
-                f"Maximum number of exceptions for this index attempt "
-                f"({INDEXING_EXCEPTION_LIMIT}) has been exceeded."
-            )
-            raise RuntimeError(
-                f"Maximum exception limit of {INDEXING_EXCEPTION_LIMIT} exceeded."
-            )
-        else:
-            pass
 
     return r
 
 
-def index_doc_batch_prepare(
+def get_doc_batch_prepare_context(
     documents: list[Document],
-    index_attempt_metadata: IndexAttemptMetadata,
     db_session: Session,
     ignore_time_skip: bool = False,
 ) -> DocumentBatchPrepareContext | None:
-    """Sets up the documents in the relational DB (source of truth) for permissions, metadata, etc.
-    This preceeds indexing it into the actual document index."""
+    """Read only part of index_doc_batch_prepare, figures out which documents need to be
+    (re)indexed. Returns None if none of them does."""
     # Create a trimmed list of docs that don't have a newer updated at
     # Shortcuts the time-consuming flow on connector index retries
     document_ids: list[str] = [document.id for document in documents]
@@ -225,6 +269,26 @@ def index_doc_batch_prepare(
         else documents
     )
 
+    # No docs to process because the batch is empty or every doc was already indexed
+    if not updatable_docs:
+        return None
+
+    id_to_db_doc_map = {doc.id: doc for doc in db_docs}
+    return DocumentBatchPrepareContext(
+        updatable_docs=updatable_docs, id_to_db_doc_map=id_to_db_doc_map
+    )
+
+
+def upsert_doc_batch_in_db(
+    documents: list[Document],
+    ctx: DocumentBatchPrepareContext | None,
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+) -> None:
+    """Writing part of index_doc_batch_prepare, for the context returned by
+    get_doc_batch_prepare_context."""
+    updatable_docs = ctx.updatable_docs if ctx else []
+
     # for all updatable docs, upsert into the DB
     # Does not include doc_updated_at which is also used to indicate a successful update
     if updatable_docs:
@@ -244,17 +308,123 @@ def index_doc_batch_prepare(
         db_session,
         index_attempt_metadata.connector_id,
         index_attempt_metadata.credential_id,
-        document_ids,
+        [document.id for document in documents],
     )
 
-    # No docs to process because the batch is empty or every doc was already indexed
-    if not updatable_docs:
-        return None
 
-    id_to_db_doc_map = {doc.id: doc for doc in db_docs}
-    return DocumentBatchPrepareContext(
-        updatable_docs=updatable_docs, id_to_db_doc_map=id_to_db_doc_map
+def index_doc_batch_prepare(
+    documents: list[Document],
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+    ignore_time_skip: bool = False,
+) -> DocumentBatchPrepareContext | None:
+    """Sets up the documents in the relational DB (source of truth) for permissions, metadata, etc.
+    This preceeds indexing it into the actual document index."""
+    ctx = get_doc_batch_prepare_context(
+        documents=documents,
+        db_session=db_session,
+        ignore_time_skip=ignore_time_skip,
     )
+    upsert_doc_batch_in_db(
+        documents=documents,
+        ctx=ctx,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+    )
+    return ctx
+
+
+# (tenant id, index name) of the indices known to have no chunk fingerprints, see
+# _delete_stale_chunk_fingerprints. Index names are shared across tenant schemas
+_INDICES_WITHOUT_CHUNK_FINGERPRINTS: set[tuple[str | None, str]] = set()
+register_process_cache(_INDICES_WITHOUT_CHUNK_FINGERPRINTS.clear)
+
+
+def _delete_stale_chunk_fingerprints(
+    document_ids: list[str],
+    index_name: str,
+    db_session: Session,
+    tenant_id: str | None,
+) -> None:
+    """With chunk diffing disabled the documents are rewritten as a whole, so
+    fingerprints stored while it was enabled no longer describe what is in the index.
+
+    Fingerprints are only written with chunk diffing enabled, which is a process wide
+    setting, so once the index of a tenant is seen without any there is nothing to
+    clean up for it for the rest of the process."""
+    if (tenant_id, index_name) in _INDICES_WITHOUT_CHUNK_FINGERPRINTS:
+        return
+
+    if not chunk_fingerprints_exist(db_session, index_name):
+        _INDICES_WITHOUT_CHUNK_FINGERPRINTS.add((tenant_id, index_name))
+        return
+
+    delete_chunk_fingerprints_for_documents__no_commit(
+        db_session=db_session, document_ids=document_ids, index_name=index_name
+    )
+    db_session.commit()
+
+
+def filter_unchanged_chunks(
+    *,
+    ctx: DocumentBatchPrepareContext,
+    chunks: list[DocAwareChunk],
+    index_name: str,
+    db_session: Session,
+    tenant_id: str | None = None,
+    enable_chunk_diffing: bool = ENABLE_CHUNK_DIFFING,
+) -> list[DocAwareChunk]:
+    """Diffs the chunks against the fingerprints stored when the documents were last
+    indexed and returns only the chunks that need to be embedded and written. The diffs
+    and the new fingerprints are kept on the context for the write.
+
+    The stored fingerprints are dropped up front, so if writing the batch fails the
+    documents are rewritten as a whole the next time."""
+    updatable_ids = [doc.id for doc in ctx.updatable_docs]
+    if not enable_chunk_diffing:
+        _delete_stale_chunk_fingerprints(
+            updatable_ids, index_name, db_session, tenant_id
+        )
+        return chunks
+
+    id_to_previous_fingerprints = get_chunk_fingerprints_for_documents(
+        db_session=db_session, document_ids=updatable_ids, index_name=index_name
+    )
+    delete_chunk_fingerprints_for_documents__no_commit(
+        db_session=db_session, document_ids=updatable_ids, index_name=index_name
+    )
+    db_session.commit()
+
+    doc_id_to_chunks: dict[str, list[DocAwareChunk]] = {
+        doc_id: [] for doc_id in updatable_ids
+    }
+    for chunk in chunks:
+        doc_id_to_chunks[chunk.source_document.id].append(chunk)
+
+    chunks_to_index: list[DocAwareChunk] = []
+    num_unchanged = num_removed = 0
+    for doc in ctx.updatable_docs:
+        doc_chunks = doc_id_to_chunks[doc.id]
+        fingerprints = [fingerprint_chunk(chunk) for chunk in doc_chunks]
+        ctx.chunk_fingerprints[doc.id] = fingerprints
+
+        changed_chunks, chunk_diff = diff_document_chunks(
+            document=doc,
+            chunks=doc_chunks,
+            fingerprints=fingerprints,
+            previous=id_to_previous_fingerprints.get(doc.id),
+        )
+        chunks_to_index.extend(changed_chunks)
+        if chunk_diff:
+            ctx.chunk_diffs[doc.id] = chunk_diff
+            num_unchanged += len(chunk_diff.unchanged_chunks)
+            num_removed += len(chunk_diff.removed_chunks)
+
+    logger.info(
+        f"Chunk diffing: changed_or_new={len(chunks_to_index)} "
+        f"unchanged={num_unchanged} removed={num_removed}"
+    )
+    return chunks_to_index
 
 
 def filter_documents(document_batch: list[Document]) -> list[Document]:
@@ -323,14 +493,6 @@ def index_doc_batch(
     Returns a tuple where the first element is the number of new docs and the
     second element is the number of chunks."""
 
-    no_access = DocumentAccess.build(
-        user_emails=[],
-        user_groups=[],
-        external_user_emails=[],
-        external_user_group_ids=[],
-        is_public=False,
-    )
-
     logger.debug("Filtering Documents")
     filtered_documents = filter_fnc(document_batch)
 
@@ -346,9 +508,47 @@ def index_doc_batch(
     logger.debug("Starting chunking")
     chunks: list[DocAwareChunk] = chunker.chunk(ctx.updatable_docs)
 
+    chunks = filter_unchanged_chunks(
+        ctx=ctx,
+        chunks=chunks,
+        index_name=document_index.index_name,
+        db_session=db_session,
+        tenant_id=tenant_id,
+    )
+
     logger.debug("Starting embedding")
     chunks_with_embeddings = embedder.embed_chunks(chunks) if chunks else []
 
+    return index_doc_batch_write(
+        ctx=ctx,
+        chunks_with_embeddings=chunks_with_embeddings,
+        document_index=document_index,
+        db_session=db_session,
+        tenant_id=tenant_id,
+    )
+
+
+def index_doc_batch_write(
+    *,
+    ctx: DocumentBatchPrepareContext,
+    chunks_with_embeddings: list[IndexChunk],
+    document_index: DocumentIndex,
+    db_session: Session,
+    tenant_id: str | None = None,
+) -> tuple[int, int]:
+    """Attaches access / document set / boost info to the embedded chunks, writes them
+    to the document index and records the successfully indexed docs in Postgres.
+
+    Returns a tuple where the first element is the number of new docs and the
+    second element is the number of chunks."""
+    no_access = DocumentAccess.build(
+        user_emails=[],
+        user_groups=[],
+        external_user_emails=[],
+        external_user_group_ids=[],
+        is_public=False,
+    )
+
     updatable_ids = [doc.id for doc in ctx.updatable_docs]
 
     # Acquires a lock on the documents so that no other process can modify them
@@ -395,7 +595,9 @@ def index_doc_batch(
         # A document will not be spread across different batches, so all the
         # documents with chunks in this set, are fully represented by the chunks
         # in this set
-        insertion_records = document_index.index(chunks=access_aware_chunks)
+        insertion_records = document_index.index(
+            chunks=access_aware_chunks, chunk_diffs=ctx.chunk_diffs or None
+        )
 
         successful_doc_ids = [record.document_id for record in insertion_records]
         successful_docs = [
@@ -420,6 +622,20 @@ def index_doc_batch(
             document_ids=last_modified_ids, db_session=db_session
         )
 
+        if ctx.chunk_fingerprints:
+            upsert_chunk_fingerprints__no_commit(
+                db_session=db_session,
+                index_name=document_index.index_name,
+                document_id_to_fingerprints={
+                    doc.id: (
+                        doc.doc_updated_at,
+                        dump_fingerprints(ctx.chunk_fingerprints[doc.id]),
+                    )
+                    for doc in successful_docs
+                    if doc.id in ctx.chunk_fingerprints
+                },
+            )
+
         db_session.commit()
 
     result = (
@@ -430,18 +646,11 @@ def index_doc_batch(
     return result
 
 
-def build_indexing_pipeline(
-    *,
+def _build_chunker(
     embedder: IndexingEmbedder,
-    document_index: DocumentIndex,
     db_session: Session,
-    chunker: Chunker | None = None,
-    ignore_time_skip: bool = False,
-    attempt_id: int | None = None,
-    tenant_id: str | None = None,
     callback: IndexingHeartbeatInterface | None = None,
-) -> IndexingPipelineProtocol:
-    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+) -> Chunker:
     search_settings = get_current_search_settings(db_session)
     multipass = (
         search_settings.multipass_indexing
@@ -462,7 +671,7 @@ def build_indexing_pipeline(
         embedder.provider_type != EmbeddingProvider.COHERE
     )
 
-    chunker = chunker or Chunker(
+    return Chunker(
         tokenizer=embedder.embedding_model.tokenizer,
         enable_multipass=multipass,
         enable_large_chunks=enable_large_chunks,
@@ -470,6 +679,23 @@ def build_indexing_pipeline(
         callback=callback,
     )
 
+
+def build_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    document_index: DocumentIndex,
+    db_session: Session,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    attempt_id: int | None = None,
+    tenant_id: str | None = None,
+    callback: IndexingHeartbeatInterface | None = None,
+) -> IndexingPipelineProtocol:
+    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+    chunker = chunker or _build_chunker(
+        embedder=embedder, db_session=db_session, callback=callback
+    )
+
     return partial(
         index_doc_batch_with_handler,
         chunker=chunker,
@@ -480,3 +706,210 @@ def build_indexing_pipeline(
         db_session=db_session,
         tenant_id=tenant_id,
     )
+
+
+class _StagedDocumentBatch(BaseModel):
+    """State of a single document batch as it moves through the staged pipeline."""
+
+    document_batch: list[Document]
+    index_attempt_metadata: IndexAttemptMetadata
+    filtered_documents: list[Document] = []
+    ctx: DocumentBatchPrepareContext | None = None
+    chunks: list[DocAwareChunk] = []
+    chunks_with_embeddings: list[IndexChunk] = []
+    result: tuple[int, int] = (0, 0)
+    # set when the write stage found that the attempt should not continue
+    stop_error: Exception | None = None
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class StagedIndexingPipeline:
+    """Indexes a stream of document batches as overlapping stages:
+
+    fetch (the connector) -> chunk (Postgres reads + chunking) -> embed -> write (document index + Postgres)
+
+    Each stage has its own worker threads and a bounded queue in front of the next stage,
+    so while one batch is being embedded the next one is already being chunked and the
+    connector is already fetching the one after that. Stages that touch Postgres open
+    their own sessions since sessions cannot be shared across threads. The chunk stage
+    only reads which documents need indexing, all of the writes of a batch (documents,
+    cc pair relationships, then the document index) happen in the write stage, in a
+    single session.
+
+    Failed batches are handled on the calling thread exactly like
+    index_doc_batch_with_handler does for the serial pipeline.
+
+    check_should_continue raises if the attempt should stop (stop signal, paused or
+    deleted connector...). It is called with the session of the pipeline thread calling
+    it, before fetching each batch and in the write stage before writing each batch."""
+
+    def __init__(
+        self,
+        *,
+        chunker: Chunker,
+        embedder: IndexingEmbedder,
+        document_index: DocumentIndex,
+        db_session: Session,
+        ignore_time_skip: bool = False,
+        attempt_id: int | None = None,
+        tenant_id: str | None = None,
+        chunk_workers: int = INDEXING_PIPELINE_CHUNK_WORKERS,
+        embed_workers: int = INDEXING_PIPELINE_EMBED_WORKERS,
+        write_workers: int = INDEXING_PIPELINE_WRITE_WORKERS,
+        queue_depth: int = INDEXING_PIPELINE_QUEUE_DEPTH,
+        filter_fnc: Callable[[list[Document]], list[Document]] = filter_documents,
+        check_should_continue: Callable[[Session], None] | None = None,
+    ) -> None:
+        self.chunker = chunker
+        self.embedder = embedder
+        self.document_index = document_index
+        self.db_session = db_session
+        self.ignore_time_skip = ignore_time_skip
+        self.attempt_id = attempt_id
+        self.tenant_id = tenant_id
+        self.filter_fnc = filter_fnc
+        self.check_should_continue = check_should_continue
+
+        self.stages = [
+            PipelineStage("chunk", self._chunk, chunk_workers, queue_depth),
+            PipelineStage("embed", self._embed, embed_workers, queue_depth),
+            PipelineStage("write", self._write, write_workers, queue_depth),
+        ]
+        self.queue_depth = queue_depth
+
+    def _chunk(self, batch: _StagedDocumentBatch) -> _StagedDocumentBatch:
+        batch.filtered_documents = self.filter_fnc(batch.document_batch)
+        with get_session_with_tenant(self.tenant_id) as db_session:
+            batch.ctx = get_doc_batch_prepare_context(
+                documents=batch.filtered_documents,
+                db_session=db_session,
+                ignore_time_skip=self.ignore_time_skip,
+            )
+
+        if batch.ctx:
+            chunks = self.chunker.chunk(batch.ctx.updatable_docs)
+            with get_session_with_tenant(self.tenant_id) as db_session:
+                batch.chunks = filter_unchanged_chunks(
+                    ctx=batch.ctx,
+                    chunks=chunks,
+                    index_name=self.document_index.index_name,
+                    db_session=db_session,
+                    tenant_id=self.tenant_id,
+                )
+        return batch
+
+    def _embed(self, batch: _StagedDocumentBatch) -> _StagedDocumentBatch:
+        if batch.chunks:
+            batch.chunks_with_embeddings = self.embedder.embed_chunks(batch.chunks)
+            batch.chunks = []
+        return batch
+
+    def _write(self, batch: _StagedDocumentBatch) -> _StagedDocumentBatch:
+        with get_session_with_tenant(self.tenant_id) as db_session:
+            if self.check_should_continue:
+                try:
+                    self.check_should_continue(db_session)
+                except Exception as e:
+                    batch.stop_error = e
+                    return batch
+
+            upsert_doc_batch_in_db(
+                documents=batch.filtered_documents,
+                ctx=batch.ctx,
+                index_attempt_metadata=batch.index_attempt_metadata,
+                db_session=db_session,
+            )
+            if batch.ctx:
+                batch.result = index_doc_batch_write(
+                    ctx=batch.ctx,
+                    chunks_with_embeddings=batch.chunks_with_embeddings,
+                    document_index=self.document_index,
+                    db_session=db_session,
+                    tenant_id=self.tenant_id,
+                )
+        batch.chunks_with_embeddings = []
+        return batch
+
+    def __call__(
+        self,
+        document_batches: Iterator[list[Document]],
+        index_attempt_metadata: IndexAttemptMetadata,
+        start_batch_num: int = 0,
+    ) -> Generator[tuple[list[Document], int, int], None, None]:
+        """Yields (document batch, number of new docs, number of chunks) for every batch
+        in the order the connector produced them."""
+
+        def _staged_batches() -> Iterator[_StagedDocumentBatch]:
+            while True:
+                # an error raised here ends the pipeline once the batches before it
+                # came out, like the connector raising would
+                if self.check_should_continue:
+                    with get_session_with_tenant(self.tenant_id) as db_session:
+                        self.check_should_continue(db_session)
+
+                document_batch = next(document_batches, None)
+                if document_batch is None:
+                    return
+                yield _StagedDocumentBatch(
+                    document_batch=document_batch,
+                    index_attempt_metadata=index_attempt_metadata.model_copy(),
+                )
+
+        staged_results = run_staged_pipeline(
+            source=_staged_batches(),
+            stages=self.stages,
+            source_queue_depth=self.queue_depth,
+        )
+        for staged_result in staged_results:
+            # stages mutate the batch in place, so the source item carries the results
+            batch: _StagedDocumentBatch = staged_result.item
+            document_batch = batch.document_batch
+            if batch.stop_error is not None:
+                raise batch.stop_error
+            # use 1-index for this
+            index_attempt_metadata.batch_num = start_batch_num + staged_result.index + 1
+
+            if staged_result.error is None:
+                new_docs, num_chunks = batch.result
+                yield document_batch, new_docs, num_chunks
+                continue
+
+            handle_index_doc_batch_exception(
+                e=cast(Exception, staged_result.error),
+                trace="".join(traceback.format_exception(staged_result.error)),
+                document_batch=document_batch,
+                index_attempt_metadata=index_attempt_metadata,
+                attempt_id=self.attempt_id,
+                db_session=self.db_session,
+            )
+            yield document_batch, 0, 0
+
+
+def build_staged_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    document_index: DocumentIndex,
+    db_session: Session,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    attempt_id: int | None = None,
+    tenant_id: str | None = None,
+    callback: IndexingHeartbeatInterface | None = None,
+    check_should_continue: Callable[[Session], None] | None = None,
+) -> StagedIndexingPipeline:
+    """Builds a pipeline which takes in a stream of doc batches and indexes them with
+    the fetch / chunk / embed / write stages running concurrently."""
+    chunker = chunker or _build_chunker(
+        embedder=embedder, db_session=db_session, callback=callback
+    )
+
+    return StagedIndexingPipeline(
+        chunker=chunker,
+        embedder=embedder,
+        document_index=document_index,
+        db_session=db_session,
+        ignore_time_skip=ignore_time_skip,
+        attempt_id=attempt_id,
+        tenant_id=tenant_id,
+        check_should_continue=check_should_continue,
+    )
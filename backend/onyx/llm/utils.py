@@ -1,7 +1,10 @@
 import copy
 import json
+import threading
 from collections.abc import Callable
 from collections.abc import Iterator
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any
 from typing import cast
 
@@ -295,39 +298,47 @@ _IMG_TOKENS = 85
 
 
 def check_message_tokens(
-    message: BaseMessage, encode_fn: Callable[[str], list] | None = None
+    message: BaseMessage,
+    encode_fn: Callable[[str], list] | None = None,
+    count_fn: Callable[[str], int] | None = None,
 ) -> int:
     if isinstance(message.content, str):
-        return check_number_of_tokens(message.content, encode_fn)
+        return check_number_of_tokens(message.content, encode_fn, count_fn)
 
     total_tokens = 0
     for part in message.content:
         if isinstance(part, str):
-            total_tokens += check_number_of_tokens(part, encode_fn)
+            total_tokens += check_number_of_tokens(part, encode_fn, count_fn)
             continue
 
         if part["type"] == "text":
-            total_tokens += check_number_of_tokens(part["text"], encode_fn)
+            total_tokens += check_number_of_tokens(part["text"], encode_fn, count_fn)
         elif part["type"] == "image_url":
             total_tokens += _IMG_TOKENS
 
     if isinstance(message, AIMessage) and message.tool_calls:
         for tool_call in message.tool_calls:
             total_tokens += check_number_of_tokens(
-                json.dumps(tool_call["args"]), encode_fn
+                json.dumps(tool_call["args"]), encode_fn, count_fn
+            )
+            total_tokens += check_number_of_tokens(
+                tool_call["name"], encode_fn, count_fn
             )
-            total_tokens += check_number_of_tokens(tool_call["name"], encode_fn)
 
     return total_tokens
 
 
 def check_number_of_tokens(
-    text: str, encode_fn: Callable[[str], list] | None = None
+    text: str,
+    encode_fn: Callable[[str], list] | None = None,
+    count_fn: Callable[[str], int] | None = None,
 ) -> int:
-    """Gets the number of tokens in the provided text, using the provided encoding
-    function. If none is provided, default to the tiktoken encoder used by GPT-3.5
-    and GPT-4.
+    """Gets the number of tokens in the provided text, using the provided counting or
+    encoding function (e.g. BaseTokenizer.count_tokens which memoizes the counts of repeated
+    texts). If none is provided, default to the tiktoken encoder used by GPT-3.5 and GPT-4.
     """
+    if count_fn is not None:
+        return count_fn(text)
 
     if encode_fn is None:
         encode_fn = tiktoken.get_encoding("cl100k_base").encode
@@ -349,7 +360,11 @@ def test_llm(llm: LLM) -> str | None:
     return error_msg
 
 
-def get_model_map() -> dict:
+_model_map: Mapping[str, Mapping[str, Any]] | None = None
+_model_map_lock = threading.Lock()
+
+
+def _build_model_map() -> Mapping[str, Mapping[str, Any]]:
     starting_map = copy.deepcopy(cast(dict, litellm.model_cost))
 
     # NOTE: we could add additional models here in the future,
@@ -371,7 +386,33 @@ def get_model_map() -> dict:
     #         "max_output_tokens": 128000,
     #     }
 
-    return starting_map
+    return MappingProxyType(
+        {
+            model_name: MappingProxyType(model_obj)
+            for model_name, model_obj in starting_map.items()
+        }
+    )
+
+
+def get_model_map() -> Mapping[str, Mapping[str, Any]]:
+    """Read only copy of the litellm model map, built once per process since copying the
+    thousands of entries of litellm.model_cost is much slower than the lookups in it.
+    Call refresh_model_map to rebuild it."""
+    global _model_map
+    model_map = _model_map
+    if model_map is None:
+        with _model_map_lock:
+            if _model_map is None:
+                _model_map = _build_model_map()
+            model_map = _model_map
+    return model_map
+
+
+def refresh_model_map() -> None:
+    """Rebuilds the model map on its next use, e.g. after the LLM providers were edited"""
+    global _model_map
+    with _model_map_lock:
+        _model_map = None
 
 
 def _strip_extra_provider_from_model_name(model_name: str) -> str:
@@ -383,8 +424,10 @@ def _strip_colon_from_model_name(model_name: str) -> str:
 
 
 def _find_model_obj(
-    model_map: dict, provider: str, model_names: list[str | None]
-) -> dict | None:
+    model_map: Mapping[str, Mapping[str, Any]],
+    provider: str,
+    model_names: list[str | None],
+) -> Mapping[str, Any] | None:
     # Filter out None values and deduplicate model names
     filtered_model_names = [name for name in model_names if name]
 
@@ -406,7 +449,7 @@ def _find_model_obj(
 
 
 def get_llm_max_tokens(
-    model_map: dict,
+    model_map: Mapping[str, Mapping[str, Any]],
     model_name: str,
     model_provider: str,
 ) -> int:
@@ -460,7 +503,7 @@ def get_llm_max_tokens(
 
 
 def get_llm_max_output_tokens(
-    model_map: dict,
+    model_map: Mapping[str, Mapping[str, Any]],
     model_name: str,
     model_provider: str,
 ) -> int:
@@ -507,7 +550,7 @@ def get_max_input_tokens(
     # and there is no other interface to get what we want. This should be okay though, since the
     # `model_cost` dict is a named public interface:
     # https://litellm.vercel.app/docs/completion/token_usage#7-model_cost
-    # model_map is  litellm.model_cost
+    # model_map is  litellm.model_cost, copied once per process
     litellm_model_map = get_model_map()
 
     input_toks = (
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import cast
+
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_MAX_LOCAL_ENTRIES
+from onyx.configs.app_configs import QUERY_EMBEDDING_CACHE_TTL
+from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from onyx.utils.process_caches import register_process_cache
+from shared_configs.contextvars import CURRENT_TENANT_ID_CONTEXTVAR
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+
+REDIS_KEY_PREFIX = "query_embedding_cache:"
+
+
+class _LocalQueryEmbeddingCache:
+    """Bounded in-process LRU in front of Redis so that repeated queries within one worker do
+    not even pay for the Redis round trip. Entries expire after the same TTL as in Redis.
+    """
+
+    def __init__(self, max_entries: int, ttl: int) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Embedding]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Embedding | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, embedding = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return embedding
+
+    def set(self, key: str, embedding: Embedding) -> None:
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = _LocalQueryEmbeddingCache(
+    max_entries=QUERY_EMBEDDING_CACHE_MAX_LOCAL_ENTRIES, ttl=QUERY_EMBEDDING_CACHE_TTL
+)
+register_process_cache(_local_cache.clear)
+
+
+def _get_cache_key(
+    query: str, model: EmbeddingModel, search_settings_id: int | None
+) -> str:
+    """The key covers everything that changes the query embedding. Updating or swapping the
+    search settings changes the settings id or the model configuration, so entries computed
+    with the previous settings are never read again and simply expire."""
+    key_input = json.dumps(
+        [
+            model.model_name,
+            model.provider_type.value if model.provider_type else None,
+            model.normalize,
+            model.query_prefix,
+            model.api_url,
+            model.deployment_name,
+            query,
+        ]
+    )
+    digest = hashlib.sha256(key_input.encode()).hexdigest()
+    return f"{REDIS_KEY_PREFIX}{search_settings_id}:{digest}"
+
+
+def _serialize_embedding(embedding: Embedding) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+def _deserialize_embedding(raw: bytes) -> Embedding:
+    embedding = array("f")
+    embedding.frombytes(raw)
+    return embedding.tolist()
+
+
+def _get_from_redis(tenant_id: str, cache_keys: list[str]) -> dict[str, Embedding]:
+    try:
+        raw_embeddings = cast(
+            list[bytes | None], get_redis_client(tenant_id=tenant_id).mget(cache_keys)
+        )
+        return {
+            cache_key: _deserialize_embedding(raw)
+            for cache_key, raw in zip(cache_keys, raw_embeddings)
+            if raw
+        }
+    except Exception as e:
+        logger.error(f"Failed to read query embeddings from Redis: {str(e)}")
+        return {}
+
+
+def _set_in_redis(tenant_id: str, key_to_embedding: dict[str, Embedding]) -> None:
+    try:
+        pipe = get_redis_client(tenant_id=tenant_id).pipeline(transaction=False)
+        for cache_key, embedding in key_to_embedding.items():
+            pipe.set(
+                cache_key,
+                _serialize_embedding(embedding),
+                ex=QUERY_EMBEDDING_CACHE_TTL,
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to write query embeddings to Redis: {str(e)}")
+
+
+def embed_queries(
+    queries: list[str],
+    model: EmbeddingModel,
+    search_settings_id: int | None,
+) -> list[Embedding]:
+    """Embeds the queries with the model, looking them up in the local LRU first and then in
+    Redis (shared by all API server workers) with a single MGET. Only the misses are sent to
+    the model server, in a single request, and written back to Redis in a single pipeline.
+    Redis errors are logged and the queries are embedded as usual.
+    """
+    if QUERY_EMBEDDING_CACHE_TTL <= 0:
+        return model.encode(queries, text_type=EmbedTextType.QUERY)
+
+    tenant_id = CURRENT_TENANT_ID_CONTEXTVAR.get()
+    cache_keys = [_get_cache_key(query, model, search_settings_id) for query in queries]
+    # the Redis keys are already tenant prefixed by the client, the local ones are not
+    key_to_embedding: dict[str, Embedding] = {}
+    for cache_key in cache_keys:
+        embedding = _local_cache.get(f"{tenant_id}:{cache_key}")
+        if embedding is not None:
+            key_to_embedding[cache_key] = embedding
+
+    redis_keys = [
+        key for key in dict.fromkeys(cache_keys) if key not in key_to_embedding
+    ]
+    if redis_keys:
+        for cache_key, embedding in _get_from_redis(tenant_id, redis_keys).items():
+            key_to_embedding[cache_key] = embedding
+            _local_cache.set(f"{tenant_id}:{cache_key}", embedding)
+
+    key_to_query = {
+        cache_key: query
+        for cache_key, query in zip(cache_keys, queries)
+        if cache_key not in key_to_embedding
+    }
+    if key_to_query:
+        embeddings = model.encode(
+            list(key_to_query.values()), text_type=EmbedTextType.QUERY
+        )
+        new_embeddings = dict(zip(key_to_query.keys(), embeddings))
+        for cache_key, embedding in new_embeddings.items():
+            _local_cache.set(f"{tenant_id}:{cache_key}", embedding)
+        _set_in_redis(tenant_id, new_embeddings)
+        key_to_embedding.update(new_embeddings)
+
+    logger.debug(
+        f"Query embedding cache: {len(queries) - len(key_to_query)} hits, "
+        f"{len(key_to_query)} misses"
+    )
+    return [key_to_embedding[cache_key] for cache_key in cache_keys]
+
+
+def embed_query(
+    query: str, model: EmbeddingModel, search_settings_id: int | None
+) -> Embedding:
+    return embed_queries([query], model, search_settings_id)[0]
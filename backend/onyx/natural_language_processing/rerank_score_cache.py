@@ -0,0 +1,95 @@
+import hashlib
+import json
+from typing import cast
+
+from onyx.configs.app_configs import RERANK_SCORE_CACHE_TTL
+from onyx.natural_language_processing.search_nlp_models import RerankingModel
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import CURRENT_TENANT_ID_CONTEXTVAR
+
+logger = setup_logger()
+
+
+REDIS_KEY_PREFIX = "rerank_score_cache:"
+
+
+def _get_query_key(query: str, model: RerankingModel) -> str:
+    key_input = json.dumps(
+        [
+            model.model_name,
+            model.provider_type.value if model.provider_type else None,
+            model.api_url,
+            query,
+        ]
+    )
+    return hashlib.sha256(key_input.encode()).hexdigest()
+
+
+def _get_cache_key(query_key: str, passage_id: str, passage: str) -> str:
+    """One key per scored passage, so that each score expires on its own and the scores
+    of re-indexed chunks (whose content hash changed) are not kept alive by later
+    searches. The content hash makes re-indexed chunks miss the cache."""
+    passage_hash = hashlib.sha256(passage.encode()).hexdigest()[:16]
+    return f"{REDIS_KEY_PREFIX}{query_key}:{passage_id}:{passage_hash}"
+
+
+def rerank_passages(
+    query: str,
+    passages: list[str],
+    passage_ids: list[str],
+    model: RerankingModel,
+) -> list[float]:
+    """Scores the passages against the query with the cross-encoder, only the passages whose
+    (id, content) have not been scored for this query and model before are sent to the model
+    server. The cached scores are read with a single MGET and the new ones written with a
+    single pipeline. Redis errors are logged and the passages are scored as usual.
+    """
+    if RERANK_SCORE_CACHE_TTL <= 0:
+        return model.predict(query=query, passages=passages)
+
+    tenant_id = CURRENT_TENANT_ID_CONTEXTVAR.get()
+    query_key = _get_query_key(query, model)
+    cache_keys = [
+        _get_cache_key(query_key, passage_id, passage)
+        for passage_id, passage in zip(passage_ids, passages)
+    ]
+
+    scores: dict[str, float] = {}
+    try:
+        raw_scores = cast(
+            list[bytes | None], get_redis_client(tenant_id=tenant_id).mget(cache_keys)
+        )
+        scores = {
+            cache_key: float(raw_score)
+            for cache_key, raw_score in zip(cache_keys, raw_scores)
+            if raw_score is not None
+        }
+    except Exception as e:
+        logger.error(f"Failed to read cached rerank scores from Redis: {str(e)}")
+
+    key_to_passage = {
+        cache_key: passage
+        for cache_key, passage in zip(cache_keys, passages)
+        if cache_key not in scores
+    }
+    logger.debug(
+        f"Rerank score cache: {len(passages) - len(key_to_passage)} hits, "
+        f"{len(key_to_passage)} misses"
+    )
+    if not key_to_passage:
+        return [scores[cache_key] for cache_key in cache_keys]
+
+    new_scores = model.predict(query=query, passages=list(key_to_passage.values()))
+    new_scores_by_key = dict(zip(key_to_passage.keys(), new_scores))
+    scores.update(new_scores_by_key)
+
+    try:
+        pipe = get_redis_client(tenant_id=tenant_id).pipeline(transaction=False)
+        for cache_key, score in new_scores_by_key.items():
+            pipe.set(cache_key, repr(score), ex=RERANK_SCORE_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to cache rerank scores in Redis: {str(e)}")
+
+    return [scores[cache_key] for cache_key in cache_keys]
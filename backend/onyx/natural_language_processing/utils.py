@@ -1,10 +1,13 @@
 import os
+import threading
 from abc import ABC
 from abc import abstractmethod
+from collections import OrderedDict
 from copy import copy
 
 from transformers import logging as transformer_logging  # type:ignore
 
+from onyx.configs.app_configs import TOKENIZER_MEMO_MAX_ENTRIES
 from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from onyx.configs.model_configs import DOCUMENT_ENCODER_MODEL
 from onyx.context.search.models import InferenceChunk
@@ -31,6 +34,12 @@ class BaseTokenizer(ABC):
     def decode(self, tokens: list[int]) -> str:
         pass
 
+    def encode_batch(self, strings: list[str]) -> list[list[int]]:
+        return [self.encode(string) for string in strings]
+
+    def count_tokens(self, string: str) -> int:
+        return len(self.encode(string))
+
 
 class TiktokenTokenizer(BaseTokenizer):
     _instances: dict[str, "TiktokenTokenizer"] = {}
@@ -44,15 +53,27 @@ class TiktokenTokenizer(BaseTokenizer):
         if not hasattr(self, "encoder"):
             import tiktoken
 
+            self.model_name = model_name
             self.encoder = tiktoken.encoding_for_model(model_name)
 
+    def __reduce__(self) -> tuple:
+        # re-created from the model name (and cached per process) when unpickled
+        return (TiktokenTokenizer, (self.model_name,))
+
     def encode(self, string: str) -> list[int]:
         # this ignores special tokens that the model is trained on, see encode_ordinary for details
         return self.encoder.encode_ordinary(string)
 
+    def encode_batch(self, strings: list[str]) -> list[list[int]]:
+        return self.encoder.encode_ordinary_batch(strings)
+
     def tokenize(self, string: str) -> list[str]:
         encoded = self.encode(string)
-        decoded = [self.encoder.decode([token]) for token in encoded]
+        # same as decoding the tokens one by one, without a call into tiktoken per token
+        decoded = [
+            token_bytes.decode("utf-8", errors="replace")
+            for token_bytes in self.encoder.decode_tokens_bytes(encoded)
+        ]
 
         if len(decoded) != len(encoded):
             logger.warning(
@@ -75,6 +96,16 @@ class HuggingFaceTokenizer(BaseTokenizer):
         # this returns no special tokens
         return self.encoder.encode(string, add_special_tokens=False).ids
 
+    def encode_batch(self, strings: list[str]) -> list[list[int]]:
+        return [
+            encoding.ids
+            for encoding in self.encoder.encode_batch(strings, add_special_tokens=False)
+        ]
+
+    def count_tokens(self, string: str) -> int:
+        # the length of the Encoding, without converting the ids to a python list
+        return len(self.encoder.encode(string, add_special_tokens=False))
+
     def tokenize(self, string: str) -> list[str]:
         return self.encoder.encode(string, add_special_tokens=False).tokens
 
@@ -82,6 +113,61 @@ class HuggingFaceTokenizer(BaseTokenizer):
         return self.encoder.decode(tokens)
 
 
+class MemoizedTokenizer(BaseTokenizer):
+    """Wraps a tokenizer and memoizes the token counts of the most recently counted strings.
+    Longer strings (whole documents) are counted but not memoized."""
+
+    MAX_MEMOIZED_STRING_LENGTH = 20_000
+
+    def __init__(
+        self, tokenizer: BaseTokenizer, max_entries: int = TOKENIZER_MEMO_MAX_ENTRIES
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._token_counts: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple:
+        # the memo and its lock stay with the process
+        return (MemoizedTokenizer, (self.tokenizer, self.max_entries))
+
+    def encode(self, string: str) -> list[int]:
+        return self.tokenizer.encode(string)
+
+    def encode_batch(self, strings: list[str]) -> list[list[int]]:
+        encoded = self.tokenizer.encode_batch(strings)
+        for string, tokens in zip(strings, encoded):
+            self._memoize(string, len(tokens))
+        return encoded
+
+    def tokenize(self, string: str) -> list[str]:
+        return self.tokenizer.tokenize(string)
+
+    def decode(self, tokens: list[int]) -> str:
+        return self.tokenizer.decode(tokens)
+
+    def count_tokens(self, string: str) -> int:
+        with self._lock:
+            token_count = self._token_counts.get(string)
+            if token_count is not None:
+                self._token_counts.move_to_end(string)
+                return token_count
+
+        token_count = self.tokenizer.count_tokens(string)
+        self._memoize(string, token_count)
+        return token_count
+
+    def _memoize(self, string: str, token_count: int) -> None:
+        if self.max_entries <= 0 or len(string) > self.MAX_MEMOIZED_STRING_LENGTH:
+            return
+
+        with self._lock:
+            self._token_counts[string] = token_count
+            self._token_counts.move_to_end(string)
+            while len(self._token_counts) > self.max_entries:
+                self._token_counts.popitem(last=False)
+
+
 _TOKENIZER_CACHE: dict[tuple[EmbeddingProvider | None, str | None], BaseTokenizer] = {}
 
 
@@ -103,7 +189,7 @@ def _check_tokenizer_cache(
             )
             tokenizer = HuggingFaceTokenizer(DOCUMENT_ENCODER_MODEL)
 
-        _TOKENIZER_CACHE[id_tuple] = tokenizer
+        _TOKENIZER_CACHE[id_tuple] = MemoizedTokenizer(tokenizer)
 
     return _TOKENIZER_CACHE[id_tuple]
 
@@ -138,7 +224,9 @@ def _try_initialize_tokenizer(
     return None
 
 
-_DEFAULT_TOKENIZER: BaseTokenizer = HuggingFaceTokenizer(DOCUMENT_ENCODER_MODEL)
+_DEFAULT_TOKENIZER: BaseTokenizer = MemoizedTokenizer(
+    HuggingFaceTokenizer(DOCUMENT_ENCODER_MODEL)
+)
 
 
 def get_tokenizer(
@@ -170,10 +258,61 @@ def tokenizer_trim_chunks(
     max_chunk_toks: int = DOC_EMBEDDING_CONTEXT_SIZE,
 ) -> list[InferenceChunk]:
     new_chunks = copy(chunks)
-    for ind, chunk in enumerate(new_chunks):
-        new_content = tokenizer_trim_content(chunk.content, max_chunk_toks, tokenizer)
-        if len(new_content) != len(chunk.content):
+    chunk_tokens = tokenizer.encode_batch([chunk.content for chunk in chunks])
+    for ind, (chunk, tokens) in enumerate(zip(chunks, chunk_tokens)):
+        if len(tokens) > max_chunk_toks:
             new_chunk = copy(chunk)
-            new_chunk.content = new_content
+            new_chunk.content = tokenizer.decode(tokens[:max_chunk_toks])
             new_chunks[ind] = new_chunk
     return new_chunks
+
+
+# the search takes about 5 counts of the desired length, encoding the whole content once
+# is cheaper unless it is several times longer
+_TRIM_SEARCH_MIN_LENGTH_RATIO = 6
+
+
+def tokenizer_trim_content_to_fit(
+    content: str,
+    desired_length: int,
+    tokenizer: BaseTokenizer,
+    token_count: int | None = None,
+) -> str:
+    """Trims the content to at most desired_length tokens. Pass token_count if the
+    content was already counted, content that fits is then returned without tokenizing
+    it again.
+
+    Content that is much longer than the desired length (e.g. a whole document trimmed
+    to the space left in the prompt) is trimmed to its longest prefix that fits, with a
+    search for where to cut the text starting from the token density of the content.
+    Only prefixes of roughly the desired length are tokenized rather than the whole
+    content, and the kept text is a verbatim prefix of the content. Otherwise the
+    content is encoded once and the kept tokens are decoded, which is cheaper than the
+    few counts of the search."""
+    if token_count is None:
+        token_count = tokenizer.count_tokens(content)
+    if token_count <= desired_length:
+        return content
+    if desired_length <= 0:
+        return ""
+    if token_count < _TRIM_SEARCH_MIN_LENGTH_RATIO * desired_length:
+        return tokenizer.decode(tokenizer.encode(content)[:desired_length])
+
+    chars_per_token = len(content) / token_count
+    # count_tokens(content[:lo]) <= desired_length < count_tokens(content[:hi])
+    lo, hi = 0, len(content)
+    cut = int(desired_length * chars_per_token)
+    while hi - lo > 1:
+        if not lo < cut < hi:
+            cut = (lo + hi) // 2
+        cut_token_count = tokenizer.count_tokens(content[:cut])
+        if cut_token_count <= desired_length:
+            lo = cut
+        else:
+            hi = cut
+        # next guess from the token density of the prefix, nudged by a token towards
+        # the side of the limit that is still unknown
+        cut = int(cut * desired_length / max(cut_token_count, 1))
+        cut += int(chars_per_token) + 1 if cut_token_count <= desired_length else -1
+
+    return content[:lo]
@@ -1,16 +1,14 @@
 import time
 from typing import cast
-from uuid import uuid4
 
 from celery import Celery
 from redis import Redis
 from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
-from onyx.configs.constants import OnyxCeleryQueues
-from onyx.configs.constants import OnyxCeleryTask
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.document import (
     construct_document_select_for_connector_credential_pair_by_needs_sync,
@@ -66,7 +64,7 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
     ) -> tuple[int, int] | None:
         last_lock_time = time.monotonic()
 
-        async_results = []
+        num_tasks = 0
         cc_pair = get_connector_credential_pair_from_id(int(self._id), db_session)
         if not cc_pair:
             return None
@@ -76,8 +74,9 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
         )
 
         num_docs = 0
+        batch: list[str] = []
 
-        for doc in db_session.scalars(stmt).yield_per(1):
+        for doc in db_session.scalars(stmt).yield_per(VESPA_SYNC_BATCH_SIZE):
             doc = cast(Document, doc)
             current_time = time.monotonic()
             if current_time - last_lock_time >= (
@@ -92,28 +91,23 @@ class RedisConnectorCredentialPair(RedisObjectHelper):
             if doc.id in self.skip_docs:
                 continue
 
-            # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # we prefix the task id so it's easier to keep track of who created the task
-            # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            custom_task_id = f"{self.task_id_prefix}_{uuid4()}"
+            batch.append(doc.id)
+            self.skip_docs.add(doc.id)
+            if len(batch) < VESPA_SYNC_BATCH_SIZE:
+                continue
 
-            # add to the tracking taskset in redis BEFORE creating the celery task.
+            # Priority on sync's triggered by new indexing should be medium
             # note that for the moment we are using a single taskset key, not differentiated by cc_pair id
-            redis_client.sadd(
-                RedisConnectorCredentialPair.get_taskset_key(), custom_task_id
+            self.send_vespa_metadata_sync_batch(
+                celery_app, redis_client, batch, tenant_id, OnyxCeleryPriority.MEDIUM
             )
+            num_tasks += 1
+            batch = []
 
-            # Priority on sync's triggered by new indexing should be medium
-            result = celery_app.send_task(
-                OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
-                kwargs=dict(document_id=doc.id, tenant_id=tenant_id),
-                queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
+        if batch:
+            self.send_vespa_metadata_sync_batch(
+                celery_app, redis_client, batch, tenant_id, OnyxCeleryPriority.MEDIUM
             )
+            num_tasks += 1
 
-            async_results.append(result)
-            self.skip_docs.add(doc.id)
-
-        return len(async_results), num_docs
+        return num_tasks, num_docs
@@ -9,18 +9,22 @@ from pydantic import BaseModel
 from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.document import construct_document_select_for_connector_credential_pair
+from onyx.db.models import ConnectorCredentialPair
 from onyx.db.models import Document as DbDocument
 
 
 class RedisConnectorDeletePayload(BaseModel):
     num_tasks: int | None
     submitted: datetime
+    # each task cleans up a batch of documents, so num_tasks counts batches
+    num_docs: int | None = None
 
 
 class RedisConnectorDelete:
@@ -85,12 +89,15 @@ class RedisConnectorDelete:
         celery_app: Celery,
         db_session: Session,
         lock: RedisLock,
-    ) -> int | None:
+    ) -> tuple[int, int] | None:
         """Returns None if the cc_pair doesn't exist.
-        Otherwise, returns an int with the number of generated tasks."""
+        Otherwise, returns the number of generated tasks and the number of documents
+        they clean up. Each task cleans up a batch of up to VESPA_SYNC_BATCH_SIZE
+        documents."""
         last_lock_time = time.monotonic()
 
-        async_results = []
+        num_tasks = 0
+        num_docs = 0
         cc_pair = get_connector_credential_pair_from_id(int(self.id), db_session)
         if not cc_pair:
             return None
@@ -98,7 +105,8 @@ class RedisConnectorDelete:
         stmt = construct_document_select_for_connector_credential_pair(
             cc_pair.connector_id, cc_pair.credential_id
         )
-        for doc_temp in db_session.scalars(stmt).yield_per(1):
+        batch: list[str] = []
+        for doc_temp in db_session.scalars(stmt).yield_per(VESPA_SYNC_BATCH_SIZE):
             doc: DbDocument = doc_temp
             current_time = time.monotonic()
             if current_time - last_lock_time >= (
@@ -107,29 +115,46 @@ class RedisConnectorDelete:
                 lock.reacquire()
                 last_lock_time = current_time
 
-            custom_task_id = self._generate_task_id()
-
-            # add to the tracking taskset in redis BEFORE creating the celery task.
-            # note that for the moment we are using a single taskset key, not differentiated by cc_pair id
-            self.redis.sadd(self.taskset_key, custom_task_id)
-
-            # Priority on sync's triggered by new indexing should be medium
-            result = celery_app.send_task(
-                OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
-                kwargs=dict(
-                    document_id=doc.id,
-                    connector_id=cc_pair.connector_id,
-                    credential_id=cc_pair.credential_id,
-                    tenant_id=self.tenant_id,
-                ),
-                queue=OnyxCeleryQueues.CONNECTOR_DELETION,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
-            )
-
-            async_results.append(result)
-
-        return len(async_results)
+            num_docs += 1
+            batch.append(doc.id)
+            if len(batch) < VESPA_SYNC_BATCH_SIZE:
+                continue
+
+            self._send_cleanup_batch(celery_app, cc_pair, batch)
+            num_tasks += 1
+            batch = []
+
+        if batch:
+            self._send_cleanup_batch(celery_app, cc_pair, batch)
+            num_tasks += 1
+
+        return num_tasks, num_docs
+
+    def _send_cleanup_batch(
+        self,
+        celery_app: Celery,
+        cc_pair: ConnectorCredentialPair,
+        document_ids: list[str],
+    ) -> None:
+        custom_task_id = self._generate_task_id()
+
+        # add to the tracking taskset in redis BEFORE creating the celery task.
+        # note that for the moment we are using a single taskset key, not differentiated by cc_pair id
+        self.redis.sadd(self.taskset_key, custom_task_id)
+
+        # Priority on sync's triggered by new indexing should be medium
+        celery_app.send_task(
+            OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_BATCH_TASK,
+            kwargs=dict(
+                document_ids=document_ids,
+                connector_id=cc_pair.connector_id,
+                credential_id=cc_pair.credential_id,
+                tenant_id=self.tenant_id,
+            ),
+            queue=OnyxCeleryQueues.CONNECTOR_DELETION,
+            task_id=custom_task_id,
+            priority=OnyxCeleryPriority.MEDIUM,
+        )
 
     def reset(self) -> None:
         self.redis.delete(self.taskset_key)
@@ -9,6 +9,7 @@ from pydantic import BaseModel
 from redis.lock import Lock as RedisLock
 
 from onyx.access.models import DocExternalAccess
+from onyx.configs.app_configs import DOC_PERMISSIONS_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
@@ -137,9 +138,11 @@ class RedisConnectorPermissionSync:
         credential_id: int,
     ) -> int | None:
         last_lock_time = time.monotonic()
-        async_results = []
 
-        # Create a task for each document permission sync
+        num_tasks = 0
+        batch: list[DocExternalAccess] = []
+
+        # Create a task for each batch of document permissions
         for doc_perm in new_permissions:
             current_time = time.monotonic()
             if lock and current_time - last_lock_time >= (
@@ -147,26 +150,52 @@ class RedisConnectorPermissionSync:
             ):
                 lock.reacquire()
                 last_lock_time = current_time
-            # Add task for document permissions sync
-            custom_task_id = f"{self.subtask_prefix}_{uuid4()}"
-            self.redis.sadd(self.taskset_key, custom_task_id)
-
-            result = celery_app.send_task(
-                OnyxCeleryTask.UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_TASK,
-                kwargs=dict(
-                    tenant_id=self.tenant_id,
-                    serialized_doc_external_access=doc_perm.to_dict(),
-                    source_string=source_string,
-                    connector_id=connector_id,
-                    credential_id=credential_id,
-                ),
-                queue=OnyxCeleryQueues.DOC_PERMISSIONS_UPSERT,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
+
+            batch.append(doc_perm)
+            if len(batch) < DOC_PERMISSIONS_SYNC_BATCH_SIZE:
+                continue
+
+            self._send_permissions_batch(
+                celery_app, batch, source_string, connector_id, credential_id
             )
-            async_results.append(result)
+            num_tasks += 1
+            batch = []
 
-        return len(async_results)
+        if batch:
+            self._send_permissions_batch(
+                celery_app, batch, source_string, connector_id, credential_id
+            )
+            num_tasks += 1
+
+        return num_tasks
+
+    def _send_permissions_batch(
+        self,
+        celery_app: Celery,
+        doc_perms: list[DocExternalAccess],
+        source_string: str,
+        connector_id: int,
+        credential_id: int,
+    ) -> None:
+        # Add task for document permissions sync
+        custom_task_id = f"{self.subtask_prefix}_{uuid4()}"
+        self.redis.sadd(self.taskset_key, custom_task_id)
+
+        celery_app.send_task(
+            OnyxCeleryTask.UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_BATCH_TASK,
+            kwargs=dict(
+                tenant_id=self.tenant_id,
+                serialized_doc_external_accesses=[
+                    doc_perm.to_dict() for doc_perm in doc_perms
+                ],
+                source_string=source_string,
+                connector_id=connector_id,
+                credential_id=credential_id,
+            ),
+            queue=OnyxCeleryQueues.DOC_PERMISSIONS_UPSERT,
+            task_id=custom_task_id,
+            priority=OnyxCeleryPriority.MEDIUM,
+        )
 
     def reset(self) -> None:
         self.redis.delete(self.generator_progress_key)
@@ -7,11 +7,13 @@ from celery import Celery
 from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
+from onyx.db.models import ConnectorCredentialPair
 
 
 class RedisConnectorPrune:
@@ -111,11 +113,12 @@ class RedisConnectorPrune:
     ) -> int | None:
         last_lock_time = time.monotonic()
 
-        async_results = []
+        num_tasks = 0
         cc_pair = get_connector_credential_pair_from_id(int(self.id), db_session)
         if not cc_pair:
             return None
 
+        batch: list[str] = []
         for doc_id in documents_to_prune:
             current_time = time.monotonic()
             if lock and current_time - last_lock_time >= (
@@ -124,32 +127,48 @@ class RedisConnectorPrune:
                 lock.reacquire()
                 last_lock_time = current_time
 
-            # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # the actual redis key is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # we prefix the task id so it's easier to keep track of who created the task
-            # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            custom_task_id = f"{self.subtask_prefix}_{uuid4()}"
-
-            # add to the tracking taskset in redis BEFORE creating the celery task.
-            self.redis.sadd(self.taskset_key, custom_task_id)
-
-            # Priority on sync's triggered by new indexing should be medium
-            result = celery_app.send_task(
-                OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
-                kwargs=dict(
-                    document_id=doc_id,
-                    connector_id=cc_pair.connector_id,
-                    credential_id=cc_pair.credential_id,
-                    tenant_id=self.tenant_id,
-                ),
-                queue=OnyxCeleryQueues.CONNECTOR_DELETION,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
-            )
-
-            async_results.append(result)
-
-        return len(async_results)
+            batch.append(doc_id)
+            if len(batch) < VESPA_SYNC_BATCH_SIZE:
+                continue
+
+            self._send_cleanup_batch(celery_app, cc_pair, batch)
+            num_tasks += 1
+            batch = []
+
+        if batch:
+            self._send_cleanup_batch(celery_app, cc_pair, batch)
+            num_tasks += 1
+
+        return num_tasks
+
+    def _send_cleanup_batch(
+        self,
+        celery_app: Celery,
+        cc_pair: ConnectorCredentialPair,
+        document_ids: list[str],
+    ) -> None:
+        # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # the actual redis key is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # we prefix the task id so it's easier to keep track of who created the task
+        # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        custom_task_id = f"{self.subtask_prefix}_{uuid4()}"
+
+        # add to the tracking taskset in redis BEFORE creating the celery task.
+        self.redis.sadd(self.taskset_key, custom_task_id)
+
+        # Priority on sync's triggered by new indexing should be medium
+        celery_app.send_task(
+            OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_BATCH_TASK,
+            kwargs=dict(
+                document_ids=document_ids,
+                connector_id=cc_pair.connector_id,
+                credential_id=cc_pair.credential_id,
+                tenant_id=self.tenant_id,
+            ),
+            queue=OnyxCeleryQueues.CONNECTOR_DELETION,
+            task_id=custom_task_id,
+            priority=OnyxCeleryPriority.MEDIUM,
+        )
 
     def reset(self) -> None:
         self.redis.delete(self.generator_progress_key)
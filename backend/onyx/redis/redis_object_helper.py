@@ -1,11 +1,15 @@
 from abc import ABC
 from abc import abstractmethod
+from uuid import uuid4
 
 from celery import Celery
 from redis import Redis
 from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
+from onyx.configs.constants import OnyxCeleryPriority
+from onyx.configs.constants import OnyxCeleryQueues
+from onyx.configs.constants import OnyxCeleryTask
 from onyx.redis.redis_pool import get_redis_client
 
 
@@ -79,6 +83,35 @@ class RedisObjectHelper(ABC):
         object_id = parts[1]
         return object_id
 
+    def send_vespa_metadata_sync_batch(
+        self,
+        celery_app: Celery,
+        redis_client: Redis,
+        document_ids: list[str],
+        tenant_id: str | None,
+        priority: OnyxCeleryPriority,
+    ) -> str:
+        """Sends one task syncing the metadata of all the documents to Vespa and tracks it
+        in the taskset. Progress is counted in tasks, so the fence should be set to the
+        number of batches sent and not the number of documents."""
+        # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # we prefix the task id so it's easier to keep track of who created the task
+        # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        custom_task_id = f"{self.task_id_prefix}_{uuid4()}"
+
+        # add to the set BEFORE creating the task.
+        redis_client.sadd(self.taskset_key, custom_task_id)
+
+        celery_app.send_task(
+            OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+            kwargs=dict(document_ids=document_ids, tenant_id=tenant_id),
+            queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
+            task_id=custom_task_id,
+            priority=priority,
+        )
+        return custom_task_id
+
     @abstractmethod
     def generate_tasks(
         self,
@@ -61,6 +61,30 @@ class TenantRedis(redis.Redis):
 
         return wrapper
 
+    def _prefix_mget(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(keys: Any, *args: Any) -> Any:
+            if isinstance(keys, (str, bytes, memoryview)):
+                keys = [keys]
+            return method(
+                [self._prefixed(key) for key in keys],
+                *[self._prefixed(key) for key in args],
+            )
+
+        return wrapper
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: Any = None
+    ) -> "TenantPipeline":
+        """A pipeline whose commands are prefixed like the ones of this client."""
+        return TenantPipeline(
+            self.tenant_id,
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint,
+        )
+
     def _prefix_scan_iter(self, method: Callable) -> Callable:
         @functools.wraps(method)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
@@ -93,6 +117,7 @@ class TenantRedis(redis.Redis):
             "get",
             "set",
             "delete",
+            "expire",
             "exists",
             "incrby",
             "hset",
@@ -109,11 +134,17 @@ class TenantRedis(redis.Redis):
 
         if item == "scan_iter":
             return self._prefix_scan_iter(original_attr)
+        elif item == "mget":
+            return self._prefix_mget(original_attr)
         elif item in methods_to_wrap and callable(original_attr):
             return self._prefix_method(original_attr)
         return original_attr
 
 
+class TenantPipeline(TenantRedis, redis.client.Pipeline):
+    pass
+
+
 class RedisPool:
     _instance: Optional["RedisPool"] = None
     _lock: threading.Lock = threading.Lock()
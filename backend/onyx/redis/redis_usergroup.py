@@ -1,6 +1,5 @@
 import time
 from typing import cast
-from uuid import uuid4
 
 import redis
 from celery import Celery
@@ -8,10 +7,9 @@ from redis import Redis
 from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
-from onyx.configs.constants import OnyxCeleryQueues
-from onyx.configs.constants import OnyxCeleryTask
 from onyx.redis.redis_object_helper import RedisObjectHelper
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 from onyx.utils.variable_functionality import global_version
@@ -58,7 +56,7 @@ class RedisUserGroup(RedisObjectHelper):
     ) -> tuple[int, int] | None:
         last_lock_time = time.monotonic()
 
-        async_results = []
+        num_tasks = 0
 
         if not global_version.is_ee_version():
             return 0, 0
@@ -72,7 +70,9 @@ class RedisUserGroup(RedisObjectHelper):
             return 0, 0
 
         stmt = construct_document_select_by_usergroup(int(self._id))
-        for doc in db_session.scalars(stmt).yield_per(1):
+        num_docs = 0
+        batch: list[str] = []
+        for doc in db_session.scalars(stmt).yield_per(VESPA_SYNC_BATCH_SIZE):
             current_time = time.monotonic()
             if current_time - last_lock_time >= (
                 CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT / 4
@@ -80,26 +80,24 @@ class RedisUserGroup(RedisObjectHelper):
                 lock.reacquire()
                 last_lock_time = current_time
 
-            # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # we prefix the task id so it's easier to keep track of who created the task
-            # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            custom_task_id = f"{self.task_id_prefix}_{uuid4()}"
-
-            # add to the set BEFORE creating the task.
-            redis_client.sadd(self.taskset_key, custom_task_id)
-
-            result = celery_app.send_task(
-                OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
-                kwargs=dict(document_id=doc.id, tenant_id=tenant_id),
-                queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.LOW,
+            num_docs += 1
+            batch.append(doc.id)
+            if len(batch) < VESPA_SYNC_BATCH_SIZE:
+                continue
+
+            self.send_vespa_metadata_sync_batch(
+                celery_app, redis_client, batch, tenant_id, OnyxCeleryPriority.LOW
             )
+            num_tasks += 1
+            batch = []
 
-            async_results.append(result)
+        if batch:
+            self.send_vespa_metadata_sync_batch(
+                celery_app, redis_client, batch, tenant_id, OnyxCeleryPriority.LOW
+            )
+            num_tasks += 1
 
-        return len(async_results), len(async_results)
+        return num_tasks, num_docs
 
     def reset(self) -> None:
         self.redis.delete(self.taskset_key)
@@ -540,7 +540,7 @@ def seed_chat(
             model_name=llm.config.model_name,
             provider_type=llm.config.model_provider,
         )
-        token_count = len(tokenizer.encode(chat_seed_request.message))
+        token_count = tokenizer.count_tokens(chat_seed_request.message)
 
         create_new_chat_message(
             chat_session_id=new_chat_session.id,
@@ -27,7 +27,7 @@ def explicit_tool_calling_supported(model_provider: str, model_name: str) -> boo
 
 
 def compute_tool_tokens(tool: Tool, llm_tokenizer: BaseTokenizer) -> int:
-    return len(llm_tokenizer.encode(json.dumps(tool.tool_definition())))
+    return llm_tokenizer.count_tokens(json.dumps(tool.tool_definition()))
 
 
 def compute_all_tool_tokens(tools: list[Tool], llm_tokenizer: BaseTokenizer) -> int:
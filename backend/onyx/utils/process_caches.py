@@ -0,0 +1,25 @@
+"""Registry of the process wide caches that must not outlive a unit of work, for processes
+that are reused across unrelated work. The warm indexing workers (see
+onyx/background/indexing/job_client.py) run index attempts of different tenants one after
+the other and reset these caches between attempts."""
+from collections.abc import Callable
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_reset_functions: list[Callable[[], None]] = []
+
+
+def register_process_cache(reset: Callable[[], None]) -> None:
+    """Registers the function clearing a process wide cache. Call it at import time, next
+    to the cache."""
+    _reset_functions.append(reset)
+
+
+def reset_process_caches() -> None:
+    for reset in _reset_functions:
+        try:
+            reset()
+        except Exception:
+            logger.exception(f"Failed to reset process cache: {reset}")
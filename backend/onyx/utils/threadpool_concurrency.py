@@ -1,6 +1,12 @@
+import contextvars
+import queue
+import threading
 import uuid
 from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterator
 from concurrent.futures import as_completed
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Generic
@@ -106,3 +112,270 @@ def run_functions_in_parallel(
                     raise
 
     return results
+
+
+def run_in_background(func: Callable[..., R], *args: Any, **kwargs: Any) -> Future[R]:
+    """
+    Starts the function on its own thread and returns a Future for its result, the
+    caller's contextvars (e.g. the current tenant) are copied over to the thread.
+    """
+    ctx = contextvars.copy_context()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(ctx.run, func, *args, **kwargs)
+    finally:
+        # the thread exits once the function returns
+        executor.shutdown(wait=False)
+
+
+_PIPELINE_QUEUE_POLL_INTERVAL = 0.1
+
+
+class PipelineStage:
+    """
+    A single stage of a staged pipeline (see run_staged_pipeline). `func` is applied
+    to every item flowing through the stage by `num_workers` threads, and at most
+    `queue_depth` finished items are buffered for the next stage before the workers
+    block (back-pressure).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        num_workers: int = 1,
+        queue_depth: int = 1,
+    ):
+        if num_workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        if queue_depth < 1:
+            raise ValueError(f"Stage '{name}' needs a queue depth of at least one")
+
+        self.name = name
+        self.func = func
+        self.num_workers = num_workers
+        self.queue_depth = queue_depth
+
+
+class StagedResult(Generic[R]):
+    """Output of run_staged_pipeline for a single input item. If any stage raised
+    for this item, `error` is set and the remaining stages were skipped."""
+
+    def __init__(
+        self,
+        index: int,
+        item: Any,
+        value: R | None = None,
+        error: BaseException | None = None,
+        failed_stage: str | None = None,
+    ):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+        self.failed_stage = failed_stage
+
+
+class _PipelineSourceError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_PIPELINE_SOURCE_DONE = object()
+
+
+def run_staged_pipeline(
+    source: Iterator[Any],
+    stages: list[PipelineStage],
+    source_queue_depth: int = 1,
+) -> Generator[StagedResult, None, None]:
+    """
+    Pushes every item produced by `source` through `stages` in order, with each stage
+    running in its own bounded thread pool so that the stages overlap. The source itself
+    is iterated in a dedicated thread and is only pulled from when there is room in the
+    first queue, so slow downstream stages naturally throttle it.
+
+    Results are yielded in the same order as the source produced them. An exception in a
+    stage is attached to that item's result instead of being raised, since callers
+    usually want per-item error handling. An exception from the source is re-raised once
+    all items before it have been yielded.
+
+    With several workers per stage, items can finish out of order. Finished items wait
+    in a reorder buffer for the ones before them, and the source is not pulled from while
+    that buffer holds more than the queue depth of the last stage.
+
+    Closing the returned generator (or raising out of the consuming loop) stops all
+    threads; items still in flight are dropped. If a pipeline thread dies (e.g. on a
+    BaseException from a stage), a RuntimeError is raised instead of waiting forever.
+    """
+    if not stages:
+        raise ValueError("run_staged_pipeline requires at least one stage")
+
+    stop_event = threading.Event()
+    # queues[i] feeds stages[i], the last queue holds the finished results
+    queues: list[queue.Queue] = [queue.Queue(maxsize=source_queue_depth)] + [
+        queue.Queue(maxsize=stage.queue_depth) for stage in stages
+    ]
+
+    def _put(q: queue.Queue, obj: Any) -> bool:
+        while not stop_event.is_set():
+            try:
+                q.put(obj, timeout=_PIPELINE_QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(q: queue.Queue) -> Any:
+        while not stop_event.is_set():
+            try:
+                return q.get(timeout=_PIPELINE_QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _PIPELINE_SOURCE_DONE
+
+    # results that finished before an earlier item, by index
+    pending: dict[int, StagedResult] = {}
+    pending_changed = threading.Condition()
+    max_pending = stages[-1].queue_depth
+
+    def _wait_for_pending_room() -> bool:
+        with pending_changed:
+            while len(pending) > max_pending:
+                if stop_event.is_set():
+                    return False
+                pending_changed.wait(timeout=_PIPELINE_QUEUE_POLL_INTERVAL)
+        return not stop_event.is_set()
+
+    def _produce() -> None:
+        index = 0
+        try:
+            for item in source:
+                # the earlier items this waits on are already in flight, so it can't deadlock
+                if not _wait_for_pending_room():
+                    return
+                if not _put(
+                    queues[0], StagedResult(index=index, item=item, value=item)
+                ):
+                    return
+                index += 1
+        except BaseException as e:
+            _put(queues[0], _PipelineSourceError(e))
+        _put(queues[0], _PIPELINE_SOURCE_DONE)
+
+    def _work(stage_ind: int, done_counter: list[int], lock: threading.Lock) -> None:
+        stage = stages[stage_ind]
+        in_q = queues[stage_ind]
+        out_q = queues[stage_ind + 1]
+        while True:
+            obj = _get(in_q)
+            if obj is _PIPELINE_SOURCE_DONE:
+                if stop_event.is_set():
+                    return
+                # let sibling workers see the marker too, only the last one forwards it
+                _put(in_q, obj)
+                with lock:
+                    done_counter[0] += 1
+                    is_last_worker = done_counter[0] == stage.num_workers
+                if is_last_worker:
+                    _put(out_q, obj)
+                return
+
+            if isinstance(obj, StagedResult) and obj.error is None:
+                try:
+                    obj.value = stage.func(obj.value)
+                except Exception as e:
+                    logger.exception(
+                        f"Pipeline stage '{stage.name}' failed for item {obj.index}"
+                    )
+                    obj.error = e
+                    obj.failed_stage = stage.name
+                    obj.value = None
+
+            if not _put(out_q, obj):
+                return
+
+    thread_errors: list[BaseException] = []
+
+    def _run_thread(func: Callable[..., None], *args: Any) -> None:
+        try:
+            func(*args)
+        except BaseException as e:
+            logger.exception(f"Pipeline thread {threading.current_thread().name} died")
+            thread_errors.append(e)
+
+    threads: list[threading.Thread] = []
+    # threads do not inherit contextvars (e.g. the current tenant), so copy them over
+    ctx = contextvars.copy_context()
+    threads.append(
+        threading.Thread(
+            target=ctx.copy().run,
+            args=(_run_thread, _produce),
+            name="pipeline-source",
+            daemon=True,
+        )
+    )
+    for stage_ind, stage in enumerate(stages):
+        done_counter = [0]
+        lock = threading.Lock()
+        for worker_ind in range(stage.num_workers):
+            threads.append(
+                threading.Thread(
+                    target=ctx.copy().run,
+                    args=(_run_thread, _work, stage_ind, done_counter, lock),
+                    name=f"pipeline-{stage.name}-{worker_ind}",
+                    daemon=True,
+                )
+            )
+
+    def _get_result() -> Any:
+        while True:
+            try:
+                return out_q.get(timeout=_PIPELINE_QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+            # the end marker may have been put right before the last thread exited
+            threads_alive = any(thread.is_alive() for thread in threads)
+            if thread_errors or not threads_alive:
+                try:
+                    return out_q.get_nowait()
+                except queue.Empty:
+                    raise RuntimeError(
+                        "Pipeline thread died before the pipeline finished"
+                    ) from (thread_errors[0] if thread_errors else None)
+
+    for thread in threads:
+        thread.start()
+
+    out_q = queues[-1]
+    next_index = 0
+    source_error: BaseException | None = None
+    try:
+        while True:
+            obj = _get_result()
+            if obj is _PIPELINE_SOURCE_DONE:
+                break
+            if isinstance(obj, _PipelineSourceError):
+                source_error = obj.error
+                continue
+
+            ready: list[StagedResult] = []
+            with pending_changed:
+                pending[obj.index] = obj
+                while next_index in pending:
+                    ready.append(pending.pop(next_index))
+                    next_index += 1
+                if ready:
+                    pending_changed.notify_all()
+            yield from ready
+
+        for index in sorted(pending):
+            yield pending[index]
+
+        if source_error is not None:
+            raise source_error
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=_PIPELINE_QUEUE_POLL_INTERVAL * 10)
@@ -0,0 +1,139 @@
+"""
+Measures Chunker throughput on a synthetic corpus of documents made of many small sections
+(think Slack exports, Zendesk tickets or spreadsheets), comparing the default chunker against
+the incremental token counting mode. With --processes, also measures how chunking a batch
+scales with the number of chunking processes.
+
+Usage (from the backend directory):
+
+python -m scripts.benchmarks.chunking_benchmark --docs 20 --sections 2000
+python -m scripts.benchmarks.chunking_benchmark --docs 64 --sections 500 --processes 1,2,4,8
+
+Uses the tokenizer of the default document encoder model unless --model is passed.
+"""
+import argparse
+import os
+import random
+import time
+
+from onyx.configs.constants import DocumentSource
+from onyx.configs.model_configs import DOCUMENT_ENCODER_MODEL
+from onyx.connectors.models import Document
+from onyx.connectors.models import Section
+from onyx.indexing.chunker import Chunker
+from onyx.natural_language_processing.utils import get_tokenizer
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog customer ticket reply escalated "
+    "deploy release rollback database index query latency error fixed thanks"
+).split()
+
+
+def _random_sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    num_words = rng.randint(min_words, max_words)
+    return " ".join(rng.choice(_WORDS) for _ in range(num_words)).capitalize() + "."
+
+
+def build_corpus(num_docs: int, sections_per_doc: int, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    docs = []
+    for doc_ind in range(num_docs):
+        sections = [
+            Section(
+                text=_random_sentence(rng, 3, 40),
+                link=f"https://example.com/doc/{doc_ind}#{section_ind}",
+            )
+            for section_ind in range(sections_per_doc)
+        ]
+        docs.append(
+            Document(
+                id=f"benchmark_doc_{doc_ind}",
+                source=DocumentSource.SLACK,
+                semantic_identifier=f"Benchmark Document {doc_ind}",
+                metadata={"channel": "benchmark", "tags": ["a", "b"]},
+                doc_updated_at=None,
+                sections=sections,
+            )
+        )
+    return docs
+
+
+def run_benchmark(
+    docs: list[Document],
+    chunker: Chunker,
+    iterations: int,
+) -> tuple[float, int]:
+    """Returns the best wall clock time over the iterations and the number of chunks"""
+    best = float("inf")
+    num_chunks = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        chunks = chunker.chunk(docs)
+        best = min(best, time.perf_counter() - start)
+        num_chunks = len(chunks)
+    return best, num_chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunker throughput benchmark")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--sections", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--multipass", action="store_true")
+    parser.add_argument("--model", type=str, default=DOCUMENT_ENCODER_MODEL)
+    parser.add_argument(
+        "--processes",
+        type=str,
+        default=None,
+        help="Comma separated numbers of chunking processes to compare, e.g. 1,2,4,8",
+    )
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer(model_name=args.model, provider_type=None)
+    corpus = build_corpus(args.docs, args.sections)
+    total_sections = args.docs * args.sections
+
+    print(
+        f"Corpus: {args.docs} docs x {args.sections} sections, multipass={args.multipass}"
+    )
+    baseline_time = None
+    for incremental in (False, True):
+        chunker = Chunker(
+            tokenizer=tokenizer,
+            enable_multipass=args.multipass,
+            incremental_token_counting=incremental,
+        )
+        elapsed, num_chunks = run_benchmark(corpus, chunker, args.iterations)
+        if baseline_time is None:
+            baseline_time = elapsed
+
+        mode = "incremental" if incremental else "default"
+        print(
+            f"{mode:>12}: {elapsed:.3f}s  "
+            f"{total_sections / elapsed:,.0f} sections/s  "
+            f"{args.docs / elapsed:,.1f} docs/s  "
+            f"chunks={num_chunks}  "
+            f"speedup={baseline_time / elapsed:.2f}x"
+        )
+
+    if args.processes:
+        print(f"Scaling with chunking processes ({os.cpu_count()} cores available)")
+        single_process_time = None
+        for num_processes in [int(n) for n in args.processes.split(",")]:
+            chunker = Chunker(
+                tokenizer=tokenizer,
+                enable_multipass=args.multipass,
+                num_processes=num_processes,
+            )
+            # start the processes and load their tokenizers outside of the measurement
+            chunker.chunk(corpus[: num_processes * 2])
+            elapsed, num_chunks = run_benchmark(corpus, chunker, args.iterations)
+            if single_process_time is None:
+                single_process_time = elapsed
+
+            print(
+                f"{num_processes:>3} processes: {elapsed:.3f}s  "
+                f"{args.docs / elapsed:,.1f} docs/s  "
+                f"chunks={num_chunks}  "
+                f"speedup={single_process_time / elapsed:.2f}x"
+            )
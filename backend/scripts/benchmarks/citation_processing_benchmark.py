@@ -0,0 +1,108 @@
+"""
+Measures the cost per streamed token of CitationProcessor on long synthetic answers that mix
+prose, citations and code blocks. The time per token should stay flat as the answers get
+longer.
+
+Usage (from the backend directory):
+
+python -m scripts.benchmarks.citation_processing_benchmark
+python -m scripts.benchmarks.citation_processing_benchmark --tokens 2000,8000,32000 --runs 5
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from onyx.chat.models import LlmDoc
+from onyx.chat.stream_processing.citation_processing import CitationProcessor
+from onyx.chat.stream_processing.utils import DocumentIdOrderMapping
+from onyx.configs.constants import DocumentSource
+
+_WORDS = (
+    "the deploy failed because the index was rebuilt while the query latency "
+    "spiked so we rolled back the release and fixed the config"
+).split()
+_CODE_LINES = [
+    "def handler(event):",
+    "    items = event['items']",
+    "    return [item for item in items if item]",
+    "print(handler({'items': [1, 2, 3]}))",
+]
+_NUM_DOCS = 10
+
+
+def _build_docs() -> tuple[list[LlmDoc], dict[str, int]]:
+    docs = [
+        LlmDoc(
+            document_id=f"doc_{ind}",
+            content="Document content",
+            blurb=f"Document #{ind}",
+            semantic_identifier=f"Doc {ind}",
+            source_type=DocumentSource.WEB,
+            metadata={},
+            updated_at=datetime.now(),
+            link=f"https://example.com/{ind}" if ind % 2 == 0 else None,
+            source_links=None,
+            match_highlights=[],
+        )
+        for ind in range(_NUM_DOCS)
+    ]
+    return docs, {doc.document_id: ind + 1 for ind, doc in enumerate(docs)}
+
+
+def build_answer_tokens(num_tokens: int, seed: int = 0) -> list[str]:
+    """Tokens roughly the size of LLM tokens: words, citations split over several tokens
+    and code blocks with and without a language tag."""
+    rng = random.Random(seed)
+    tokens: list[str] = []
+    while len(tokens) < num_tokens:
+        roll = rng.random()
+        if roll < 0.05:
+            tokens.extend(["\n```", rng.choice(["python", ""]), "\n"])
+            for line in rng.sample(_CODE_LINES, 3):
+                tokens.extend(word + " " for word in line.split(" "))
+                tokens.append("\n")
+            tokens.extend(["```", "\n"])
+        elif roll < 0.15:
+            tokens.extend([" [", str(rng.randint(1, _NUM_DOCS)), "]"])
+        else:
+            tokens.append(" " + rng.choice(_WORDS))
+    return tokens[:num_tokens]
+
+
+def _process(tokens: list[str], docs: list[LlmDoc], order: dict[str, int]) -> None:
+    processor = CitationProcessor(
+        context_docs=docs,
+        doc_id_to_rank_map=DocumentIdOrderMapping(order_mapping=order),
+        display_doc_order_dict=order,
+        stop_stream=None,
+    )
+    for token in tokens:
+        for _ in processor.process_token(token):
+            pass
+    for _ in processor.process_token(None):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=str, default="1000,4000,16000")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    docs, order = _build_docs()
+    print(f"{'tokens':>8}{'total ms':>12}{'us/token':>12}")
+    for num_tokens in [int(value) for value in args.tokens.split(",")]:
+        tokens = build_answer_tokens(num_tokens)
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            _process(tokens, docs, order)
+            timings.append(time.perf_counter() - start)
+        total = statistics.median(timings)
+        print(f"{num_tokens:>8}{total * 1000:>12.1f}{total / num_tokens * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Measures the latency of retrieving search results together with their surrounding context
+against the running Vespa index and model server, comparing the serial flow (hybrid search,
+then fetching the chunks referenced by large chunks, then fetching the surrounding chunks)
+against batched context expansion (ENABLE_BATCHED_CONTEXT_EXPANSION) where the last two
+fetches are made in one batched request.
+
+Three context modes are measured:
+- none: no surrounding chunks, only the chunks referenced by large chunks are fetched
+- neighbours: --chunks-above / --chunks-below surrounding chunks of every hit
+- full_doc: the whole documents of the hits
+
+Usage (from the backend directory):
+
+python -m scripts.benchmarks.context_expansion_benchmark --queries "reset my password" "vpn setup"
+python -m scripts.benchmarks.context_expansion_benchmark --queries-file queries.txt --runs 5
+
+The first run over the queries is a warmup (query embeddings, Vespa caches) and is not
+measured. Runs without access control filtering, so only point it at test data.
+"""
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+from typing import cast
+
+from onyx.configs.chat_configs import HYBRID_ALPHA
+from onyx.configs.chat_configs import NUM_RETURNED_HITS
+from onyx.context.search import pipeline as pipeline_module
+from onyx.context.search.enums import LLMEvaluationType
+from onyx.context.search.enums import SearchType
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import SearchQuery
+from onyx.context.search.models import SearchRequest
+from onyx.context.search.pipeline import SearchPipeline
+from onyx.db.engine import get_session_context_manager
+from onyx.db.engine import SqlEngine
+from onyx.document_index.interfaces import DocumentIndex
+from onyx.llm.interfaces import LLM
+
+_CONTEXT_MODES = ["none", "neighbours", "full_doc"]
+
+
+class _RequestCounter:
+    """Counts the requests made to the document index by wrapping its retrieval methods."""
+
+    def __init__(self, document_index: DocumentIndex) -> None:
+        self.num_requests = 0
+        for method_name in ["hybrid_retrieval", "id_based_retrieval"]:
+            setattr(
+                document_index,
+                method_name,
+                self._counted(getattr(document_index, method_name)),
+            )
+
+    def _counted(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            self.num_requests += 1
+            return func(*args, **kwargs)
+
+        return wrapped
+
+
+def _build_search_query(
+    query: str, context_mode: str, chunks_above: int, chunks_below: int
+) -> SearchQuery:
+    return SearchQuery(
+        query=query,
+        processed_keywords=query.split(),
+        search_type=SearchType.SEMANTIC,
+        evaluation_type=LLMEvaluationType.SKIP,
+        filters=IndexFilters(access_control_list=None),
+        chunks_above=chunks_above if context_mode == "neighbours" else 0,
+        chunks_below=chunks_below if context_mode == "neighbours" else 0,
+        full_doc=context_mode == "full_doc",
+        rerank_settings=None,
+        hybrid_alpha=HYBRID_ALPHA,
+        recency_bias_multiplier=1.0,
+        max_llm_filter_sections=0,
+        num_hits=NUM_RETURNED_HITS,
+    )
+
+
+def _run_query(
+    query: str,
+    context_mode: str,
+    batched: bool,
+    chunks_above: int,
+    chunks_below: int,
+) -> tuple[float, int]:
+    """Returns the latency of retrieval + section expansion and the number of requests
+    made to the document index."""
+    pipeline_module.ENABLE_BATCHED_CONTEXT_EXPANSION = batched
+    with get_session_context_manager() as db_session:
+        search_pipeline = SearchPipeline(
+            search_request=SearchRequest(query=query),
+            user=None,
+            # preprocessing is skipped, the LLMs are never used
+            llm=cast(LLM, None),
+            fast_llm=cast(LLM, None),
+            db_session=db_session,
+        )
+        search_pipeline._search_query = _build_search_query(
+            query, context_mode, chunks_above, chunks_below
+        )
+        counter = _RequestCounter(search_pipeline.document_index)
+
+        start = time.monotonic()
+        search_pipeline._get_sections()
+        return time.monotonic() - start, counter.num_requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", nargs="*", default=[])
+    parser.add_argument("--queries-file", type=str, default=None)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--chunks-above", type=int, default=1)
+    parser.add_argument("--chunks-below", type=int, default=1)
+    args = parser.parse_args()
+
+    queries = list(args.queries)
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    if not queries:
+        parser.error("Pass at least one query with --queries or --queries-file")
+
+    SqlEngine.init_engine(pool_size=5, max_overflow=0)
+
+    for query in queries:
+        _run_query(query, "none", False, args.chunks_above, args.chunks_below)
+
+    print(
+        f"{'mode':<12}{'flow':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'requests':>10}"
+    )
+    for context_mode in _CONTEXT_MODES:
+        for batched in [False, True]:
+            latencies: list[float] = []
+            num_requests: list[int] = []
+            for _ in range(args.runs):
+                for query in queries:
+                    latency, requests = _run_query(
+                        query,
+                        context_mode,
+                        batched,
+                        args.chunks_above,
+                        args.chunks_below,
+                    )
+                    latencies.append(latency * 1000)
+                    num_requests.append(requests)
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{context_mode:<12}{'batched' if batched else 'serial':<10}"
+                f"{statistics.mean(latencies):>10.1f}"
+                f"{statistics.median(latencies):>10.1f}{p95:>10.1f}"
+                f"{statistics.mean(num_requests):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Compares the full precision and the int8 quantized (INT8_QUANTIZED_MODELS) CPU inference of
+the local model server models: latency per call, and how closely the quantized model matches
+the full precision one.
+
+- embedding model: cosine similarity between the fp32 and int8 embeddings, and the overlap of
+  the top 10 passages retrieved for each query
+- reranking model: Spearman correlation of the scores and the overlap of the top 10 passages
+- intent model: agreement of the keyword/semantic prediction and of the keyword tokens
+
+Usage (from the backend directory):
+
+python -m scripts.benchmarks.quantization_benchmark --embedding-model intfloat/e5-base-v2
+python -m scripts.benchmarks.quantization_benchmark \
+    --rerank-model mixedbread-ai/mxbai-rerank-xsmall-v1 --intent --passages-file docs.txt
+
+Passages default to a synthetic corpus, pass --passages-file (one passage per line) and
+--queries-file for numbers representative of real data. Run with INT8_QUANTIZED_MODELS unset
+so that the full precision intent model is loaded.
+"""
+import argparse
+import copy
+import random
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder  # type: ignore
+from sentence_transformers import SentenceTransformer  # type: ignore
+
+from model_server.custom_models import get_intent_model_tokenizer
+from model_server.custom_models import get_local_intent_model
+from model_server.quantization import quantize_dynamic_int8
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog customer ticket reply escalated "
+    "deploy release rollback database index query latency error fixed thanks "
+    "password reset vpn access onboarding invoice refund policy holiday laptop"
+).split()
+_TOP_K = 10
+
+
+def _random_text(rng: random.Random, min_words: int, max_words: int) -> str:
+    num_words = rng.randint(min_words, max_words)
+    return " ".join(rng.choice(_WORDS) for _ in range(num_words))
+
+
+def _read_lines(path: str) -> list[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _time_calls(func: Callable[[], Any], runs: int) -> tuple[Any, float]:
+    """Returns the result of the last call and the median latency in ms."""
+    result = func()  # warmup
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(latencies)
+
+
+def _top_k_overlap(scores_a: np.ndarray, scores_b: np.ndarray, k: int) -> float:
+    top_a = set(np.argsort(-scores_a)[:k])
+    top_b = set(np.argsort(-scores_b)[:k])
+    return len(top_a & top_b) / min(k, len(scores_a))
+
+
+def _spearman(scores_a: np.ndarray, scores_b: np.ndarray) -> float:
+    ranks_a = np.argsort(np.argsort(scores_a))
+    ranks_b = np.argsort(np.argsort(scores_b))
+    return float(np.corrcoef(ranks_a, ranks_b)[0, 1])
+
+
+def _print_row(name: str, fp32_ms: float, int8_ms: float, accuracy: str) -> None:
+    print(
+        f"{name:<12}{fp32_ms:>12.1f}{int8_ms:>12.1f}{fp32_ms / int8_ms:>10.2f}x  "
+        f"{accuracy}"
+    )
+
+
+def benchmark_embedding_model(
+    model_name: str, queries: list[str], passages: list[str], runs: int
+) -> None:
+    model = SentenceTransformer(model_name, trust_remote_code=True, device="cpu")
+    quantized = quantize_dynamic_int8(copy.deepcopy(model))
+
+    def _encode(encoder: SentenceTransformer, texts: list[str]) -> np.ndarray:
+        return encoder.encode(texts, normalize_embeddings=True)
+
+    fp32_passages, fp32_ms = _time_calls(lambda: _encode(model, passages), runs)
+    int8_passages, int8_ms = _time_calls(lambda: _encode(quantized, passages), runs)
+    fp32_queries = _encode(model, queries)
+    int8_queries = _encode(quantized, queries)
+
+    cosine = float(np.mean(np.sum(fp32_passages * int8_passages, axis=1)))
+    overlaps = [
+        _top_k_overlap(fp32_passages @ fp32_query, int8_passages @ int8_query, _TOP_K)
+        for fp32_query, int8_query in zip(fp32_queries, int8_queries)
+    ]
+    _print_row(
+        "embedding",
+        fp32_ms,
+        int8_ms,
+        f"cosine={cosine:.4f} top{_TOP_K}_overlap={statistics.mean(overlaps):.3f}",
+    )
+
+
+def benchmark_rerank_model(
+    model_name: str, queries: list[str], passages: list[str], runs: int
+) -> None:
+    model = CrossEncoder(model_name, device="cpu")
+    quantized = copy.deepcopy(model)
+    quantized.model = quantize_dynamic_int8(quantized.model)
+
+    def _predict(encoder: CrossEncoder, query: str) -> np.ndarray:
+        return encoder.predict([(query, passage) for passage in passages])
+
+    fp32_ms_all, int8_ms_all, correlations, overlaps = [], [], [], []
+    for query in queries:
+        fp32_scores, fp32_ms = _time_calls(lambda: _predict(model, query), runs)
+        int8_scores, int8_ms = _time_calls(lambda: _predict(quantized, query), runs)
+        fp32_ms_all.append(fp32_ms)
+        int8_ms_all.append(int8_ms)
+        correlations.append(_spearman(fp32_scores, int8_scores))
+        overlaps.append(_top_k_overlap(fp32_scores, int8_scores, _TOP_K))
+
+    _print_row(
+        "rerank",
+        statistics.mean(fp32_ms_all),
+        statistics.mean(int8_ms_all),
+        f"spearman={statistics.mean(correlations):.4f} "
+        f"top{_TOP_K}_overlap={statistics.mean(overlaps):.3f}",
+    )
+
+
+def benchmark_intent_model(queries: list[str], runs: int) -> None:
+    tokenizer = get_intent_model_tokenizer()
+    model = get_local_intent_model()
+    quantized = quantize_dynamic_int8(copy.deepcopy(model))
+
+    def _predict(classifier: torch.nn.Module, query: str) -> tuple[int, list[bool]]:
+        tokens = tokenizer(query, return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            outputs = classifier(
+                query_ids=tokens["input_ids"], query_mask=tokens["attention_mask"]
+            )
+        is_keyword = outputs["token_logits"][0].argmax(dim=-1).tolist()
+        return int(outputs["intent_logits"][0].argmax()), is_keyword
+
+    fp32_ms_all, int8_ms_all = [], []
+    intent_agreement, token_agreement = [], []
+    for query in queries:
+        fp32_pred, fp32_ms = _time_calls(lambda: _predict(model, query), runs)
+        int8_pred, int8_ms = _time_calls(lambda: _predict(quantized, query), runs)
+        fp32_ms_all.append(fp32_ms)
+        int8_ms_all.append(int8_ms)
+        intent_agreement.append(fp32_pred[0] == int8_pred[0])
+        token_agreement.append(
+            statistics.mean(a == b for a, b in zip(fp32_pred[1], int8_pred[1]))
+        )
+
+    _print_row(
+        "intent",
+        statistics.mean(fp32_ms_all),
+        statistics.mean(int8_ms_all),
+        f"intent_agreement={statistics.mean(intent_agreement):.3f} "
+        f"token_agreement={statistics.mean(token_agreement):.3f}",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embedding-model", type=str, default=None)
+    parser.add_argument("--rerank-model", type=str, default=None)
+    parser.add_argument("--intent", action="store_true")
+    parser.add_argument("--passages-file", type=str, default=None)
+    parser.add_argument("--queries-file", type=str, default=None)
+    parser.add_argument("--num-passages", type=int, default=64)
+    parser.add_argument("--num-queries", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if not (args.embedding_model or args.rerank_model or args.intent):
+        parser.error("Pass at least one of --embedding-model, --rerank-model, --intent")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rng = random.Random(0)
+    passages = (
+        _read_lines(args.passages_file)
+        if args.passages_file
+        else [_random_text(rng, 20, 200) for _ in range(args.num_passages)]
+    )
+    queries = (
+        _read_lines(args.queries_file)
+        if args.queries_file
+        else [_random_text(rng, 3, 12) for _ in range(args.num_queries)]
+    )
+
+    print(f"{'model':<12}{'fp32 ms':>12}{'int8 ms':>12}{'speedup':>11}  accuracy")
+    if args.embedding_model:
+        benchmark_embedding_model(args.embedding_model, queries, passages, args.runs)
+    if args.rerank_model:
+        benchmark_rerank_model(args.rerank_model, queries, passages, args.runs)
+    if args.intent:
+        benchmark_intent_model(queries, args.runs)
+
+
+if __name__ == "__main__":
+    main()
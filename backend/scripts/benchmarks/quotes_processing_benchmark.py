@@ -0,0 +1,120 @@
+"""
+Measures QuotesProcessor on long synthetic json answers: the cost per streamed token, the
+latency from the end of the stream to the last quotes (time to final quotes) and how long
+after the stream started each quote was yielded.
+
+Usage (from the backend directory):
+
+python -m scripts.benchmarks.quotes_processing_benchmark
+python -m scripts.benchmarks.quotes_processing_benchmark --answer-words 500,4000 --docs 50
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from onyx.chat.models import LlmDoc
+from onyx.chat.stream_processing.quotes_processing import OnyxQuotes
+from onyx.chat.stream_processing.quotes_processing import QuotesProcessor
+from onyx.configs.constants import DocumentSource
+
+_WORDS = (
+    "the deploy failed because the index was rebuilt while the query latency "
+    "spiked so we rolled back the release and fixed the config"
+).split()
+_NUM_QUOTES = 5
+
+
+def _random_text(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(num_words))
+
+
+def _build_docs(rng: random.Random, num_docs: int, doc_words: int) -> list[LlmDoc]:
+    return [
+        LlmDoc(
+            document_id=f"doc_{ind}",
+            content=_random_text(rng, doc_words),
+            blurb=f"Document #{ind}",
+            semantic_identifier=f"Doc {ind}",
+            source_type=DocumentSource.WEB,
+            metadata={},
+            updated_at=None,
+            link=None,
+            source_links={0: f"https://example.com/{ind}"},
+            match_highlights=[],
+        )
+        for ind in range(num_docs)
+    ]
+
+
+def build_answer_tokens(
+    rng: random.Random, docs: list[LlmDoc], answer_words: int
+) -> list[str]:
+    """A json answer followed by quotes taken from the last docs, split in tokens of
+    roughly the size of LLM tokens."""
+    quotes = [
+        " ".join(doc.content.split()[:12]) for doc in docs[-_NUM_QUOTES:]
+    ]  # the last docs so that matching has to go through all of them
+    model_output = json.dumps(
+        {"answer": _random_text(rng, answer_words), "quotes": quotes}, indent=2
+    )
+    tokens = []
+    pos = 0
+    while pos < len(model_output):
+        size = rng.randint(2, 6)
+        tokens.append(model_output[pos : pos + size])
+        pos += size
+    return tokens
+
+
+def _process(tokens: list[str], docs: list[LlmDoc]) -> tuple[float, float, list[float]]:
+    """Returns the total time, the time to process the end of the stream and the time
+    at which each quote was yielded."""
+    start = time.perf_counter()
+    quote_times: list[float] = []
+    processor = QuotesProcessor(context_docs=docs)
+    for token in tokens:
+        for output in processor.process_token(token):
+            if isinstance(output, OnyxQuotes):
+                quote_times.append(time.perf_counter() - start)
+
+    stream_end = time.perf_counter()
+    for output in processor.process_token(None):
+        if isinstance(output, OnyxQuotes) and output.quotes:
+            quote_times.append(time.perf_counter() - start)
+    end = time.perf_counter()
+    return end - start, end - stream_end, quote_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answer-words", type=str, default="200,1000,5000")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--doc-words", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    docs = _build_docs(rng, args.docs, args.doc_words)
+    print(
+        f"{'words':>8}{'tokens':>8}{'total ms':>12}{'us/token':>12}"
+        f"{'final ms':>12}{'first quote ms':>16}"
+    )
+    for answer_words in [int(value) for value in args.answer_words.split(",")]:
+        tokens = build_answer_tokens(rng, docs, answer_words)
+        results = [_process(tokens, docs) for _ in range(args.runs)]
+        total = statistics.median(result[0] for result in results)
+        final = statistics.median(result[1] for result in results)
+        first_quote = statistics.median(
+            result[2][0] if result[2] else float("nan") for result in results
+        )
+        print(
+            f"{answer_words:>8}{len(tokens):>8}{total * 1000:>12.2f}"
+            f"{total / len(tokens) * 1e6:>12.2f}{final * 1000:>12.3f}"
+            f"{first_quote * 1000:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -54,6 +54,28 @@ MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
 # or intent classification
 INDEXING_ONLY = os.environ.get("INDEXING_ONLY", "").lower() == "true"
 
+# Coalesces concurrent embedding requests for the same local model into shared forward passes.
+# Waits at most EMBEDDING_BATCH_MAX_WAIT_MS for other requests to join a batch of up to
+# EMBEDDING_BATCH_MAX_SIZE texts. Query texts are always scheduled ahead of passage texts.
+ENABLE_EMBEDDING_BATCHING = (
+    os.environ.get("ENABLE_EMBEDDING_BATCHING", "").lower() == "true"
+)
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE") or 64)
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS") or 5)
+
+# Comma separated names of the local models (embedding, reranking or intent model) to run with
+# dynamic int8 quantization of their linear layers on CPU. Lowers the CPU time per request at a
+# small accuracy cost, compare a model with scripts/benchmarks/quantization_benchmark.py first
+INT8_QUANTIZED_MODELS = [
+    model_name.strip()
+    for model_name in (os.environ.get("INT8_QUANTIZED_MODELS") or "").split(",")
+    if model_name.strip()
+]
+
+# Number of (query, passage) pairs per cross-encoder forward pass. The pairs of a request are
+# sorted by length first so that each forward pass only pads to similar lengths
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE") or 32)
+
 # The process needs to have this for the log file to write to
 # otherwise, it will not create additional log files
 LOG_FILE_NAME = os.environ.get("LOG_FILE_NAME") or "onyx"
@@ -0,0 +1,106 @@
+import multiprocessing
+import time
+from pathlib import Path
+
+import psutil
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import Section
+from onyx.indexing.chunker import Chunker
+from onyx.indexing.chunker import shutdown_chunking_processes
+from onyx.natural_language_processing.utils import BaseTokenizer
+from onyx.natural_language_processing.utils import get_tokenizer
+
+
+@pytest.fixture
+def tokenizer() -> BaseTokenizer:
+    return get_tokenizer(model_name="intfloat/e5-base-v2", provider_type=None)
+
+
+def test_chunking_processes_preserve_order(tokenizer: BaseTokenizer) -> None:
+    documents = [
+        Document(
+            id=f"test_doc_{doc_ind}",
+            source=DocumentSource.WEB,
+            semantic_identifier=f"Test Document {doc_ind}",
+            metadata={},
+            doc_updated_at=None,
+            sections=[
+                Section(text=f"Section {i} of document {doc_ind}. " * 20, link=f"l{i}")
+                for i in range(doc_ind * 5 + 1)
+            ],
+        )
+        for doc_ind in range(4)
+    ]
+
+    sequential_chunks = Chunker(tokenizer=tokenizer, num_processes=1).chunk(documents)
+    try:
+        parallel_chunks = Chunker(tokenizer=tokenizer, num_processes=2).chunk(
+            documents
+        )
+    finally:
+        shutdown_chunking_processes()
+
+    assert parallel_chunks == sequential_chunks
+
+
+def test_chunking_processes_are_shut_down(tokenizer: BaseTokenizer) -> None:
+    chunker = Chunker(tokenizer=tokenizer, num_processes=2)
+    process_pool = chunker._get_process_pool()
+    process_pool.submit(int).result()
+    processes = list(process_pool._processes.values())
+    assert processes and all(process.is_alive() for process in processes)
+
+    shutdown_chunking_processes()
+
+    for process in processes:
+        process.join(timeout=10)
+        assert not process.is_alive()
+
+
+def _start_chunking_processes(pid_file: str) -> None:
+    chunker = Chunker(
+        tokenizer=get_tokenizer(model_name="intfloat/e5-base-v2", provider_type=None),
+        num_processes=2,
+    )
+    process_pool = chunker._get_process_pool()
+    process_pool.submit(int).result()
+    pids = list(process_pool._processes)
+    # written in one go, the test polls for the file
+    tmp_file = Path(f"{pid_file}.tmp")
+    tmp_file.write_text(" ".join(str(pid) for pid in pids))
+    tmp_file.rename(pid_file)
+    # keep the pool alive until the test terminates this process
+    time.sleep(60)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def test_chunking_processes_exit_with_a_terminated_parent(tmp_path: Path) -> None:
+    pid_file = tmp_path / "pids"
+    # stands in for an indexing job process, terminated when the attempt is stopped
+    parent = multiprocessing.get_context("spawn").Process(
+        target=_start_chunking_processes, args=(str(pid_file),)
+    )
+    parent.start()
+    deadline = time.monotonic() + 60
+    while not pid_file.exists():
+        assert time.monotonic() < deadline and parent.is_alive()
+        time.sleep(0.1)
+    pids = [int(pid) for pid in pid_file.read_text().split()]
+    assert pids
+
+    parent.terminate()
+    parent.join()
+
+    deadline = time.monotonic() + 10
+    while any(_is_running(pid) for pid in pids):
+        assert time.monotonic() < deadline, "chunking processes outlived their parent"
+        time.sleep(0.1)
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from model_server.batching import EmbeddingBatcher
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+
+class _RecordingEncoder:
+    def __init__(self, block_first_batch: bool = False) -> None:
+        self.batches: list[list[str]] = []
+        self.release_first_batch = threading.Event()
+        if not block_first_batch:
+            self.release_first_batch.set()
+
+    def __call__(self, texts: list[str]) -> list[Embedding]:
+        self.batches.append(texts)
+        if len(self.batches) == 1:
+            self.release_first_batch.wait(timeout=5)
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_batch() -> None:
+    encoder = _RecordingEncoder()
+    batcher = EmbeddingBatcher(encode=encoder, max_batch_size=16, max_wait_seconds=0.05)
+
+    results = await asyncio.gather(
+        batcher.embed(["a", "bb"], EmbedTextType.PASSAGE),
+        batcher.embed(["ccc"], EmbedTextType.QUERY),
+        batcher.embed(["dddd"], EmbedTextType.PASSAGE),
+    )
+
+    assert results == [[[1.0], [2.0]], [[3.0]], [[4.0]]]
+    assert len(encoder.batches) == 1
+    # queries are scheduled ahead of passages
+    assert encoder.batches[0] == ["ccc", "a", "bb", "dddd"]
+
+
+@pytest.mark.asyncio
+async def test_queries_jump_ahead_of_queued_passages() -> None:
+    encoder = _RecordingEncoder(block_first_batch=True)
+    batcher = EmbeddingBatcher(encode=encoder, max_batch_size=2, max_wait_seconds=0)
+
+    passages = asyncio.create_task(
+        batcher.embed(["p1", "p2", "p3", "p4", "p5", "p6"], EmbedTextType.PASSAGE)
+    )
+    # wait for the first passage batch to be running
+    while not encoder.batches:
+        await asyncio.sleep(0.001)
+
+    query = asyncio.create_task(batcher.embed(["query"], EmbedTextType.QUERY))
+    await asyncio.sleep(0.01)
+    encoder.release_first_batch.set()
+
+    assert await query == [[5.0]]
+    assert len(await passages) == 6
+    assert encoder.batches[0] == ["p1", "p2"]
+    assert encoder.batches[1] == ["query", "p3"]
+
+
+@pytest.mark.asyncio
+async def test_encode_error_fails_only_the_batch() -> None:
+    def _encode(texts: list[str]) -> list[Embedding]:
+        if "bad" in texts:
+            raise ValueError("encode failed")
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(encode=_encode, max_batch_size=8, max_wait_seconds=0)
+
+    with pytest.raises(ValueError, match="encode failed"):
+        await batcher.embed(["bad"], EmbedTextType.PASSAGE)
+
+    assert await batcher.embed(["good"], EmbedTextType.PASSAGE) == [[1.0]]
@@ -7,6 +7,7 @@ from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 from httpx import AsyncClient
 from litellm.exceptions import RateLimitError
@@ -124,9 +125,7 @@ async def test_embed_text_local_model() -> None:
 async def test_local_rerank() -> None:
     with patch("model_server.encoders.get_local_reranking_model") as mock_get_model:
         mock_model = MagicMock()
-        mock_array = MagicMock()
-        mock_array.tolist.return_value = [0.8, 0.6]
-        mock_model.predict.return_value = mock_array
+        mock_model.predict.return_value = np.array([0.8, 0.6])
         mock_get_model.return_value = mock_model
 
         result = await local_rerank(
@@ -137,6 +136,30 @@ async def test_local_rerank() -> None:
         mock_model.predict.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_local_rerank_sorts_pairs_by_length() -> None:
+    with patch("model_server.encoders.get_local_reranking_model") as mock_get_model:
+        mock_model = MagicMock()
+        # scores of the length sorted pairs
+        mock_model.predict.return_value = np.array([0.1, 0.2, 0.3])
+        mock_get_model.return_value = mock_model
+
+        result = await local_rerank(
+            query="q",
+            docs=["a much longer document", "short", "medium doc"],
+            model_name="fake-rerank-model",
+        )
+
+        pairs = mock_model.predict.call_args.args[0]
+        assert pairs == [
+            ("q", "short"),
+            ("q", "medium doc"),
+            ("q", "a much longer document"),
+        ]
+        # the scores are returned in the order of the docs
+        assert result == [0.3, 0.1, 0.2]
+
+
 @pytest.mark.asyncio
 async def test_rate_limit_handling() -> None:
     with patch("model_server.encoders.CloudEmbedding.embed") as mock_embed:
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import torch
+
+from model_server import encoders
+from model_server.quantization import quantize_dynamic_int8
+
+
+def test_quantize_dynamic_int8_replaces_linear_layers() -> None:
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(
+        torch.nn.Linear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 4)
+    )
+    inputs = torch.randn(8, 16)
+    expected = model(inputs)
+
+    quantized = quantize_dynamic_int8(model)
+
+    assert not any(isinstance(module, torch.nn.Linear) for module in quantized)
+    assert torch.allclose(quantized(inputs), expected, atol=0.05)
+
+
+def test_reranking_model_quantized_when_selected() -> None:
+    cross_encoder = MagicMock()
+    with patch.object(encoders, "_RERANK_MODEL", None), patch.object(
+        encoders, "CrossEncoder", return_value=cross_encoder
+    ), patch.object(
+        encoders, "use_int8_quantization", lambda model_name: True
+    ), patch.object(
+        encoders, "quantize_dynamic_int8", return_value="quantized"
+    ) as quantize:
+        model = encoders.get_local_reranking_model("fake-rerank-model")
+
+    quantize.assert_called_once()
+    assert model.model == "quantized"
+
+
+def test_reranking_model_not_quantized_by_default() -> None:
+    with patch.object(encoders, "_RERANK_MODEL", None), patch.object(
+        encoders, "CrossEncoder", return_value=MagicMock()
+    ), patch.object(encoders, "quantize_dynamic_int8") as quantize:
+        encoders.get_local_reranking_model("fake-rerank-model")
+
+    quantize.assert_not_called()
@@ -0,0 +1,45 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from onyx.access import access
+from onyx.access import user_acl_cache
+from onyx.access.access import get_acl_for_user
+from onyx.access.user_acl_cache import invalidate_user_acl_cache
+from tests.unit.onyx.conftest import FakeRedis
+
+
+@pytest.fixture
+def acl_fn(fake_redis: FakeRedis) -> Generator[Mock, None, None]:
+    def _get_redis_client(**kwargs: Any) -> FakeRedis:
+        return fake_redis
+
+    acl_fn = Mock(return_value={"user_email:a@b.com", "group:eng"})
+    with patch.object(access, "USER_ACL_CACHE_TTL", 60), patch.object(
+        user_acl_cache, "USER_ACL_CACHE_TTL", 60
+    ), patch.object(user_acl_cache, "get_redis_client", _get_redis_client), patch(
+        "onyx.access.access.fetch_versioned_implementation", return_value=acl_fn
+    ):
+        yield acl_fn
+
+
+def test_acl_is_cached_until_invalidated(acl_fn: Mock) -> None:
+    user = Mock(id=uuid4())
+
+    assert get_acl_for_user(user) == {"user_email:a@b.com", "group:eng"}
+    assert get_acl_for_user(user) == {"user_email:a@b.com", "group:eng"}
+    assert acl_fn.call_count == 1
+
+    acl_fn.return_value = {"user_email:a@b.com"}
+    invalidate_user_acl_cache()
+    assert get_acl_for_user(user) == {"user_email:a@b.com"}
+    assert acl_fn.call_count == 2
+
+    # anonymous users are not cached
+    get_acl_for_user(None)
+    get_acl_for_user(None)
+    assert acl_fn.call_count == 4
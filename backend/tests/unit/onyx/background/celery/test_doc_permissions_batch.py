@@ -0,0 +1,109 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from ee.onyx.db.document import upsert_document_external_perms_batch
+from onyx.access.models import DocExternalAccess
+from onyx.access.models import ExternalAccess
+from onyx.configs.constants import DocumentSource
+from onyx.configs.constants import OnyxCeleryTask
+from onyx.redis import redis_connector_doc_perm_sync
+from onyx.redis.redis_connector_doc_perm_sync import RedisConnectorPermissionSync
+
+
+def _doc_access(
+    doc_id: str, emails: set[str], groups: set[str], is_public: bool = False
+) -> DocExternalAccess:
+    return DocExternalAccess(
+        external_access=ExternalAccess(
+            external_user_emails=emails,
+            external_user_group_ids=groups,
+            is_public=is_public,
+        ),
+        doc_id=doc_id,
+    )
+
+
+def test_permission_tasks_are_batched(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        redis_connector_doc_perm_sync, "DOC_PERMISSIONS_SYNC_BATCH_SIZE", 2
+    )
+    celery_app = MagicMock()
+    redis_client = MagicMock()
+
+    permission_sync = RedisConnectorPermissionSync(None, 1, redis_client)
+    num_tasks = permission_sync.generate_tasks(
+        celery_app,
+        None,
+        [_doc_access(f"doc_{ind}", {"a@b.com"}, set()) for ind in range(5)],
+        DocumentSource.GOOGLE_DRIVE.value,
+        connector_id=3,
+        credential_id=4,
+    )
+
+    assert num_tasks == 3
+    sent = celery_app.send_task.call_args_list
+    assert {call.args[0] for call in sent} == {
+        OnyxCeleryTask.UPDATE_EXTERNAL_DOCUMENT_PERMISSIONS_BATCH_TASK
+    }
+    assert [
+        [
+            serialized["doc_id"]
+            for serialized in call.kwargs["kwargs"]["serialized_doc_external_accesses"]
+        ]
+        for call in sent
+    ] == [["doc_0", "doc_1"], ["doc_2", "doc_3"], ["doc_4"]]
+    assert redis_client.sadd.call_count == 3
+
+
+def test_only_new_and_changed_permissions_written() -> None:
+    source = DocumentSource.GOOGLE_DRIVE
+    db_session = MagicMock()
+    db_session.execute.side_effect = [
+        # existing permissions, in the order of the select
+        [
+            ("unchanged", ["a@b.com"], ["GOOGLE_DRIVE_eng"], False),
+            ("changed", ["a@b.com"], [], False),
+        ],
+        None,
+    ]
+
+    created, changed = upsert_document_external_perms_batch(
+        db_session=db_session,
+        document_external_accesses=[
+            _doc_access("unchanged", {"a@b.com"}, {"eng"}),
+            _doc_access("changed", {"a@b.com"}, set(), is_public=True),
+            _doc_access("new", set(), {"eng"}),
+        ],
+        source_type=source,
+    )
+
+    assert created == ["new"]
+    assert changed == ["changed"]
+
+    insert_stmt = db_session.execute.call_args_list[1].args[0]
+    params = insert_stmt.compile(dialect=postgresql.dialect()).params
+    written = {value for key, value in params.items() if key.startswith("id_m")}
+    assert written == {"changed", "new"}
+    # last_modified is set from the same (python) clock as last_synced
+    last_modified = {
+        value for key, value in params.items() if key.startswith("last_modified_m")
+    }
+    assert len(last_modified) == 1
+    assert isinstance(last_modified.pop(), datetime)
+    db_session.commit.assert_called_once()
+
+
+def test_nothing_written_when_permissions_unchanged() -> None:
+    db_session = MagicMock()
+    db_session.execute.return_value = [("doc", [], [], True)]
+
+    assert upsert_document_external_perms_batch(
+        db_session=db_session,
+        document_external_accesses=[_doc_access("doc", set(), set(), is_public=True)],
+        source_type=DocumentSource.GOOGLE_DRIVE,
+    ) == ([], [])
+    assert db_session.execute.call_count == 1
+    db_session.commit.assert_not_called()
@@ -0,0 +1,189 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from celery.exceptions import Retry
+from celery.exceptions import SoftTimeLimitExceeded
+
+from onyx.background.celery.tasks.shared import tasks as shared_tasks
+from onyx.configs.constants import OnyxCeleryTask
+from onyx.redis import redis_connector_prune
+from onyx.redis.redis_connector_prune import RedisConnectorPrune
+
+CONNECTOR_COUNTS = {"only_here": 1, "shared": 2, "orphan": 0}
+
+
+def test_prune_tasks_are_batched(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(redis_connector_prune, "VESPA_SYNC_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        redis_connector_prune,
+        "get_connector_credential_pair_from_id",
+        lambda cc_pair_id, db_session: SimpleNamespace(connector_id=3, credential_id=4),
+    )
+    celery_app = MagicMock()
+    redis_client = MagicMock()
+
+    prune = RedisConnectorPrune(None, 1, redis_client)
+    num_tasks = prune.generate_tasks(
+        {"doc_0", "doc_1", "doc_2"}, celery_app, MagicMock(), None
+    )
+
+    assert num_tasks == 2
+    sent = celery_app.send_task.call_args_list
+    assert {call.args[0] for call in sent} == {
+        OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_BATCH_TASK
+    }
+    assert sorted(
+        document_id
+        for call in sent
+        for document_id in call.kwargs["kwargs"]["document_ids"]
+    ) == ["doc_0", "doc_1", "doc_2"]
+    assert redis_client.sadd.call_count == 2
+
+
+@pytest.fixture
+def cleanup_env(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    @contextmanager
+    def _session(tenant_id: str | None) -> Generator[MagicMock, None, None]:
+        yield MagicMock()
+
+    calls: dict[str, Any] = {"index": MagicMock()}
+
+    def _record(name: str) -> Any:
+        def _func(**kwargs: Any) -> None:
+            calls.setdefault(name, []).extend(kwargs["document_ids"])
+
+        return _func
+
+    monkeypatch.setattr(shared_tasks, "get_session_with_tenant", _session)
+    monkeypatch.setattr(
+        shared_tasks, "get_both_index_names", lambda db_session: ("index", None)
+    )
+    monkeypatch.setattr(
+        shared_tasks, "get_default_document_index", lambda **kwargs: calls["index"]
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "get_document_connector_counts",
+        lambda db_session, document_ids: [
+            (document_id, CONNECTOR_COUNTS[document_id])
+            for document_id in document_ids
+            if document_id in CONNECTOR_COUNTS
+        ],
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "get_vespa_document_fields",
+        lambda document_ids, db_session: {
+            document_id: MagicMock() for document_id in document_ids
+        },
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "delete_documents_complete__no_commit",
+        _record("deleted"),
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "delete_documents_by_connector_credential_pair__no_commit",
+        _record("detached"),
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "mark_documents_as_synced",
+        lambda document_ids, db_session: calls.setdefault("synced", []).extend(
+            document_ids
+        ),
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "mark_documents_as_modified",
+        lambda document_ids, db_session: calls.setdefault("modified", []).extend(
+            document_ids
+        ),
+    )
+    return calls
+
+
+def test_documents_deleted_or_detached(cleanup_env: dict[str, Any]) -> None:
+    index = cleanup_env["index"]
+    index.delete_single.return_value = 3
+    index.update_single.return_value = 2
+
+    assert shared_tasks.document_by_cc_pair_cleanup_batch_task.run(
+        ["only_here", "shared", "orphan", "unknown"], 3, 4, None
+    )
+
+    assert [call.args[0] for call in index.delete_single.call_args_list] == [
+        "only_here"
+    ]
+    assert [call.args[0] for call in index.update_single.call_args_list] == ["shared"]
+    assert cleanup_env["deleted"] == ["only_here"]
+    assert cleanup_env["detached"] == ["shared"]
+    assert cleanup_env["synced"] == ["shared"]
+
+
+def test_failed_documents_retried_then_marked_dirty(
+    monkeypatch: pytest.MonkeyPatch, cleanup_env: dict[str, Any]
+) -> None:
+    index = cleanup_env["index"]
+    index.delete_single.side_effect = ConnectionError("vespa unavailable")
+    index.update_single.return_value = 2
+    task = shared_tasks.document_by_cc_pair_cleanup_batch_task
+    retry = MagicMock(side_effect=Retry())
+    monkeypatch.setattr(task, "retry", retry)
+
+    with pytest.raises(Retry):
+        task.run(["only_here", "shared"], 3, 4, None)
+
+    assert "deleted" not in cleanup_env
+    assert cleanup_env["detached"] == ["shared"]
+    assert retry.call_args.kwargs["kwargs"]["document_ids"] == ["only_here"]
+
+    # last attempt: detach from the cc_pair and leave the rest to reconciliation
+    task.push_request(retries=shared_tasks.DOCUMENT_BY_CC_PAIR_CLEANUP_MAX_RETRIES)
+    try:
+        assert not task.run(["only_here"], 3, 4, None)
+    finally:
+        task.pop_request()
+
+    assert cleanup_env["detached"] == ["shared", "only_here"]
+    assert cleanup_env["modified"] == ["only_here"]
+
+
+def test_soft_time_limit_retries_uncommitted_documents(
+    monkeypatch: pytest.MonkeyPatch, cleanup_env: dict[str, Any]
+) -> None:
+    monkeypatch.setattr(shared_tasks, "VESPA_SYNC_MAX_THREADS", 1)
+    monkeypatch.setitem(CONNECTOR_COUNTS, "only_here_2", 1)
+    index = cleanup_env["index"]
+    index.delete_single.return_value = 3
+    index.update_single.return_value = 2
+    run_in_parallel = shared_tasks.run_functions_tuples_in_parallel
+
+    def _run_in_parallel(functions_with_args: list, max_workers: int) -> list:
+        # the time limit hits while the second document is being deleted
+        if any("only_here_2" in args for _, args in functions_with_args):
+            raise SoftTimeLimitExceeded()
+        return run_in_parallel(functions_with_args, max_workers=max_workers)
+
+    monkeypatch.setattr(
+        shared_tasks, "run_functions_tuples_in_parallel", _run_in_parallel
+    )
+    task = shared_tasks.document_by_cc_pair_cleanup_batch_task
+    retry = MagicMock(side_effect=Retry())
+    monkeypatch.setattr(task, "retry", retry)
+
+    with pytest.raises(Retry):
+        task.run(["only_here", "only_here_2", "shared", "orphan"], 3, 4, None)
+
+    # the first deletion was committed before the time limit
+    assert cleanup_env["deleted"] == ["only_here"]
+    assert retry.call_args.kwargs["kwargs"]["document_ids"] == [
+        "only_here_2",
+        "shared",
+    ]
+    assert isinstance(retry.call_args.kwargs["exc"], SoftTimeLimitExceeded)
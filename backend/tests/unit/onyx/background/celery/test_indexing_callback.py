@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock
+
+import pytest
+from redis.exceptions import LockError
+
+from onyx.background.celery.tasks.indexing import tasks as indexing_tasks
+from onyx.background.celery.tasks.indexing.tasks import IndexingCallback
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(indexing_tasks.time, "monotonic", clock)
+    monkeypatch.setattr(indexing_tasks, "INDEXING_PROGRESS_FLUSH_INTERVAL", 5.0)
+    monkeypatch.setattr(indexing_tasks, "INDEXING_STOP_CHECK_INTERVAL", 1.0)
+    return clock
+
+
+def _callback(
+    lock_timeout: int = 400,
+) -> tuple[IndexingCallback, MagicMock, MagicMock]:
+    redis_lock = MagicMock(timeout=lock_timeout)
+    redis_client = MagicMock()
+    redis_client.exists.return_value = 0
+    callback = IndexingCallback("stop", "progress", redis_lock, redis_client)
+    redis_lock.reacquire.reset_mock()
+    return callback, redis_lock, redis_client
+
+
+def test_progress_is_accumulated_and_flushed(clock: _Clock) -> None:
+    callback, redis_lock, redis_client = _callback()
+
+    for _ in range(100):
+        callback.progress("doc", 1)
+    # the first report is written right away, the rest is accumulated
+    redis_client.incrby.assert_called_once_with("progress", 1)
+    redis_lock.reacquire.assert_not_called()
+
+    clock.now += 5
+    callback.progress("doc", 1)
+    assert redis_client.incrby.call_args.args == ("progress", 100)
+
+    callback.progress("doc", 3)
+    callback.flush_progress()
+    assert redis_client.incrby.call_args.args == ("progress", 3)
+    assert sum(call.args[1] for call in redis_client.incrby.call_args_list) == 104
+
+    # nothing pending, nothing written
+    callback.flush_progress()
+    assert redis_client.incrby.call_count == 3
+
+
+def test_lock_is_reacquired_after_a_quarter_of_its_timeout(clock: _Clock) -> None:
+    callback, redis_lock, _ = _callback(lock_timeout=400)
+
+    clock.now += 99
+    callback.progress("doc", 1)
+    redis_lock.reacquire.assert_not_called()
+
+    clock.now += 1
+    callback.progress("doc", 1)
+    callback.progress("doc", 1)
+    redis_lock.reacquire.assert_called_once()
+
+
+def test_lock_error_is_raised(clock: _Clock) -> None:
+    callback, redis_lock, _ = _callback(lock_timeout=400)
+    redis_lock.reacquire.side_effect = LockError("lost")
+
+    clock.now += 100
+    with pytest.raises(LockError):
+        callback.progress("doc", 1)
+
+
+def test_stop_signal_is_cached_and_sticky(clock: _Clock) -> None:
+    callback, _, redis_client = _callback()
+
+    assert not callback.should_stop()
+    redis_client.exists.return_value = 1
+    assert not callback.should_stop()
+    assert redis_client.exists.call_count == 1
+
+    clock.now += 1
+    assert callback.should_stop()
+    assert redis_client.exists.call_count == 2
+
+    redis_client.exists.return_value = 0
+    clock.now += 10
+    assert callback.should_stop()
+    assert redis_client.exists.call_count == 2
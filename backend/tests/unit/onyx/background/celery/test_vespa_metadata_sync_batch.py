@@ -0,0 +1,185 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from celery.exceptions import Retry
+from celery.exceptions import SoftTimeLimitExceeded
+
+from onyx.background.celery.tasks.shared import tasks as shared_tasks
+from onyx.background.celery.tasks.vespa import tasks as vespa_tasks
+from onyx.configs.constants import OnyxCeleryTask
+from onyx.redis import redis_document_set
+from onyx.redis import redis_object_helper
+from onyx.redis.redis_document_set import RedisDocumentSet
+
+
+def _doc(document_id: str) -> SimpleNamespace:
+    return SimpleNamespace(id=document_id, boost=0, hidden=False)
+
+
+def test_document_set_sync_tasks_are_batched(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(redis_object_helper, "get_redis_client", MagicMock())
+    monkeypatch.setattr(redis_document_set, "VESPA_SYNC_BATCH_SIZE", 4)
+    monkeypatch.setattr(
+        redis_document_set, "construct_document_select_by_docset", MagicMock()
+    )
+    db_session = MagicMock()
+    db_session.scalars.return_value.yield_per.return_value = [
+        _doc(f"doc_{ind}") for ind in range(10)
+    ]
+    celery_app = MagicMock()
+    redis_client = MagicMock()
+
+    rds = RedisDocumentSet(None, 1)
+    result = rds.generate_tasks(celery_app, db_session, redis_client, MagicMock(), None)
+
+    assert result == (3, 10)
+    sent = celery_app.send_task.call_args_list
+    assert [call.args[0] for call in sent] == [
+        OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK
+    ] * 3
+    assert [call.kwargs["kwargs"]["document_ids"] for call in sent] == [
+        ["doc_0", "doc_1", "doc_2", "doc_3"],
+        ["doc_4", "doc_5", "doc_6", "doc_7"],
+        ["doc_8", "doc_9"],
+    ]
+    # one tracked task id per batch, added before the task is sent
+    task_ids = [call.args[1] for call in redis_client.sadd.call_args_list]
+    assert task_ids == [call.kwargs["task_id"] for call in sent]
+    assert all(task_id.startswith("documentset_1_") for task_id in task_ids)
+
+
+@pytest.fixture
+def sync_env(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    @contextmanager
+    def _session(tenant_id: str | None) -> Generator[MagicMock, None, None]:
+        yield MagicMock()
+
+    marked: list[str] = []
+    index = MagicMock()
+    monkeypatch.setattr(vespa_tasks, "get_session_with_tenant", _session)
+    monkeypatch.setattr(
+        vespa_tasks, "get_both_index_names", lambda db_session: ("index", None)
+    )
+    monkeypatch.setattr(
+        vespa_tasks, "get_default_document_index", lambda **kwargs: index
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "get_documents_by_ids",
+        lambda db_session, document_ids: [
+            _doc(document_id)
+            for document_id in document_ids
+            if document_id != "missing"
+        ],
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "fetch_document_sets_for_documents",
+        lambda document_ids, db_session: [
+            (document_id, ["set"]) for document_id in document_ids
+        ],
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "get_access_for_documents",
+        lambda document_ids, db_session: {
+            document_id: MagicMock() for document_id in document_ids
+        },
+    )
+    monkeypatch.setattr(
+        shared_tasks,
+        "mark_documents_as_synced",
+        lambda document_ids, db_session: marked.extend(document_ids),
+    )
+    return {"index": index, "marked": marked}
+
+
+def test_batch_synced_and_marked(sync_env: dict[str, Any]) -> None:
+    sync_env["index"].update_single.return_value = 2
+
+    assert vespa_tasks.vespa_metadata_sync_batch_task.run(
+        ["doc_0", "missing", "doc_1"], None
+    )
+
+    updated = {
+        call.args[0]: call.args[1]
+        for call in sync_env["index"].update_single.call_args_list
+    }
+    assert updated.keys() == {"doc_0", "doc_1"}
+    assert updated["doc_0"].document_sets == {"set"}
+    assert sorted(sync_env["marked"]) == ["doc_0", "doc_1"]
+
+
+def test_only_failed_documents_retried(
+    monkeypatch: pytest.MonkeyPatch, sync_env: dict[str, Any]
+) -> None:
+    bad_request = httpx.HTTPStatusError(
+        "bad request",
+        request=httpx.Request("PUT", "http://vespa"),
+        response=httpx.Response(400),
+    )
+
+    def _update_single(document_id: str, fields: Any) -> int:
+        if document_id == "doc_1":
+            raise ConnectionError("vespa unavailable")
+        if document_id == "doc_2":
+            raise bad_request
+        return 1
+
+    sync_env["index"].update_single.side_effect = _update_single
+    retry = MagicMock(side_effect=Retry())
+    monkeypatch.setattr(vespa_tasks.vespa_metadata_sync_batch_task, "retry", retry)
+
+    with pytest.raises(Retry):
+        vespa_tasks.vespa_metadata_sync_batch_task.run(
+            ["doc_0", "doc_1", "doc_2"], None
+        )
+
+    assert sync_env["marked"] == ["doc_0"]
+    assert retry.call_args.kwargs["kwargs"] == {
+        "document_ids": ["doc_1"],
+        "tenant_id": None,
+    }
+    assert isinstance(retry.call_args.kwargs["exc"], ConnectionError)
+
+
+def test_soft_time_limit_retries_unsynced_documents(
+    monkeypatch: pytest.MonkeyPatch, sync_env: dict[str, Any]
+) -> None:
+    monkeypatch.setattr(shared_tasks, "VESPA_SYNC_MAX_THREADS", 2)
+    run_in_parallel = shared_tasks.run_functions_tuples_in_parallel
+
+    def _run_in_parallel(functions_with_args: list, max_workers: int) -> list:
+        # the time limit hits while the second group of updates is running
+        if any(args[1] == "doc_2" for _, args in functions_with_args):
+            raise SoftTimeLimitExceeded()
+        return run_in_parallel(functions_with_args, max_workers=max_workers)
+
+    sync_env["index"].update_single.return_value = 1
+    monkeypatch.setattr(
+        shared_tasks, "run_functions_tuples_in_parallel", _run_in_parallel
+    )
+    get_fields = MagicMock(wraps=shared_tasks.get_vespa_document_fields)
+    monkeypatch.setattr(shared_tasks, "get_vespa_document_fields", get_fields)
+    retry = MagicMock(side_effect=Retry())
+    monkeypatch.setattr(vespa_tasks.vespa_metadata_sync_batch_task, "retry", retry)
+
+    with pytest.raises(Retry):
+        vespa_tasks.vespa_metadata_sync_batch_task.run(
+            ["doc_0", "doc_1", "doc_2", "doc_3"], None
+        )
+
+    # the fields of the whole batch are loaded at once, and the first group of
+    # updates was marked synced before the time limit
+    get_fields.assert_called_once()
+    assert sync_env["marked"] == ["doc_0", "doc_1"]
+    assert retry.call_args.kwargs["kwargs"] == {
+        "document_ids": ["doc_2", "doc_3"],
+        "tenant_id": None,
+    }
+    assert isinstance(retry.call_args.kwargs["exc"], SoftTimeLimitExceeded)
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from onyx.background.indexing.job_client import _WarmWorker
+from onyx.background.indexing.job_client import WarmJob
+from onyx.background.indexing.job_client import WarmJobClient
+from onyx.utils.process_caches import register_process_cache
+
+# stands in for a process wide cache of e.g. a connector, filled by the jobs
+_PROCESS_CACHE: dict[str, int] = {}
+register_process_cache(_PROCESS_CACHE.clear)
+
+
+def _record_pid(path: str) -> None:
+    Path(path).write_text(str(os.getpid()))
+
+
+def _fill_process_cache() -> None:
+    _PROCESS_CACHE["pid"] = os.getpid()
+
+
+def _record_process_cache(path: str) -> None:
+    Path(path).write_text(str(len(_PROCESS_CACHE)))
+
+
+def _fail() -> None:
+    raise ValueError("boom")
+
+
+def _sleep() -> None:
+    time.sleep(60)
+
+
+def _wait(job: WarmJob | None, timeout: float = 60) -> WarmJob:
+    assert job is not None
+    deadline = time.monotonic() + timeout
+    while not job.done():
+        assert time.monotonic() < deadline, "job did not finish in time"
+        time.sleep(0.05)
+    return job
+
+
+@pytest.fixture
+def client() -> Generator[WarmJobClient, None, None]:
+    client = WarmJobClient(n_workers=1, max_jobs_per_worker=2)
+    yield client
+    for worker in list(client.workers):
+        worker.process.terminate()
+
+
+def test_workers_are_reused_then_recycled(
+    client: WarmJobClient, tmp_path: Path
+) -> None:
+    client.prewarm()
+    prewarmed_pid = client.workers[0].process.pid
+
+    pids = []
+    for ind in range(3):
+        path = str(tmp_path / f"pid_{ind}")
+        job = _wait(client.submit(_record_pid, path))
+        assert job.status == "finished"
+        assert job.startup_latency is not None
+        job.release()
+        pids.append(int(Path(path).read_text()))
+
+    # the first two jobs ran in the prewarmed worker, which was then recycled
+    assert pids[0] == pids[1] == prewarmed_pid
+    assert pids[2] != prewarmed_pid
+    assert len(client.workers) == 1
+
+
+def test_failed_job_keeps_the_worker(client: WarmJobClient, tmp_path: Path) -> None:
+    job = _wait(client.submit(_fail))
+    assert job.status == "error"
+    # the worker is still alive, the job reports how it failed
+    assert job.exit_code == 1
+    assert "ValueError: boom" in job.exception()
+    job.release()
+    failed_pid = client.workers[0].process.pid
+
+    path = str(tmp_path / "pid")
+    job = _wait(client.submit(_record_pid, path))
+    assert job.status == "finished"
+    assert int(Path(path).read_text()) == failed_pid
+
+
+def test_process_caches_are_reset_between_jobs(
+    client: WarmJobClient, tmp_path: Path
+) -> None:
+    job = _wait(client.submit(_fill_process_cache))
+    assert job.status == "finished"
+    assert job.exit_code == 0
+    job.release()
+
+    path = str(tmp_path / "cache_size")
+    job = _wait(client.submit(_record_process_cache, path))
+    assert job.status == "finished"
+    assert Path(path).read_text() == "0"
+
+
+def test_released_running_job_discards_the_worker(client: WarmJobClient) -> None:
+    job = client.submit(_sleep)
+    assert job is not None and job.status == "running"
+    worker_pid = client.workers[0].process.pid
+
+    assert job.release()
+    assert all(worker.process.pid != worker_pid for worker in client.workers)
+    # a replacement is started right away
+    assert len(client.workers) == 1
+
+
+def test_recycled_worker_is_joined_without_the_lock() -> None:
+    # every worker is in excess of the pool size, so the idle one gets recycled
+    client = WarmJobClient(n_workers=0)
+    worker = _WarmWorker(process=MagicMock(), conn=MagicMock())
+    client.workers.append(worker)
+    lock_free_during_join: list[bool] = []
+
+    def _try_lock() -> None:
+        acquired = client.lock.acquire(blocking=False)
+        if acquired:
+            client.lock.release()
+        lock_free_during_join.append(acquired)
+
+    def _join(timeout: float) -> None:
+        # e.g. the watchdog thread of another job polling its status
+        thread = threading.Thread(target=_try_lock)
+        thread.start()
+        thread.join()
+
+    worker.process.join.side_effect = _join
+
+    client.prewarm()
+
+    assert client.workers == []
+    worker.conn.send.assert_called_once_with(None)
+    assert lock_free_during_join == [True]
+    worker.conn.close.assert_called_once()
@@ -6,6 +6,7 @@ from onyx.chat.models import CitationInfo
 from onyx.chat.models import LlmDoc
 from onyx.chat.models import OnyxAnswerPiece
 from onyx.chat.stream_processing.citation_processing import CitationProcessor
+from onyx.chat.stream_processing.citation_processing import CodeFenceTracker
 from onyx.chat.stream_processing.utils import DocumentIdOrderMapping
 from onyx.configs.constants import DocumentSource
 
@@ -435,3 +436,21 @@ def test_citation_extraction(
     ] == expected_citations, (
         f"Test '{test_name}' failed: Citations do not match expected output."
     )
+
+
+@pytest.mark.parametrize(
+    "tokens",
+    [
+        ["```", "python\n", "x = 1\n", "``", "`\n", "text"],
+        ["``", "``", "``", "`", "a"],
+        ["a`", "``b", "``````", "c", "```"],
+        ["````", "x", "``````", "`"],
+    ],
+)
+def test_code_fence_tracker_matches_counting_fences(tokens: list[str]) -> None:
+    tracker = CodeFenceTracker()
+    text = ""
+    for token in tokens:
+        tracker.feed(token)
+        text += token
+        assert tracker.in_code_block == (text.count("```") % 2 != 0)
@@ -2,7 +2,11 @@ import textwrap
 
 import pytest
 
+from onyx.chat.models import LlmDoc
+from onyx.chat.models import OnyxAnswerPiece
 from onyx.chat.stream_processing.quotes_processing import match_quotes_to_docs
+from onyx.chat.stream_processing.quotes_processing import OnyxQuotes
+from onyx.chat.stream_processing.quotes_processing import QuotesProcessor
 from onyx.chat.stream_processing.quotes_processing import separate_answer_quotes
 from onyx.configs.constants import DocumentSource
 from onyx.context.search.models import InferenceChunk
@@ -219,3 +223,84 @@ def test_fuzzy_match_quotes_to_docs() -> None:
         },
         "DIFFERENT-LINK": {"document": "test doc 1", "link": "last link"},
     }
+
+
+def _quote_doc(document_id: str, content: str) -> LlmDoc:
+    return LlmDoc(
+        document_id=document_id,
+        content=content,
+        blurb=document_id,
+        semantic_identifier=document_id,
+        source_type=DocumentSource.FILE,
+        metadata={},
+        updated_at=None,
+        link=None,
+        source_links={0: f"{document_id} base", 10: f"{document_id} second link"},
+        match_highlights=[],
+    )
+
+
+def test_quotes_processor_streams_answer_and_quotes() -> None:
+    docs = [
+        _quote_doc("doc 0", "Onyx can ingest PDFs as they are.\nNo conversion needed"),
+        _quote_doc(
+            "doc 1", "The llm package aims to provide a comprehensive framework"
+        ),
+    ]
+    model_output = (
+        '{\n  "answer": "I can assist \\"James\\" with "that"\\nright away",\n'
+        '  "quotes": [\n    "the LLM package aims",\n    "as they are. No conversion"\n'
+        "  ]\n}"
+    )
+    processor = QuotesProcessor(context_docs=docs)
+
+    outputs: list[list[OnyxAnswerPiece | OnyxQuotes]] = []
+    for start in range(0, len(model_output), 3):
+        outputs.append(list(processor.process_token(model_output[start : start + 3])))
+    outputs.append(list(processor.process_token(None)))
+
+    answer_pieces = [
+        output.answer_piece
+        for token_outputs in outputs
+        for output in token_outputs
+        if isinstance(output, OnyxAnswerPiece)
+    ]
+    assert answer_pieces[-1] is None
+    assert (
+        "".join(piece or "" for piece in answer_pieces[:-1])
+        == 'I can assist "James" with "that"\nright away'
+    )
+
+    # each quote is yielded as soon as the character following its closing `"` shows
+    # that it is complete, not at the end of the stream
+    quote_token_inds = [
+        ind
+        for ind, token_outputs in enumerate(outputs)
+        for output in token_outputs
+        if isinstance(output, OnyxQuotes)
+    ]
+    assert quote_token_inds == [
+        (model_output.index('aims",') + len('aims"')) // 3,
+        model_output.index("]") // 3,
+    ]
+    quotes = [
+        quote
+        for token_outputs in outputs
+        for output in token_outputs
+        if isinstance(output, OnyxQuotes)
+        for quote in output.quotes
+    ]
+    assert [(quote.document_id, quote.link) for quote in quotes] == [
+        ("doc 1", "doc 1 base"),
+        ("doc 0", "doc 0 second link"),
+    ]
+
+
+def test_quotes_processor_falls_back_for_non_json_output() -> None:
+    docs = [_quote_doc("doc 0", "Onyx can ingest PDFs as they are.")]
+    processor = QuotesProcessor(context_docs=docs)
+
+    outputs = list(processor.process_token("Onyx can ingest PDFs as they are."))
+    outputs.extend(processor.process_token(None))
+
+    assert outputs == [OnyxQuotes(quotes=[])]
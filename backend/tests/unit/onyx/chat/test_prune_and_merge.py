@@ -1,9 +1,16 @@
+import json
+from unittest.mock import MagicMock
+
 import pytest
 
+from onyx.chat import prune_and_merge
 from onyx.chat.prune_and_merge import _merge_sections
 from onyx.configs.constants import DocumentSource
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
+from onyx.natural_language_processing.utils import BaseTokenizer
+from onyx.natural_language_processing.utils import tokenizer_trim_content_to_fit
+from onyx.tools.tool_implementations.search.search_utils import section_to_dict
 
 
 # This large test accounts for all of the following:
@@ -228,3 +235,147 @@ def test_merge_minimal_sections(
     merged_sections = _merge_sections(sections)
     assert merged_sections[0].combined_content == expected_content
     assert merged_sections[0].center_chunk == expected_center_chunk
+
+
+class _WhitespaceTokenizer(BaseTokenizer):
+    def __init__(self) -> None:
+        self.vocab: dict[str, int] = {}
+
+    def encode(self, string: str) -> list[int]:
+        return [self.vocab.setdefault(word, len(self.vocab)) for word in string.split()]
+
+    def tokenize(self, string: str) -> list[str]:
+        return string.split()
+
+    def decode(self, tokens: list[int]) -> str:
+        words = list(self.vocab)
+        return " ".join(words[token] for token in tokens)
+
+
+def _section(document_id: str, num_words: int) -> InferenceSection:
+    chunk = create_inference_chunk(document_id, 0, "", 1.0)
+    return InferenceSection(
+        center_chunk=chunk,
+        chunks=[chunk],
+        combined_content=" ".join(f"{document_id}_{ind}" for ind in range(num_words)),
+    )
+
+
+@pytest.mark.parametrize("using_tool_message", [False, True])
+def test_apply_pruning_truncates_final_section(
+    monkeypatch: pytest.MonkeyPatch, using_tool_message: bool
+) -> None:
+    monkeypatch.setattr(
+        prune_and_merge, "get_tokenizer", lambda **kwargs: _WhitespaceTokenizer()
+    )
+    sections = [_section("doc1", 100), _section("doc2", 100), _section("doc3", 100)]
+    original_contents = [section.combined_content for section in sections]
+    overhead = prune_and_merge._count_section_tokens(
+        sections[0], 0, using_tool_message, _WhitespaceTokenizer()
+    ).overhead_token_count
+
+    pruned = prune_and_merge._apply_pruning(
+        sections=sections,
+        section_relevance_list=None,
+        token_limit=150 + 2 * overhead,
+        is_manually_selected_docs=False,
+        use_sections=True,
+        using_tool_message=using_tool_message,
+        llm_config=MagicMock(),
+    )
+
+    assert [section.center_chunk.document_id for section in pruned] == [
+        "doc1",
+        "doc2",
+    ]
+    # the first section is passed through as is, the final one is truncated to fit
+    assert pruned[0] is sections[0]
+    assert pruned[1].combined_content.split() == [f"doc2_{ind}" for ind in range(50)]
+    assert pruned[1].chunks is sections[1].chunks
+    # the sections passed in are not modified
+    assert [section.combined_content for section in sections] == original_contents
+
+
+def test_apply_pruning_chunk_level(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        prune_and_merge, "get_tokenizer", lambda **kwargs: _WhitespaceTokenizer()
+    )
+    monkeypatch.setattr(prune_and_merge, "DOC_EMBEDDING_CONTEXT_SIZE", 100)
+    sections = [_section("doc1", 300), _section("doc2", 50), _section("doc3", 100)]
+
+    pruned = prune_and_merge._apply_pruning(
+        sections=sections,
+        section_relevance_list=None,
+        token_limit=200,
+        is_manually_selected_docs=False,
+        use_sections=False,
+        using_tool_message=False,
+        llm_config=MagicMock(),
+    )
+
+    # the chunk longer than expected is trimmed, the chunk over the limit is dropped
+    assert [len(section.combined_content.split()) for section in pruned] == [100, 50]
+    assert len(sections[0].combined_content.split()) == 300
+
+
+class _CharTokenizer(BaseTokenizer):
+    def encode(self, string: str) -> list[int]:
+        return [ord(char) for char in string]
+
+    def tokenize(self, string: str) -> list[str]:
+        return list(string)
+
+    def decode(self, tokens: list[int]) -> str:
+        return "".join(chr(token) for token in tokens)
+
+
+@pytest.mark.parametrize("use_sections", [False, True])
+def test_apply_pruning_counts_json_escaped_content(
+    monkeypatch: pytest.MonkeyPatch, use_sections: bool
+) -> None:
+    monkeypatch.setattr(
+        prune_and_merge, "get_tokenizer", lambda **kwargs: _CharTokenizer()
+    )
+    # each character is escaped as \uXXXX in the tool message json
+    sections = [
+        InferenceSection(
+            center_chunk=create_inference_chunk(f"doc{ind}", 0, "", 1.0),
+            chunks=[],
+            combined_content="索引文档内容\n" * 50,
+        )
+        for ind in range(10)
+    ]
+    token_limit = 3000
+
+    pruned = prune_and_merge._apply_pruning(
+        sections=sections,
+        section_relevance_list=None,
+        token_limit=token_limit,
+        is_manually_selected_docs=False,
+        use_sections=use_sections,
+        using_tool_message=True,
+        llm_config=MagicMock(),
+    )
+
+    serialized_token_count = sum(
+        len(json.dumps(section_to_dict(section, ind)))
+        for ind, section in enumerate(pruned)
+    )
+    assert pruned
+    assert serialized_token_count <= token_limit
+    if use_sections:
+        # the final section is truncated to use the rest of the budget
+        assert serialized_token_count > token_limit - 7
+
+
+@pytest.mark.parametrize("desired_length", [0, 1, 37, 299, 300, 500])
+def test_tokenizer_trim_content_to_fit(desired_length: int) -> None:
+    tokenizer = _WhitespaceTokenizer()
+    content = " ".join("word" * (1 + ind % 7) + "\n" * (ind % 3) for ind in range(300))
+
+    trimmed = tokenizer_trim_content_to_fit(content, desired_length, tokenizer)
+
+    assert tokenizer.count_tokens(trimmed) == min(desired_length, 300)
+    if desired_length < 300 / 6:
+        # much shorter than the content, the text is cut instead of decoded
+        assert content.startswith(trimmed)
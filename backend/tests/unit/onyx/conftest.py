@@ -0,0 +1,62 @@
+import pytest
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis_client: "FakeRedis") -> None:
+        self.redis_client = redis_client
+        self.commands: list[tuple[str, str | bytes, int | None]] = []
+
+    def set(self, key: str, value: str | bytes, ex: int | None = None) -> None:
+        self.commands.append((key, value, ex))
+
+    def execute(self) -> None:
+        self.redis_client.round_trip()
+        for key, value, ex in self.commands:
+            self.redis_client.store(key, value, ex)
+
+
+class FakeRedis:
+    """In memory stand-in for the few Redis commands used by the caches. Values are
+    stored as bytes like Redis returns them, and every call or pipeline execution
+    counts as one round trip. Set fail to make every call raise like a Redis outage."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, bytes] = {}
+        self.ttls: dict[str, int | None] = {}
+        self.round_trips = 0
+        self.fail = False
+
+    def round_trip(self) -> None:
+        if self.fail:
+            raise ConnectionError("redis is down")
+        self.round_trips += 1
+
+    def store(self, key: str, value: str | bytes, ex: int | None = None) -> None:
+        self.entries[key] = value.encode() if isinstance(value, str) else value
+        self.ttls[key] = ex
+
+    def get(self, key: str) -> bytes | None:
+        self.round_trip()
+        return self.entries.get(key)
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        self.round_trip()
+        return [self.entries.get(key) for key in keys]
+
+    def set(self, key: str, value: str | bytes, ex: int | None = None) -> None:
+        self.round_trip()
+        self.store(key, value, ex)
+
+    def incrby(self, key: str, amount: int) -> int:
+        self.round_trip()
+        value = int(self.entries.get(key, b"0")) + amount
+        self.entries[key] = str(value).encode()
+        return value
+
+    def pipeline(self, transaction: bool = True) -> FakeRedisPipeline:
+        return FakeRedisPipeline(self)
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
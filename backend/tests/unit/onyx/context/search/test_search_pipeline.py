@@ -0,0 +1,191 @@
+import threading
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search import pipeline as pipeline_module
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.pipeline import SearchPipeline
+
+
+QUERY = "how do I rotate the api keys"
+EMBEDDING = [0.1, 0.2, 0.3]
+
+
+@pytest.fixture
+def retrieve_calls(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    monkeypatch.setattr(
+        pipeline_module,
+        "get_current_search_settings",
+        lambda db_session: SimpleNamespace(id=1, index_name="danswer_index"),
+    )
+    monkeypatch.setattr(
+        pipeline_module, "get_default_document_index", lambda **kwargs: MagicMock()
+    )
+    monkeypatch.setattr(pipeline_module, "EmbeddingModel", MagicMock())
+
+    calls: list[dict[str, Any]] = []
+
+    def _retrieve_chunks(**kwargs: Any) -> list:
+        calls.append(kwargs)
+        return []
+
+    monkeypatch.setattr(pipeline_module, "retrieve_chunks", _retrieve_chunks)
+    return calls
+
+
+def _build_pipeline() -> SearchPipeline:
+    return SearchPipeline(
+        search_request=MagicMock(query=QUERY),
+        user=None,
+        llm=MagicMock(),
+        fast_llm=MagicMock(),
+        db_session=MagicMock(),
+    )
+
+
+def test_query_embedded_concurrently_with_preprocessing(
+    monkeypatch: pytest.MonkeyPatch, retrieve_calls: list[dict[str, Any]]
+) -> None:
+    embedding_started = threading.Event()
+
+    def _embed_query(query: str, model: Any, search_settings_id: int) -> list[float]:
+        embedding_started.set()
+        return EMBEDDING
+
+    def _preprocessing(**kwargs: Any) -> SimpleNamespace:
+        # only returns once the embedding is running, i.e. it did not wait for us
+        assert embedding_started.wait(timeout=5)
+        return SimpleNamespace(query=QUERY, search_type=None)
+
+    monkeypatch.setattr(pipeline_module, "embed_query", _embed_query)
+    monkeypatch.setattr(pipeline_module, "retrieval_preprocessing", _preprocessing)
+
+    search_pipeline = _build_pipeline()
+    assert search_pipeline._get_chunks() == []
+
+    assert len(retrieve_calls) == 1
+    assert retrieve_calls[0]["query_embedding"] == EMBEDDING
+    assert {
+        "preprocessing",
+        "query_embedding",
+        "query_embedding_wait",
+        "retrieval",
+    } <= search_pipeline.stage_timings.keys()
+
+
+def test_speculative_embedding_dropped_when_query_changes(
+    monkeypatch: pytest.MonkeyPatch, retrieve_calls: list[dict[str, Any]]
+) -> None:
+    monkeypatch.setattr(
+        pipeline_module, "embed_query", lambda *args, **kwargs: EMBEDDING
+    )
+    monkeypatch.setattr(
+        pipeline_module,
+        "retrieval_preprocessing",
+        lambda **kwargs: SimpleNamespace(query="rewritten query", search_type=None),
+    )
+
+    _build_pipeline()._get_chunks()
+
+    assert retrieve_calls[0]["query_embedding"] is None
+
+
+def test_failed_speculative_embedding_falls_back(
+    monkeypatch: pytest.MonkeyPatch, retrieve_calls: list[dict[str, Any]]
+) -> None:
+    def _embed_query(*args: Any, **kwargs: Any) -> list[float]:
+        raise ConnectionError("model server unavailable")
+
+    monkeypatch.setattr(pipeline_module, "embed_query", _embed_query)
+    monkeypatch.setattr(
+        pipeline_module,
+        "retrieval_preprocessing",
+        lambda **kwargs: SimpleNamespace(query=QUERY, search_type=None),
+    )
+
+    _build_pipeline()._get_chunks()
+
+    assert retrieve_calls[0]["query_embedding"] is None
+
+
+def _chunk(document_id: str, chunk_id: int) -> InferenceChunk:
+    return InferenceChunk(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb=f"{document_id}_{chunk_id}",
+        content=f"{document_id}_{chunk_id}",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=None,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+    )
+
+
+@pytest.mark.parametrize("full_doc", [False, True])
+def test_sections_built_from_batched_context(
+    monkeypatch: pytest.MonkeyPatch, full_doc: bool
+) -> None:
+    monkeypatch.setattr(pipeline_module, "ENABLE_BATCHED_CONTEXT_EXPANSION", True)
+    monkeypatch.setattr(pipeline_module, "ENABLE_SPECULATIVE_QUERY_EMBEDDING", False)
+    monkeypatch.setattr(
+        pipeline_module,
+        "get_current_search_settings",
+        lambda db_session: SimpleNamespace(id=1, index_name="danswer_index"),
+    )
+    document_index = MagicMock()
+    monkeypatch.setattr(
+        pipeline_module, "get_default_document_index", lambda **kwargs: document_index
+    )
+    monkeypatch.setattr(
+        pipeline_module,
+        "retrieval_preprocessing",
+        lambda **kwargs: SimpleNamespace(
+            query=QUERY,
+            search_type=None,
+            chunks_above=1,
+            chunks_below=1,
+            full_doc=full_doc,
+        ),
+    )
+
+    hits = [_chunk("doc2", 3), _chunk("doc1", 0)]
+
+    def _retrieve_chunks(context_chunks: dict, **kwargs: Any) -> list:
+        # filled in out of order, as the retrieval of several rephrasings would
+        for document_id, chunk_id in [("doc1", 1), ("doc2", 2), ("doc1", 0)]:
+            context_chunks[(document_id, chunk_id)] = _chunk(document_id, chunk_id)
+        for chunk_id in [4, 3, 0, 1]:
+            context_chunks[("doc2", chunk_id)] = _chunk("doc2", chunk_id)
+        return hits
+
+    monkeypatch.setattr(pipeline_module, "retrieve_chunks", _retrieve_chunks)
+
+    sections = _build_pipeline()._get_sections()
+
+    document_index.id_based_retrieval.assert_not_called()
+    section_chunks = [
+        [(chunk.document_id, chunk.chunk_id) for chunk in section.chunks]
+        for section in sections
+    ]
+    if full_doc:
+        assert section_chunks == [
+            [("doc2", 0), ("doc2", 1), ("doc2", 2), ("doc2", 3), ("doc2", 4)],
+            [("doc1", 0), ("doc1", 1)],
+        ]
+    else:
+        assert section_chunks == [
+            [("doc2", 2), ("doc2", 3), ("doc2", 4)],
+            [("doc1", 0), ("doc1", 1)],
+        ]
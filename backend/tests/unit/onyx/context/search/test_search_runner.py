@@ -0,0 +1,243 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.enums import LLMEvaluationType
+from onyx.context.search.enums import SearchType
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.models import InferenceChunkUncleaned
+from onyx.context.search.models import SearchQuery
+from onyx.context.search.retrieval import search_runner
+from onyx.context.search.retrieval.search_runner import _merge_chunk_requests
+from onyx.context.search.retrieval.search_runner import doc_index_retrieval
+from onyx.context.search.retrieval.search_runner import reciprocal_rank_fusion
+from onyx.context.search.retrieval.search_runner import retrieve_chunks
+from onyx.document_index.interfaces import VespaChunkRequest
+
+
+def _chunk(
+    document_id: str,
+    chunk_id: int,
+    score: float | None = None,
+    large_chunk_reference_ids: list[int] | None = None,
+) -> InferenceChunkUncleaned:
+    return InferenceChunkUncleaned(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        semantic_identifier=document_id,
+        title=None,
+        blurb=f"{document_id}_{chunk_id}",
+        content=f"{document_id}_{chunk_id}",
+        source_links=None,
+        section_continuation=False,
+        source_type=DocumentSource.WEB,
+        boost=0,
+        recency_bias=1.0,
+        score=score,
+        hidden=False,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        large_chunk_reference_ids=large_chunk_reference_ids or [],
+        metadata_suffix=None,
+    )
+
+
+def _query(
+    chunks_above: int = 0, chunks_below: int = 0, query: str = "query"
+) -> SearchQuery:
+    return SearchQuery(
+        query=query,
+        processed_keywords=[query],
+        search_type=SearchType.SEMANTIC,
+        evaluation_type=LLMEvaluationType.SKIP,
+        filters=IndexFilters(access_control_list=None),
+        chunks_above=chunks_above,
+        chunks_below=chunks_below,
+        rerank_settings=None,
+        hybrid_alpha=0.5,
+        recency_bias_multiplier=1.0,
+        max_llm_filter_sections=0,
+    )
+
+
+class _FakeDocumentIndex:
+    """Documents of 10 chunks each, records the id based requests."""
+
+    def __init__(self, hits: list[InferenceChunkUncleaned]) -> None:
+        self.hits = hits
+        self.chunk_requests: list[list[VespaChunkRequest]] = []
+
+    def hybrid_retrieval(self, **kwargs: Any) -> list[InferenceChunkUncleaned]:
+        return self.hits
+
+    def id_based_retrieval(
+        self, chunk_requests: list[VespaChunkRequest], **kwargs: Any
+    ) -> list[InferenceChunkUncleaned]:
+        self.chunk_requests.append(chunk_requests)
+        return [
+            _chunk(request.document_id, chunk_id)
+            for request in chunk_requests
+            for chunk_id in range(
+                request.min_chunk_ind or 0,
+                min(request.max_chunk_ind or 9, 9) + 1,
+            )
+        ]
+
+
+def test_merge_chunk_requests() -> None:
+    merged = _merge_chunk_requests(
+        [
+            VespaChunkRequest(document_id="b", min_chunk_ind=4, max_chunk_ind=6),
+            VespaChunkRequest(document_id="a", min_chunk_ind=0, max_chunk_ind=2),
+            VespaChunkRequest(document_id="b", min_chunk_ind=0, max_chunk_ind=1),
+            VespaChunkRequest(document_id="b", min_chunk_ind=2, max_chunk_ind=3),
+            VespaChunkRequest(document_id="a", min_chunk_ind=8, max_chunk_ind=9),
+            VespaChunkRequest(document_id="c", min_chunk_ind=3, max_chunk_ind=4),
+            VespaChunkRequest(document_id="c"),
+        ]
+    )
+
+    assert merged == [
+        VespaChunkRequest(document_id="b", min_chunk_ind=0, max_chunk_ind=6),
+        VespaChunkRequest(document_id="a", min_chunk_ind=0, max_chunk_ind=2),
+        VespaChunkRequest(document_id="a", min_chunk_ind=8, max_chunk_ind=9),
+        VespaChunkRequest(document_id="c"),
+    ]
+
+
+def test_context_fetched_with_large_chunk_references() -> None:
+    document_index = _FakeDocumentIndex(
+        [
+            _chunk("doc1", 5, score=0.9),
+            _chunk("doc2", 100, score=0.8, large_chunk_reference_ids=[2, 3, 4]),
+        ]
+    )
+    context_chunks: dict[tuple[str, int], InferenceChunk] = {}
+
+    retrieved = doc_index_retrieval(
+        query=_query(chunks_above=1, chunks_below=1),
+        document_index=document_index,  # type: ignore
+        db_session=MagicMock(),
+        query_embedding=[0.0],
+        context_chunks=context_chunks,
+    )
+
+    # a single request for the large chunk references and the context
+    assert document_index.chunk_requests == [
+        [
+            VespaChunkRequest(document_id="doc1", min_chunk_ind=4, max_chunk_ind=6),
+            VespaChunkRequest(document_id="doc2", min_chunk_ind=1, max_chunk_ind=5),
+        ]
+    ]
+    # context chunks are not returned as hits
+    assert [
+        (chunk.document_id, chunk.chunk_id, chunk.score) for chunk in retrieved
+    ] == [
+        ("doc1", 5, 0.9),
+        ("doc2", 2, 0.8),
+        ("doc2", 3, 0.8),
+        ("doc2", 4, 0.8),
+    ]
+    assert sorted(context_chunks) == [
+        ("doc1", 4),
+        ("doc1", 5),
+        ("doc1", 6),
+        ("doc2", 1),
+        ("doc2", 2),
+        ("doc2", 3),
+        ("doc2", 4),
+        ("doc2", 5),
+    ]
+
+
+def test_no_context_only_fetches_large_chunk_references() -> None:
+    document_index = _FakeDocumentIndex(
+        [_chunk("doc1", 100, score=0.5, large_chunk_reference_ids=[0, 1])]
+    )
+
+    retrieved = doc_index_retrieval(
+        query=_query(chunks_above=2, chunks_below=2),
+        document_index=document_index,  # type: ignore
+        db_session=MagicMock(),
+        query_embedding=[0.0],
+    )
+
+    assert document_index.chunk_requests == [
+        [VespaChunkRequest(document_id="doc1", min_chunk_ind=0, max_chunk_ind=1)]
+    ]
+    assert [chunk.chunk_id for chunk in retrieved] == [0, 1]
+
+
+def test_reciprocal_rank_fusion() -> None:
+    fused = reciprocal_rank_fusion(
+        [
+            [_chunk("a", 0, score=50.0), _chunk("b", 0, score=40.0)],
+            [_chunk("c", 0, score=0.9), _chunk("b", 0, score=0.8)],
+        ],
+        k=60,
+    )
+
+    # b is found by both queries, the raw scores of different queries are not compared
+    assert [chunk.document_id for chunk in fused] == ["b", "a", "c"]
+    assert fused[0].score == pytest.approx(2 / 62)
+    assert fused[1].score == pytest.approx(1 / 61)
+
+
+def test_multilingual_rephrases_embedded_in_one_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        search_runner, "get_multilingual_expansion", lambda db_session: ["German"]
+    )
+    monkeypatch.setattr(
+        search_runner,
+        "multilingual_query_expansion",
+        lambda query, languages: ["Passwort zurücksetzen", "reset password!"],
+    )
+    monkeypatch.setattr(
+        search_runner,
+        "_get_query_embedding_model",
+        lambda db_session: (MagicMock(), 1),
+    )
+    embed_calls: list[list[str]] = []
+
+    def _embed_queries(queries: list[str], **kwargs: Any) -> list[list[float]]:
+        embed_calls.append(queries)
+        return [[float(len(query))] for query in queries]
+
+    monkeypatch.setattr(search_runner, "embed_queries", _embed_queries)
+    searched: list[tuple[str, list[float]]] = []
+
+    def _doc_index_retrieval(
+        query: SearchQuery,
+        document_index: Any,
+        db_session: Any,
+        query_embedding: list[float],
+        context_chunks: Any,
+    ) -> list[InferenceChunk]:
+        searched.append((query.query, query_embedding))
+        return [_chunk(query.query, 0, score=1.0).to_inference_chunk()]
+
+    monkeypatch.setattr(search_runner, "doc_index_retrieval", _doc_index_retrieval)
+
+    retrieved = retrieve_chunks(
+        query=_query(query="reset password"),
+        document_index=MagicMock(),
+        db_session=MagicMock(),
+        query_embedding=[0.5],
+    )
+
+    # the original query was already embedded, the near duplicate rephrase is dropped
+    assert embed_calls == [["Passwort zurücksetzen"]]
+    assert sorted(searched) == [
+        ("Passwort zurücksetzen", [21.0]),
+        ("reset password", [0.5]),
+    ]
+    assert {chunk.document_id for chunk in retrieved} == {
+        "reset password",
+        "Passwort zurücksetzen",
+    }
@@ -0,0 +1,175 @@
+from datetime import datetime
+from datetime import timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import Section
+from onyx.db.models import DocumentChunkFingerprints
+from onyx.document_index.interfaces import IndexChunkRef
+from onyx.indexing import indexing_pipeline
+from onyx.indexing.chunk_diff import diff_document_chunks
+from onyx.indexing.chunk_diff import dump_fingerprints
+from onyx.indexing.chunk_diff import fingerprint_chunk
+from onyx.indexing.indexing_pipeline import DocumentBatchPrepareContext
+from onyx.indexing.indexing_pipeline import filter_unchanged_chunks
+from onyx.indexing.models import DocAwareChunk
+
+_UPDATED_AT = datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+
+def _make_document(doc_updated_at: datetime | None = _UPDATED_AT) -> Document:
+    return Document(
+        id="test_doc",
+        source=DocumentSource.CONFLUENCE,
+        semantic_identifier="Test Document",
+        metadata={"space": "eng"},
+        doc_updated_at=doc_updated_at,
+        sections=[Section(text="unused", link="link")],
+    )
+
+
+def _make_chunks(document: Document, contents: list[str]) -> list[DocAwareChunk]:
+    return [
+        DocAwareChunk(
+            chunk_id=chunk_id,
+            blurb=content,
+            content=content,
+            source_links={0: "link"},
+            section_continuation=chunk_id > 0,
+            source_document=document,
+            title_prefix="Test Document\n",
+            metadata_suffix_semantic="",
+            metadata_suffix_keyword="",
+            mini_chunk_texts=None,
+        )
+        for chunk_id, content in enumerate(contents)
+    ]
+
+
+def _stored_fingerprints(
+    document: Document, contents: list[str]
+) -> DocumentChunkFingerprints:
+    chunks = _make_chunks(document, contents)
+    return DocumentChunkFingerprints(
+        document_id=document.id,
+        index_name="test_index",
+        doc_updated_at=document.doc_updated_at,
+        chunk_fingerprints=dump_fingerprints([fingerprint_chunk(c) for c in chunks]),
+    )
+
+
+def test_diff_only_returns_changed_chunks() -> None:
+    document = _make_document()
+    previous = _stored_fingerprints(document, ["a", "b", "c", "d"])
+
+    chunks = _make_chunks(document, ["a", "B", "c"])
+    changed, chunk_diff = diff_document_chunks(
+        document=document,
+        chunks=chunks,
+        fingerprints=[fingerprint_chunk(chunk) for chunk in chunks],
+        previous=previous,
+    )
+
+    assert [chunk.content for chunk in changed] == ["B"]
+    assert chunk_diff is not None
+    assert chunk_diff.unchanged_chunks == [IndexChunkRef(0), IndexChunkRef(2)]
+    assert chunk_diff.removed_chunks == [IndexChunkRef(3)]
+    # update time did not move, nothing to refresh on the unchanged chunks
+    assert chunk_diff.doc_updated_at is None
+
+
+def test_diff_refreshes_update_time_and_tracks_document_fields() -> None:
+    previous = _stored_fingerprints(_make_document(), ["a", "b"])
+
+    newer = datetime(2024, 12, 2, tzinfo=timezone.utc)
+    document = _make_document(doc_updated_at=newer)
+    chunks = _make_chunks(document, ["a", "b"])
+    changed, chunk_diff = diff_document_chunks(
+        document=document,
+        chunks=chunks,
+        fingerprints=[fingerprint_chunk(chunk) for chunk in chunks],
+        previous=previous,
+    )
+    assert changed == []
+    assert chunk_diff is not None
+    assert chunk_diff.doc_updated_at == newer
+
+    # document level fields are stored on every chunk so they invalidate all of them
+    renamed = document.model_copy(update={"semantic_identifier": "Renamed"})
+    chunks = _make_chunks(renamed, ["a", "b"])
+    changed, _ = diff_document_chunks(
+        document=renamed,
+        chunks=chunks,
+        fingerprints=[fingerprint_chunk(chunk) for chunk in chunks],
+        previous=previous,
+    )
+    assert len(changed) == 2
+
+
+def test_diff_falls_back_to_full_rewrite() -> None:
+    document = _make_document()
+    chunks = _make_chunks(document, ["a"])
+    fingerprints = [fingerprint_chunk(chunk) for chunk in chunks]
+
+    changed, chunk_diff = diff_document_chunks(
+        document=document, chunks=chunks, fingerprints=fingerprints, previous=None
+    )
+    assert changed == chunks
+    assert chunk_diff is None
+
+    # the update time cannot be unset on the unchanged chunks
+    previous = _stored_fingerprints(document, ["a"])
+    no_time_document = _make_document(doc_updated_at=None)
+    chunks = _make_chunks(no_time_document, ["a"])
+    changed, chunk_diff = diff_document_chunks(
+        document=no_time_document,
+        chunks=chunks,
+        fingerprints=[fingerprint_chunk(chunk) for chunk in chunks],
+        previous=previous,
+    )
+    assert changed == chunks
+    assert chunk_diff is None
+
+
+def test_disabled_diffing_only_cleans_up_existing_fingerprints(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    document = _make_document()
+    chunks = _make_chunks(document, ["first", "second"])
+    ctx = DocumentBatchPrepareContext(updatable_docs=[document], id_to_db_doc_map={})
+    fingerprints_exist = MagicMock(side_effect=[True, False, False])
+    delete_fingerprints = MagicMock()
+    monkeypatch.setattr(
+        indexing_pipeline, "chunk_fingerprints_exist", fingerprints_exist
+    )
+    monkeypatch.setattr(
+        indexing_pipeline,
+        "delete_chunk_fingerprints_for_documents__no_commit",
+        delete_fingerprints,
+    )
+    monkeypatch.setattr(indexing_pipeline, "_INDICES_WITHOUT_CHUNK_FINGERPRINTS", set())
+
+    for tenant_id in ["tenant_1", "tenant_1", "tenant_1", "tenant_2"]:
+        db_session = MagicMock()
+        assert (
+            filter_unchanged_chunks(
+                ctx=ctx,
+                chunks=chunks,
+                index_name="test_index",
+                db_session=db_session,
+                tenant_id=tenant_id,
+                enable_chunk_diffing=False,
+            )
+            == chunks
+        )
+
+    # fingerprints left from when diffing was enabled are deleted, and once there
+    # are none left the index of the tenant is not checked again. The same index
+    # name of another tenant is still checked
+    assert fingerprints_exist.call_count == 3
+    assert delete_fingerprints.call_count == 1
+    assert not ctx.chunk_fingerprints
+    assert db_session.method_calls == []
@@ -1,9 +1,17 @@
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest.mock import Mock
+
 import pytest
 
 from onyx.configs.constants import DocumentSource
 from onyx.connectors.models import Document
 from onyx.connectors.models import Section
+from onyx.indexing import chunker as chunker_module
+from onyx.indexing.chunker import _exit_with_parent
 from onyx.indexing.chunker import Chunker
+from onyx.indexing.chunker import shutdown_chunking_processes
 from onyx.indexing.embedder import DefaultIndexingEmbedder
 from tests.unit.onyx.indexing.conftest import MockHeartbeat
 
@@ -81,3 +89,134 @@ def test_chunker_heartbeat(
 
     assert mock_heartbeat.call_count == 1
     assert len(chunks) > 0
+
+
+@pytest.mark.parametrize("enable_multipass", [False, True])
+def test_chunker_incremental_token_counting_matches_default(
+    embedder: DefaultIndexingEmbedder, enable_multipass: bool
+) -> None:
+    sections = [
+        Section(text=f"Message number {i} in the channel, some text.", link=f"l{i}")
+        for i in range(300)
+    ]
+    sections.insert(
+        50,
+        Section(
+            text="This is a long section that should be split. " * 200,
+            link="long",
+        ),
+    )
+    document = Document(
+        id="test_doc",
+        source=DocumentSource.SLACK,
+        semantic_identifier="Test Document",
+        metadata={"channel": "general"},
+        doc_updated_at=None,
+        sections=sections,
+    )
+
+    default_chunks = Chunker(
+        tokenizer=embedder.embedding_model.tokenizer,
+        enable_multipass=enable_multipass,
+        enable_large_chunks=enable_multipass,
+        incremental_token_counting=False,
+    ).chunk([document])
+    incremental_chunks = Chunker(
+        tokenizer=embedder.embedding_model.tokenizer,
+        enable_multipass=enable_multipass,
+        enable_large_chunks=enable_multipass,
+        incremental_token_counting=True,
+    ).chunk([document])
+
+    assert len(default_chunks) > 1
+    assert incremental_chunks == default_chunks
+
+
+class _InlineProcessPool(ThreadPoolExecutor):
+    """Stands in for the pool of chunking processes, runs the chunking process code in a
+    single thread of the test process"""
+
+    def __init__(
+        self,
+        max_workers: int,
+        mp_context: Any,
+        initializer: Callable,
+        initargs: tuple,
+    ) -> None:
+        super().__init__(max_workers=1, initializer=initializer, initargs=initargs)
+
+
+def test_chunker_processes_preserve_order(
+    embedder: DefaultIndexingEmbedder,
+    mock_heartbeat: MockHeartbeat,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(chunker_module, "ProcessPoolExecutor", _InlineProcessPool)
+    # the parent of the test process is not the one that started the "process"
+    monkeypatch.setattr(chunker_module, "_exit_with_parent", lambda parent_pid: None)
+
+    documents = [
+        Document(
+            id=f"test_doc_{doc_ind}",
+            source=DocumentSource.WEB,
+            semantic_identifier=f"Test Document {doc_ind}",
+            metadata={},
+            doc_updated_at=None,
+            sections=[
+                Section(text=f"Section {i} of document {doc_ind}. " * 20, link=f"l{i}")
+                for i in range(doc_ind * 5 + 1)
+            ],
+        )
+        for doc_ind in range(4)
+    ]
+
+    sequential_chunks = Chunker(
+        tokenizer=embedder.embedding_model.tokenizer, num_processes=1
+    ).chunk(documents)
+    parallel_chunker = Chunker(
+        tokenizer=embedder.embedding_model.tokenizer,
+        callback=mock_heartbeat,
+        num_processes=2,
+    )
+    try:
+        parallel_chunks = parallel_chunker.chunk(documents)
+    finally:
+        shutdown_chunking_processes()
+
+    assert parallel_chunks == sequential_chunks
+    assert parallel_chunks[0].source_document is documents[0]
+    assert mock_heartbeat.call_count == len(documents)
+
+
+def test_daemonic_process_chunks_itself(
+    embedder: DefaultIndexingEmbedder, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        chunker_module.multiprocessing, "current_process", lambda: Mock(daemon=True)
+    )
+
+    chunker = Chunker(tokenizer=embedder.embedding_model.tokenizer, num_processes=2)
+
+    assert chunker.num_processes == 1
+
+
+def test_chunking_process_exits_once_its_parent_is_gone(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # the process is reparented after two checks
+    parent_pids = iter([1234, 1234, 1])
+    exit_codes: list[int] = []
+
+    def _exit(code: int) -> None:
+        exit_codes.append(code)
+        raise SystemExit(code)
+
+    monkeypatch.setattr(chunker_module.os, "getppid", lambda: next(parent_pids))
+    monkeypatch.setattr(chunker_module.os, "_exit", _exit)
+    monkeypatch.setattr(chunker_module.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(SystemExit):
+        _exit_with_parent(1234)
+
+    assert exit_codes == [1]
+    assert next(parent_pids, None) is None
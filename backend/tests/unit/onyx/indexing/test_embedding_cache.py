@@ -0,0 +1,117 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.indexing.embedding_cache import EmbeddingCache
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import Embedding
+
+
+class _FakeCacheStore:
+    def __init__(self) -> None:
+        self.entries: dict[str, Embedding] = {}
+
+    def get(self, db_session: Any, cache_keys: list[str]) -> dict[str, Embedding]:
+        return {key: self.entries[key] for key in cache_keys if key in self.entries}
+
+    def upsert(
+        self,
+        db_session: Any,
+        model_name: str,
+        key_to_embedding: dict[str, Embedding],
+    ) -> None:
+        self.entries.update(key_to_embedding)
+
+
+@contextmanager
+def _fake_session() -> Generator[Mock, None, None]:
+    yield Mock()
+
+
+@pytest.fixture
+def fake_store() -> Generator[_FakeCacheStore, None, None]:
+    store = _FakeCacheStore()
+    with patch(
+        "onyx.indexing.embedding_cache.get_session_with_default_tenant",
+        _fake_session,
+    ), patch("onyx.indexing.embedding_cache.get_cached_embeddings", store.get), patch(
+        "onyx.indexing.embedding_cache.upsert_cached_embeddings", store.upsert
+    ):
+        yield store
+
+
+def _mock_embedding_model(
+    model_name: str = "test-model", api_url: str | None = None
+) -> Mock:
+    model = Mock()
+    model.model_name = model_name
+    model.provider_type = None
+    model.api_url = api_url
+    model.deployment_name = None
+    model.api_version = None
+    model.normalize = True
+    model.passage_prefix = None
+    model.encode.side_effect = lambda texts, **kwargs: [
+        [float(len(text))] for text in texts
+    ]
+    return model
+
+
+def test_encode_passages_only_embeds_misses(fake_store: _FakeCacheStore) -> None:
+    model = _mock_embedding_model()
+    cache = EmbeddingCache(model, max_entries=100)
+
+    first = cache.encode_passages(["a", "bb", "a"])
+    assert first == [[1.0], [2.0], [1.0]]
+    model.encode.assert_called_once_with(
+        texts=["a", "bb"],
+        text_type=EmbedTextType.PASSAGE,
+        large_chunks_present=False,
+    )
+
+    model.encode.reset_mock()
+    second = cache.encode_passages(["bb", "ccc"])
+    assert second == [[2.0], [3.0]]
+    model.encode.assert_called_once_with(
+        texts=["ccc"],
+        text_type=EmbedTextType.PASSAGE,
+        large_chunks_present=False,
+    )
+
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 3
+
+
+def test_cache_key_depends_on_model_and_sequence_length(
+    fake_store: _FakeCacheStore,
+) -> None:
+    model = _mock_embedding_model()
+    EmbeddingCache(model, max_entries=100).encode_passages(["a"])
+
+    other_model = _mock_embedding_model("other-model")
+    EmbeddingCache(other_model, max_entries=100).encode_passages(["a"])
+    other_model.encode.assert_called_once()
+
+    model.encode.reset_mock()
+    EmbeddingCache(model, max_entries=100).encode_passages(
+        ["a"], large_chunks_present=True
+    )
+    model.encode.assert_called_once()
+
+    assert len(fake_store.entries) == 3
+
+
+def test_cache_key_depends_on_endpoint(fake_store: _FakeCacheStore) -> None:
+    EmbeddingCache(
+        _mock_embedding_model(api_url="https://a.example.com"), max_entries=100
+    ).encode_passages(["a"])
+
+    other_endpoint = _mock_embedding_model(api_url="https://b.example.com")
+    EmbeddingCache(other_endpoint, max_entries=100).encode_passages(["a"])
+    other_endpoint.encode.assert_called_once()
+
+    assert len(fake_store.entries) == 2
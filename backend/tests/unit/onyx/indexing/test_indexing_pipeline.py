@@ -1,10 +1,20 @@
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
 from typing import List
+from unittest.mock import MagicMock
+
+import pytest
 
 from onyx.configs.app_configs import MAX_DOCUMENT_CHARS
 from onyx.connectors.models import Document
 from onyx.connectors.models import DocumentSource
+from onyx.connectors.models import IndexAttemptMetadata
 from onyx.connectors.models import Section
+from onyx.indexing import indexing_pipeline
 from onyx.indexing.indexing_pipeline import filter_documents
+from onyx.indexing.indexing_pipeline import StagedIndexingPipeline
 
 
 def create_test_document(
@@ -118,3 +128,107 @@ def test_filter_documents_multiple_documents() -> None:
 def test_filter_documents_empty_batch() -> None:
     result = filter_documents([])
     assert len(result) == 0
+
+
+class _StopIndexing(Exception):
+    pass
+
+
+def test_staged_pipeline_stops_fetching_and_writing(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    written: list[str] = []
+
+    def _write(ctx: MagicMock, **kwargs: Any) -> tuple[int, int]:
+        written.append(ctx.doc_id)
+        return 1, 1
+
+    monkeypatch.setattr(indexing_pipeline, "get_session_with_tenant", MagicMock())
+    monkeypatch.setattr(
+        indexing_pipeline,
+        "get_doc_batch_prepare_context",
+        lambda documents, **kwargs: MagicMock(doc_id=documents[0].id),
+    )
+    monkeypatch.setattr(indexing_pipeline, "upsert_doc_batch_in_db", MagicMock())
+    monkeypatch.setattr(
+        indexing_pipeline, "filter_unchanged_chunks", lambda chunks, **kwargs: chunks
+    )
+    monkeypatch.setattr(indexing_pipeline, "index_doc_batch_write", _write)
+
+    stopped = threading.Event()
+
+    def _check_should_continue(db_session: Any) -> None:
+        if stopped.is_set():
+            raise _StopIndexing()
+
+    fetched: list[int] = []
+
+    def _document_batches() -> Iterator[list[Document]]:
+        for ind in range(30):
+            fetched.append(ind)
+            yield [create_test_document(doc_id=f"doc_{ind}")]
+
+    pipeline = StagedIndexingPipeline(
+        chunker=MagicMock(),
+        embedder=MagicMock(),
+        document_index=MagicMock(),
+        db_session=MagicMock(),
+        queue_depth=1,
+        filter_fnc=lambda documents: documents,
+        check_should_continue=_check_should_continue,
+    )
+
+    yielded = []
+    with pytest.raises(_StopIndexing):
+        for document_batch, _, _ in pipeline(
+            _document_batches(), IndexAttemptMetadata(connector_id=1, credential_id=1)
+        ):
+            yielded.append(document_batch[0].id)
+            stopped.set()
+
+    assert yielded == ["doc_0"]
+    # batches in flight when the stop was seen are neither fetched nor written
+    assert len(fetched) < 30
+    num_written = len(written)
+    time.sleep(0.5)
+    assert len(written) == num_written < len(fetched)
+
+
+def test_staged_pipeline_writes_unchanged_batches_to_db(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    upsert = MagicMock()
+    write = MagicMock()
+    monkeypatch.setattr(indexing_pipeline, "get_session_with_tenant", MagicMock())
+    # every document of every batch is already indexed
+    monkeypatch.setattr(
+        indexing_pipeline, "get_doc_batch_prepare_context", lambda **kwargs: None
+    )
+    monkeypatch.setattr(indexing_pipeline, "upsert_doc_batch_in_db", upsert)
+    monkeypatch.setattr(indexing_pipeline, "index_doc_batch_write", write)
+
+    pipeline = StagedIndexingPipeline(
+        chunker=MagicMock(),
+        embedder=MagicMock(),
+        document_index=MagicMock(),
+        db_session=MagicMock(),
+        filter_fnc=lambda documents: documents,
+    )
+    results = list(
+        pipeline(
+            iter([[create_test_document(doc_id=f"doc_{ind}")] for ind in range(3)]),
+            IndexAttemptMetadata(connector_id=1, credential_id=1),
+        )
+    )
+
+    assert [(batch[0].id, new_docs) for batch, new_docs, _ in results] == [
+        ("doc_0", 0),
+        ("doc_1", 0),
+        ("doc_2", 0),
+    ]
+    # the cc pair relationships are still recorded, by the write stage
+    assert sorted(
+        call.kwargs["documents"][0].id for call in upsert.call_args_list
+    ) == ["doc_0", "doc_1", "doc_2"]
+    assert all(call.kwargs["ctx"] is None for call in upsert.call_args_list)
+    write.assert_not_called()
@@ -0,0 +1,179 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from onyx.access.models import DocumentAccess
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import Section
+from onyx.document_index.document_index_utils import get_uuid_from_chunk
+from onyx.document_index.vespa.feed import feed_vespa_chunks
+from onyx.document_index.vespa.feed import feed_vespa_chunks_async
+from onyx.indexing.models import ChunkEmbedding
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+
+
+def _make_chunks(doc_id: str, num_chunks: int) -> list[DocMetadataAwareIndexChunk]:
+    document = Document(
+        id=doc_id,
+        source=DocumentSource.FILE,
+        semantic_identifier=doc_id,
+        metadata={},
+        sections=[Section(text="unused", link=None)],
+    )
+    return [
+        DocMetadataAwareIndexChunk(
+            chunk_id=chunk_id,
+            blurb="blurb",
+            content=f"content {chunk_id}",
+            source_links=None,
+            section_continuation=False,
+            source_document=document,
+            title_prefix="",
+            metadata_suffix_semantic="",
+            metadata_suffix_keyword="",
+            mini_chunk_texts=None,
+            embeddings=ChunkEmbedding(full_embedding=[0.1], mini_chunk_embeddings=[]),
+            title_embedding=None,
+            access=DocumentAccess.build([], [], [], [], is_public=True),
+            document_sets=set(),
+            boost=0,
+            tenant_id=None,
+        )
+        for chunk_id in range(num_chunks)
+    ]
+
+
+class _FakeVespa:
+    def __init__(self, existing_chunk_ids: set[str]) -> None:
+        self.chunk_ids = set(existing_chunk_ids)
+        self.calls: Counter[str] = Counter()
+        self.fail_puts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        chunk_id = request.url.path.rsplit("/", 1)[-1]
+        self.calls[request.method] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if request.method == "GET":
+                return httpx.Response(200 if chunk_id in self.chunk_ids else 404)
+            if request.method == "DELETE":
+                self.chunk_ids.discard(chunk_id)
+                return httpx.Response(200)
+            if self.fail_puts:
+                self.fail_puts -= 1
+                return httpx.Response(503)
+            self.chunk_ids.add(chunk_id)
+            return httpx.Response(200)
+        finally:
+            self.in_flight -= 1
+
+
+def _feed(fake_vespa: _FakeVespa, **kwargs: object) -> set[str]:
+    async def _run() -> set[str]:
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(fake_vespa.handle)
+        ) as http_client:
+            return await feed_vespa_chunks_async(
+                index_name="test_index",
+                http_client=http_client,
+                multitenant=False,
+                retry_delay=0,
+                **kwargs,  # type: ignore
+            )
+
+    return asyncio.run(_run())
+
+
+def test_feed_replaces_existing_documents() -> None:
+    old_chunks = _make_chunks("existing", 3)
+    fake_vespa = _FakeVespa({str(get_uuid_from_chunk(c)) for c in old_chunks})
+
+    with patch(
+        "onyx.document_index.vespa.feed.get_all_vespa_ids_for_document_id",
+        return_value=[str(get_uuid_from_chunk(c)) for c in old_chunks],
+    ):
+        existing = _feed(
+            fake_vespa,
+            chunks=_make_chunks("existing", 1) + _make_chunks("new", 2),
+            check_existing=True,
+            max_in_flight=2,
+        )
+
+    assert existing == {"existing"}
+    # the document shrunk, its stale chunks are gone
+    assert fake_vespa.chunk_ids == {
+        str(get_uuid_from_chunk(c))
+        for c in _make_chunks("existing", 1) + _make_chunks("new", 2)
+    }
+    assert fake_vespa.calls == Counter({"GET": 2, "DELETE": 3, "POST": 3})
+    assert fake_vespa.max_in_flight <= 2
+
+
+def test_feed_skips_existence_checks_and_retries() -> None:
+    fake_vespa = _FakeVespa(set())
+    fake_vespa.fail_puts = 2
+
+    existing = _feed(
+        fake_vespa,
+        chunks=_make_chunks("diffed", 2),
+        check_existing=True,
+        skip_existence_check_doc_ids={"diffed"},
+        max_retries=2,
+    )
+
+    assert existing == set()
+    assert fake_vespa.calls == Counter({"POST": 4})
+    assert len(fake_vespa.chunk_ids) == 2
+
+
+def test_feed_raises_once_retries_are_exhausted() -> None:
+    fake_vespa = _FakeVespa(set())
+    fake_vespa.fail_puts = 10
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _feed(
+            fake_vespa,
+            chunks=_make_chunks("doc", 1),
+            check_existing=False,
+            max_retries=1,
+        )
+    assert fake_vespa.calls["POST"] == 2
+
+
+def test_sync_feeds_share_the_loop_and_client() -> None:
+    fake_vespa = _FakeVespa(set())
+    client_factory = Mock(
+        side_effect=lambda: httpx.AsyncClient(
+            transport=httpx.MockTransport(fake_vespa.handle)
+        )
+    )
+
+    with patch(
+        "onyx.document_index.vespa.feed.get_vespa_async_http_client", client_factory
+    ), patch("onyx.document_index.vespa.feed._feed_http_client", None):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda doc_id: feed_vespa_chunks(
+                        chunks=_make_chunks(doc_id, 2),
+                        index_name="test_index",
+                        multitenant=False,
+                        check_existing=False,
+                    ),
+                    [f"doc_{i}" for i in range(8)],
+                )
+            )
+
+    assert results == [set()] * 8
+    assert len(fake_vespa.chunk_ids) == 16
+    client_factory.assert_called_once()
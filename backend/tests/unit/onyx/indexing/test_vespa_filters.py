@@ -0,0 +1,27 @@
+import json
+from unittest.mock import patch
+
+from onyx.context.search.models import IndexFilters
+from onyx.document_index.vespa.shared_utils import vespa_request_builders
+from onyx.document_index.vespa.shared_utils.vespa_request_builders import (
+    build_vespa_filters,
+)
+
+
+def test_compact_acl_filter_is_bound_as_query_param() -> None:
+    acl = [f"external_group:group_{i}" for i in range(500)] + ["PUBLIC"]
+    filters = IndexFilters(access_control_list=acl)
+
+    inline_filters = build_vespa_filters(filters)
+    assert inline_filters.count("access_control_list contains") == len(acl)
+
+    with patch.object(vespa_request_builders, "ENABLE_VESPA_COMPACT_ACL_FILTER", True):
+        query_params: dict[str, str | int | float] = {}
+        compact_filters = build_vespa_filters(filters, query_params=query_params)
+        # without query params to bind to, the filter stays inline
+        assert build_vespa_filters(filters) == inline_filters
+
+    assert compact_filters == (
+        "!(hidden=true) and weightedSet(access_control_list, @acl_entries) and "
+    )
+    assert set(json.loads(str(query_params["acl_entries"]))) == set(acl)
@@ -0,0 +1,50 @@
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from onyx.document_index.vespa.shared_utils.utils import get_shared_vespa_http_client
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client_stats
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def local_server_url() -> Generator[str, None, None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_vespa_http_client_reuses_connections(local_server_url: str) -> None:
+    client = get_shared_vespa_http_client(http2=False)
+    assert get_shared_vespa_http_client(http2=False) is client
+
+    stats = get_vespa_http_client_stats()
+    requests_before = stats.requests
+    connections_before = stats.new_connections
+
+    for _ in range(5):
+        client.get(local_server_url).raise_for_status()
+
+    assert stats.requests - requests_before == 5
+    assert stats.new_connections - connections_before == 1
+    assert not client.is_closed
@@ -0,0 +1,45 @@
+from collections.abc import Generator
+
+import litellm
+import pytest
+
+from onyx.llm import utils as llm_utils
+from onyx.llm.utils import get_max_input_tokens
+from onyx.llm.utils import get_model_map
+from onyx.llm.utils import refresh_model_map
+
+
+@pytest.fixture
+def model_cost(monkeypatch: pytest.MonkeyPatch) -> Generator[dict, None, None]:
+    model_cost = {
+        "openai/gpt-test": {"max_input_tokens": 100_000, "max_tokens": 4_000},
+        "llama-test": {"max_tokens": 8_000},
+    }
+    monkeypatch.setattr(litellm, "model_cost", model_cost)
+    monkeypatch.setattr(llm_utils, "GEN_AI_MAX_TOKENS", None)
+    refresh_model_map()
+    yield model_cost
+    refresh_model_map()
+
+
+def test_model_map_is_built_once(model_cost: dict) -> None:
+    model_map = get_model_map()
+    assert get_model_map() is model_map
+    assert model_map["llama-test"]["max_tokens"] == 8_000
+
+    # read only, and a copy of the litellm entries
+    with pytest.raises(TypeError):
+        model_map["llama-test"]["max_tokens"] = 1  # type: ignore[index]
+    model_cost["llama-test"]["max_tokens"] = 16_000
+    assert get_model_map()["llama-test"]["max_tokens"] == 8_000
+
+    refresh_model_map()
+    assert get_model_map()["llama-test"]["max_tokens"] == 16_000
+
+
+def test_max_input_tokens_lookup_fallbacks(model_cost: dict) -> None:
+    assert get_max_input_tokens("gpt-test", "openai", output_tokens=0) == 100_000
+    # extra provider prefix from a model proxy
+    assert get_max_input_tokens("proxy/gpt-test", "openai", output_tokens=0) == 100_000
+    # ollama tags
+    assert get_max_input_tokens("llama-test:8b", "ollama", output_tokens=0) == 8_000
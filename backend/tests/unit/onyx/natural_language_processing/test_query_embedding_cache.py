@@ -0,0 +1,82 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.natural_language_processing import query_embedding_cache
+from onyx.natural_language_processing.query_embedding_cache import embed_queries
+from shared_configs.enums import EmbedTextType
+from tests.unit.onyx.conftest import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(fake_redis: FakeRedis) -> Generator[FakeRedis, None, None]:
+    def _get_redis_client(**kwargs: Any) -> FakeRedis:
+        return fake_redis
+
+    query_embedding_cache._local_cache.clear()
+    with patch.object(query_embedding_cache, "QUERY_EMBEDDING_CACHE_TTL", 60), patch(
+        "onyx.natural_language_processing.query_embedding_cache.get_redis_client",
+        _get_redis_client,
+    ):
+        yield fake_redis
+    query_embedding_cache._local_cache.clear()
+
+
+def _mock_embedding_model(query_prefix: str | None = None) -> Mock:
+    model = Mock()
+    model.model_name = "test-model"
+    model.provider_type = None
+    model.normalize = True
+    model.query_prefix = query_prefix
+    model.api_url = None
+    model.deployment_name = None
+    model.encode.side_effect = lambda texts, **kwargs: [
+        [float(len(text)), 0.5] for text in texts
+    ]
+    return model
+
+
+def test_repeated_queries_skip_the_model(fake_redis: FakeRedis) -> None:
+    model = _mock_embedding_model()
+
+    assert embed_queries(["a", "bb", "a"], model, search_settings_id=1) == [
+        [1.0, 0.5],
+        [2.0, 0.5],
+        [1.0, 0.5],
+    ]
+    model.encode.assert_called_once_with(["a", "bb"], text_type=EmbedTextType.QUERY)
+    assert len(fake_redis.entries) == 2
+
+    # another worker only shares the Redis entries
+    query_embedding_cache._local_cache.clear()
+    model.encode.reset_mock()
+    assert embed_queries(["bb", "ccc"], model, search_settings_id=1) == [
+        [2.0, 0.5],
+        [3.0, 0.5],
+    ]
+    model.encode.assert_called_once_with(["ccc"], text_type=EmbedTextType.QUERY)
+    # one read and one write per call, whatever the number of queries
+    assert fake_redis.round_trips == 4
+
+
+def test_search_settings_change_invalidates(fake_redis: FakeRedis) -> None:
+    embed_queries(["a"], _mock_embedding_model(), search_settings_id=1)
+
+    new_settings_model = _mock_embedding_model()
+    embed_queries(["a"], new_settings_model, search_settings_id=2)
+    new_settings_model.encode.assert_called_once()
+
+    prefixed_model = _mock_embedding_model(query_prefix="query: ")
+    embed_queries(["a"], prefixed_model, search_settings_id=2)
+    prefixed_model.encode.assert_called_once()
+
+
+def test_redis_errors_fall_back_to_the_model(fake_redis: FakeRedis) -> None:
+    fake_redis.fail = True
+    model = _mock_embedding_model()
+
+    assert embed_queries(["a"], model, search_settings_id=1) == [[1.0, 0.5]]
+    model.encode.assert_called_once()
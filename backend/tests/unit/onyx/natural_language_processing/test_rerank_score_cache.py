@@ -0,0 +1,88 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.natural_language_processing import rerank_score_cache
+from onyx.natural_language_processing.rerank_score_cache import rerank_passages
+from tests.unit.onyx.conftest import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(fake_redis: FakeRedis) -> Generator[FakeRedis, None, None]:
+    def _get_redis_client(**kwargs: Any) -> FakeRedis:
+        return fake_redis
+
+    with patch.object(rerank_score_cache, "RERANK_SCORE_CACHE_TTL", 60), patch(
+        "onyx.natural_language_processing.rerank_score_cache.get_redis_client",
+        _get_redis_client,
+    ):
+        yield fake_redis
+
+
+def _mock_reranking_model(model_name: str = "test-reranker") -> Mock:
+    model = Mock()
+    model.model_name = model_name
+    model.provider_type = None
+    model.api_url = None
+    model.predict.side_effect = lambda query, passages: [
+        float(len(passage)) for passage in passages
+    ]
+    return model
+
+
+def test_only_unscored_passages_are_reranked(fake_redis: FakeRedis) -> None:
+    model = _mock_reranking_model()
+
+    assert rerank_passages("query", ["a", "bb"], ["doc__0", "doc__1"], model) == [
+        1.0,
+        2.0,
+    ]
+    # the next page adds a new chunk, the already scored ones come from the cache
+    assert rerank_passages(
+        "query", ["bb", "ccc", "a"], ["doc__1", "doc__2", "doc__0"], model
+    ) == [2.0, 3.0, 1.0]
+
+    assert model.predict.call_count == 2
+    assert model.predict.call_args.kwargs["passages"] == ["ccc"]
+    # one read and one write per search
+    assert fake_redis.round_trips == 4
+    # every score is its own entry with its own expiry
+    assert len(fake_redis.entries) == 3
+    assert set(fake_redis.ttls.values()) == {60}
+
+
+def test_changed_content_query_or_model_miss(fake_redis: FakeRedis) -> None:
+    model = _mock_reranking_model()
+    rerank_passages("query", ["a"], ["doc__0"], model)
+
+    rerank_passages("query", ["a updated"], ["doc__0"], model)
+    rerank_passages("other query", ["a"], ["doc__0"], model)
+    other_model = _mock_reranking_model("other-reranker")
+    rerank_passages("query", ["a"], ["doc__0"], other_model)
+
+    assert model.predict.call_count == 3
+    assert other_model.predict.call_count == 1
+
+
+def test_redis_errors_fall_back_to_the_model(fake_redis: FakeRedis) -> None:
+    fake_redis.fail = True
+    model = _mock_reranking_model()
+
+    assert rerank_passages("query", ["a", "bb"], ["doc__0", "doc__1"], model) == [
+        1.0,
+        2.0,
+    ]
+    model.predict.assert_called_once()
+
+
+def test_disabled_cache_calls_model(fake_redis: FakeRedis) -> None:
+    model = _mock_reranking_model()
+    with patch.object(rerank_score_cache, "RERANK_SCORE_CACHE_TTL", 0):
+        rerank_passages("query", ["a"], ["doc__0"], model)
+        rerank_passages("query", ["a"], ["doc__0"], model)
+
+    assert model.predict.call_count == 2
+    assert fake_redis.entries == {}
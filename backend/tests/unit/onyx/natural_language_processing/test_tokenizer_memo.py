@@ -0,0 +1,47 @@
+from onyx.natural_language_processing.utils import BaseTokenizer
+from onyx.natural_language_processing.utils import MemoizedTokenizer
+
+
+class _WhitespaceTokenizer(BaseTokenizer):
+    def __init__(self) -> None:
+        self.num_counted = 0
+
+    def encode(self, string: str) -> list[int]:
+        self.num_counted += 1
+        return [len(word) for word in string.split()]
+
+    def tokenize(self, string: str) -> list[str]:
+        return string.split()
+
+    def decode(self, tokens: list[int]) -> str:
+        return " ".join("x" * token for token in tokens)
+
+
+def test_token_counts_are_memoized() -> None:
+    base_tokenizer = _WhitespaceTokenizer()
+    tokenizer = MemoizedTokenizer(base_tokenizer, max_entries=2)
+
+    assert tokenizer.count_tokens("a b c") == 3
+    assert tokenizer.count_tokens("a b c") == 3
+    assert base_tokenizer.num_counted == 1
+
+    # batch encoding memoizes the counts as well
+    assert tokenizer.encode_batch(["d e", "f"]) == [[1, 1], [1]]
+    base_tokenizer.num_counted = 0
+    assert tokenizer.count_tokens("d e") == 2
+    assert tokenizer.count_tokens("f") == 1
+    assert base_tokenizer.num_counted == 0
+
+    # the least recently used count was evicted
+    assert tokenizer.count_tokens("a b c") == 3
+    assert base_tokenizer.num_counted == 1
+
+
+def test_long_strings_are_not_memoized() -> None:
+    base_tokenizer = _WhitespaceTokenizer()
+    tokenizer = MemoizedTokenizer(base_tokenizer, max_entries=10)
+    long_string = "a " * MemoizedTokenizer.MAX_MEMOIZED_STRING_LENGTH
+
+    tokenizer.count_tokens(long_string)
+    tokenizer.count_tokens(long_string)
+    assert base_tokenizer.num_counted == 2
@@ -1,9 +1,11 @@
 import os
+from unittest.mock import patch
 
 import pytest
 import redis
 
 from onyx.redis.redis_pool import RedisPool
+from onyx.redis.redis_pool import TenantRedis
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -37,3 +39,21 @@ def test_redis_ssl() -> None:
 
     r = redis.Redis(connection_pool=pool)
     assert r.ping()
+
+
+def test_tenant_redis_prefixes_mget_and_pipeline_keys() -> None:
+    r = TenantRedis("tenant_1", connection_pool=redis.ConnectionPool())
+
+    pipe = r.pipeline(transaction=False)
+    pipe.set("a", "1", ex=60)
+    pipe.get("tenant_1:b")
+    assert [command[0] for command in pipe.command_stack] == [
+        ("SET", "tenant_1:a", "1", "EX", 60),
+        ("GET", "tenant_1:b"),
+    ]
+
+    with patch.object(
+        redis.Redis, "execute_command", lambda self, *args, **kwargs: args
+    ):
+        assert r.mget(["a", "b"]) == ("MGET", "tenant_1:a", "tenant_1:b")
+        assert r.mget("a", "b") == ("MGET", "tenant_1:a", "tenant_1:b")
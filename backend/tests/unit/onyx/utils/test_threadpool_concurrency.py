@@ -0,0 +1,189 @@
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from onyx.utils.threadpool_concurrency import PipelineStage
+from onyx.utils.threadpool_concurrency import run_staged_pipeline
+
+
+def test_run_staged_pipeline_preserves_order() -> None:
+    def _slow_for_even(x: int) -> int:
+        # make earlier items finish after later ones
+        if x % 2 == 0:
+            time.sleep(0.01)
+        return x * 2
+
+    results = list(
+        run_staged_pipeline(
+            source=iter(range(20)),
+            stages=[
+                PipelineStage("double", _slow_for_even, num_workers=4, queue_depth=2),
+                PipelineStage("inc", lambda x: x + 1, num_workers=2, queue_depth=2),
+            ],
+        )
+    )
+
+    assert [r.index for r in results] == list(range(20))
+    assert [r.value for r in results] == [x * 2 + 1 for x in range(20)]
+    assert all(r.error is None for r in results)
+
+
+def test_run_staged_pipeline_stage_error_skips_later_stages() -> None:
+    calls: list[int] = []
+
+    def _fail_on_three(x: int) -> int:
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    def _record(x: int) -> int:
+        calls.append(x)
+        return x
+
+    results = list(
+        run_staged_pipeline(
+            source=iter(range(5)),
+            stages=[
+                PipelineStage("fail", _fail_on_three),
+                PipelineStage("record", _record),
+            ],
+        )
+    )
+
+    assert len(results) == 5
+    assert isinstance(results[3].error, ValueError)
+    assert results[3].failed_stage == "fail"
+    assert results[3].item == 3
+    assert sorted(calls) == [0, 1, 2, 4]
+
+
+def test_run_staged_pipeline_reraises_source_error() -> None:
+    def _source() -> Iterator[int]:
+        yield 1
+        yield 2
+        raise RuntimeError("connector failed")
+
+    seen = []
+    with pytest.raises(RuntimeError, match="connector failed"):
+        for result in run_staged_pipeline(
+            source=_source(),
+            stages=[PipelineStage("noop", lambda x: x)],
+        ):
+            seen.append(result.value)
+
+    assert seen == [1, 2]
+
+
+class _ThreadKilled(BaseException):
+    pass
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_run_staged_pipeline_raises_if_a_thread_dies(num_workers: int) -> None:
+    def _die_on_two(x: int) -> int:
+        if x == 2:
+            raise _ThreadKilled()
+        return x
+
+    seen = []
+    with pytest.raises(RuntimeError, match="Pipeline thread died"):
+        for result in run_staged_pipeline(
+            source=iter(range(5)),
+            stages=[
+                PipelineStage("die", _die_on_two, num_workers=num_workers),
+                PipelineStage("noop", lambda x: x),
+            ],
+        ):
+            seen.append(result.value)
+
+    assert 2 not in seen
+
+
+def test_run_staged_pipeline_overlaps_stages() -> None:
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def _track(x: int) -> int:
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return x
+
+    start = time.monotonic()
+    list(
+        run_staged_pipeline(
+            source=iter(range(10)),
+            stages=[
+                PipelineStage("a", _track),
+                PipelineStage("b", _track),
+                PipelineStage("c", _track),
+            ],
+        )
+    )
+    elapsed = time.monotonic() - start
+
+    # serially this would take 10 * 3 * 0.02 = 0.6s
+    assert max_active > 1
+    assert elapsed < 0.5
+
+
+def test_run_staged_pipeline_is_bounded() -> None:
+    produced = 0
+
+    def _source() -> Iterator[int]:
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    results = run_staged_pipeline(
+        source=_source(),
+        stages=[PipelineStage("noop", lambda x: x, queue_depth=1)],
+        source_queue_depth=1,
+    )
+    next(results)
+    time.sleep(0.1)
+
+    # one yielded + one per queue + one held by each blocked thread
+    assert produced < 10
+    results.close()
+
+
+def test_run_staged_pipeline_bounds_out_of_order_results() -> None:
+    produced = 0
+    release_first = threading.Event()
+
+    def _source() -> Iterator[int]:
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    def _slow_first(x: int) -> int:
+        if x == 0:
+            release_first.wait(timeout=5)
+        return x
+
+    results = run_staged_pipeline(
+        source=_source(),
+        stages=[PipelineStage("slow_first", _slow_first, num_workers=2)],
+    )
+    values: list[int] = []
+    consumer = threading.Thread(
+        target=lambda: values.extend(r.value for r in results)
+    )
+    consumer.start()
+    time.sleep(0.3)
+
+    # the second worker finished everything it was allowed to while item 0 is stuck
+    assert produced < 10
+    release_first.set()
+    consumer.join(timeout=5)
+    assert values == list(range(100))